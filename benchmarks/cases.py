@@ -0,0 +1,249 @@
+import os
+import shutil
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from src.allpoints_manager import AllPointRecord, AllPointsManager
+from src.city_manager import CityManager
+from src.export import export_points
+
+STORAGES = ("records", "columnar", "mmap")
+# Сколько запросов выполняет один замер поиска
+QUERIES = 200
+# Сколько точек добавляет замер add_point (каждая — отдельная дозапись с fsync)
+ADDS = 200
+# Сколько потоков-производителей делят те же ADDS точек в замере add_point.threads
+PRODUCERS = 4
+
+
+class Case(NamedTuple):
+    """
+    Замер: setup(ctx) готовит состояние (не замеряется), run(state)
+    выполняет замеряемую операцию; ops — число операций в run.
+    kind — "points" (параметры: файл базы и тип хранилища) или "cities";
+    storages — типы хранилища, для которых замер имеет смысл.
+    """
+
+    name: str
+    kind: str
+    setup: Callable[[Dict[str, object]], object]
+    run: Callable[[object], object]
+    ops: int = 1
+    storages: Tuple[str, ...] = STORAGES
+
+
+def _copy(ctx: Dict[str, object]) -> str:
+    # Изменяющие замеры работают с копией базы во временном каталоге замера
+    path = str(ctx["points"])
+    target = os.path.join(str(ctx["tmp"]), os.path.basename(path))
+    shutil.copyfile(path, target)
+    return target
+
+
+def _manager(ctx: Dict[str, object], **kwargs) -> AllPointsManager:
+    return AllPointsManager(str(ctx["points"]), storage=str(ctx["storage"]), **kwargs)
+
+
+def _loaded(ctx: Dict[str, object]):
+    mgr = _manager(ctx)
+    # Значения для запросов — из самой базы, через равные промежутки
+    step = max(len(mgr) // QUERIES, 1)
+    sample = mgr.store.records_at(range(0, len(mgr), step))[:QUERIES]
+    return mgr, sample
+
+
+def _warm(ctx: Dict[str, object], index: str):
+    # Индекс строится в setup: замеряются только запросы
+    mgr, sample = _loaded(ctx)
+    if index == "spatial":
+        mgr.spatial_index
+    elif index == "time":
+        mgr.time_index
+    else:
+        mgr.find_ids(index, *[""] * len(mgr.indexes[index].columns))
+    return mgr, sample
+
+
+def _add_points(state):
+    mgr, points = state
+    for point in points:
+        mgr.add_point(point)
+
+
+def _add_points_threads(state):
+    # Те же точки из нескольких потоков: одновременные вызовы add_point
+    # объединяются в общие дозаписи (GroupCommit)
+    mgr, points = state
+    threads = [
+        threading.Thread(target=_add_points, args=((mgr, points[n::PRODUCERS]),))
+        for n in range(PRODUCERS)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _new_points(ctx: Dict[str, object]):
+    mgr = AllPointsManager(_copy(ctx), storage=str(ctx["storage"]))
+    step = max(len(mgr) // ADDS, 1)
+    points = [
+        AllPointRecord(dict(rec.data)) for rec in mgr.store.records_at(range(0, len(mgr), step))
+    ][:ADDS]
+    return mgr, points
+
+
+def _appended_elsewhere(ctx: Dict[str, object]):
+    # Загруженная база с индексом по городу; ADDS точек дописывает в файл
+    # другой экземпляр (как сторонний процесс) — замеряется refresh
+    mgr, points = _new_points(ctx)
+    mgr.find_ids("city", "")
+    AllPointsManager(mgr.csv_path, lazy=True).add_points(points)
+    return mgr
+
+
+def _prime_points_cache(ctx: Dict[str, object]):
+    _manager(ctx, cache=True)
+    return ctx
+
+
+def _prime_city_cache(ctx: Dict[str, object]):
+    CityManager(str(ctx["cities"]), cache=True)
+    return ctx
+
+
+def _cities_sample(ctx: Dict[str, object]):
+    mgr = CityManager(str(ctx["cities"]))
+    names = [c.orig_name for c in mgr.all_cities()]
+    step = max(len(names) // QUERIES, 1)
+    return mgr, names[::step][:QUERIES]
+
+
+def _typos(state):
+    mgr, names = state
+    for name in names:
+        mgr.suggest(name[1:] + name[0])
+
+
+CASES: List[Case] = [
+    Case("load", "points", lambda ctx: ctx, lambda ctx: _manager(ctx)),
+    Case(
+        "load_cached",
+        "points",
+        _prime_points_cache,
+        lambda ctx: _manager(ctx, cache=True),
+        storages=("columnar",),
+    ),
+    Case(
+        "save",
+        "points",
+        lambda ctx: AllPointsManager(_copy(ctx), storage=str(ctx["storage"])),
+        lambda mgr: mgr.save(),
+    ),
+    Case("add_point", "points", _new_points, _add_points, ADDS),
+    Case("add_point.threads", "points", _new_points, _add_points_threads, ADDS),
+    Case("refresh", "points", _appended_elsewhere, lambda mgr: mgr.refresh()),
+    Case(
+        "find_by_city.cold",
+        "points",
+        _loaded,
+        lambda s: [s[0].find_by_city(r.city) for r in s[1][:1]],
+    ),
+    Case(
+        "find_by_city",
+        "points",
+        lambda ctx: _warm(ctx, "city"),
+        lambda s: [s[0].find_by_city(r.city) for r in s[1]],
+        QUERIES,
+    ),
+    Case(
+        "find_by_date",
+        "points",
+        lambda ctx: _warm(ctx, "date"),
+        lambda s: [s[0].find_by_date(r.date) for r in s[1]],
+        QUERIES,
+    ),
+    Case(
+        "find_by_lon_lat",
+        "points",
+        lambda ctx: _warm(ctx, "lon_lat"),
+        lambda s: [s[0].find_by_lon_lat(r.lon, r.lat) for r in s[1]],
+        QUERIES,
+    ),
+    Case(
+        "find_within_radius",
+        "points",
+        lambda ctx: _warm(ctx, "spatial"),
+        lambda s: [s[0].find_within_radius(float(r.lat), float(r.lon), 5.0) for r in s[1]],
+        QUERIES,
+    ),
+    Case(
+        "find_nearest",
+        "points",
+        lambda ctx: _warm(ctx, "spatial"),
+        lambda s: [s[0].find_nearest(float(r.lat), float(r.lon), k=10) for r in s[1]],
+        QUERIES,
+    ),
+    Case(
+        "find_in_bbox",
+        "points",
+        lambda ctx: _warm(ctx, "spatial"),
+        lambda s: [
+            s[0].find_in_bbox(
+                float(r.lat) - 0.05, float(r.lon) - 0.05, float(r.lat) + 0.05, float(r.lon) + 0.05
+            )
+            for r in s[1]
+        ],
+        QUERIES,
+    ),
+    Case(
+        "find_between",
+        "points",
+        lambda ctx: _warm(ctx, "time"),
+        lambda s: [s[0].find_ids_between(r.date, r.date) for r in s[1]],
+        QUERIES,
+    ),
+    Case(
+        "query",
+        "points",
+        lambda ctx: _warm(ctx, "city"),
+        lambda s: [
+            s[0].query(city=r.city, date_range=(r.date, None), text="ветер") for r in s[1]
+        ],
+        QUERIES,
+    ),
+    Case(
+        "export_csv",
+        "points",
+        lambda ctx: (_manager(ctx), os.path.join(str(ctx["tmp"]), "export.csv")),
+        lambda s: export_points(s[0], s[1]),
+    ),
+    Case(
+        "export_geojson",
+        "points",
+        lambda ctx: (_manager(ctx), os.path.join(str(ctx["tmp"]), "export.geojson")),
+        lambda s: export_points(s[0], s[1]),
+    ),
+    Case("city_load", "cities", lambda ctx: ctx, lambda ctx: CityManager(str(ctx["cities"]))),
+    Case(
+        "city_load_cached",
+        "cities",
+        _prime_city_cache,
+        lambda ctx: CityManager(str(ctx["cities"]), cache=True),
+    ),
+    Case(
+        "city_search",
+        "cities",
+        _cities_sample,
+        lambda s: [s[0].search(name) for name in s[1]],
+        QUERIES,
+    ),
+    Case("city_suggest", "cities", _cities_sample, _typos, QUERIES),
+]
+
+
+def find_case(name: str) -> Optional[Case]:
+    for case in CASES:
+        if case.name == name:
+            return case
+    return None
@@ -0,0 +1,60 @@
+"""
+Сравнение двух файлов результатов benchmarks.run:
+
+    python -m benchmarks.compare results/old.json results/new.json --threshold 1.2
+
+Код возврата 1, если какой-либо замер стал медленнее более чем в threshold раз.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional, Tuple
+
+Key = Tuple[str, int, Optional[str]]
+
+
+def _load(path: str) -> Dict[Key, dict]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {(r["case"], r["size"], r["storage"]): r for r in data["results"]}
+
+
+def compare(old: Dict[Key, dict], new: Dict[Key, dict]) -> List[Tuple[Key, float, float, float]]:
+    """
+    Общие замеры двух прогонов: (ключ, секунды было, стало, отношение).
+    """
+    rows = []
+    for key in sorted(old.keys() & new.keys(), key=lambda k: (k[0], k[1], k[2] or "")):
+        before, after = old[key]["seconds"], new[key]["seconds"]
+        rows.append((key, before, after, after / before if before else float("inf")))
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Сравнение результатов замеров")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument(
+        "--threshold", type=float, default=1.2, help="Допустимое замедление (во сколько раз)"
+    )
+    args = parser.parse_args(argv)
+
+    regressions = 0
+    for (case, size, storage), before, after, ratio in compare(_load(args.old), _load(args.new)):
+        mark = ""
+        if ratio > args.threshold:
+            mark = "  ← медленнее"
+            regressions += 1
+        print(
+            f"{case:<20} {size:>9} {storage or '-':<9}"
+            f" {before:>9.4f} → {after:>9.4f} s  ×{ratio:.2f}{mark}"
+        )
+    if regressions:
+        print(f"Замедлилось замеров: {regressions}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
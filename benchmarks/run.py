@@ -0,0 +1,203 @@
+"""
+Запуск замеров на синтетических данных.
+
+    python -m benchmarks.run --sizes 10000 100000
+    python -m benchmarks.run --sizes 1000000 --cases load find_by_city
+
+Каждый замер выполняется в отдельном процессе, поэтому пик RSS относится
+только к нему. Результаты пишутся в JSON (по умолчанию
+benchmarks/results/<коммит>.json) и сравниваются benchmarks.compare.
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: пик RSS не замеряется
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+DEFAULT_SIZES = [10000, 100000]
+DEFAULT_CITIES = [10000]
+
+
+def _rss_mb() -> Optional[float]:
+    # Пиковый RSS процесса: в Linux ru_maxrss в килобайтах, в macOS — в байтах
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _measure(name: str, ctx: Dict[str, object], alloc: bool) -> Dict[str, object]:
+    """
+    Выполнить замер name в текущем (дочернем) процессе.
+    """
+    from benchmarks.cases import find_case
+
+    case = find_case(name)
+    tmp = tempfile.mkdtemp(prefix="points-bench-")
+    try:
+        ctx = dict(ctx, tmp=tmp)
+        state = case.setup(ctx)
+        gc.collect()
+        rss_before = _rss_mb()
+        started = time.perf_counter()
+        case.run(state)
+        seconds = time.perf_counter() - started
+        rss_peak = _rss_mb()
+        del state
+        alloc_peak = None
+        if alloc:
+            # Отдельный прогон: tracemalloc заметно замедляет код, и время
+            # первого прогона не должно от него зависеть
+            shutil.rmtree(tmp)
+            os.makedirs(tmp)
+            state = case.setup(ctx)
+            gc.collect()
+            tracemalloc.start()
+            case.run(state)
+            alloc_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "seconds": seconds,
+        "ops": case.ops,
+        "per_op_ms": seconds * 1000 / case.ops,
+        "peak_rss_mb": rss_peak,
+        "rss_delta_mb": None if rss_peak is None else rss_peak - rss_before,
+        "alloc_peak_mb": alloc_peak,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _meta() -> Dict[str, object]:
+    import numpy
+
+    return {
+        "commit": _git_commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def _plan(args) -> List[Dict[str, object]]:
+    """
+    Список запусков: замер × размер × хранилище, с подготовленными данными.
+    """
+    from benchmarks.cases import CASES
+    from benchmarks.synthetic import write_allpoints, write_city_txt
+
+    unknown = set(args.cases or []) - {case.name for case in CASES}
+    if unknown:
+        raise SystemExit(f"Неизвестные замеры: {', '.join(sorted(unknown))}")
+    cases = [case for case in CASES if not args.cases or case.name in args.cases]
+    os.makedirs(args.data_dir, exist_ok=True)
+    runs = []
+    for case in cases:
+        if case.kind == "points":
+            for size in args.sizes:
+                points = write_allpoints(
+                    os.path.join(args.data_dir, f"AllPoint_{size}.csv"), size
+                )
+                for storage in args.storage:
+                    if storage in case.storages:
+                        runs.append(
+                            {
+                                "case": case.name,
+                                "size": size,
+                                "storage": storage,
+                                "ctx": {"points": points, "storage": storage},
+                            }
+                        )
+        else:
+            for size in args.cities:
+                cities = write_city_txt(os.path.join(args.data_dir, f"city_{size}.txt"), size)
+                runs.append(
+                    {"case": case.name, "size": size, "storage": None, "ctx": {"cities": cities}}
+                )
+    return runs
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Замеры на синтетических данных")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Строк в AllPoint.csv"
+    )
+    parser.add_argument(
+        "--cities", type=int, nargs="+", default=DEFAULT_CITIES, help="Городов в city.txt"
+    )
+    parser.add_argument(
+        "--storage",
+        nargs="+",
+        default=["records", "columnar"],
+        choices=["records", "columnar", "mmap"],
+    )
+    parser.add_argument("--cases", nargs="+", help="Только эти замеры")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Каталог сгенерированных данных")
+    parser.add_argument("--out", help="Файл результатов (по умолчанию results/<коммит>.json)")
+    parser.add_argument(
+        "--no-alloc", action="store_true", help="Не замерять выделения памяти (tracemalloc)"
+    )
+    args = parser.parse_args(argv)
+
+    meta = _meta()
+    out = args.out or os.path.join(RESULTS_DIR, f"{meta['commit']}.json")
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for run in _plan(args):
+        # Новый процесс на каждый замер: пик RSS и кэши не переходят между ними
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=context
+        ) as pool:
+            row = pool.submit(_measure, run["case"], run["ctx"], not args.no_alloc).result()
+        row = {"case": run["case"], "size": run["size"], "storage": run["storage"], **row}
+        results.append(row)
+        print(
+            f"{row['case']:<20} {row['size']:>9} {row['storage'] or '-':<9}"
+            f" {row['seconds']:>9.4f} s {row['per_op_ms']:>10.3f} ms/op"
+            + ("" if row["peak_rss_mb"] is None else f" {row['peak_rss_mb']:>8.1f} MB RSS"),
+            flush=True,
+        )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
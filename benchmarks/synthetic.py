@@ -0,0 +1,129 @@
+import csv
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+from src.allpoints_manager import AllPointsManager
+from src.city_manager import CityManager
+from src.gauss_kruger import wgs84_to_gk
+
+# Реальный справочник: города-центры, вокруг которых генерируются точки
+REAL_CITY_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "city.txt")
+# Сколько строк генерируется и пишется за один проход
+CHUNK_ROWS = 100000
+
+_SYLLABLES_EN = ["ka", "lo", "mi", "ra", "no", "vo", "sk", "be", "tu", "gra", "dor", "zh"]
+_SYLLABLES_RU = ["ка", "ло", "ми", "ра", "но", "во", "ск", "бе", "ту", "гра", "дор", "жи"]
+_COUNTRIES = ["Россия", "Белоруссия", "Украина", "Казахстан", "Польша", "Франция"]
+_TEXTS = [
+    "Температура {t} °C, ветер {w} м/с",
+    "Осадки {w} мм, видимость {t} км",
+    "Давление 7{t} мм рт. ст., облачность {w} баллов",
+]
+
+
+def _anchors() -> List[Tuple[str, str, float, float]]:
+    manager = CityManager(REAL_CITY_FILE)
+    return [
+        (c.orig_name, c.country, c.latitude, c.longitude)
+        for c in manager.all_cities()
+        if c.latitude == c.latitude and c.longitude == c.longitude
+    ]
+
+
+def write_allpoints(path: str, rows: int, seed: int = 0) -> str:
+    """
+    Синтетический AllPoint.csv: точки вокруг реальных городов за несколько
+    лет, с X/Y СК-42, описаниями и текстом сообщения. Файл не пересоздаётся,
+    если уже есть.
+    """
+    if os.path.exists(path):
+        return path
+    rng = np.random.default_rng(seed)
+    anchors = _anchors()
+    names = [a[0] for a in anchors]
+    countries = [a[1] for a in anchors]
+    base_lat = np.array([a[2] for a in anchors])
+    base_lon = np.array([a[3] for a in anchors])
+    header = AllPointsManager(path, lazy=True).header
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for start in range(0, rows, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, rows - start)
+            city = rng.integers(0, len(anchors), n)
+            lat = base_lat[city] + rng.normal(0, 0.3, n)
+            lon = base_lon[city] + rng.normal(0, 0.5, n)
+            x, y = wgs84_to_gk(lat, lon)
+            day = rng.integers(0, 5 * 365, n)
+            minute = rng.integers(0, 24 * 60, n)
+            dates = np.datetime64("2020-01-01") + day
+            temp = rng.integers(-30, 35, n)
+            wind = rng.integers(0, 25, n)
+            text = rng.integers(0, len(_TEXTS), n)
+            for i in range(n):
+                d = str(dates[i])
+                writer.writerow(
+                    [
+                        f"{d[8:10]}.{d[5:7]}.{d[0:4]}",
+                        f"{minute[i] // 60:02d}:{minute[i] % 60:02d}",
+                        f"{lat[i]:.6f}",
+                        f"{lon[i]:.6f}",
+                        f"{x[i]:.0f}",
+                        f"{y[i]:.0f}",
+                        names[city[i]],
+                        countries[city[i]],
+                        f"{abs(temp[i])} км от г.{names[city[i]]}",
+                        f"на территории {countries[city[i]]}",
+                        _TEXTS[text[i]].format(t=temp[i], w=wind[i]),
+                    ]
+                )
+    os.replace(tmp_path, path)
+    return path
+
+
+def city_names(count: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """
+    Уникальные пары (английское, русское) название для синтетических городов.
+    """
+    rng = np.random.default_rng(seed)
+    result: List[Tuple[str, str]] = []
+    seen = set()
+    while len(result) < count:
+        parts = rng.integers(0, len(_SYLLABLES_EN), rng.integers(2, 5))
+        en = "".join(_SYLLABLES_EN[p] for p in parts).capitalize() + str(len(result))
+        if en in seen:
+            continue
+        seen.add(en)
+        ru = "".join(_SYLLABLES_RU[p] for p in parts).capitalize() + str(len(result))
+        result.append((en, ru))
+    return result
+
+
+def write_city_txt(path: str, count: int, seed: int = 0) -> str:
+    """
+    Синтетический city.txt в формате справочника: разделы стран, города
+    по алфавиту, координаты без дубликатов.
+    """
+    if os.path.exists(path):
+        return path
+    rng = np.random.default_rng(seed)
+    names = city_names(count, seed)
+    country = rng.integers(0, len(_COUNTRIES), count)
+    lat = rng.uniform(41.0, 70.0, count)
+    lon = rng.uniform(20.0, 90.0, count)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write("' Синтетический справочник для замеров\n")
+        for c, title in sorted(enumerate(_COUNTRIES), key=lambda item: item[1]):
+            f.write(f"' ================== {title.upper()} ==================\n\n")
+            ids = sorted(np.flatnonzero(country == c).tolist(), key=lambda i: names[i][0])
+            for i in ids:
+                en, ru = names[i]
+                la = f"{lat[i]:.6f}".replace(".", ",")
+                lo = f"{lon[i]:.6f}".replace(".", ",")
+                f.write(f"{en}=н.п.{ru}_{la}_{lo}_{title}__на территории {title}\n")
+    os.replace(tmp_path, path)
+    return path
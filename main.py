@@ -1,23 +1,56 @@
-import os
 import sys
 
-import customtkinter as ctk  # type: ignore
-
-from src.city_manager import CityManager
+from src.metrics import METRICS, configure as configure_metrics, metrics_file
 from src.settings_manager import SettingsManager
 
-# Настройка внешнего вида
-ctk.set_appearance_mode("System")  # Modes: "System" (standard), "Dark", "Light"
-ctk.set_default_color_theme("blue")  # Themes: "blue" (standard), "green", "dark-blue"
+# customtkinter и модули данных импортируются только при запуске окна
+# (load_gui и методы PointsApp): команды без GUI (python main.py <команда>,
+# см. src/cli.py) работают без Tk и дисплея и запускаются быстро
+ctk = None
+
+
+def load_gui():
+    global ctk
+    if ctk is None:
+        import customtkinter  # type: ignore
+
+        # Настройка внешнего вида. Modes: "System" (standard), "Dark", "Light";
+        # themes: "blue" (standard), "green", "dark-blue"
+        customtkinter.set_appearance_mode("System")
+        customtkinter.set_default_color_theme("blue")
+        ctk = customtkinter
+    return ctk
+
+
+# Колонки таблицы результатов во вкладке «Точки»: (колонка, заголовок, ширина)
+POINTS_GRID_COLUMNS = (
+    ("Data", "Дата", 80),
+    ("Time", "Время", 60),
+    ("Lat_WGS84", "Широта", 80),
+    ("Lon_WGS84", "Долгота", 80),
+    ("City_Value", "Город", 140),
+    ("Country_Value", "Страна", 100),
+    ("Description of the area", "Район", 200),
+)
+# Задачи базы точек, которые меняют хранилище и файл: пока они идут, таблица
+# и edit-поля не читают записи из главного потока
+POINTS_WRITE_TASKS = ("points_load", "points_refresh", "ingest", "process")
+
+# Как часто окно забирает у FileWatcher изменённые файлы, мс
+WATCH_CHECK_MS = 1000
 
 
 class PointsApp:
     def __init__(self):
+        load_gui()
 
         self.settings_manager = SettingsManager()
-        # Получаем путь к city.txt из настроек, иначе по умолчанию
-        city_file = self.settings_manager.get("cityDataFile", "data/city.txt")
-        self.city_manager = CityManager(city_file)
+        configure_metrics(self.settings_manager)
+        # Справочник городов загружается в фоне (см. reload_cities)
+        self.city_manager = None
+        self.allpoints_manager = None
+        # Условия последнего поиска во вкладке «Точки» (их использует «Сохранить»)
+        self.points_conditions = {}
 
         app_name = "Points Data Manager"
         width = 800
@@ -32,6 +65,132 @@ class PointsApp:
 
         self.create_widgets()
 
+        from src.gui_workers import TaskRunner
+
+        # Фоновые задачи: база точек и справочник городов — в отдельных
+        # потоках, чтобы долгая загрузка точек не задерживала поиск городов.
+        # Внутри каждого пула задачи выполняются по очереди.
+        self.points_tasks = TaskRunner(self.root.after)
+        self.city_tasks = TaskRunner(self.root.after)
+        self.reload_cities()
+
+        # Слежение за файлами точек и городов (их дописывают другие программы)
+        self.file_watcher = None
+        self.watched_points = set()
+        self.watched_city = ""
+        self.start_watching()
+        self.root.after(WATCH_CHECK_MS, self.check_watched_files)
+
+    def reload_cities(self):
+        """
+        Загрузить справочник городов в фоне; до окончания поиск городов недоступен.
+        """
+        from src.city_manager import CityManager
+
+        city_file = self.settings_manager.get("cityDataFile", "data/city.txt")
+        self.status_label.configure(text="Загрузка справочника городов...")
+
+        def done(manager):
+            self.city_manager = manager
+            # Время загрузки справочника: из кэша или разбором city.txt
+            self.status_label.configure(text=manager.load_report())
+
+        def failed(error):
+            self.status_label.configure(text=f"Ошибка загрузки городов: {error}")
+
+        self.city_tasks.submit(
+            "city_reload",
+            lambda task: CityManager(city_file, cache=True),
+            on_done=done,
+            on_error=failed,
+        )
+
+    def start_watching(self):
+        """
+        Следить за файлами базы точек и городов (watchFiles=True); изменения
+        забирает check_watched_files. Вызывается и после смены путей.
+        """
+        from src.allpoints_manager import is_sqlite_path, points_path
+        from src.file_watcher import FileWatcher
+
+        if self.file_watcher is not None:
+            self.file_watcher.stop()
+            self.file_watcher = None
+        if self.settings_manager.get("watchFiles", True) is not True:
+            return
+        points_file = points_path(self.settings_manager)
+        self.watched_points = {points_file}
+        if is_sqlite_path(points_file):
+            # В режиме WAL новые транзакции попадают в файл -wal
+            self.watched_points.add(points_file + "-wal")
+        self.watched_city = self.settings_manager.get("cityDataFile", "data/city.txt")
+        self.file_watcher = FileWatcher([*self.watched_points, self.watched_city]).start()
+
+    def check_watched_files(self):
+        # Вызывается в главном потоке по root.after: перечитывание — в фоне
+        if self.file_watcher is not None:
+            changed = set(self.file_watcher.changed())
+            if self.watched_city in changed:
+                self.refresh_cities()
+            if changed & self.watched_points:
+                self.refresh_points()
+        self.root.after(WATCH_CHECK_MS, self.check_watched_files)
+
+    def refresh_points(self):
+        """
+        Дочитать в фоне точки, дописанные в базу другими программами
+        (разбирается только новый хвост файла). Незагруженная база не читается.
+        """
+        manager = self.allpoints_manager
+        if manager is None or not manager.loaded or self.points_tasks.is_running("points_load"):
+            return
+
+        def done(added):
+            if not added:
+                return
+            text = f"Точек в базе: {len(manager)} (новых: {added})"
+            self.status_label.configure(text=text)
+            if hasattr(self, "points_state_label") and self.points_state_label.winfo_exists():
+                self.points_state_label.configure(text=text)
+
+        self.points_tasks.submit(
+            "points_refresh",
+            lambda task: manager.refresh(),
+            on_done=done,
+            on_error=lambda e: self.status_label.configure(
+                text=f"Ошибка обновления базы точек: {e}"
+            ),
+            on_finish=self._points_written,
+        )
+
+    def refresh_cities(self):
+        """
+        Перечитать справочник городов в фоне, если city.txt действительно
+        изменился (см. CityManager.reload_if_changed).
+        """
+        manager = self.city_manager
+        if (
+            manager is None
+            or manager.filepath != self.watched_city
+            or self.city_tasks.is_running("city_reload")
+        ):
+            return
+
+        def done(reloaded):
+            if reloaded:
+                self.status_label.configure(
+                    text="Справочник городов обновлён. " + manager.load_report()
+                )
+
+        self.city_tasks.submit(
+            "city_refresh",
+            lambda task: manager.reload_if_changed(),
+            on_done=done,
+            on_error=lambda e: self.status_label.configure(
+                text=f"Ошибка обновления городов: {e}"
+            ),
+        )
+
     def create_widgets(self):
         # Боковая панель
         self.sidebar_frame = ctk.CTkFrame(self.root, width=200, corner_radius=0)
@@ -67,6 +226,60 @@ class PointsApp:
         )
         self.settings_button.grid(row=4, column=0, padx=20, pady=10)
 
+        # Настройки внешнего вида
+        self.appearance_mode_label = ctk.CTkLabel(
+            self.sidebar_frame, text="Тема:", anchor="w"
+        )
+        self.appearance_mode_label.grid(row=5, column=0, padx=20, pady=(10, 0))
+
+        self.appearance_mode_optionemenu = ctk.CTkOptionMenu(
+            self.sidebar_frame,
+            values=["Light", "Dark", "System"],
+            command=self.change_appearance_mode_event,
+        )
+        self.appearance_mode_optionemenu.grid(row=6, column=0, padx=20, pady=(10, 10))
+
+        # Основная область
+        self.main_frame = ctk.CTkFrame(self.root)
+        self.main_frame.grid(
+            row=0, column=1, sticky="nsew", padx=(20, 20), pady=(20, 20)
+        )
+        self.main_frame.grid_columnconfigure(0, weight=1)
+        self.main_frame.grid_rowconfigure(1, weight=1)
+
+        # Заголовок основной области
+        self.main_title = ctk.CTkLabel(
+            self.main_frame,
+            text="Добро пожаловать в Points Manager",
+            font=ctk.CTkFont(size=24, weight="bold"),
+        )
+        self.main_title.grid(row=0, column=0, padx=20, pady=20)
+
+        # Текстовое поле для вывода информации
+        self.textbox = ctk.CTkTextbox(self.main_frame, width=400)
+        self.textbox.grid(row=1, column=0, padx=20, pady=(0, 20), sticky="nsew")
+
+        # Добавляем приветственное сообщение
+        welcome_text = """Приложение для работы с данными Points готово к использованию!
+
+Возможности:
+• Загрузка данных из CSV и JSON файлов
+• Обработка и анализ данных
+• Сохранение результатов
+
+Используйте кнопки в боковой панели для начала работы.
+        """
+        self.textbox.insert("0.0", welcome_text)
+
+        # Статус бар
+        self.status_frame = ctk.CTkFrame(self.root, height=30)
+        self.status_frame.grid(
+            row=1, column=0, columnspan=2, sticky="ew", padx=20, pady=(0, 20)
+        )
+
+        self.status_label = ctk.CTkLabel(self.status_frame, text="Готов к работе")
+        self.status_label.pack(pady=5)
+
     def open_settings_window(self):
         # Окно для настроек с вкладками
         win = ctk.CTkToplevel(self.root)
@@ -87,6 +300,11 @@ class PointsApp:
                 "Файл (база данных) для хранения всех ранее отмеченных точек (CSV, UTF-8)",
             ),
             ("cityDataFile", "Файл для хранения данных о городах (txt, UTF-8)"),
+            ("pointsStorage", "Хранение базы точек: csv, mmap или sqlite"),
+            ("pointsDatabase", "Файл базы SQLite (пусто — mainDataCSV с расширением .sqlite)"),
+            ("watchFiles", "Подхватывать изменения файлов точек и городов (True/False)"),
+            ("metricsEnabled", "Собирать статистику операций (True/False)"),
+            ("metricsFile", "Файл для выгрузки статистики (JSON)"),
         ]
         settings_frame = ctk.CTkFrame(self.tab_main)
         settings_frame.pack(fill="both", expand=True, padx=10, pady=10)
@@ -101,7 +319,7 @@ class PointsApp:
             entry.insert(0, str(value))
             entry.grid(row=row, column=0, columnspan=2, sticky="w", padx=2, pady=(0, 8))
             self.settings_entries[key] = entry
-            if key in ("rootFolder", "mainDataCSV", "cityDataFile"):
+            if key in ("rootFolder", "mainDataCSV", "cityDataFile", "pointsDatabase"):
 
                 def make_callback(entry_ref=entry, is_dir=(key == "rootFolder")):
                     import tkinter.filedialog as fd
@@ -209,19 +427,22 @@ class PointsApp:
         city_frame.grid_columnconfigure(1, weight=1)
 
         win.lift()
-        win.update()
         self.settings_window = win
 
         # === Вкладка 3: Все точки ===
-        from src.allpoints_manager import AllPointsManager
+        from src.allpoints_manager import open_points_manager, points_path
+        from src.virtual_grid import VirtualGrid
 
         self.tab_points = self.tabview.add("Точки")
         points_frame = ctk.CTkFrame(self.tab_points)
         points_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
-        # Путь к базе точек
-        points_path = self.settings_manager.get("mainDataCSV", "data/AllPoint.csv")
-        self.allpoints_manager = AllPointsManager(points_path)
+        # Путь к базе точек; сама база загружается в фоне (load_points)
+        if (
+            self.allpoints_manager is None
+            or self.allpoints_manager.csv_path != points_path(self.settings_manager)
+        ):
+            self.allpoints_manager = open_points_manager(self.settings_manager)
 
         # Фильтры поиска: сдвинуты к левому краю, друг за другом, затем кнопка поиска
         filter_label = ctk.CTkLabel(
@@ -241,7 +462,7 @@ class PointsApp:
             row=1, column=0, padx=(filter_padx, filter_padx), pady=2, sticky="e"
         )
         self.filter_date = ctk.CTkEntry(
-            points_frame, width=filter_entry_width, placeholder_text="Дата"
+            points_frame, width=filter_entry_width, placeholder_text="Дата (с .. по)"
         )
         self.filter_date.grid(
             row=1, column=1, padx=(filter_padx, filter_padx), pady=2, sticky="e"
@@ -265,38 +486,56 @@ class PointsApp:
             date = self.filter_date.get().strip()
             lat = self.filter_lat.get().strip()
             lon = self.filter_lon.get().strip()
-            # Если все фильтры пустые, не выполнять поиск и не выводить результат
-            if not (lat or lon or city or date):
-                for entry in self.point_result_entries.values():
-                    entry.delete(0, "end")
-                return
-            if lat and lon:
-                records = self.allpoints_manager.find_by_lon_lat(lon, lat)
-            elif city:
-                records = self.allpoints_manager.find_by_city(city)
-            elif date:
-                records = self.allpoints_manager.find_by_date(date)
-            else:
-                records = []
             # edit-поля: очищаем
             for entry in self.point_result_entries.values():
                 entry.delete(0, "end")
-            # Только первое совпадение
-            if records:
-                first = records[0]
-                for key, entry in self.point_result_entries.items():
-                    entry.insert(0, first.data.get(key, ""))
+            # Если все фильтры пустые (координаты — только парой), не выполнять
+            # поиск и не выводить результат
+            if not ((lat and lon) or city or date):
+                return
+            manager = self.allpoints_manager
+            from src.point_query import filter_conditions
+
+            # Дата — день целиком или диапазон "01.03.2024 06:00 .. 07.03.2024"
+            # по индексу меток времени; нераспознанная — строгое сравнение
+            conditions = filter_conditions(city, date, lat, lon)
+            self.points_conditions = conditions
+
+            def search(task):
+                from src.result_view import ResultSet
+
+                # Поиск идёт в фоне (очередь задач базы точек); заполненные
+                # фильтры объединяются по И, в результате только номера строк,
+                # записи читаются страницами при показе
+                return ResultSet(manager, manager.query(**conditions))
+
+            self.points_state_label.configure(text="Поиск...")
+            self.points_tasks.submit(
+                "points_search",
+                search,
+                on_done=self._show_points,
+                on_error=lambda e: self.points_state_label.configure(
+                    text=f"Ошибка поиска: {e}"
+                ),
+            )
 
-        search_btn = ctk.CTkButton(
+        self.points_search_btn = ctk.CTkButton(
             points_frame, text="Поиск", width=80, command=update_points_fields
         )
-        search_btn.grid(row=1, column=4, padx=(0, 2), pady=2, sticky="w")
-
-        # --- отступ между строкой поиска и результатами ---
-        spacer = ctk.CTkLabel(points_frame, text="")
-        spacer.grid(row=2, column=0, columnspan=5, pady=(10, 0))
+        self.points_search_btn.grid(row=1, column=4, padx=(0, 2), pady=2, sticky="w")
+
+        # --- все совпадения: таблица с виртуальной прокруткой ---
+        self.points_results = None
+        self.points_grid = VirtualGrid(
+            points_frame,
+            POINTS_GRID_COLUMNS,
+            visible_rows=8,
+            on_sort=self.sort_points,
+            on_select=self.show_point,
+        )
+        self.points_grid.grid(row=2, column=0, columnspan=5, sticky="w", pady=(10, 5))
 
-        # --- edit-поля для первого совпадения ---
+        # --- edit-поля для выбранного совпадения ---
         edit_labels = [
             ("Дата:", "Data"),
             ("Время:", "Time"),
@@ -312,7 +551,7 @@ class PointsApp:
         ]
         self.point_result_entries = {}
 
-        # edit-поля для первого совпадения (начиная с row=3), все одинаковой ширины
+        # edit-поля для выбранной строки (начиная с row=3), все одинаковой ширины
         for i, (label_text, key) in enumerate(edit_labels):
             label = ctk.CTkLabel(points_frame, text=label_text, anchor="w")
             label.grid(row=3 + i, column=0, sticky="w", padx=2, pady=(2, 0))
@@ -326,6 +565,191 @@ class PointsApp:
         for entry in self.point_result_entries.values():
             entry.delete(0, "end")
 
+        # Состояние базы точек (загрузка с прогрессом и отменой)
+        state_row = 3 + len(edit_labels)
+        self.points_state_label = ctk.CTkLabel(points_frame, text="", anchor="w")
+        self.points_state_label.grid(
+            row=state_row, column=0, columnspan=4, sticky="w", padx=2, pady=(10, 0)
+        )
+        self.points_cancel_btn = ctk.CTkButton(
+            points_frame,
+            text="Отмена",
+            width=80,
+            command=self.cancel_points_load,
+        )
+        self.points_cancel_btn.grid(
+            row=state_row, column=4, sticky="w", padx=(0, 2), pady=(10, 0)
+        )
+        self.load_points()
+
+        # === Вкладка 4: Диагностика ===
+        self.tab_diagnostics = self.tabview.add("Диагностика")
+        diag_frame = ctk.CTkFrame(self.tab_diagnostics)
+        diag_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        diag_frame.grid_columnconfigure(4, weight=1)
+        diag_frame.grid_rowconfigure(1, weight=1)
+
+        ctk.CTkButton(
+            diag_frame, text="Обновить", width=100, command=self.show_metrics
+        ).grid(row=0, column=0, padx=2, pady=(5, 5), sticky="w")
+        ctk.CTkButton(
+            diag_frame, text="Сбросить", width=100, command=self.reset_metrics
+        ).grid(row=0, column=1, padx=2, pady=(5, 5), sticky="w")
+        ctk.CTkButton(
+            diag_frame, text="Выгрузить в файл", width=140, command=self.dump_metrics
+        ).grid(row=0, column=2, padx=2, pady=(5, 5), sticky="w")
+        # Профиль одного действия: следующая фоновая задача (поиск, загрузка...)
+        self.profile_menu = ctk.CTkOptionMenu(
+            diag_frame,
+            values=["Без профиля", "cProfile", "tracemalloc"],
+            command=self.profile_next_action,
+        )
+        self.profile_menu.grid(row=0, column=3, padx=2, pady=(5, 5), sticky="w")
+
+        self.metrics_textbox = ctk.CTkTextbox(
+            diag_frame, font=ctk.CTkFont(family="Courier", size=12), wrap="none"
+        )
+        self.metrics_textbox.grid(
+            row=1, column=0, columnspan=5, sticky="nsew", padx=2, pady=(0, 5)
+        )
+        self.show_metrics()
+
+    def show_metrics(self):
+        self.metrics_textbox.delete("0.0", "end")
+        if not METRICS.enabled:
+            self.metrics_textbox.insert(
+                "0.0", "Сбор статистики выключен (metricsEnabled=True в настройках).\n\n"
+            )
+        self.metrics_textbox.insert("end", METRICS.report())
+
+    def reset_metrics(self):
+        METRICS.reset()
+        self.show_metrics()
+
+    def dump_metrics(self):
+        try:
+            path = METRICS.dump(metrics_file(self.settings_manager))
+        except OSError as e:
+            self.status_label.configure(text=f"Ошибка записи статистики: {e}")
+            return
+        self.status_label.configure(text=f"Статистика сохранена: {path}")
+
+    def profile_next_action(self, choice: str):
+        mode = {"cProfile": "cprofile", "tracemalloc": "tracemalloc"}.get(choice)
+        METRICS.profile_next(mode)
+        if mode is not None:
+            self.status_label.configure(
+                text=f"Следующее действие будет профилировано ({choice})."
+            )
+
+    def _show_points(self, results):
+        # Таблица запрашивает у результата только видимые строки
+        self.points_results = results
+        self.points_state_label.configure(text=f"Найдено точек: {len(results)}")
+        self.points_grid.set_sort_marker(results.sort_column, results.descending)
+        columns = [key for key, _, _ in POINTS_GRID_COLUMNS]
+        self.points_grid.set_source(
+            len(results),
+            lambda start, count: (
+                [] if self._points_writing() else results.page(start, count, columns)
+            ),
+        )
+        if len(results):
+            self.show_point(0)
+
+    def _points_writing(self) -> bool:
+        return any(self.points_tasks.is_running(name) for name in POINTS_WRITE_TASKS)
+
+    def _points_written(self):
+        # Задача, менявшая базу, завершилась: страницы результата читаются заново
+        results = getattr(self, "points_results", None)
+        if results is None or self._points_writing() or not self.points_grid.winfo_exists():
+            return
+        results.invalidate()
+        self.points_grid.refresh()
+
+    def show_point(self, index: int):
+        """
+        Показать строку index результата поиска в edit-полях (пока базу
+        меняет фоновая задача, записи не читаются).
+        """
+        if self._points_writing():
+            return
+        record = self.points_results.record(index)
+        for key, entry in self.point_result_entries.items():
+            entry.delete(0, "end")
+            entry.insert(0, record.data.get(key, ""))
+
+    def sort_points(self, column: str):
+        """
+        Сортировка результата по колонке (повторный щелчок — в обратном порядке).
+        Порядок колонки вычисляется в фоне один раз и далее переиспользуется.
+        """
+        results = self.points_results
+        if results is None or not len(results):
+            return
+        descending = results.sort_column == column and not results.descending
+        self.points_state_label.configure(text="Сортировка...")
+
+        def done(ids):
+            # Порядок считается в фоне, а применяется здесь: таблица тем
+            # временем читает страницы прежнего порядка
+            results.set_order(ids, column, descending)
+            self._show_points(results)
+
+        self.points_tasks.submit(
+            "points_sort",
+            lambda task: results.sorted_ids(column, descending),
+            on_done=done,
+        )
+
+    def load_points(self):
+        """
+        Загрузить базу точек в фоне; пока идёт загрузка, вкладка «Точки»
+        показывает прогресс, поиск недоступен.
+        """
+        manager = self.allpoints_manager
+        if manager.loaded:
+            self.points_state_label.configure(text=f"Точек в базе: {len(manager)}")
+            self.points_cancel_btn.configure(state="disabled")
+            return
+        self.points_search_btn.configure(state="disabled")
+        self.points_cancel_btn.configure(state="normal")
+        self.points_state_label.configure(text="Загрузка базы точек...")
+
+        def progress(fraction, message):
+            self.points_state_label.configure(
+                text=f"Загрузка базы точек: {fraction:.0%}. {message}"
+            )
+
+        def finish(loaded):
+            self.points_search_btn.configure(state="normal")
+            self.points_cancel_btn.configure(state="disabled")
+            if loaded:
+                self.points_state_label.configure(text=f"Точек в базе: {len(manager)}")
+            else:
+                self.points_state_label.configure(text="Загрузка отменена.")
+
+        def failed(error):
+            self.points_cancel_btn.configure(state="disabled")
+            self.points_state_label.configure(text=f"Ошибка загрузки базы: {error}")
+
+        self.points_tasks.submit(
+            "points_load",
+            lambda task: manager.load(task.report, lambda: task.cancelled),
+            on_done=finish,
+            on_error=failed,
+            on_progress=progress,
+            on_finish=self._points_written,
+        )
+
+    def cancel_points_load(self):
+        # Отменённая задача не доставляет результат — состояние обновляем сразу
+        if self.points_tasks.cancel("points_load"):
+            self.points_search_btn.configure(state="normal")
+            self.points_cancel_btn.configure(state="disabled")
+            self.points_state_label.configure(text="Загрузка отменена.")
+
     def city_search_action(self):
         query = self.city_search_entry.get().strip()
         # Очистить все поля
@@ -336,7 +760,27 @@ class PointsApp:
                 0, "Введите название города для поиска."
             )
             return
-        rec = self.city_manager.search(query)
+        if self.city_manager is None:
+            self.status_label.configure(text="Справочник городов ещё загружается...")
+            return
+        manager = self.city_manager
+
+        def search(task):
+            # Построение индекса нечёткого поиска при первом запросе — в фоне
+            rec = manager.search(query)
+            return rec, [] if rec is not None else manager.suggest(query, limit=5)
+
+        self.city_tasks.submit("city_search", search, on_done=self._show_city)
+
+    def _show_city(self, result):
+        rec, candidates = result
+        if rec is None and candidates:
+            # Точного совпадения нет — берём лучший из похожих вариантов
+            rec = candidates[0][0]
+            self.status_label.configure(
+                text="Точного совпадения нет. Похожие: "
+                + ", ".join(c.orig_name for c, _ in candidates)
+            )
         if rec:
             values = {
                 "orig_name": rec.orig_name,
@@ -362,62 +806,44 @@ class PointsApp:
             "Введите название города для поиска.",
         ):
             return
-        # Найти город в city_manager
-        rec = self.city_manager.find_by_eng(orig_name)
-        if not rec:
-            # Добавление нового города не реализовано (только обновление)
+        fields = {
+            "type_and_rus": values["type_and_rus"],
+            "country": values["country"],
+            "description": values["description"],
+            "region": values["region"],
+        }
+        for key in ("latitude", "longitude"):
+            try:
+                fields[key] = float(values[key].replace(",", "."))
+            except Exception:
+                pass
+        manager = self.city_manager
+        if manager is None:
             return
-        # Обновить поля объекта
-        rec.type_and_rus = values["type_and_rus"]
-        try:
-            rec.latitude = float(values["latitude"].replace(",", "."))
-        except Exception:
-            pass
-        try:
-            rec.longitude = float(values["longitude"].replace(",", "."))
-        except Exception:
-            pass
-        rec.country = values["country"]
-        rec.description = values["description"]
-        rec.region = values["region"]
-        # Сохранить изменения в файл
-        self._save_city_manager_to_file()
-
-    def _save_city_manager_to_file(self):
-        # Перезаписать city.txt с обновлёнными данными, сохраняя структуру и комментарии
-        path = self.settings_manager.get("cityDataFile", "data/city.txt")
-        # Читаем все строки
-        with open(path, encoding="utf-8") as f:
-            lines = f.readlines()
-        # Собираем новые строки
-        new_lines = []
-        for line in lines:
-            l = line.strip()
-            if not l or l.startswith("'") or l.startswith("=") or "=" not in l:
-                new_lines.append(line)
-                continue
-            orig_name, rest = l.split("=", 1)
-            rec = self.city_manager.find_by_eng(orig_name)
-            if rec:
-                # Формируем новую строку
-                parts = [
-                    rec.type_and_rus,
-                    str(rec.latitude).replace(".", ","),
-                    str(rec.longitude).replace(".", ","),
-                    rec.country,
-                    rec.description,
-                    rec.region,
-                ]
-                # Удаляем пустые поля в конце
-                while parts and parts[-1] == "":
-                    parts.pop()
-                new_line = f"{orig_name}={'_'.join(parts)}\n"
-                new_lines.append(new_line)
+        from src.city_manager import CityRecord
+
+        def update(task):
+            # Правка и запись файла — в очереди задач справочника, после поиска
+            if manager.find_by_eng(orig_name):
+                manager.update_city(orig_name, **fields)
             else:
-                new_lines.append(line)
-        # Записываем обратно
-        with open(path, "w", encoding="utf-8") as f:
-            f.writelines(new_lines)
+                # Новый город попадает в блок своей страны по алфавиту
+                fields.setdefault("latitude", 0.0)
+                fields.setdefault("longitude", 0.0)
+                manager.add_city(CityRecord(orig_name=orig_name, **fields))
+            # Сохранить изменения в файл (перезаписывается только изменённая часть)
+            manager.save()
+
+        self.city_tasks.submit(
+            f"city_update:{orig_name}",
+            update,
+            on_done=lambda _: self.status_label.configure(
+                text=f"Город {orig_name} сохранён."
+            ),
+            on_error=lambda e: self.status_label.configure(
+                text=f"Ошибка сохранения города: {e}"
+            ),
+        )
 
     def reload_settings_from_file(self):
         self.settings_manager.load()
@@ -428,6 +854,7 @@ class PointsApp:
 
     def save_settings_from_window(self):
         # Сохраняет значения из окна настроек в файл
+        old_city_file = self.settings_manager.get("cityDataFile", "data/city.txt")
         for key, entry in self.settings_entries.items():
             val = entry.get()
             if key in (
@@ -442,93 +869,167 @@ class PointsApp:
                     val = int(val)
                 except Exception:
                     pass
-            elif key in ("auto_update", "cache_enabled"):
+            elif key in ("auto_update", "cache_enabled", "metricsEnabled", "watchFiles"):
                 val = val in ("True", "true", "1")
             self.settings_manager.set(key, val)
         self.settings_manager.save()
+        configure_metrics(self.settings_manager)
         if hasattr(self, "settings_window") and self.settings_window.winfo_exists():
             self.settings_window.destroy()
         self.status_label.configure(
             text="Настройки сохранены. Перезапустите приложение для применения размеров окна и заголовка."
         )
+        if self.settings_manager.get("cityDataFile", "data/city.txt") != old_city_file:
+            self.reload_cities()
+        self.start_watching()
 
-        # Настройки внешнего вида
-        self.appearance_mode_label = ctk.CTkLabel(
-            self.sidebar_frame, text="Тема:", anchor="w"
-        )
-        self.appearance_mode_label.grid(row=5, column=0, padx=20, pady=(10, 0))
-
-        self.appearance_mode_optionemenu = ctk.CTkOptionMenu(
-            self.sidebar_frame,
-            values=["Light", "Dark", "System"],
-            command=self.change_appearance_mode_event,
-        )
-        self.appearance_mode_optionemenu.grid(row=6, column=0, padx=20, pady=(10, 10))
+    def load_data(self):
+        """Загрузка данных из rootFolder в базу точек (в фоновом потоке)"""
+        if self.points_tasks.is_running("ingest"):
+            # Повторное нажатие прерывает загрузку (уже добавленные точки остаются)
+            self.points_tasks.cancel("ingest")
+            self.status_label.configure(text="Загрузка прервана.")
+            return
+        from src.allpoints_manager import open_points_manager, points_path
+        from src.ingest import ingest_folder
 
-        # Основная область
-        self.main_frame = ctk.CTkFrame(self.root)
-        self.main_frame.grid(
-            row=0, column=1, sticky="nsew", padx=(20, 20), pady=(20, 20)
-        )
-        self.main_frame.grid_columnconfigure(0, weight=1)
-        self.main_frame.grid_rowconfigure(1, weight=1)
+        root_folder = self.settings_manager.get("rootFolder", "INPUT")
+        self.textbox.delete("0.0", "end")
+        self.textbox.insert("0.0", f"Загрузка файлов из {root_folder}...\n")
+        self.status_label.configure(text="Загрузка данных...")
+        # Та же база, что и во вкладке «Точки»: задачи базы точек выполняются
+        # по очереди, поэтому загрузка не пересекается с поиском
+        if (
+            self.allpoints_manager is None
+            or self.allpoints_manager.csv_path != points_path(self.settings_manager)
+        ):
+            self.allpoints_manager = open_points_manager(self.settings_manager)
+        manager = self.allpoints_manager
+
+        def ingest(task):
+            # Разбор идёт в пуле процессов, поток только пишет пачки в базу
+            return ingest_folder(
+                manager,
+                root_folder,
+                progress=lambda stats: task.report(
+                    stats.files / max(stats.total_files, 1), stats.summary()
+                ),
+                should_stop=lambda: task.cancelled,
+            )
 
-        # Заголовок основной области
-        self.main_title = ctk.CTkLabel(
-            self.main_frame,
-            text="Добро пожаловать в Points Manager",
-            font=ctk.CTkFont(size=24, weight="bold"),
+        def done(stats):
+            self.textbox.insert("end", stats.summary() + "\n")
+            for path, error in stats.errors:
+                self.textbox.insert("end", f"{path}: {error}\n")
+            self.status_label.configure(text="Загрузка завершена. " + stats.summary())
+
+        self.points_tasks.submit(
+            "ingest",
+            ingest,
+            on_done=done,
+            on_error=lambda e: self.status_label.configure(
+                text=f"Ошибка загрузки: {e}"
+            ),
+            on_progress=lambda fraction, message: self.status_label.configure(
+                text=f"{fraction:.0%}. {message}"
+            ),
+            on_finish=self._points_written,
         )
-        self.main_title.grid(row=0, column=0, padx=20, pady=20)
 
-        # Текстовое поле для вывода информации
-        self.textbox = ctk.CTkTextbox(self.main_frame, width=400)
-        self.textbox.grid(row=1, column=0, padx=20, pady=(0, 20), sticky="nsew")
-
-        # Добавляем приветственное сообщение
-        welcome_text = """Приложение для работы с данными Points готово к использованию!
+    def process_data(self):
+        """Обработка данных: пересчёт и проверка координат WGS-84 ↔ СК-42 (в фоне)"""
+        manager = self.allpoints_manager
+        self.textbox.delete("0.0", "end")
+        if manager is None:
+            self.textbox.insert("0.0", "База точек не загружена.\n")
+            return
+        self.textbox.insert("0.0", "Пересчёт координат WGS-84 ↔ СК-42...\n")
+        self.status_label.configure(text="Обработка данных...")
 
-Возможности:
-• Загрузка данных из CSV и JSON файлов
-• Обработка и анализ данных
-• Сохранение результатов
+        def process(task):
+            filled = manager.fill_coordinates()
+            ids, error = manager.check_coordinates()
+            return filled, manager.store.records_at(ids.tolist()[:100]), error.tolist()
 
-Используйте кнопки в боковой панели для начала работы.
-        """
-        self.textbox.insert("0.0", welcome_text)
+        def done(result):
+            filled, bad, error = result
+            self.textbox.insert("end", f"Заполнено координат: {filled}\n")
+            self.textbox.insert(
+                "end", f"Расхождение X/Y с широтой/долготой: {len(error)} точек\n"
+            )
+            for rec, metres in zip(bad, error):
+                self.textbox.insert(
+                    "end", f"{rec.date} {rec.time} {rec.lat}, {rec.lon}: {metres:.0f} м\n"
+                )
+            self.status_label.configure(text="Обработка завершена.")
+
+        self.points_tasks.submit(
+            "process",
+            process,
+            on_done=done,
+            on_error=lambda e: self.status_label.configure(
+                text=f"Ошибка обработки: {e}"
+            ),
+            on_finish=self._points_written,
+        )
 
-        # Статус бар
-        self.status_frame = ctk.CTkFrame(self.root, height=30)
-        self.status_frame.grid(
-            row=1, column=0, columnspan=2, sticky="ew", padx=20, pady=(0, 20)
+    def save_data(self):
+        """Выгрузка точек (по условиям последнего поиска во вкладке «Точки») в файл"""
+        if self.points_tasks.is_running("export"):
+            # Повторное нажатие прерывает выгрузку (прежний файл не меняется)
+            self.points_tasks.cancel("export")
+            self.status_label.configure(text="Выгрузка прервана.")
+            return
+        import tkinter.filedialog as fd
+
+        from src.allpoints_manager import open_points_manager, points_path
+        from src.export import export_points
+
+        path = fd.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[
+                ("CSV", "*.csv"),
+                ("TXT (формат city.txt)", "*.txt"),
+                ("GeoJSON", "*.geojson"),
+            ],
         )
+        if not path:
+            return
+        if (
+            self.allpoints_manager is None
+            or self.allpoints_manager.csv_path != points_path(self.settings_manager)
+        ):
+            self.allpoints_manager = open_points_manager(self.settings_manager)
+        manager = self.allpoints_manager
+        conditions = self.points_conditions
+        self.textbox.delete("0.0", "end")
+        self.textbox.insert("0.0", f"Выгрузка точек в {path}...\n")
+        self.status_label.configure(text="Сохранение данных...")
 
-        self.status_label = ctk.CTkLabel(self.status_frame, text="Готов к работе")
-        self.status_label.pack(pady=5)
+        def export(task):
+            ids = manager.query(**conditions) if conditions else None
 
-    def load_data(self):
-        """Загрузка данных"""
-        self.textbox.delete("0.0", "end")
-        self.textbox.insert(
-            "0.0", "Функция загрузки данных будет реализована здесь...\n"
-        )
-        self.status_label.configure(text="Загрузка данных...")
+            def progress(done, total):
+                task.check_cancelled()
+                task.report(done / max(total, 1), f"Выгружено точек: {done} из {total}")
 
-    def process_data(self):
-        """Обработка данных"""
-        self.textbox.delete("0.0", "end")
-        self.textbox.insert(
-            "0.0", "Функция обработки данных будет реализована здесь...\n"
-        )
-        self.status_label.configure(text="Обработка данных...")
+            return export_points(manager, path, ids, progress=progress)
 
-    def save_data(self):
-        """Сохранение данных"""
-        self.textbox.delete("0.0", "end")
-        self.textbox.insert(
-            "0.0", "Функция сохранения данных будет реализована здесь...\n"
+        def done(count):
+            self.textbox.insert("end", f"Выгружено точек: {count}\n")
+            self.status_label.configure(text=f"Сохранено: {path}")
+
+        self.points_tasks.submit(
+            "export",
+            export,
+            on_done=done,
+            on_error=lambda e: self.status_label.configure(
+                text=f"Ошибка сохранения: {e}"
+            ),
+            on_progress=lambda fraction, message: self.status_label.configure(
+                text=f"{fraction:.0%}. {message}"
+            ),
         )
-        self.status_label.configure(text="Сохранение данных...")
 
     def change_appearance_mode_event(self, new_appearance_mode: str):
         """Изменение темы приложения"""
@@ -537,8 +1038,29 @@ class PointsApp:
     def run(self):
         """Запуск приложения"""
         self.root.mainloop()
+        if self.file_watcher is not None:
+            self.file_watcher.stop()
+        if METRICS.enabled:
+            # Статистика сеанса выгружается при закрытии окна
+            try:
+                METRICS.dump(metrics_file(self.settings_manager))
+            except OSError:
+                pass
 
 
-if __name__ == "__main__":
+def main(argv=None) -> int:
+    """
+    Без аргументов — окно приложения, с аргументами — команда без GUI.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        from src.cli import main as cli_main
+
+        return cli_main(argv)
     app = PointsApp()
     app.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
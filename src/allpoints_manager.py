@@ -1,5 +1,103 @@
+import calendar
 import csv
-from typing import Dict, List, Optional
+import datetime
+import io
+import math
+import os
+import tempfile
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from src.file_lock import FileLock, GroupCommit, keep_file_mode
+from src.metrics import METRICS, timed
+from src.point_indexes import INDEX_COLUMNS, HashIndex
+
+# Форматы колонок Data и Time, которые распознаются при разборе меток времени
+DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%d.%m.%y")
+TIME_FORMATS = ("%H:%M:%S", "%H:%M")
+
+# Направления (по 45°) для описания положения точки относительно города
+DIRECTION_NAMES = (
+    "сев.",
+    "сев.-вост.",
+    "вост.",
+    "юго-вост.",
+    "юж.",
+    "юго-зап.",
+    "зап.",
+    "сев.-зап.",
+)
+
+# Колонки базы точек в порядке файла AllPoint.csv
+POINT_COLUMNS = (
+    "Data",
+    "Time",
+    "Lat_WGS84",
+    "Lon_WGS84",
+    "X_SK-42_Gauss_Kruger",
+    "Y_SK-42_Gauss_Kruger",
+    "City_Value",
+    "Country_Value",
+    "Description of the area",
+    "Description of the region",
+    "Original text",
+)
+
+# Расширения файла базы точек в SQLite (см. sqlite_store)
+SQLITE_EXTENSIONS = (".sqlite", ".sqlite3", ".db")
+
+# Сколько строк CSV разбирается перед передачей пачки в хранилище
+LOAD_BATCH_SIZE = 65536
+
+# Сколько последних байт корректной части файла запоминается, чтобы refresh
+# отличил дозапись от правки или замены файла
+TAIL_MARK_SIZE = 256
+
+# Колонки прямоугольных координат СК-42 (Гаусс-Крюгер), число знаков после
+# запятой при их заполнении и допустимое расхождение с WGS-84 при проверке
+GK_X = "X_SK-42_Gauss_Kruger"
+GK_Y = "Y_SK-42_Gauss_Kruger"
+GK_DECIMALS = 0
+WGS84_DECIMALS = 6
+GK_TOLERANCE_M = 50.0
+
+
+def parse_date(value: str) -> Optional[int]:
+    """
+    Дата из колонки Data в секундах от 1970-01-01 (UTC) или None.
+    """
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return calendar.timegm(parsed.timetuple())
+    return None
+
+
+def parse_time(value: str) -> Optional[int]:
+    """
+    Время из колонки Time в секундах от начала суток или None.
+    """
+    value = value.strip()
+    for fmt in TIME_FORMATS:
+        try:
+            parsed = datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+    return None
 
 
 class AllPointRecord:
@@ -55,65 +153,1122 @@ class AllPointRecord:
         return self.data.get("Original text", "")
 
 
-class AllPointsManager:
-    def find_by_lon_lat(self, lon: str, lat: str) -> List[AllPointRecord]:
-        """
-        Поиск точек по паре долгота и широта (строгое сравнение строк)
-        """
-        return [rec for rec in self.records if rec.lon == lon and rec.lat == lat]
+class RecordListStore:
+    """
+    Хранилище точек по умолчанию: список объектов AllPointRecord.
+    """
+
+    def __init__(self, header: List[str]):
+        self.header = header
+        self.records: List[AllPointRecord] = []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def append(self, rec: AllPointRecord):
+        self.records.append(rec)
+
+    def extend(self, records: Iterable[AllPointRecord]):
+        self.records.extend(records)
 
+    def pop(self):
+        self.records.pop()
+
+    def clear(self):
+        self.records.clear()
+
+    def value(self, i: int, column: str) -> str:
+        return self.records[i].data.get(column, "")
+
+    def record(self, i: int) -> AllPointRecord:
+        return self.records[i]
+
+    def records_at(self, ids: Iterable[int]) -> List[AllPointRecord]:
+        return [self.records[i] for i in ids]
+
+    def iter_records(self) -> Iterable[AllPointRecord]:
+        return iter(self.records)
+
+    def column_values(self, column: str, start: int = 0) -> List[str]:
+        return [rec.data.get(column) or "" for rec in self.records[start:]]
+
+    def set_values(self, column: str, ids: Sequence[int], values: Sequence[str]):
+        for i, value in zip(ids, values):
+            self.records[i].data[column] = value
+
+    def find_where(self, conditions: Dict[str, str]) -> List[int]:
+        items = list(conditions.items())
+        return [
+            i
+            for i, rec in enumerate(self.records)
+            if all(rec.data.get(column, "") == value for column, value in items)
+        ]
+
+
+class FileChangedError(RuntimeError):
+    """
+    Файл базы перезаписан другим процессом после загрузки: правки в памяти
+    с ним не совместить — перечитайте базу (load) и повторите их.
+    """
+
+
+class AllPointsManager:
     """
     Класс для управления базой точек AllPoint.csv
+
+    Новые точки дописываются в конец файла (append-only) с fsync, без
+    перезаписи всей базы. Полная перезапись файла выполняется только
+    в compact() (её используют clear() и сохранение правок).
+
+    storage="records" хранит точки списком AllPointRecord, storage="columnar"
+    использует колоночное хранилище на numpy (ColumnarPointStore), которое
+    требует в разы меньше памяти на больших базах. storage="mmap" отображает
+    файл в память и хранит только смещения строк (MappedPointStore): запись
+    декодируется, только когда к ней обращаются.
+
+    indexes — имена хеш-индексов для find_* (см. INDEX_COLUMNS: "city",
+    "date", "lon_lat"); по умолчанию включены все. Индекс строится при первом
+    поиске по нему и далее обновляется в add_point. Поиск без индекса
+    выполняется полным просмотром.
+
+    Пространственный индекс (find_within_radius, find_nearest, find_in_bbox)
+    строится при первом таком запросе и далее обновляется в add_point.
+    Так же устроен индекс меток времени Data+Time (find_between): отсортированный
+    массив, по которому диапазон дат и времени находится двоичным поиском.
+
+    lazy=True — файл не читается в конструкторе: iter_records и add_point
+    работают напрямую с диском, остальные операции загружают базу при
+    первом обращении.
+
+    cache=True (только для storage="columnar") — после разбора CSV рядом
+    сохраняется двоичный кэш колонок (<файл>.pcache, см. points_cache), и
+    следующая загрузка отображает его в память вместо разбора CSV. Строки,
+    дописанные в файл после сохранения кэша, дочитываются из CSV.
+
+    Строки, дописанные в файл другими процессами, подхватывает refresh:
+    разбирается только новый хвост файла, построенные индексы дополняются.
+
+    Несколько процессов могут писать в один файл: дозапись и compact идут
+    под блокировкой файла (FileLock, <файл>.lock) и сначала дочитывают
+    чужие строки, так что обрыв и перезапись не затирают их. Чтение берёт
+    блокировку только на время открытия файла и дальше читает срез того
+    размера, который был в этот момент. add_point из разных потоков
+    процесса объединяются в одну дозапись (GroupCommit).
     """
 
-    def __init__(self, csv_path: str):
+    def __init__(
+        self,
+        csv_path: str,
+        storage: str = "records",
+        indexes: Optional[Iterable[str]] = None,
+        lazy: bool = False,
+        cache: bool = False,
+    ):
         self.csv_path = csv_path
-        self.header = [
-            "Data",
-            "Time",
-            "Lat_WGS84",
-            "Lon_WGS84",
-            "X_SK-42_Gauss_Kruger",
-            "Y_SK-42_Gauss_Kruger",
-            "City_Value",
-            "Country_Value",
-            "Description of the area",
-            "Description of the region",
-            "Original text",
-        ]
-        self.records: List[AllPointRecord] = []
-        self._load()
+        self.header = list(POINT_COLUMNS)
+        if storage == "records":
+            self.store = RecordListStore(self.header)
+        elif storage == "columnar":
+            from src.columnar_store import ColumnarPointStore
+
+            self.store = ColumnarPointStore(self.header)
+        elif storage == "mmap":
+            from src.mapped_store import MappedPointStore
+
+            self.store = MappedPointStore(self.header)
+        else:
+            raise ValueError(f"Неизвестный тип хранилища: {storage}")
+        if cache and storage != "columnar":
+            raise ValueError("Кэш поддерживается только для storage=\"columnar\"")
+        self.storage = storage
+        self.cache = cache
+        self.indexes: Dict[str, HashIndex] = {}
+        for name in INDEX_COLUMNS if indexes is None else indexes:
+            if name not in INDEX_COLUMNS:
+                raise ValueError(f"Неизвестный индекс: {name}")
+            self.indexes[name] = HashIndex(INDEX_COLUMNS[name])
+        self._spatial = None
+        self._time_index = None
+        # Индекс близких координат для проверки дубликатов (см. dedup)
+        self._dedup_index = None
+        # Порядки сортировки по колонкам для результатов поиска (см. sort_rank)
+        self._sort_ranks: Dict[str, object] = {}
+        # Размер корректной части файла в байтах (после него — оборванная запись)
+        self._valid_size = 0
+        # Количество байт оборванной записи в конце файла (обрезаются при дозаписи)
+        self.torn_bytes = 0
+        # Последняя строка файла не завершена переводом строки, но запись целая
+        self._missing_newline = False
+        # (st_dev, st_ino) файла и последние байты его корректной части
+        # на момент загрузки или нашей записи (см. refresh)
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._tail_mark = b""
+        self.lock = FileLock(csv_path)
+        self._commits = GroupCommit(self._write_batch)
+        self.loaded = False
+        if not lazy:
+            self._load()
+
+    @property
+    def records(self) -> List[AllPointRecord]:
+        """
+        Все записи списком. Для колоночного хранилища записи создаются
+        заново при каждом обращении — используйте find_* и get_all.
+        """
+        self._ensure_loaded()
+        if isinstance(self.store, RecordListStore):
+            return self.store.records
+        return list(self.store.iter_records())
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self.store)
 
     def _load(self):
-        self.records.clear()
+        self._load_rows()
+        self._remember_file()
+        self.rebuild_indexes()
+
+    def load(
+        self,
+        progress: Optional[Callable[[float, str], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> bool:
+        """
+        Загрузить (перечитать) базу с диска. progress(доля, сообщение)
+        вызывается после каждой пачки строк; should_stop позволяет прервать
+        загрузку — тогда база остаётся незагруженной и возвращается False.
+        """
+        if not self._load_rows(progress, should_stop):
+            self.store.clear()
+            self.loaded = False
+            return False
+        self._remember_file()
+        self.rebuild_indexes()
+        return True
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self._load()
+
+    def rebuild_indexes(self):
+        """
+        Сбросить индексы (нужно после правки записей на месте); каждый индекс
+        строится заново при первом поиске по нему.
+        """
+        for index in self.indexes.values():
+            index.reset()
+        self._spatial = None
+        self._time_index = None
+        self._dedup_index = None
+        self._sort_ranks.clear()
+
+    @property
+    def spatial_index(self):
+        """
+        Пространственный индекс точек (SpatialIndex), строится при первом обращении.
+        """
+        self._ensure_loaded()
+        if self._spatial is None:
+            from src.spatial_index import SpatialIndex, store_coordinates
+
+            self._spatial = SpatialIndex()
+            self._spatial.extend(*store_coordinates(self.store))
+        return self._spatial
+
+    @property
+    def time_index(self):
+        """
+        Индекс меток времени Data+Time (TimeIndex), строится при первом обращении.
+        """
+        self._ensure_loaded()
+        if self._time_index is None:
+            from src.time_index import TimeIndex
+
+            self._time_index = TimeIndex()
+            self._time_index.build(self.store)
+        return self._time_index
+
+    @timed("points.load")
+    def _load_rows(
+        self,
+        progress: Optional[Callable[[float, str], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> bool:
+        self.store.clear()
+        self._valid_size = 0
+        self.torn_bytes = 0
+        self._missing_newline = False
+        self.loaded = True
+        if not os.path.exists(self.csv_path):
+            return True  # Файл может отсутствовать при первом запуске
+        if self.storage == "mmap":
+            # Разметка — под блокировкой чтения: файл не заменят, пока его
+            # отображают (дозаписи после размера разметки не видны)
+            with self.lock.shared():
+                scan = self.store.attach(self.csv_path)
+            self._valid_size = scan.valid_size
+            self.torn_bytes = scan.torn_bytes
+            self._missing_newline = scan.missing_newline
+            METRICS.add("points.load", rows=len(self.store), bytes_read=scan.valid_size)
+            return True
+        start = 0
+        if self.cache:
+            from src.points_cache import load_cache
+
+            hit = load_cache(self.csv_path, self.header)
+            if hit is not None:
+                self.store = hit.store
+                self._valid_size = hit.valid_size
+                self.torn_bytes = hit.torn_bytes
+                self._missing_newline = hit.missing_newline
+                if not hit.prefix_only:
+                    METRICS.add("points.load", rows=len(self.store))
+                    return True
+                start = hit.valid_size  # дочитать строки, дописанные после кэша
         try:
-            with open(self.csv_path, encoding="utf-8", newline="") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    self.records.append(AllPointRecord(row))
+            f, size = self._open_snapshot()
         except FileNotFoundError:
-            pass  # Файл может отсутствовать при первом запуске
+            return True
+        with f:
+            total = size or 1
+            lines = _LineReader(f, start, size)
+            fieldnames = self.header if start else None
+            batch: List[AllPointRecord] = []
+            for rec in self._scan(f, lines, fieldnames):
+                batch.append(rec)
+                if len(batch) >= LOAD_BATCH_SIZE:
+                    self.store.extend(batch)
+                    batch = []
+                    if should_stop is not None and should_stop():
+                        return False
+                    if progress is not None:
+                        progress(lines.offset / total, f"Прочитано строк: {len(self.store)}")
+            self.store.extend(batch)
+            if lines.torn_start is None:
+                self._valid_size = lines.offset
+                self._missing_newline = lines.missing_newline
+            else:
+                self._valid_size = lines.torn_start
+                self.torn_bytes = lines.offset - lines.torn_start
+            METRICS.add("points.load", rows=len(self.store), bytes_read=lines.offset - start)
+            # Ключ кэша — по разобранному срезу открытого файла, а не по
+            # текущему размеру: чужие дозаписи после среза кэш не покрывает
+            self._save_cache(f)
+        return True
 
-    def save(self):
-        with open(self.csv_path, "w", encoding="utf-8", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=self.header)
+    def _save_cache(self, f: Optional[BinaryIO] = None):
+        if self.cache:
+            from src.points_cache import save_cache
+
+            save_cache(
+                self.csv_path,
+                self.store,
+                {
+                    "valid_size": self._valid_size,
+                    "torn_bytes": self.torn_bytes,
+                    "missing_newline": self._missing_newline,
+                },
+                f,
+            )
+
+    def _open_snapshot(self) -> Tuple[BinaryIO, int]:
+        """
+        Открыть файл для чтения согласованного среза: под блокировкой
+        чтения запоминается его размер, дальше читается только он. Чужие
+        дозаписи идут после этого размера, а замена файла при compact не
+        затрагивает уже открытый файл, так что на время самого чтения
+        блокировка не держится. Нет файла — FileNotFoundError.
+        """
+        with self.lock.shared():
+            f = open(self.csv_path, "rb")
+            return f, os.fstat(f.fileno()).st_size
+
+    def _read_tail_mark(self, f: BinaryIO) -> Tuple[Tuple[int, int], bytes]:
+        st = os.fstat(f.fileno())
+        f.seek(max(self._valid_size - TAIL_MARK_SIZE, 0))
+        return (st.st_dev, st.st_ino), f.read(min(self._valid_size, TAIL_MARK_SIZE))
+
+    def _remember_file(self):
+        # Запомнить файл после загрузки или нашей записи: refresh сравнит
+        # с ним текущее состояние файла
+        try:
+            with open(self.csv_path, "rb") as f:
+                self._file_id, self._tail_mark = self._read_tail_mark(f)
+        except FileNotFoundError:
+            self._file_id, self._tail_mark = None, b""
+
+    @timed("points.refresh", rows=lambda added: added)
+    def refresh(self) -> int:
+        """
+        Подхватить изменения файла, сделанные другими процессами. Если файл
+        только вырос (дозапись), разбираются лишь новые байты: записи
+        добавляются в хранилище, построенные индексы дополняются. Если файл
+        заменён, укорочен или изменились его последние прежние байты
+        (TAIL_MARK_SIZE), база перечитывается целиком; правка в середине
+        файла без замены не отслеживается. Возвращает число новых точек
+        (после перечитывания — всех). Незагруженная база не читается:
+        ленивый режим и так работает с диском.
+        """
+        if not self.loaded:
+            return 0
+        return self._catch_up(reload=True)
+
+    def _catch_up(self, reload: bool) -> int:
+        # Дочитать строки, дописанные в файл после загрузки или нашей
+        # записи. Файл изменён иначе: reload — перечитать его целиком,
+        # иначе — FileChangedError (правки в памяти нельзя совместить)
+        try:
+            f, size = self._open_snapshot()
+        except FileNotFoundError:
+            return 0
+        with f:
+            file_id, mark = self._read_tail_mark(f)
+            known = self._valid_size + self.torn_bytes
+            if file_id == self._file_id and size == known:
+                return 0
+            start = self._valid_size
+            appended = (
+                (start == 0 or file_id == self._file_id)
+                and size >= start
+                and mark == self._tail_mark
+            )
+            if appended and self._missing_newline:
+                # Дописывать после строки без перевода строки можно, только
+                # начав с него (так делает _append)
+                f.seek(start)
+                appended = f.read(1) in (b"\r", b"\n")
+            if appended:
+                # Начинаем с конца корректной части: оборванная запись,
+                # которую другой процесс к этому времени дописал, читается заново
+                lines = _LineReader(f, start, size)
+                points = list(self._scan(f, lines, self.header if start else None))
+                if lines.torn_start is None:
+                    self._valid_size = lines.offset
+                    self.torn_bytes = 0
+                    self._missing_newline = lines.missing_newline
+                else:
+                    self._valid_size = lines.torn_start
+                    self.torn_bytes = lines.offset - lines.torn_start
+                self._file_id, self._tail_mark = self._read_tail_mark(f)
+        if not appended:
+            if not reload:
+                raise FileChangedError(
+                    f"Файл {self.csv_path} перезаписан другим процессом после загрузки"
+                )
+            self.load()
+            return len(self.store)
+        if points:
+            self._extend_loaded(points)
+        METRICS.add("points.refresh", bytes_read=lines.offset - start)
+        return len(points)
+
+    def _scan(
+        self, f, lines: "_LineReader", fieldnames: Optional[List[str]] = None
+    ) -> Iterator[AllPointRecord]:
+        """
+        Записи файла по порядку. Последняя запись выдаётся только после проверки
+        на обрыв; итог проверки сохраняется в lines (torn_start, missing_newline).
+        fieldnames — имена колонок, если чтение начинается не с заголовка.
+        """
+        reader = csv.DictReader(lines, fieldnames=fieldnames)
+        prev: Optional[AllPointRecord] = None
+        prev_start = 0  # смещение начала последней прочитанной записи
+        for row in reader:
+            start = lines.record_start
+            lines.record_start = lines.offset
+            if prev is not None:
+                yield prev
+            prev, prev_start = AllPointRecord(row), start
+        if lines.complete:
+            if prev is not None:
+                yield prev
+            return
+        # Последняя строка не завершена переводом строки
+        if prev is None:
+            # Оборван сам заголовок — при дозаписи файл начнётся заново
+            lines.torn_start = 0
+        elif not lines.undecodable and self._is_complete(prev, f, prev_start, lines.end):
+            # Файл сохранён без завершающего перевода строки (ручная правка)
+            lines.missing_newline = True
+            yield prev
+        else:
+            # Оборванная дозапись (сбой во время add_point) — отбрасываем её,
+            # сами байты обрезаются при следующей записи
+            lines.torn_start = prev_start
+
+    def iter_records(
+        self,
+        filter: Union[None, Dict[str, str], Callable[[AllPointRecord], bool]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Iterator[AllPointRecord]:
+        """
+        Потоковое чтение записей с диска без загрузки базы в память.
+
+        filter — словарь {колонка: значение} (строгое сравнение строк) или
+        функция от AllPointRecord; columns — оставить в записях только эти колонки.
+        Оборванная последняя запись пропускается так же, как при загрузке.
+        """
+        if isinstance(filter, dict):
+            conditions = list(filter.items())
+
+            def predicate(rec: AllPointRecord) -> bool:
+                return all(rec.data.get(k, "") == v for k, v in conditions)
+
+        else:
+            predicate = filter
+        try:
+            f, size = self._open_snapshot()
+        except FileNotFoundError:
+            return
+        with f:
+            for rec in self._scan(f, _LineReader(f, 0, size)):
+                if predicate is not None and not predicate(rec):
+                    continue
+                if columns is not None:
+                    rec = AllPointRecord({c: rec.data.get(c, "") for c in columns})
+                yield rec
+
+    @staticmethod
+    def _is_complete(
+        rec: AllPointRecord, f, row_start: int, end: Optional[int] = None
+    ) -> bool:
+        # Все поля на месте и нет незакрытой кавычки
+        if None in rec.data or any(v is None for v in rec.data.values()):
+            return False
+        f.seek(row_start)
+        raw = f.read() if end is None else f.read(end - row_start)
+        return raw.count(b'"') % 2 == 0
+
+    def _write_rows(self, f, records: Iterable[AllPointRecord], with_header: bool):
+        writer = csv.DictWriter(f, fieldnames=self.header)
+        if with_header:
             writer.writeheader()
-            for rec in self.records:
-                writer.writerow(rec.data)
+        for rec in records:
+            writer.writerow(rec.data)
+
+    def _encode_rows(self, records: Iterable[AllPointRecord], with_header: bool) -> bytes:
+        buf = io.StringIO()
+        self._write_rows(buf, records, with_header)
+        return buf.getvalue().encode("utf-8")
+
+    def _append(self, records: List[AllPointRecord]):
+        """
+        Дописать записи в конец файла одной операцией записи с fsync
+        (вызывается под блокировкой записи). Оборванная запись в конце
+        файла (если была) предварительно обрезается.
+        """
+        with open(self.csv_path, "ab") as f:
+            if self.torn_bytes:
+                f.truncate(self._valid_size)
+                self.torn_bytes = 0
+            prefix = b""
+            if self._missing_newline:
+                prefix = b"\r\n"
+                self._missing_newline = False
+            data = prefix + self._encode_rows(records, with_header=self._valid_size == 0)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._valid_size += len(data)
+        self._remember_file()
+        METRICS.add("points.add", bytes_written=len(data))
+
+    @timed("points.save")
+    def compact(self):
+        """
+        Полностью переписать файл из памяти (атомарно: временный файл + замена).
+        Нужен после правок и удаления записей; обрезает оборванные хвосты.
+        Строки, дописанные другими процессами после загрузки, сначала
+        дочитываются и тоже попадают в файл. Если файл за это время
+        перезаписан целиком — FileChangedError, файл не меняется.
+        """
+        self._ensure_loaded()
+        with self.lock.exclusive():
+            self._catch_up(reload=False)
+            self._rewrite()
+
+    def _rewrite(self):
+        # Переписать файл из памяти (вызывается под блокировкой записи)
+        directory = os.path.dirname(os.path.abspath(self.csv_path))
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".AllPoint-", suffix=".tmp", dir=directory
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                keep_file_mode(tmp_path, self.csv_path)
+                self._write_rows(f, self.store.iter_records(), with_header=True)
+                f.flush()
+                os.fsync(f.fileno())
+            if self.storage == "mmap":
+                # Отображённый в память файл нельзя заменить (Windows)
+                self.store.close()
+            os.replace(tmp_path, self.csv_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if self.storage == "mmap":
+                self.store.reopen()
+            raise
+        if self.storage == "mmap":
+            # Правки и добавленные точки теперь в файле: разметить его заново
+            self.store.attach(self.csv_path)
+        self._valid_size = os.path.getsize(self.csv_path)
+        self.torn_bytes = 0
+        self._missing_newline = False
+        self._remember_file()
+        METRICS.add("points.save", rows=len(self.store), bytes_written=self._valid_size)
+        self._save_cache()
+
+    def save(self):
+        self.compact()
 
     def add_point(self, point: AllPointRecord):
-        self.records.append(point)
-        self.save()
+        self.add_points([point])
+
+    @timed("points.add", rows=lambda added: added)
+    def add_points(
+        self, points: List[AllPointRecord], skip_duplicates_m: Optional[float] = None
+    ) -> int:
+        """
+        Добавить пачку точек одной дозаписью в файл (один write + fsync).
+        skip_duplicates_m — не добавлять точки, лежащие ближе этого расстояния
+        (м) к уже имеющимся или к предыдущим точкам пачки (база при этом
+        загружается). Вызовы из разных потоков, пришедшие во время записи,
+        объединяются в следующую дозапись. Возвращает количество добавленных
+        точек.
+        """
+        if points and skip_duplicates_m is not None:
+            points = self._without_duplicates(points, skip_duplicates_m)
+        if not points:
+            return 0
+        self._commits.submit(points)
+        return len(points)
+
+    def _write_batch(self, points: List[AllPointRecord]):
+        # Дозапись пачки GroupCommit под блокировкой файла. Сначала — чужие
+        # строки, дописанные после нашей записи: номера строк в памяти
+        # совпадают с файлом, а их байты не примутся за оборванную запись
+        with METRICS.span("points.commit") as span, self.lock.exclusive():
+            if self.loaded:
+                self._catch_up(reload=True)
+            else:
+                self._inspect_tail()
+            # Ленивый режим: только дозапись в файл, база в память не читается
+            self._append(points)
+            if self.loaded:
+                self._extend_loaded(points)
+            span.rows = len(points)
+
+    def _extend_loaded(self, points: List[AllPointRecord]):
+        # Добавить записи в загруженную базу и в уже построенные индексы
+        start = len(self.store)
+        self.store.extend(points)
+        for index in self.indexes.values():
+            if index.built:
+                for row_id, point in enumerate(points, start):
+                    index.add(row_id, point.data)
+        self._sort_ranks.clear()
+        if self._spatial is not None:
+            self._spatial.extend(
+                [_parse_coordinate(p.lat) for p in points],
+                [_parse_coordinate(p.lon) for p in points],
+            )
+        if self._time_index is not None:
+            from src.time_index import store_timestamps
+
+            self._time_index.extend(store_timestamps(self.store, start), start)
+        if self._dedup_index is not None:
+            from src.spatial_index import store_coordinates
+
+            self._dedup_index.extend(*store_coordinates(self.store, start))
+
+    def dedup_index(self, tolerance_m: float):
+        """
+        Индекс близких координат (CoordinateIndex) с допуском tolerance_m;
+        строится при первом обращении и далее обновляется в add_point.
+        """
+        from src.dedup import CoordinateIndex
+        from src.spatial_index import store_coordinates
+
+        self._ensure_loaded()
+        index = self._dedup_index
+        if index is None or index.tolerance_m != tolerance_m:
+            index = self._dedup_index = CoordinateIndex(tolerance_m)
+            index.extend(*store_coordinates(self.store))
+        return index
+
+    def _without_duplicates(
+        self, points: List[AllPointRecord], tolerance_m: float
+    ) -> List[AllPointRecord]:
+        # Проверка перед вставкой: с базой — по индексу, внутри пачки — по
+        # временному индексу самой пачки (остаётся первая точка группы)
+        from src.dedup import CoordinateIndex
+
+        lats = [_parse_coordinate(p.lat) for p in points]
+        lons = [_parse_coordinate(p.lon) for p in points]
+        drop = set(self.dedup_index(tolerance_m).near(lats, lons)[0].tolist())
+        batch = CoordinateIndex(tolerance_m)
+        batch.extend(lats, lons)
+        for group in batch.groups():
+            drop.update(group[1:].tolist())
+        return [p for i, p in enumerate(points) if i not in drop]
+
+    def find_duplicates(self, tolerance_m: Optional[float] = None):
+        """
+        Группы номеров строк с совпадающими (с точностью tolerance_m метров,
+        по умолчанию DEDUP_TOLERANCE_M) координатами WGS-84.
+        """
+        from src.dedup import DEDUP_TOLERANCE_M
+
+        return self.dedup_index(tolerance_m or DEDUP_TOLERANCE_M).groups()
+
+    def merge_duplicates(self, tolerance_m: Optional[float] = None) -> int:
+        """
+        Объединить дубликаты по координатам: в каждой группе остаётся первая
+        точка, её пустые поля заполняются из остальных; остальные удаляются,
+        файл переписывается. Возвращает количество удалённых точек.
+        """
+        groups = self.find_duplicates(tolerance_m)
+        if not groups:
+            return 0
+        drop = set()
+        # Заполнения копятся по колонкам и пишутся одним set_values на колонку
+        fills: Dict[str, Tuple[List[int], List[str]]] = {}
+        for group in groups:
+            ids = group.tolist()
+            first, *rest = self.store.records_at(ids)
+            for column in self.header:
+                if not first.data.get(column):
+                    for rec in rest:
+                        if rec.data.get(column):
+                            targets, values = fills.setdefault(column, ([], []))
+                            targets.append(ids[0])
+                            values.append(rec.data[column])
+                            break
+            drop.update(ids[1:])
+        for column, (targets, values) in fills.items():
+            self.store.set_values(column, targets, values)
+        self._drop_rows(drop)
+        return len(drop)
+
+    def _drop_rows(self, drop: Iterable[int]):
+        # Удалить строки (номера остальных сдвигаются) и переписать файл
+        drop = set(drop)
+        keep = [i for i in range(len(self.store)) if i not in drop]
+        store = type(self.store)(self.header)
+        store.extend(self.store.records_at(keep))
+        self.store = store
+        self.rebuild_indexes()
+        self.compact()
+
+    def _inspect_tail(self):
+        """
+        Проверить конец файла без загрузки: если последняя строка завершена,
+        дописывать можно сразу, иначе (возможен обрыв) база загружается целиком.
+        """
+        try:
+            size = os.path.getsize(self.csv_path)
+        except FileNotFoundError:
+            size = 0
+        if size:
+            with open(self.csv_path, "rb") as f:
+                f.seek(size - 1)
+                if f.read(1) != b"\n":
+                    self._load()
+                    return
+        self._valid_size = size
+        self.torn_bytes = 0
+        self._missing_newline = False
 
     def get_all(self) -> List[AllPointRecord]:
-        return list(self.records)
+        self._ensure_loaded()
+        return list(self.store.iter_records())
+
+    @timed("points.find_ids", rows=len)
+    def find_ids(self, index_name: str, *values: str) -> Sequence[int]:
+        """
+        Номера строк, у которых колонки индекса index_name (см. INDEX_COLUMNS)
+        равны values. Записи по номерам — store.records_at или ResultSet.
+        """
+        self._ensure_loaded()
+        index = self.indexes.get(index_name)
+        if index is not None:
+            if not index.built:
+                index.build(self.store)
+            return index.lookup(*values)
+        return self.store.find_where(dict(zip(INDEX_COLUMNS[index_name], values)))
+
+    def _find(self, index_name: str, values: Sequence[str]) -> List[AllPointRecord]:
+        return self.store.records_at(self.find_ids(index_name, *values))
+
+    def sort_rank(self, column: str):
+        """
+        Место значения каждой строки базы в порядке сортировки по колонке
+        (numpy int64, пустые — -1, см. column_sort_rank). Вычисляется один раз
+        на колонку и сбрасывается при изменении базы; подмножество строк
+        сортируется по rank[ids] (ResultSet.sorted_ids).
+        """
+        self._ensure_loaded()
+        rank = self._sort_ranks.get(column)
+        if rank is None:
+            from src.result_view import column_sort_rank
+
+            rank = self._sort_ranks[column] = column_sort_rank(self.store, column)
+        return rank
 
     def find_by_city(self, city: str) -> List[AllPointRecord]:
-        return [rec for rec in self.records if rec.city == city]
+        return self._find("city", [city])
 
     def find_by_date(self, date: str) -> List[AllPointRecord]:
-        return [rec for rec in self.records if rec.date == date]
+        return self._find("date", [date])
+
+    @timed("points.find_between", rows=len)
+    def find_ids_between(self, start=None, end=None):
+        """
+        Номера строк с моментом Data+Time в диапазоне [start, end], по времени.
+        Границы — секунды от 1970-01-01 (UTC), строки "дата [время]" (конец
+        без времени включает весь день) или None (без ограничения).
+        """
+        from src.time_index import to_seconds
+
+        return self.time_index.range(to_seconds(start), to_seconds(end, end=True))
+
+    def find_between(self, start=None, end=None) -> List[AllPointRecord]:
+        """
+        Точки в диапазоне дат и времени, например
+        find_between("2024-03-01 06:00", "2024-03-07").
+        """
+        return self.store.records_at(self.find_ids_between(start, end).tolist())
+
+    def count_between(self, start=None, end=None) -> int:
+        from src.time_index import to_seconds
+
+        return self.time_index.count(to_seconds(start), to_seconds(end, end=True))
+
+    def plan_query(
+        self,
+        city: Optional[str] = None,
+        country: Optional[str] = None,
+        date: Optional[str] = None,
+        date_range=None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        lon_lat: Optional[Tuple[str, str]] = None,
+        text: Optional[str] = None,
+        mode: str = "and",
+    ):
+        """
+        План запроса по нескольким условиям (QueryPlan, см. point_query).
+        Пустые условия (None или "") не участвуют.
+
+        city, country, date (колонка Data) — строгое сравнение; date_range — пара границ
+        (как в find_between) или строка "дата [время] .. дата [время]";
+        bbox — (lat_min, lon_min, lat_max, lon_max); lon_lat — пара строк
+        (как в find_by_lon_lat); text — подстрока исходного текста без
+        учёта регистра; mode — "and" (все условия) или "or" (любое).
+        """
+        from src.point_query import (
+            BBoxPredicate,
+            QueryPlan,
+            TextPredicate,
+            TimeRangePredicate,
+            ValuePredicate,
+        )
+        from src.time_index import parse_range, to_seconds
+
+        self._ensure_loaded()
+
+        def value(name: str, columns: Sequence[str], values: Sequence[str]):
+            index = name if name in self.indexes else None
+            return ValuePredicate(name, columns, values, index)
+
+        predicates = []
+        if city:
+            predicates.append(value("city", ["City_Value"], [city]))
+        if country:
+            predicates.append(value("country", ["Country_Value"], [country]))
+        if date:
+            predicates.append(value("date", ["Data"], [date]))
+        if date_range:
+            if isinstance(date_range, str):
+                start, end = parse_range(date_range)
+            else:
+                start, end = to_seconds(date_range[0]), to_seconds(date_range[1], end=True)
+            predicates.append(TimeRangePredicate(start, end))
+        if bbox:
+            predicates.append(BBoxPredicate(*bbox))
+        if lon_lat:
+            predicates.append(value("lon_lat", INDEX_COLUMNS["lon_lat"], lon_lat))
+        if text:
+            predicates.append(TextPredicate(text))
+        return QueryPlan(self, predicates, mode)
+
+    @timed("points.query", rows=len)
+    def query(self, **conditions) -> Sequence[int]:
+        """
+        Номера строк (по возрастанию), подходящих под условия plan_query,
+        например query(city="Москва", date_range="01.03.2024 .. 07.03.2024").
+        Условия с индексом выполняются первыми, остальные проверяются только
+        на отобранных строках; записи не создаются (см. ResultSet).
+        """
+        return self.plan_query(**conditions).ids()
+
+    def query_count(self, **conditions) -> int:
+        """
+        Число строк, подходящих под условия plan_query; для одного условия
+        с индексом — по индексу, без построения списка строк.
+        """
+        return self.plan_query(**conditions).count()
+
+    def find_by_lon_lat(self, lon: str, lat: str) -> List[AllPointRecord]:
+        """
+        Поиск точек по паре долгота и широта (строгое сравнение строк)
+        """
+        return self._find("lon_lat", [lon, lat])
+
+    @timed("points.find_within_radius", rows=len)
+    def find_within_radius(
+        self, lat: float, lon: float, radius_km: float
+    ) -> List[AllPointRecord]:
+        """
+        Точки на расстоянии не более radius_km (по гаверсинусу), от ближних к дальним
+        """
+        ids, _ = self.spatial_index.within_radius(lat, lon, radius_km)
+        return self.store.records_at(ids.tolist())
+
+    @timed("points.find_nearest", rows=len)
+    def find_nearest(
+        self, lat: float, lon: float, k: int = 1, max_km: Optional[float] = None
+    ) -> List[Tuple[AllPointRecord, float]]:
+        """
+        k ближайших точек с расстоянием в км
+        """
+        ids, dist = self.spatial_index.nearest(lat, lon, k, max_km)
+        return list(zip(self.store.records_at(ids.tolist()), dist.tolist()))
+
+    @timed("points.find_in_bbox", rows=len)
+    def find_in_bbox(
+        self, lat_min: float, lon_min: float, lat_max: float, lon_max: float
+    ) -> List[AllPointRecord]:
+        """
+        Точки внутри прямоугольника широт/долгот (lon_min > lon_max — через 180°)
+        """
+        ids = self.spatial_index.in_bbox(lat_min, lon_min, lat_max, lon_max)
+        return self.store.records_at(ids.tolist())
+
+    def fill_locations(
+        self, city_manager, max_km: Optional[float] = None, only_empty: bool = False
+    ) -> int:
+        """
+        Заполнить City_Value, Country_Value и описания района/региона по ближайшему
+        городу из CityManager для всех точек сразу, затем переписать файл.
+        Описание района — в формате city.txt: "88 км юго-зап. г.Гомель".
+        only_empty — не трогать точки, у которых город уже указан.
+        Возвращает количество заполненных точек.
+        """
+        from src.spatial_index import bearing_deg, store_coordinates
+
+        self._ensure_loaded()
+        lats, lons = store_coordinates(self.store)
+        cities, km = city_manager.nearest_city(lats, lons, max_km)
+        ids = [i for i, city in enumerate(cities) if city is not None]
+        if only_empty:
+            current = self.store.column_values("City_Value")
+            ids = [i for i in ids if not current[i]]
+        if not ids:
+            return 0
+        matched = [cities[i] for i in ids]
+        bearings = bearing_deg(
+            [c.latitude for c in matched],
+            [c.longitude for c in matched],
+            lats[ids],
+            lons[ids],
+        )
+        areas = []
+        for city, dist, bearing in zip(matched, km[ids].tolist(), bearings.tolist()):
+            if dist < 1.0:
+                areas.append("")
+            else:
+                direction = DIRECTION_NAMES[int(round(bearing / 45.0)) % 8]
+                areas.append(f"{round(dist)} км {direction} {city.type_and_rus}")
+        self.store.set_values("City_Value", ids, [c.orig_name for c in matched])
+        self.store.set_values("Country_Value", ids, [c.country for c in matched])
+        self.store.set_values("Description of the area", ids, areas)
+        self.store.set_values("Description of the region", ids, [c.region for c in matched])
+        self.rebuild_indexes()
+        self.compact()
+        return len(ids)
+
+    def fill_coordinates(self, overwrite: bool = False) -> int:
+        """
+        Заполнить X/Y СК-42 (Гаусс-Крюгер) по широте/долготе WGS-84, а у точек
+        без широты/долготы — наоборот, по X/Y; затем переписать файл.
+        Пересчёт всей базы выполняется одним проходом над массивами numpy
+        (см. gauss_kruger). overwrite — пересчитать X/Y и там, где они уже
+        указаны. Возвращает количество изменённых точек.
+        """
+        import numpy as np
+
+        from src.gauss_kruger import gk_to_wgs84, wgs84_to_gk
+
+        lats, lons, xs, ys = self._coordinate_arrays()
+        has_wgs = ~(np.isnan(lats) | np.isnan(lons))
+        has_gk = ~(np.isnan(xs) | np.isnan(ys))
+        to_gk = np.flatnonzero(has_wgs if overwrite else has_wgs & ~has_gk)
+        to_wgs = np.flatnonzero(~has_wgs & has_gk)
+        if len(to_gk):
+            x, y = wgs84_to_gk(lats[to_gk], lons[to_gk])
+            self._set_floats(GK_X, to_gk, x, GK_DECIMALS)
+            self._set_floats(GK_Y, to_gk, y, GK_DECIMALS)
+        if len(to_wgs):
+            lat, lon = gk_to_wgs84(xs[to_wgs], ys[to_wgs])
+            self._set_floats("Lat_WGS84", to_wgs, lat, WGS84_DECIMALS)
+            self._set_floats("Lon_WGS84", to_wgs, lon, WGS84_DECIMALS)
+        if not len(to_gk) and not len(to_wgs):
+            return 0
+        self.rebuild_indexes()
+        self.compact()
+        return len(to_gk) + len(to_wgs)
+
+    def _coordinate_arrays(self):
+        # Широта, долгота WGS-84 и X, Y СК-42 всех строк (NaN для пустых)
+        from src.spatial_index import store_floats
 
+        self._ensure_loaded()
+        return tuple(
+            store_floats(self.store, column)
+            for column in ("Lat_WGS84", "Lon_WGS84", GK_X, GK_Y)
+        )
+
+    def _set_floats(self, column: str, ids, values, decimals: int):
+        text = [f"{v:.{decimals}f}" for v in values.tolist()]
+        self.store.set_values(column, ids.tolist(), text)
+
+    def check_coordinates(self, tolerance_m: float = GK_TOLERANCE_M):
+        """
+        Точки, у которых X/Y СК-42 не соответствуют широте/долготе WGS-84:
+        (номера строк, расхождение в метрах). Точки без одной из пар
+        координат не проверяются.
+        """
+        import numpy as np
+
+        from src.gauss_kruger import ZONE_MULTIPLIER, wgs84_to_gk
+
+        lats, lons, xs, ys = self._coordinate_arrays()
+        missing = np.isnan(lats) | np.isnan(lons) | np.isnan(xs) | np.isnan(ys)
+        ids = np.flatnonzero(~missing)
+        # Зона — по записанной Y, чтобы точку у границы зоны, пересчитанную
+        # в соседнюю зону, не считать ошибочной
+        zones = np.floor(ys[ids] / ZONE_MULTIPLIER).astype(np.int64)
+        x, y = wgs84_to_gk(lats[ids], lons[ids], zones)
+        error = np.hypot(x - xs[ids], y - ys[ids])
+        bad = error > tolerance_m
+        return ids[bad], error[bad]
+
+    @timed("points.save")
     def clear(self):
-        self.records.clear()
-        self.save()
+        with self.lock.exclusive():
+            self.loaded = True
+            self.store.clear()
+            for index in self.indexes.values():
+                index.clear()
+            self._spatial = None
+            self._time_index = None
+            self._dedup_index = None
+            self._sort_ranks.clear()
+            self._rewrite()
+
+
+def is_sqlite_path(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in SQLITE_EXTENSIONS
+
+
+def points_path(settings) -> str:
+    """
+    Файл базы точек по настройкам: mainDataCSV или, при pointsStorage=sqlite,
+    pointsDatabase (по умолчанию — mainDataCSV с расширением .sqlite).
+    """
+    csv_path = settings.get("mainDataCSV", "data/AllPoint.csv")
+    if settings.get("pointsStorage", "csv") != "sqlite" or is_sqlite_path(csv_path):
+        return csv_path
+    return settings.get("pointsDatabase") or os.path.splitext(csv_path)[0] + ".sqlite"
+
+
+def open_points_manager(settings=None, path: Optional[str] = None) -> AllPointsManager:
+    """
+    Менеджер базы точек по настройкам (или по явному пути path): файл
+    .sqlite/.db — SqlitePointsManager, при pointsStorage=mmap — CSV,
+    отображённый в память, иначе CSV с колоночным хранилищем и кэшем;
+    загрузка ленивая. Если выбрана SQLite, а базы ещё нет, она один раз
+    создаётся из mainDataCSV.
+    """
+    if path is None:
+        path = points_path(settings)
+    if not is_sqlite_path(path):
+        if settings is not None and settings.get("pointsStorage", "csv") == "mmap":
+            return AllPointsManager(path, storage="mmap", lazy=True)
+        return AllPointsManager(path, storage="columnar", cache=True, lazy=True)
+    from src.sqlite_store import SqlitePointsManager, migrate_csv_to_sqlite
+
+    if settings is not None and not os.path.exists(path):
+        csv_path = settings.get("mainDataCSV", "data/AllPoint.csv")
+        if not is_sqlite_path(csv_path) and os.path.exists(csv_path):
+            migrate_csv_to_sqlite(csv_path, path)
+    return SqlitePointsManager(path)
+
+
+def _parse_coordinate(value: str) -> float:
+    try:
+        return float(value.replace(",", "."))
+    except ValueError:
+        return math.nan
+
+
+class _LineReader:
+    """
+    Построчное чтение бинарного файла для csv-модуля с подсчётом смещений:
+    offset — число байт, отданных читателю, record_start — начало текущей
+    записи (обновляется снаружи), complete — завершена ли последняя
+    отданная строка переводом строки. offset — начать чтение с этого
+    байта (с начала записи, заголовок при этом не читается), end —
+    не читать дальше этого байта (срез файла, см. _open_snapshot).
+    """
+
+    def __init__(self, f, offset: int = 0, end: Optional[int] = None):
+        self._f = f
+        f.seek(offset)
+        self.end = end
+        self.offset = offset
+        self.record_start = offset
+        self.complete = True
+        # Итог проверки последней записи (заполняет AllPointsManager._scan)
+        self.torn_start: Optional[int] = None
+        self.missing_newline = False
+        # Незавершённая последняя строка оборвана посреди символа UTF-8
+        self.undecodable = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if self.end is None:
+            raw = self._f.readline()
+        else:
+            raw = self._f.readline(self.end - self.offset) if self.offset < self.end else b""
+        if not raw:
+            raise StopIteration
+        first = self.offset == 0
+        self.offset += len(raw)
+        if first:
+            self.record_start = self.offset  # первая строка — заголовок
+        self.complete = raw.endswith(b"\n")
+        encoding = "utf-8-sig" if first else "utf-8"
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            if self.complete:
+                raise
+            # Дозапись оборвана посреди многобайтного символа: это обрыв,
+            # а не ошибка файла (запись отбрасывается в _scan)
+            self.undecodable = True
+            return raw.decode(encoding, errors="replace")
@@ -1,5 +1,30 @@
+import gc
+import hashlib
+import os
+import pickle
 import re
-from typing import Any, Dict, List, Optional
+import tempfile
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.file_lock import keep_file_mode
+from src.metrics import METRICS, timed
+
+# Скомпилированный city.txt (<файл>.cache): записи, индексы и ключ файла.
+# Версия меняется при изменении формата — старый кэш тогда игнорируется.
+CACHE_SUFFIX = ".cache"
+CACHE_VERSION = 1
+# Поля CityRecord в порядке аргументов конструктора (записи хранятся в кэше по колонкам)
+CITY_FIELDS = (
+    "orig_name",
+    "type_and_rus",
+    "latitude",
+    "longitude",
+    "country",
+    "description",
+    "region",
+)
 
 
 class CityRecord:
@@ -33,57 +58,575 @@ class CityRecord:
         }
 
 
-class CityManager:
+def _parse_float(s: str) -> float:
+    s = s.replace(",", ".")
+    try:
+        return float(s)
+    except Exception:
+        return 0.0
+
+
+def parse_city_line(line: str) -> Optional[CityRecord]:
+    """
+    Запись города из строки city.txt или None (комментарий, заголовок, ошибка).
+    """
+    line = line.strip()
+    if not line or line.startswith("'") or line.startswith("="):
+        return None
+    if re.match(r"^=+ ", line):
+        return None  # country section header
+    if "=" not in line:
+        return None
+    orig_name, rest = line.split("=", 1)
+    parts = rest.split("_")
+    # Format: <тип_Русское_название>_<широта>_<долгота>_<страна>_[описание]_<регион>
+    if len(parts) < 5:
+        return None  # invalid line
+    return CityRecord(
+        orig_name=orig_name,
+        type_and_rus=parts[0],
+        latitude=_parse_float(parts[1]),
+        longitude=_parse_float(parts[2]),
+        country=parts[3],
+        description=parts[4] if len(parts) > 4 else "",
+        region=parts[5] if len(parts) > 5 else "",
+    )
+
+
+def format_city_line(rec: CityRecord) -> str:
+    """
+    Строка city.txt для записи (без перевода строки). Пустой регион в конце
+    опускается; поле описания остаётся всегда (иначе строка не разберётся).
+    """
+    parts = [
+        rec.type_and_rus,
+        str(rec.latitude).replace(".", ","),
+        str(rec.longitude).replace(".", ","),
+        rec.country,
+        rec.description,
+        rec.region,
+    ]
+    if parts[-1] == "":
+        parts.pop()
+    return f"{rec.orig_name}={'_'.join(parts)}"
+
+
+# Заголовок блока страны: ' ================== РОССИЯ ==================
+_SECTION_RE = re.compile(r"^'?\s*=+\s*([^=\s][^=]*?)\s*=+\s*$")
+
+
+class _CityLine:
+    """
+    Строка документа city.txt: text — текст с переводом строки, name —
+    название города для строки-записи (иначе None), offset и size —
+    положение в файле на момент последнего чтения/записи (None — новая строка).
+    """
+
+    __slots__ = ("text", "name", "offset", "size")
+
+    def __init__(self, text: str, name: Optional[str], offset: Optional[int], size: int):
+        self.text = text
+        self.name = name
+        self.offset = offset
+        self.size = size
+
+
+class _CitySection:
+    """
+    Блок файла: заголовок страны (или вступление без страны) и строки до следующего заголовка.
+    """
+
+    def __init__(self, country: Optional[str]):
+        self.country = country
+        self.lines: List[_CityLine] = []
+
+
+class CityDocument:
+    """
+    Документ city.txt: все строки файла с комментариями и заголовками стран
+    и смещения каждой строки в файле.
+
+    Правки (set_record, insert_record, delete_record) копятся в журнале и
+    записываются одним save(): строки той же длины перезаписываются на
+    месте, иначе файл переписывается с первой изменённой строки до конца.
+    Новые города попадают в блок своей страны по алфавиту (блок страны
+    создаётся, если его нет).
+    """
+
     def __init__(self, filepath: str):
         self.filepath = filepath
+        self.newline = "\n"
+        self.sections: List[_CitySection] = []
+        self._by_country: Dict[str, _CitySection] = {}
+        self._records: Dict[str, Tuple[_CitySection, _CityLine]] = {}
+        # Журнал: строки той же длины для записи на месте и начало
+        # изменённого хвоста файла
+        self._patched: List[_CityLine] = []
+        self._dirty_from: Optional[int] = None
+        self._stat: Optional[Tuple[int, int]] = None
+        self.load()
+
+    def load(self) -> None:
+        self.sections = [_CitySection(None)]
+        self._by_country.clear()
+        self._records.clear()
+        self._patched = []
+        self._dirty_from = None
+        with open(self.filepath, "rb") as f:
+            raw_lines = f.read().splitlines(keepends=True)
+            st = os.fstat(f.fileno())
+        self._stat = (st.st_size, st.st_mtime_ns)
+        if raw_lines and raw_lines[0].endswith(b"\r\n"):
+            self.newline = "\r\n"
+        offset = 0
+        for raw in raw_lines:
+            text = raw.decode("utf-8")
+            line = _CityLine(text, None, offset, len(raw))
+            offset += len(raw)
+            header = _SECTION_RE.match(text.strip())
+            if header:
+                section = _CitySection(header.group(1))
+                self.sections.append(section)
+                self._by_country.setdefault(header.group(1).upper(), section)
+            else:
+                record = parse_city_line(text)
+                if record is not None:
+                    line.name = record.orig_name
+                    self._records[record.orig_name] = (self.sections[-1], line)
+            self.sections[-1].lines.append(line)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._patched) or self._dirty_from is not None
+
+    def __contains__(self, orig_name: str) -> bool:
+        return orig_name in self._records
+
+    def lines(self) -> Iterator[str]:
+        for section in self.sections:
+            for line in section.lines:
+                yield line.text
+
+    def _mark(self, offset: Optional[int]):
+        if offset is not None and (self._dirty_from is None or offset < self._dirty_from):
+            self._dirty_from = offset
+
+    def _offset_after(self, section: _CitySection, index: int) -> int:
+        """
+        Смещение в файле первой сохранённой строки начиная с позиции index блока.
+        """
+        start = self.sections.index(section)
+        for sec in self.sections[start:]:
+            for line in sec.lines[index:]:
+                if line.offset is not None:
+                    return line.offset
+            index = 0
+        return self._stat[0] if self._stat else 0
+
+    def _new_line(self, text: str, name: Optional[str] = None) -> _CityLine:
+        text += self.newline
+        return _CityLine(text, name, None, len(text.encode("utf-8")))
+
+    def _insert(self, section: _CitySection, index: int, line: _CityLine):
+        if index > 0:
+            prev = section.lines[index - 1]
+            if not prev.text.endswith("\n"):
+                # Последняя строка файла без перевода строки
+                self._replace(prev, prev.text + self.newline)
+        self._mark(self._offset_after(section, index))
+        section.lines.insert(index, line)
+
+    def _replace(self, line: _CityLine, text: str):
+        size = len(text.encode("utf-8"))
+        line.text = text
+        if line.offset is None:
+            line.size = size
+        elif size == line.size:
+            self._patched.append(line)
+        else:
+            self._mark(line.offset)
+            line.size = size
+
+    def set_record(self, rec: CityRecord, old_name: Optional[str] = None) -> None:
+        """
+        Обновить строку города (old_name — прежнее название при переименовании).
+        """
+        section, line = self._records.pop(old_name or rec.orig_name)
+        self._replace(line, format_city_line(rec) + self.newline)
+        line.name = rec.orig_name
+        self._records[rec.orig_name] = (section, line)
+
+    def insert_record(self, rec: CityRecord) -> None:
+        """
+        Добавить город в блок его страны, по алфавиту среди записей блока.
+        """
+        if rec.orig_name in self._records:
+            raise ValueError(f"Город уже есть в файле: {rec.orig_name}")
+        section = self._by_country.get(rec.country.upper())
+        if section is None:
+            section = self._add_section(rec.country.upper())
+        names = [(i, line.name) for i, line in enumerate(section.lines) if line.name]
+        key = rec.orig_name.casefold()
+        pos = bisect_left([name.casefold() for _, name in names], key)
+        if pos < len(names):
+            index = names[pos][0]
+        elif names:
+            index = names[-1][0] + 1
+        else:
+            index = len(section.lines)
+        line = self._new_line(format_city_line(rec), rec.orig_name)
+        self._insert(section, index, line)
+        self._records[rec.orig_name] = (section, line)
+
+    def _add_section(self, country: str) -> _CitySection:
+        # Блоки стран упорядочены по алфавиту; вступление (без страны) — первым
+        countries = [sec.country.upper() for sec in self.sections[1:]]
+        pos = bisect_left(countries, country) + 1
+        section = _CitySection(country)
+        if pos < len(self.sections):
+            offset = self._offset_after(self.sections[pos], 0)
+        else:
+            offset = self._offset_after(self.sections[-1], len(self.sections[-1].lines))
+        prev = self.sections[pos - 1]
+        if prev.lines and not prev.lines[-1].text.endswith("\n"):
+            self._replace(prev.lines[-1], prev.lines[-1].text + self.newline)
+        section.lines.append(self._new_line(f"' {'=' * 18} {country} {'=' * 18}"))
+        section.lines.append(self._new_line(""))
+        self.sections.insert(pos, section)
+        self._by_country[country] = section
+        self._mark(offset)
+        return section
+
+    def delete_record(self, orig_name: str) -> None:
+        section, line = self._records.pop(orig_name)
+        index = section.lines.index(line)
+        if line.offset is not None:
+            self._mark(line.offset)
+        else:
+            self._mark(self._offset_after(section, index + 1))
+        del section.lines[index]
+
+    def save(self) -> None:
+        """
+        Записать накопленные правки одним проходом. Если файл изменили извне
+        после чтения, он переписывается целиком (атомарно).
+        """
+        if not self.dirty:
+            return
+        try:
+            st = os.stat(self.filepath)
+            unchanged = self._stat == (st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            unchanged = False
+        if not unchanged:
+            self._rewrite()
+        else:
+            with open(self.filepath, "r+b") as f:
+                dirty_from = self._dirty_from
+                for line in self._patched:
+                    if dirty_from is None or line.offset < dirty_from:
+                        f.seek(line.offset)
+                        f.write(line.text.encode("utf-8"))
+                if dirty_from is not None:
+                    f.seek(dirty_from)
+                    f.write(self._encode_from(dirty_from))
+                    f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+        self._reindex()
+
+    def _encode_from(self, start: int) -> bytes:
+        chunks = []
+        offset = 0
+        for section in self.sections:
+            for line in section.lines:
+                if offset >= start:
+                    chunks.append(line.text)
+                offset += line.size
+        return "".join(chunks).encode("utf-8")
+
+    def _rewrite(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.filepath))
+        fd, tmp_path = tempfile.mkstemp(prefix=".city-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                keep_file_mode(tmp_path, self.filepath)
+                f.writelines(self.lines())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _reindex(self) -> None:
+        offset = 0
+        for section in self.sections:
+            for line in section.lines:
+                line.offset = offset
+                offset += line.size
+        st = os.stat(self.filepath)
+        self._stat = (st.st_size, st.st_mtime_ns)
+        self._patched = []
+        self._dirty_from = None
+
+
+class CityManager:
+    """
+    Справочник городов из city.txt.
+
+    cache=True — разобранный файл сохраняется рядом (<файл>.cache) вместе
+    с индексами и при следующем запуске читается из кэша, если city.txt
+    не менялся (совпадают размер, время изменения и хеш содержимого).
+    После load: load_seconds — время загрузки, from_cache — взят ли кэш,
+    parse_seconds — время последнего разбора самого city.txt.
+    duplicate_names — названия, встретившиеся в файле повторно (в справочнике
+    остаётся последняя строка); дубликаты по координатам — find_duplicates.
+    Изменения city.txt другими программами подхватывает reload_if_changed.
+    """
+
+    def __init__(self, filepath: str, cache: bool = False):
+        self.filepath = filepath
+        self.cache = cache
         self.cities: Dict[str, CityRecord] = {}
         self._rus_name_map: Dict[str, str] = {}
+        self.duplicate_names: List[str] = []
+        # Пространственный индекс по координатам городов (строится по запросу)
+        self._geo_index = None
+        self._geo_records: List[CityRecord] = []
+        # Индекс нечёткого поиска по названиям (строится по запросу)
+        self._search_index = None
+        # Документ city.txt для правок (читается при первой правке)
+        self._document: Optional[CityDocument] = None
+        self.load_seconds = 0.0
+        self.parse_seconds = 0.0
+        self.from_cache = False
+        # Ключ city.txt (размер, время изменения, хеш) на момент загрузки
+        # или последнего сохранения (см. reload_if_changed)
+        self._loaded_key: Optional[Tuple[int, int, str]] = None
         self.load()
 
+    @property
+    def cache_path(self) -> str:
+        return self.filepath + CACHE_SUFFIX
+
+    @timed("cities.load")
     def load(self) -> None:
-        self.cities.clear()
-        self._rus_name_map.clear()
+        started = time.perf_counter()
+        self._loaded_key = self._file_key()
+        # Документ для правок читается заново при следующей правке
+        self._document = None
+        self.from_cache = self.cache and self._load_cache()
+        if not self.from_cache:
+            self._parse()
+            self.parse_seconds = time.perf_counter() - started
+            if self.cache:
+                self.save_cache()
+        self.load_seconds = time.perf_counter() - started
+        METRICS.add("cities.load", rows=len(self.cities))
+
+    def load_report(self) -> str:
+        """
+        Строка для статуса: сколько городов загружено и откуда, за какое время.
+        """
+        text = f"Городов: {len(self.cities)}, загрузка {self.load_seconds * 1000:.0f} мс"
+        if self.from_cache:
+            text += f" из кэша (разбор city.txt — {self.parse_seconds * 1000:.0f} мс)"
+        return text
+
+    def _file_key(self) -> Tuple[int, int, str]:
+        st = os.stat(self.filepath)
+        h = hashlib.blake2b(digest_size=16)
+        with open(self.filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return st.st_size, st.st_mtime_ns, h.hexdigest()
+
+    def _load_cache(self) -> bool:
+        """
+        Загрузить кэш, если он соответствует city.txt. Устаревший или
+        повреждённый кэш молча игнорируется (False).
+        """
+        # Сборщик мусора на время загрузки отключён: сотни тысяч новых строк
+        # и объектов иначе запускают его многократно впустую
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(self.cache_path, "rb") as f:
+                data = pickle.load(f)
+            if data["version"] != CACHE_VERSION or data["key"] != self._loaded_key:
+                return False
+            cities = {row[0]: CityRecord(*row) for row in zip(*data["columns"])}
+            rus_name_map = data["rus_name_map"]
+            duplicate_names = data.get("duplicate_names", [])
+        except Exception:
+            return False
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self.cities = cities
+        self._rus_name_map = rus_name_map
+        self.duplicate_names = duplicate_names
+        self.reset_indexes()
+        if data.get("geo_index") is not None:
+            self._geo_records = self.all_cities()
+            self._geo_index = data["geo_index"]
+        self._search_index = data.get("search_index")
+        self.parse_seconds = data.get("parse_seconds", 0.0)
+        return True
+
+    def save_cache(self) -> bool:
+        """
+        Сохранить скомпилированный справочник (атомарно). Ошибки записи
+        не критичны: возвращается False.
+        """
+        try:
+            data = {
+                "version": CACHE_VERSION,
+                "key": self._file_key(),
+                "parse_seconds": self.parse_seconds,
+                "columns": [
+                    [getattr(rec, name) for rec in self.cities.values()]
+                    for name in CITY_FIELDS
+                ],
+                "rus_name_map": self._rus_name_map,
+                "duplicate_names": self.duplicate_names,
+                "geo_index": self._geo_index,
+                "search_index": self._search_index,
+            }
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=".city-", dir=os.path.dirname(os.path.abspath(self.cache_path))
+            )
+        except OSError:
+            return False
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+            return True
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    @property
+    def document(self) -> CityDocument:
+        if self._document is None:
+            self._document = CityDocument(self.filepath)
+        return self._document
+
+    def _set_rus_name(self, rec: CityRecord, old_type_and_rus: Optional[str] = None):
+        if old_type_and_rus is not None:
+            old = self._extract_rus_name(old_type_and_rus)
+            if old and self._rus_name_map.get(old) == rec.orig_name:
+                del self._rus_name_map[old]
+        rus_name = self._extract_rus_name(rec.type_and_rus)
+        if rus_name:
+            self._rus_name_map[rus_name] = rec.orig_name
+
+    def add_city(self, rec: CityRecord) -> None:
+        """
+        Добавить новый город (в файл попадёт при save()).
+        """
+        if rec.orig_name in self.cities:
+            raise ValueError(f"Город уже существует: {rec.orig_name}")
+        self.document.insert_record(rec)
+        self.cities[rec.orig_name] = rec
+        self._set_rus_name(rec)
+        self.reset_indexes()
+
+    def update_city(self, orig_name: str, **fields: Any) -> CityRecord:
+        """
+        Изменить поля города (имена полей — как у CityRecord); в файл
+        изменения попадут при save().
+        """
+        rec = self.cities[orig_name]
+        unknown = set(fields) - set(CITY_FIELDS) - {"orig_name"}
+        if unknown:
+            raise ValueError(f"Неизвестные поля города: {', '.join(sorted(unknown))}")
+        new_name = fields.get("orig_name", orig_name)
+        if new_name != orig_name and new_name in self.cities:
+            raise ValueError(f"Город уже существует: {new_name}")
+        old_type_and_rus = rec.type_and_rus
+        for name, value in fields.items():
+            setattr(rec, name, value)
+        if new_name != orig_name:
+            del self.cities[orig_name]
+            self.cities[new_name] = rec
+        self._set_rus_name(rec, old_type_and_rus)
+        self.document.set_record(rec, old_name=orig_name)
+        self.reset_indexes()
+        return rec
+
+    def delete_city(self, orig_name: str) -> None:
+        rec = self.cities.pop(orig_name)
+        rus_name = self._extract_rus_name(rec.type_and_rus)
+        if rus_name and self._rus_name_map.get(rus_name) == orig_name:
+            del self._rus_name_map[rus_name]
+        self.document.delete_record(orig_name)
+        self.reset_indexes()
+
+    def save(self) -> None:
+        """
+        Записать все накопленные правки городов в city.txt одним проходом
+        (комментарии и заголовки стран сохраняются).
+        """
+        if self._document is None or not self._document.dirty:
+            return
+        with METRICS.span("cities.save") as span:
+            self._document.save()
+            span.bytes_written = os.path.getsize(self.filepath)
+        self._loaded_key = self._file_key()
+        if self.cache:
+            self.save_cache()
+
+    def reload_if_changed(self) -> bool:
+        """
+        Перечитать city.txt, если его содержимое изменилось после загрузки
+        или нашего сохранения: сначала сравниваются размер и время
+        изменения, при расхождении — хеш (файл, пересохранённый без правок,
+        не перечитывается). Пока есть несохранённые правки, файл не
+        перечитывается. Возвращает True, если справочник перечитан.
+        """
+        if self._document is not None and self._document.dirty:
+            return False
+        try:
+            st = os.stat(self.filepath)
+        except FileNotFoundError:
+            return False
+        loaded = self._loaded_key
+        if loaded is not None and loaded[:2] == (st.st_size, st.st_mtime_ns):
+            return False
+        key = self._file_key()
+        if loaded is not None and loaded[2] == key[2]:
+            self._loaded_key = key
+            return False
+        self.load()
+        return True
+
+    def _parse(self) -> None:
+        self.cities = {}
+        self._rus_name_map = {}
+        self.duplicate_names = []
+        self.reset_indexes()
+        self._document = None
+        METRICS.add("cities.load", bytes_read=os.path.getsize(self.filepath))
         with open(self.filepath, encoding="utf-8") as f:
             for line in f:
-                line = line.strip()
-                if not line or line.startswith("'") or line.startswith("="):
-                    continue
-                if re.match(r"^=+ ", line):
-                    continue  # country section header
-                if "=" not in line:
+                record = parse_city_line(line)
+                if record is None:
                     continue
-                orig_name, rest = line.split("=", 1)
-                parts = rest.split("_")
-                # Format: <тип_Русское_название>_<широта>_<долгота>_<страна>_[описание]_<регион>
-                if len(parts) < 5:
-                    continue  # invalid line
-                type_and_rus = parts[0]
-                latitude = self._parse_float(parts[1])
-                longitude = self._parse_float(parts[2])
-                country = parts[3]
-                description = parts[4] if len(parts) > 4 else ""
-                region = parts[5] if len(parts) > 5 else ""
-                record = CityRecord(
-                    orig_name=orig_name,
-                    type_and_rus=type_and_rus,
-                    latitude=latitude,
-                    longitude=longitude,
-                    country=country,
-                    description=description,
-                    region=region,
-                )
-                self.cities[orig_name] = record
+                if record.orig_name in self.cities:
+                    self.duplicate_names.append(record.orig_name)
+                self.cities[record.orig_name] = record
                 # Русское название для поиска
-                rus_name = self._extract_rus_name(type_and_rus)
+                rus_name = self._extract_rus_name(record.type_and_rus)
                 if rus_name:
-                    self._rus_name_map[rus_name] = orig_name
+                    self._rus_name_map[rus_name] = record.orig_name
 
     def _parse_float(self, s: str) -> float:
-        s = s.replace(",", ".")
-        try:
-            return float(s)
-        except Exception:
-            return 0.0
+        return _parse_float(s)
 
     def _extract_rus_name(self, type_and_rus: str) -> Optional[str]:
         # тип.Русское_название или г.Белгород, н.п.Аннаба и т.д.
@@ -100,6 +643,7 @@ class CityManager:
             return self.cities.get(eng)
         return None
 
+    @timed("cities.search", rows=lambda rec: rec is not None)
     def search(self, name: str) -> Optional[CityRecord]:
         # Поиск по английскому или русскому названию, с обработкой префикса "г." и "г "
         clean_name = name.strip()
@@ -112,5 +656,88 @@ class CityManager:
             return rec
         return self.find_by_rus(clean_name)
 
+    @timed("cities.suggest", rows=len)
+    def suggest(
+        self, query: str, limit: int = 10, min_score: float = 0.3
+    ) -> List[Tuple[CityRecord, float]]:
+        """
+        Ранжированные кандидаты для названия с опечатками, в другом регистре,
+        с ё/е или неполного (по префиксу): [(город, оценка от 0 до 1)].
+        Ищется и по английскому, и по русскому названию.
+        """
+        from src.city_search import CitySearchIndex
+
+        if self._search_index is None:
+            self._search_index = CitySearchIndex(
+                (rec.orig_name, (rec.orig_name, rec.type_and_rus))
+                for rec in self.cities.values()
+            )
+            if self.cache:
+                self.save_cache()  # индекс тоже попадает в кэш
+        return [
+            (self.cities[orig_name], score)
+            for orig_name, score in self._search_index.search(query, limit, min_score)
+        ]
+
     def all_cities(self) -> List[CityRecord]:
         return list(self.cities.values())
+
+    def find_duplicates(self, tolerance_m: Optional[float] = None) -> List[List[CityRecord]]:
+        """
+        Группы городов с совпадающими (с точностью tolerance_m метров,
+        по умолчанию DEDUP_TOLERANCE_M) координатами — в city.txt их быть
+        не должно. Города в группе — в порядке справочника.
+        """
+        from src.dedup import DEDUP_TOLERANCE_M, find_duplicates
+
+        records = self.all_cities()
+        groups = find_duplicates(
+            [c.latitude for c in records],
+            [c.longitude for c in records],
+            tolerance_m or DEDUP_TOLERANCE_M,
+        )
+        return [[records[i] for i in group.tolist()] for group in groups]
+
+    def merge_duplicates(self, tolerance_m: Optional[float] = None) -> List[str]:
+        """
+        Удалить дубликаты по координатам: в каждой группе остаётся первый
+        город. Изменения попадут в файл при save(). Возвращает названия
+        удалённых городов.
+        """
+        removed = []
+        for group in self.find_duplicates(tolerance_m):
+            for rec in group[1:]:
+                self.delete_city(rec.orig_name)
+                removed.append(rec.orig_name)
+        return removed
+
+    def reset_indexes(self) -> None:
+        """
+        Сбросить производные индексы (нужно после правки координат городов).
+        """
+        self._geo_index = None
+        self._geo_records = []
+        self._search_index = None
+
+    def nearest_city(
+        self, lats, lons, max_km: Optional[float] = None
+    ) -> Tuple[List[Optional[CityRecord]], Any]:
+        """
+        Ближайший город для каждой точки (векторизовано, numpy).
+        Возвращает список городов (None, если города нет в пределах max_km)
+        и массив расстояний в км.
+        """
+        from src.spatial_index import SpatialIndex
+
+        if self._geo_index is None:
+            self._geo_records = self.all_cities()
+            self._geo_index = SpatialIndex()
+            self._geo_index.extend(
+                [c.latitude for c in self._geo_records],
+                [c.longitude for c in self._geo_records],
+            )
+            if self.cache:
+                self.save_cache()  # индекс тоже попадает в кэш
+        ids, km = self._geo_index.nearest_many(lats, lons, max_km)
+        records = self._geo_records
+        return [records[i] if i >= 0 else None for i in ids.tolist()], km
@@ -0,0 +1,159 @@
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# Сокращения типа населённого пункта перед названием: "г.", "н.п.", "пгт " и т.п.
+_TYPE_PREFIX_RE = re.compile(r"^(?:[а-я]{1,4}\.\s*)+|^(?:г|пгт|пос|с|д)\s+")
+_SEPARATORS_RE = re.compile(r"[\s\-_'`\"«»()]+")
+
+# Оценки совпадений: точное > по префиксу > нечёткое (по триграммам)
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.9
+FUZZY_SCORE = 0.8
+
+
+def normalize_name(name: str) -> str:
+    """
+    Нормализованное название для поиска: нижний регистр, ё → е, без
+    сокращения типа ("г.", "н.п.") и с одиночными пробелами вместо
+    дефисов, подчёркиваний и кавычек.
+    """
+    name = name.casefold().replace("ё", "е").strip()
+    name = _TYPE_PREFIX_RE.sub("", name)
+    return _SEPARATORS_RE.sub(" ", name).strip()
+
+
+def trigrams(key: str) -> List[str]:
+    padded = f"  {key} "
+    return sorted({padded[i : i + 3] for i in range(len(padded) - 2)})
+
+
+class CitySearchIndex:
+    """
+    Поиск городов по английскому и русскому названию с опечатками.
+
+    Нормализованные названия хранятся отсортированным списком: все ключи
+    с заданным префиксом занимают в нём непрерывный отрезок, который
+    находится двоичным поиском (как поддерево префиксного дерева, но без
+    отдельного узла на каждую букву). Нечёткий поиск — по инвертированному
+    индексу триграмм: число общих триграмм со всеми ключами считается
+    одним np.bincount, оценка — коэффициент Жаккара.
+    """
+
+    def __init__(self, names: Iterable[Tuple[str, Sequence[str]]]):
+        """
+        names — пары (идентификатор города, его названия).
+        """
+        owners: Dict[str, List[str]] = {}
+        for city_id, city_names in names:
+            for name in city_names:
+                key = normalize_name(name)
+                if not key:
+                    continue
+                ids = owners.setdefault(key, [])
+                if city_id not in ids:
+                    ids.append(city_id)
+        self.keys: List[str] = sorted(owners)
+        self.owners: List[List[str]] = [owners[key] for key in self.keys]
+        postings: Dict[str, List[int]] = {}
+        counts = np.empty(len(self.keys), dtype=np.int32)
+        for i, key in enumerate(self.keys):
+            grams = trigrams(key)
+            counts[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self._gram_counts = counts
+        self._postings: Dict[str, np.ndarray] = {
+            gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def exact(self, query: str) -> List[str]:
+        key = normalize_name(query)
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return list(self.owners[i])
+        return []
+
+    def prefix(self, query: str, limit: int = 10) -> List[str]:
+        """
+        Города, одно из названий которых начинается с query (короткие названия первыми).
+        """
+        matches = self._prefix_matches(normalize_name(query), limit)
+        return [city_id for city_id, _ in matches[:limit]]
+
+    def _prefix_matches(self, key: str, limit: int) -> List[Tuple[str, float]]:
+        if not key:
+            return []
+        start = bisect_left(self.keys, key)
+        # Верхняя граница отрезка: первый ключ, больший всех строк с префиксом key
+        end = bisect_left(self.keys, key + "\U0010ffff", start)
+        # Берём с запасом и сортируем по длине: точное совпадение и короткие — выше
+        span = range(start, min(end, start + max(limit * 20, 200)))
+        found: List[Tuple[str, float]] = []
+        for i in sorted(span, key=lambda i: len(self.keys[i])):
+            name = self.keys[i]
+            if name == key:
+                score = EXACT_SCORE
+            else:
+                score = PREFIX_SCORE * (0.5 + 0.5 * len(key) / len(name))
+            for city_id in self.owners[i]:
+                found.append((city_id, score))
+        return found[: limit * 4]
+
+    def fuzzy(
+        self, query: str, limit: int = 10, min_score: float = 0.3
+    ) -> List[Tuple[str, float]]:
+        """
+        Города с похожими названиями: (идентификатор, оценка Жаккара по триграммам).
+        """
+        return self._fuzzy_matches(normalize_name(query), limit, min_score)
+
+    def _fuzzy_matches(
+        self, key: str, limit: int, min_score: float
+    ) -> List[Tuple[str, float]]:
+        if not key or not self.keys:
+            return []
+        grams = trigrams(key)
+        lists = [self._postings[g] for g in grams if g in self._postings]
+        if not lists:
+            return []
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.keys))
+        candidates = np.flatnonzero(shared)
+        inter = shared[candidates]
+        score = inter / (len(grams) + self._gram_counts[candidates] - inter)
+        keep = score >= min_score
+        candidates, score = candidates[keep], score[keep]
+        if len(candidates) > limit:
+            top = np.argpartition(-score, limit)[:limit]
+            candidates, score = candidates[top], score[top]
+        order = np.argsort(-score, kind="stable")
+        found: List[Tuple[str, float]] = []
+        for i, s in zip(candidates[order].tolist(), score[order].tolist()):
+            for city_id in self.owners[i]:
+                found.append((city_id, s))
+        return found
+
+    def search(
+        self, query: str, limit: int = 10, min_score: float = 0.3
+    ) -> List[Tuple[str, float]]:
+        """
+        Ранжированные кандидаты: точное совпадение, затем по префиксу, затем
+        нечёткие. Оценка от 0 до 1; у каждого города — лучшая из оценок.
+        """
+        key = normalize_name(query)
+        best: Dict[str, float] = {}
+        for city_id, score in self._prefix_matches(key, limit):
+            if score > best.get(city_id, 0.0):
+                best[city_id] = score
+        if len(best) < limit:
+            for city_id, score in self._fuzzy_matches(key, limit, min_score):
+                score *= FUZZY_SCORE
+                if score > best.get(city_id, 0.0):
+                    best[city_id] = score
+        ranked = sorted(best.items(), key=lambda item: -item[1])
+        return ranked[:limit]
@@ -0,0 +1,352 @@
+"""
+Командная строка без GUI: загрузка, запросы, выгрузка, геокодирование и
+статистика базы точек. Tk не импортируется, дисплей не нужен.
+
+    python main.py import
+    python main.py query --city Москва --range "01.03.2024 .. 07.03.2024"
+    python main.py export --out moscow.csv --city Москва
+    python main.py geocode --only-empty
+    python main.py stats --json
+    python main.py migrate --to sqlite
+
+Пути к файлам берутся из settings.txt (--settings) и могут быть заданы
+явно (--csv, --cities, --root). Модули данных импортируются только для
+выбранной команды, поэтому запуск занимает миллисекунды.
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional, Sequence
+
+from src.settings_manager import SettingsManager
+
+
+class CliError(Exception):
+    """
+    Ошибка команды: сообщение выводится в stderr, код возврата 1.
+    """
+
+
+def _settings(args) -> SettingsManager:
+    return SettingsManager(args.settings)
+
+
+def _points_path(args) -> str:
+    from src.allpoints_manager import points_path
+
+    return args.csv or points_path(_settings(args))
+
+
+def _cities_path(args) -> str:
+    return args.cities or _settings(args).get("cityDataFile", "data/city.txt")
+
+
+def _points_manager(args, lazy: bool = False):
+    from src.allpoints_manager import open_points_manager
+
+    # Тот же менеджер, что и в GUI: кэш колонок CSV переиспользуется, база
+    # SQLite (файл .sqlite/.db или pointsStorage=sqlite) открывается без загрузки
+    if args.csv:
+        manager = open_points_manager(path=args.csv)
+    else:
+        manager = open_points_manager(_settings(args))
+    if not lazy:
+        manager.load()
+    return manager
+
+
+def _city_manager(args):
+    from src.city_manager import CityManager
+
+    path = _cities_path(args)
+    if not os.path.exists(path):
+        raise CliError(f"Файл городов не найден: {path}")
+    return CityManager(path, cache=True)
+
+
+def _conditions(args) -> dict:
+    conditions = {
+        "city": args.city,
+        "country": args.country,
+        "date": args.date,
+        "date_range": args.range,
+        "text": args.text,
+        "mode": "or" if args.any else "and",
+    }
+    if args.bbox:
+        conditions["bbox"] = tuple(args.bbox)
+    if args.lon_lat:
+        conditions["lon_lat"] = tuple(args.lon_lat)
+    return conditions
+
+
+def _query_ids(manager, args):
+    try:
+        plan = manager.plan_query(**_conditions(args))
+    except ValueError as e:
+        raise CliError(str(e))
+    if args.explain:
+        for name, estimate, how in plan.explain():
+            if estimate is None:
+                print(f"# {name}: {how}", file=sys.stderr)
+            else:
+                print(f"# {name}: ~{estimate} строк, {how}", file=sys.stderr)
+    ids = plan.ids()
+    return ids[: args.limit] if args.limit is not None else ids
+
+
+def _columns(manager, args) -> List[str]:
+    if not args.columns:
+        return manager.header
+    unknown = [c for c in args.columns if c not in manager.header]
+    if unknown:
+        raise CliError(f"Неизвестные колонки: {', '.join(unknown)}")
+    return args.columns
+
+
+def cmd_import(args) -> int:
+    from src.ingest import ingest_folder
+
+    root = args.root or _settings(args).get("rootFolder", "INPUT")
+    if not os.path.isdir(root):
+        raise CliError(f"Папка не найдена: {root}")
+    manager = _points_manager(args, lazy=True)
+    progress = None
+    if args.verbose:
+        progress = lambda stats: print(stats.summary(), file=sys.stderr)  # noqa: E731
+    stats = ingest_folder(manager, root, workers=args.workers, progress=progress)
+    print(stats.summary())
+    for path, error in stats.errors:
+        print(f"{path}: {error}", file=sys.stderr)
+    return 1 if stats.errors else 0
+
+
+def cmd_query(args) -> int:
+    manager = _points_manager(args)
+    if args.count:
+        if args.limit is None and not args.explain:
+            try:
+                print(manager.query_count(**_conditions(args)))
+            except ValueError as e:
+                raise CliError(str(e))
+        else:
+            print(len(_query_ids(manager, args)))
+        return 0
+    from src.export import write_csv
+
+    columns = _columns(manager, args)
+    write_csv(manager, _query_ids(manager, args), columns, sys.stdout)
+    return 0
+
+
+def cmd_export(args) -> int:
+    from src.export import export_points
+
+    manager = _points_manager(args)
+    columns = _columns(manager, args)
+    ids = _query_ids(manager, args)
+    count = export_points(manager, args.out, ids, args.format, columns)
+    print(f"Выгружено точек: {count} → {args.out}")
+    return 0
+
+
+def cmd_geocode(args) -> int:
+    city_manager = _city_manager(args)
+    manager = _points_manager(args)
+    filled = manager.fill_locations(city_manager, args.max_km, args.only_empty)
+    print(f"Заполнено точек: {filled}")
+    if args.coordinates:
+        print(f"Заполнено координат: {manager.fill_coordinates()}")
+    return 0
+
+
+def cmd_city(args) -> int:
+    manager = _city_manager(args)
+    rec = manager.search(args.name)
+    if rec is not None:
+        candidates = [(rec, 1.0)]
+    else:
+        candidates = manager.suggest(args.name, limit=args.limit)
+    if not candidates:
+        print("Город не найден.", file=sys.stderr)
+        return 1
+    for rec, score in candidates:
+        print(
+            f"{rec.orig_name}\t{rec.type_and_rus}\t{rec.latitude}\t{rec.longitude}"
+            f"\t{rec.country}\t{score:.2f}"
+        )
+    return 0
+
+
+def cmd_migrate(args) -> int:
+    from src.allpoints_manager import is_sqlite_path
+    from src.sqlite_store import export_sqlite_to_csv, migrate_csv_to_sqlite
+
+    source = _points_path(args)
+    if not os.path.exists(source):
+        raise CliError(f"База не найдена: {source}")
+    if args.to == "sqlite":
+        if is_sqlite_path(source):
+            raise CliError(f"База уже в SQLite: {source}")
+        out = args.out or os.path.splitext(source)[0] + ".sqlite"
+        if os.path.exists(out):
+            raise CliError(f"Файл уже существует: {out}")
+        count = migrate_csv_to_sqlite(source, out)
+    else:
+        if not is_sqlite_path(source):
+            raise CliError(f"База уже в CSV: {source}")
+        out = args.out or os.path.splitext(source)[0] + ".csv"
+        count = export_sqlite_to_csv(source, out)
+    print(f"Перенесено точек: {count} → {out}")
+    return 0
+
+
+def cmd_stats(args) -> int:
+    import datetime
+
+    manager = _points_manager(args)
+    path = manager.csv_path
+    stats = {
+        "file": path,
+        "bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+        "points": len(manager),
+    }
+    times = manager.time_index.times
+    if len(times):
+        stats["first"], stats["last"] = (
+            datetime.datetime.fromtimestamp(int(t), datetime.timezone.utc)
+            .strftime("%d.%m.%Y %H:%M:%S")
+            for t in (times[0], times[-1])
+        )
+    # Города с наибольшим числом точек (по хеш-индексу города; у базы
+    # SQLite — одним проходом по колонке)
+    cities = manager.indexes.get("city")
+    if cities is not None:
+        if not cities.built:
+            cities.build(manager.store)
+        counts = [(key, cities.count(key)) for key in cities.keys()]
+    else:
+        from collections import Counter
+
+        counts = list(Counter(manager.store.column_values("City_Value")).items())
+    top = sorted(counts, key=lambda item: -item[1])
+    stats["cities"] = len(top)
+    stats["top_cities"] = top[: args.top]
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return 0
+    print(f"Файл: {stats['file']} ({stats['bytes']} байт)")
+    print(f"Точек: {stats['points']}")
+    if "first" in stats:
+        print(f"Период: {stats['first']} — {stats['last']}")
+    print(f"Городов: {stats['cities']}")
+    for name, count in stats["top_cities"]:
+        print(f"  {name or '(без города)'}: {count}")
+    return 0
+
+
+def _add_filters(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group("условия (как в поиске GUI; по умолчанию — все точки)")
+    group.add_argument("--city", help="Город (City_Value)")
+    group.add_argument("--country", help="Страна (Country_Value)")
+    group.add_argument("--date", help="Дата (Data), строгое сравнение")
+    group.add_argument("--range", help='Диапазон "дата [время] .. дата [время]"')
+    group.add_argument(
+        "--bbox",
+        nargs=4,
+        type=float,
+        metavar=("LAT_MIN", "LON_MIN", "LAT_MAX", "LON_MAX"),
+        help="Прямоугольник широт/долгот",
+    )
+    group.add_argument("--lon-lat", nargs=2, metavar=("LON", "LAT"), help="Точные координаты")
+    group.add_argument("--text", help="Подстрока исходного текста")
+    group.add_argument("--any", action="store_true", help="Любое из условий (ИЛИ)")
+    group.add_argument("--limit", type=int, help="Не больше стольких точек")
+    group.add_argument("--explain", action="store_true", help="Вывести план запроса в stderr")
+    parser.add_argument("--columns", nargs="+", help="Колонки вывода (по умолчанию все)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="Points Data Manager: работа с базой без GUI"
+    )
+    parser.add_argument("--settings", default="settings.txt", help="Файл настроек")
+    parser.add_argument("--csv", help="База точек, CSV или .sqlite (вместо mainDataCSV)")
+    parser.add_argument("--cities", help="Файл городов (вместо cityDataFile)")
+    parser.add_argument(
+        "--metrics", metavar="FILE", help="Собрать статистику операций и записать в FILE"
+    )
+    commands = parser.add_subparsers(dest="command", required=True, metavar="команда")
+
+    p = commands.add_parser("import", help="Загрузить xml/json из rootFolder в базу")
+    p.add_argument("--root", help="Папка с файлами (вместо rootFolder)")
+    p.add_argument("--workers", type=int, help="Число процессов разбора")
+    p.add_argument("-v", "--verbose", action="store_true", help="Показывать прогресс")
+    p.set_defaults(handler=cmd_import)
+
+    p = commands.add_parser("query", help="Найти точки и вывести CSV в stdout")
+    _add_filters(p)
+    p.add_argument("--count", action="store_true", help="Только число точек")
+    p.set_defaults(handler=cmd_query)
+
+    p = commands.add_parser("export", help="Выгрузить точки в CSV, TXT или GeoJSON")
+    p.add_argument("--out", required=True, help="Файл результата")
+    p.add_argument(
+        "--format",
+        choices=("csv", "txt", "geojson"),
+        help="Формат (по умолчанию — по расширению --out)",
+    )
+    _add_filters(p)
+    p.set_defaults(handler=cmd_export)
+
+    p = commands.add_parser("geocode", help="Заполнить город и район по ближайшему городу")
+    p.add_argument("--max-km", type=float, help="Не дальше стольких км от города")
+    p.add_argument("--only-empty", action="store_true", help="Только точки без города")
+    p.add_argument(
+        "--coordinates", action="store_true", help="Также пересчитать WGS-84 ↔ СК-42"
+    )
+    p.set_defaults(handler=cmd_geocode)
+
+    p = commands.add_parser("city", help="Найти город в справочнике")
+    p.add_argument("name", help="Название (английское или русское)")
+    p.add_argument("--limit", type=int, default=5, help="Сколько похожих показать")
+    p.set_defaults(handler=cmd_city)
+
+    p = commands.add_parser("migrate", help="Перенести базу точек между CSV и SQLite")
+    p.add_argument("--to", required=True, choices=("sqlite", "csv"), help="Формат результата")
+    p.add_argument("--out", help="Файл результата (по умолчанию — рядом с базой)")
+    p.set_defaults(handler=cmd_migrate)
+
+    p = commands.add_parser("stats", help="Сводка по базе точек")
+    p.add_argument("--top", type=int, default=10, help="Сколько городов показать")
+    p.add_argument("--json", action="store_true", help="Вывод в JSON")
+    p.set_defaults(handler=cmd_stats)
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from src.metrics import METRICS
+
+    args = build_parser().parse_args(argv)
+    metrics_enabled = METRICS.enabled
+    if args.metrics:
+        METRICS.enabled = True
+    try:
+        return args.handler(args)
+    except CliError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # Вывод оборван (например, `| head`) — это не ошибка команды
+        sys.stderr.close()
+        return 0
+    finally:
+        if args.metrics:
+            METRICS.dump(args.metrics)
+            METRICS.enabled = metrics_enabled
+
+
+if __name__ == "__main__":
+    sys.exit(main())
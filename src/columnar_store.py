@@ -0,0 +1,599 @@
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.allpoints_manager import AllPointRecord, parse_date, parse_time
+
+# Значение метки времени для строк с нераспознанной датой
+NO_TIMESTAMP = np.iinfo(np.int64).min
+
+FLOAT_COLUMNS = (
+    "Lat_WGS84",
+    "Lon_WGS84",
+    "X_SK-42_Gauss_Kruger",
+    "Y_SK-42_Gauss_Kruger",
+)
+CATEGORY_COLUMNS = (
+    "Data",
+    "Time",
+    "City_Value",
+    "Country_Value",
+    "Description of the area",
+    "Description of the region",
+)
+TEXT_COLUMNS = ("Original text",)
+
+
+class GrowableArray:
+    """
+    Одномерный numpy-массив с амортизированным добавлением в конец.
+    """
+
+    def __init__(self, dtype, capacity: int = 1024):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    @classmethod
+    def wrap(cls, data: np.ndarray) -> "GrowableArray":
+        """
+        Обернуть готовый массив без копирования (например, отображённый из файла
+        только для чтения); копия создаётся при первом изменении.
+        """
+        arr = cls(data.dtype, 0)
+        arr._data = data
+        arr._size = len(data)
+        return arr
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, size: int):
+        if size > len(self._data) or not self._data.flags.writeable:
+            new = np.empty(max(size, 2 * len(self._data)), dtype=self._data.dtype)
+            new[: self._size] = self._data[: self._size]
+            self._data = new
+
+    def append(self, value):
+        self._reserve(self._size + 1)
+        self._data[self._size] = value
+        self._size += 1
+
+    def extend(self, values: np.ndarray):
+        n = len(values)
+        self._reserve(self._size + n)
+        self._data[self._size : self._size + n] = values
+        self._size += n
+
+    def view(self) -> np.ndarray:
+        return self._data[: self._size]
+
+    def writable_view(self) -> np.ndarray:
+        self._reserve(self._size)
+        return self._data[: self._size]
+
+    def truncate(self, size: int):
+        self._size = min(size, self._size)
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+
+_FIXED_RE = re.compile(r"^-?(?:0|[1-9]\d*)(?:[.,](\d+))?$")
+# Код формата числа: число знаков после запятой, флаг десятичной запятой,
+# NO_FORMAT — пустая строка (NaN)
+_COMMA_FLAG = 64
+NO_FORMAT = -1
+
+
+def _parse_float(s: str) -> float:
+    try:
+        return float(s.replace(",", "."))
+    except ValueError:
+        return math.nan
+
+
+def _format_code(s: str) -> int:
+    if not s:
+        return NO_FORMAT
+    m = _FIXED_RE.match(s)
+    if not m:
+        return NO_FORMAT
+    decimals = len(m.group(1) or "")
+    if decimals >= _COMMA_FLAG:
+        return NO_FORMAT
+    return decimals | (_COMMA_FLAG if "," in s else 0)
+
+
+def _format_float(v: float, code: int) -> str:
+    if code == NO_FORMAT or math.isnan(v):
+        return ""
+    s = f"{v:.{code & (_COMMA_FLAG - 1)}f}"
+    return s.replace(".", ",") if code & _COMMA_FLAG else s
+
+
+class FloatColumn:
+    """
+    Числовая колонка float64. Для каждой строки хранится код формата
+    (число знаков после запятой, точка или запятая), поэтому исходная
+    строка восстанавливается без потерь. Строки в нестандартной записи
+    ("1e-5", "+55.7", мусор) хранятся отдельно в словаре overrides.
+    """
+
+    def __init__(self):
+        self.values = GrowableArray(np.float64)
+        self.formats = GrowableArray(np.int8)
+        self.overrides: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def extend(self, raw_values: List[str]):
+        start = len(self.values)
+        values: List[float] = []
+        codes: List[int] = []
+        match = _FIXED_RE.match
+        for i, s in enumerate(raw_values):
+            m = match(s)
+            if m is None:
+                values.append(_parse_float(s))
+                codes.append(NO_FORMAT)
+                if s:
+                    self.overrides[start + i] = s
+                continue
+            frac = m.group(1)
+            code = len(frac) if frac else 0
+            if code >= _COMMA_FLAG:
+                code = NO_FORMAT
+            elif frac and s[-len(frac) - 1] == ",":
+                code |= _COMMA_FLAG
+            v = float(s.replace(",", ".")) if code & _COMMA_FLAG else float(s)
+            values.append(v)
+            codes.append(code)
+            # До 15 значащих цифр запись с тем же числом знаков точно совпадает
+            if len(s) > 15 and _format_float(v, code) != s:
+                self.overrides[start + i] = s
+        self.values.extend(np.array(values, dtype=np.float64))
+        self.formats.extend(np.array(codes, dtype=np.int8))
+
+    def get(self, i: int) -> str:
+        raw = self.overrides.get(i)
+        if raw is not None:
+            return raw
+        return _format_float(float(self.values.view()[i]), int(self.formats.view()[i]))
+
+    def values_at(self, ids: np.ndarray) -> List[str]:
+        """
+        Исходные строки для номеров ids (как get): значения с одним кодом
+        формата форматируются одним проходом.
+        """
+        values = self.values.view()[ids]
+        codes = self.formats.view()[ids]
+        result = [""] * len(ids)
+        for code in np.unique(codes).tolist():
+            if code == NO_FORMAT:
+                continue
+            sel = np.flatnonzero((codes == code) & ~np.isnan(values))
+            text = list(map(f"%.{code & (_COMMA_FLAG - 1)}f".__mod__, values[sel].tolist()))
+            if code & _COMMA_FLAG:
+                text = [t.replace(".", ",") for t in text]
+            if len(sel) == len(ids):
+                result = text
+            else:
+                for k, t in zip(sel.tolist(), text):
+                    result[k] = t
+        if self.overrides:
+            for k, i in enumerate(ids.tolist()):
+                raw = self.overrides.get(i)
+                if raw is not None:
+                    result[k] = raw
+        return result
+
+    def find(self, value: str) -> np.ndarray:
+        arr = self.values.view()
+        v = _parse_float(value)
+        code = _format_code(value)
+        if _format_float(v, code) == value:
+            if math.isnan(v):
+                mask = self.formats.view() == NO_FORMAT
+            else:
+                mask = (arr == v) & (self.formats.view() == code)
+            ids = np.flatnonzero(mask)
+            if self.overrides:
+                keys = np.fromiter(self.overrides, dtype=np.int64)
+                ids = ids[~np.isin(ids, keys)]
+        else:
+            ids = np.empty(0, dtype=np.int64)
+        extra = [i for i, raw in self.overrides.items() if raw == value]
+        if extra:
+            ids = np.union1d(ids, np.array(extra, dtype=np.int64))
+        return ids
+
+    def set(self, ids: Sequence[int], raw_values: Sequence[str]):
+        column = FloatColumn()
+        column.extend(list(raw_values))
+        ids = np.asarray(ids, dtype=np.int64)
+        self.values.writable_view()[ids] = column.values.view()
+        self.formats.writable_view()[ids] = column.formats.view()
+        for i, row_id in enumerate(ids.tolist()):
+            raw = column.overrides.get(i)
+            if raw is not None:
+                self.overrides[row_id] = raw
+            else:
+                self.overrides.pop(row_id, None)
+
+    def truncate(self, size: int):
+        self.values.truncate(size)
+        self.formats.truncate(size)
+        for i in [i for i in self.overrides if i >= size]:
+            del self.overrides[i]
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.formats.nbytes + 100 * len(self.overrides)
+
+    def export(self) -> Tuple[Dict[str, np.ndarray], Dict[str, object]]:
+        arrays = {"values": self.values.view(), "formats": self.formats.view()}
+        return arrays, {"overrides": {str(i): v for i, v in self.overrides.items()}}
+
+    @classmethod
+    def restore(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, object]) -> "FloatColumn":
+        column = cls()
+        column.values = GrowableArray.wrap(arrays["values"])
+        column.formats = GrowableArray.wrap(arrays["formats"])
+        column.overrides = {int(i): v for i, v in meta["overrides"].items()}
+        return column
+
+
+class CategoryColumn:
+    """
+    Строковая колонка со словарным кодированием: коды int32 + список значений.
+    """
+
+    def __init__(self):
+        self.codes = GrowableArray(np.int32)
+        self.values: List[str] = []
+        self._lookup: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def code(self, value: str) -> int:
+        code = self._lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._lookup[value] = code
+        return code
+
+    def lookup(self, value: str) -> Optional[int]:
+        """
+        Код значения или None, если такого значения в колонке нет.
+        """
+        return self._lookup.get(value)
+
+    def extend(self, raw_values: List[str]):
+        code = self.code
+        self.codes.extend(
+            np.fromiter((code(s) for s in raw_values), dtype=np.int32, count=len(raw_values))
+        )
+
+    def get(self, i: int) -> str:
+        return self.values[self.codes.view()[i]]
+
+    def values_at(self, ids: np.ndarray) -> List[str]:
+        values = self.values
+        return [values[c] for c in self.codes.view()[ids].tolist()]
+
+    def set(self, ids: Sequence[int], raw_values: Sequence[str]):
+        code = self.code
+        self.codes.writable_view()[np.asarray(ids, dtype=np.int64)] = [
+            code(s) for s in raw_values
+        ]
+
+    def find(self, value: str) -> np.ndarray:
+        code = self.lookup(value)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.codes.view() == code)
+
+    def truncate(self, size: int):
+        self.codes.truncate(size)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + sum(50 + len(v) * 2 for v in self.values)
+
+    def export(self) -> Tuple[Dict[str, np.ndarray], Dict[str, object]]:
+        return {"codes": self.codes.view()}, {"values": self.values}
+
+    @classmethod
+    def restore(
+        cls, arrays: Dict[str, np.ndarray], meta: Dict[str, object]
+    ) -> "CategoryColumn":
+        column = cls()
+        column.codes = GrowableArray.wrap(arrays["codes"])
+        column.values = list(meta["values"])
+        column._lookup = {value: code for code, value in enumerate(column.values)}
+        return column
+
+
+class TextColumn:
+    """
+    Колонка произвольного текста: UTF-8 байты всех значений подряд + смещения.
+    """
+
+    def __init__(self):
+        self.blob = bytearray()
+        self.offsets = GrowableArray(np.int64)
+        self.offsets.append(0)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def extend(self, raw_values: List[str]):
+        if not isinstance(self.blob, bytearray):
+            self.blob = bytearray(self.blob)
+        ends = []
+        for s in raw_values:
+            self.blob += s.encode("utf-8")
+            ends.append(len(self.blob))
+        self.offsets.extend(np.array(ends, dtype=np.int64))
+
+    def get(self, i: int) -> str:
+        offsets = self.offsets.view()
+        return str(self.blob[offsets[i] : offsets[i + 1]], "utf-8")
+
+    def values_at(self, ids: np.ndarray) -> List[str]:
+        offsets = self.offsets.view()
+        blob = self.blob
+        return [
+            str(blob[a:b], "utf-8")
+            for a, b in zip(offsets[ids].tolist(), offsets[ids + 1].tolist())
+        ]
+
+    def find(self, value: str) -> np.ndarray:
+        return np.array(
+            [i for i in range(len(self)) if self.get(i) == value], dtype=np.int64
+        )
+
+    def set(self, ids: Sequence[int], raw_values: Sequence[str]):
+        # Значения той же длины в байтах пишутся на место; иначе буфер
+        # склеивается один раз из нетронутых кусков и новых значений,
+        # а смещения после каждой правленой строки сдвигаются разом
+        updates = {int(i): s.encode("utf-8") for i, s in zip(ids, raw_values)}
+        if not updates:
+            return
+        if not isinstance(self.blob, bytearray):
+            self.blob = bytearray(self.blob)
+        offsets = self.offsets.writable_view()
+        rows = sorted(updates)
+        starts = offsets[rows].tolist()
+        ends = offsets[np.asarray(rows) + 1].tolist()
+        deltas = [len(updates[r]) - (b - a) for r, a, b in zip(rows, starts, ends)]
+        if not any(deltas):
+            for r, a, b in zip(rows, starts, ends):
+                self.blob[a:b] = updates[r]
+            return
+        blob = memoryview(self.blob)
+        pieces = []
+        pos = 0
+        for r, a, b in zip(rows, starts, ends):
+            pieces.append(blob[pos:a])
+            pieces.append(updates[r])
+            pos = b
+        pieces.append(blob[pos:])
+        new_blob = bytearray(b"".join(pieces))
+        del pieces
+        blob.release()
+        self.blob = new_blob
+        shift = np.zeros(len(offsets), dtype=np.int64)
+        shift[np.asarray(rows) + 1] = deltas
+        offsets += np.cumsum(shift)
+
+    def truncate(self, size: int):
+        if size < len(self):
+            if not isinstance(self.blob, bytearray):
+                self.blob = bytearray(self.blob)
+            del self.blob[int(self.offsets.view()[size]) :]
+            self.offsets.truncate(size + 1)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.blob) + self.offsets.nbytes
+
+    def export(self) -> Tuple[Dict[str, np.ndarray], Dict[str, object]]:
+        blob = np.frombuffer(self.blob, dtype=np.uint8) if len(self.blob) else np.empty(0, np.uint8)
+        return {"blob": blob, "offsets": self.offsets.view()}, {}
+
+    @classmethod
+    def restore(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, object]) -> "TextColumn":
+        column = cls()
+        column.blob = memoryview(arrays["blob"])
+        column.offsets = GrowableArray.wrap(arrays["offsets"])
+        return column
+
+
+class ColumnarPointStore:
+    """
+    Колоночное хранилище точек AllPoint.csv на numpy-массивах.
+
+    Координаты хранятся как float64, дата, время, город, страна и описания —
+    словарным кодированием, исходный текст — одним UTF-8 буфером.
+    Объекты AllPointRecord создаются только по запросу.
+    """
+
+    def __init__(self, header: List[str]):
+        self.header = list(header)
+        self.columns: Dict[str, object] = {}
+        for name in self.header:
+            if name in FLOAT_COLUMNS:
+                self.columns[name] = FloatColumn()
+            elif name in CATEGORY_COLUMNS:
+                self.columns[name] = CategoryColumn()
+            else:
+                self.columns[name] = TextColumn()
+        self._size = 0
+        self._timestamps: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def export(self) -> Dict[str, Tuple[str, Dict[str, np.ndarray], Dict[str, object]]]:
+        """
+        Состояние колонок для сохранения: {колонка: (тип, массивы, метаданные)}.
+        """
+        return {
+            name: (type(column).__name__, *column.export())
+            for name, column in self.columns.items()
+        }
+
+    @classmethod
+    def restore(
+        cls,
+        header: List[str],
+        size: int,
+        columns: Dict[str, Tuple[str, Dict[str, np.ndarray], Dict[str, object]]],
+    ) -> "ColumnarPointStore":
+        """
+        Восстановить хранилище из результата export() (массивы не копируются).
+        """
+        store = cls(header)
+        kinds = {c.__name__: c for c in (FloatColumn, CategoryColumn, TextColumn)}
+        for name in store.header:
+            kind, arrays, meta = columns[name]
+            store.columns[name] = kinds[kind].restore(arrays, meta)
+        store._size = size
+        return store
+
+    def append(self, rec: AllPointRecord):
+        self.extend([rec])
+
+    def extend(self, records: Iterable[AllPointRecord]):
+        rows = [rec.data for rec in records]
+        if not rows:
+            return
+        for name, column in self.columns.items():
+            column.extend([row.get(name) or "" for row in rows])
+        self._size += len(rows)
+        self._timestamps = None
+
+    def pop(self):
+        self._truncate(self._size - 1)
+
+    def clear(self):
+        self._truncate(0)
+
+    def _truncate(self, size: int):
+        for column in self.columns.values():
+            column.truncate(size)
+        self._size = size
+        self._timestamps = None
+
+    def value(self, i: int, column: str) -> str:
+        return self.columns[column].get(i)
+
+    def record(self, i: int) -> AllPointRecord:
+        return AllPointRecord(
+            {name: column.get(i) for name, column in self.columns.items()}
+        )
+
+    def records_at(self, ids: Iterable[int]) -> List[AllPointRecord]:
+        return [self.record(int(i)) for i in ids]
+
+    def iter_records(self) -> Iterable[AllPointRecord]:
+        for i in range(self._size):
+            yield self.record(i)
+
+    def rows_at(self, ids: Sequence[int], columns: Sequence[str]) -> List[Tuple[str, ...]]:
+        """
+        Значения колонок columns для строк ids кортежами — по колонке за раз,
+        без создания записей (для выгрузки больших выборок).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        return list(zip(*(self.columns[name].values_at(ids) for name in columns)))
+
+    def set_values(self, column: str, ids: Sequence[int], values: Sequence[str]):
+        """
+        Записать значения колонки для строк ids (правка на месте).
+        """
+        self.columns[column].set(ids, values)
+        if column in ("Data", "Time"):
+            self._timestamps = None
+
+    def column_values(self, column: str, start: int = 0) -> List[str]:
+        col = self.columns[column]
+        if isinstance(col, CategoryColumn):
+            values = col.values
+            return [values[c] for c in col.codes.view()[start:].tolist()]
+        return [col.get(i) for i in range(start, self._size)]
+
+    def row_groups(self, column: str, start: int = 0) -> Dict[str, np.ndarray]:
+        """
+        Номера строк (начиная с start), сгруппированные по значению колонки.
+        """
+        col = self.columns[column]
+        if not isinstance(col, CategoryColumn):
+            groups: Dict[str, List[int]] = {}
+            for i, value in enumerate(self.column_values(column, start), start):
+                groups.setdefault(value, []).append(i)
+            return {k: np.array(v, dtype=np.int64) for k, v in groups.items()}
+        codes = col.codes.view()[start:]
+        if not len(codes):
+            return {}
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+        starts = np.r_[0, bounds]
+        ends = np.r_[bounds, len(order)]
+        return {
+            col.values[int(sorted_codes[s])]: order[s:e] + start
+            for s, e in zip(starts.tolist(), ends.tolist())
+        }
+
+    def find_where(self, conditions: Dict[str, str]) -> np.ndarray:
+        """
+        Номера строк, у которых все указанные колонки равны заданным строкам.
+        """
+        ids: Optional[np.ndarray] = None
+        for name, value in conditions.items():
+            found = self.columns[name].find(value)
+            ids = found if ids is None else np.intersect1d(ids, found, assume_unique=True)
+            if not len(ids):
+                break
+        return ids if ids is not None else np.arange(self._size)
+
+    def float_array(self, column: str) -> np.ndarray:
+        """
+        Значения числовой колонки (NaN для пустых и нераспознанных).
+        """
+        return self.columns[column].values.view()
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """
+        Метки времени Data+Time в секундах (NO_TIMESTAMP, если дата не распознана).
+        Разбор выполняется один раз на каждое уникальное значение даты и времени.
+        """
+        if self._timestamps is None:
+            dates = self.columns["Data"]
+            times = self.columns["Time"]
+            day = np.array(
+                [NO_TIMESTAMP if (d := parse_date(v)) is None else d for v in dates.values],
+                dtype=np.int64,
+            )
+            sec = np.array([parse_time(v) or 0 for v in times.values], dtype=np.int64)
+            day_of_row = day[dates.codes.view()]
+            ts = day_of_row + sec[times.codes.view()]
+            ts[day_of_row == NO_TIMESTAMP] = NO_TIMESTAMP
+            self._timestamps = ts
+        return self._timestamps
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Приблизительный объём памяти, занятый колонками.
+        """
+        return sum(column.nbytes for column in self.columns.values())
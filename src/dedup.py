@@ -0,0 +1,192 @@
+import itertools
+from typing import List, Tuple
+
+import numpy as np
+
+from src.spatial_index import EARTH_RADIUS_KM, to_unit_xyz
+
+# Допуск по умолчанию: точки ближе этого расстояния (м) считаются дубликатами
+DEDUP_TOLERANCE_M = 10.0
+
+_EARTH_RADIUS_M = EARTH_RADIUS_KM * 1000.0
+# Смещения к соседним ячейкам: сама ячейка и «половина» из 26 соседних
+# (вторая половина даёт те же пары в обратном порядке)
+_ALL_OFFSETS = np.array(list(itertools.product((-1, 0, 1), repeat=3)), dtype=np.int64)
+_HALF_OFFSETS = _ALL_OFFSETS[13:]
+
+
+def _cell_hash(cells: np.ndarray) -> np.ndarray:
+    # Хеш номера ячейки (x, y, z) в int64; переполнение допустимо — совпадения
+    # хешей разных ячеек отсеиваются проверкой расстояния
+    with np.errstate(over="ignore"):
+        return (
+            cells[..., 0] * np.int64(73856093)
+            + cells[..., 1] * np.int64(19349663)
+            + cells[..., 2] * np.int64(83492791)
+        )
+
+
+class CoordinateIndex:
+    """
+    Поиск точек, лежащих ближе tolerance_m друг к другу.
+
+    Точки переводятся в прямоугольные координаты (м) на сфере и
+    квантуются в кубические ячейки со стороной tolerance_m: близкие точки
+    лежат в одной или в соседних ячейках. Ячейки хранятся отсортированным
+    массивом хешей, поэтому поиск соседей — векторный двоичный поиск по
+    27 ячейкам, а поиск всех дубликатов — O(N) проверок пар (плюс сортировка).
+    Точки без координат (NaN) не индексируются.
+    """
+
+    def __init__(self, tolerance_m: float = DEDUP_TOLERANCE_M):
+        if tolerance_m <= 0:
+            raise ValueError("Допуск должен быть больше нуля")
+        self.tolerance_m = float(tolerance_m)
+        self._xyz = np.empty((0, 3), dtype=np.float64)
+        self._cells = np.empty((0, 3), dtype=np.int64)
+        self._valid = np.empty(0, dtype=bool)
+        self._sorted_keys = np.empty(0, dtype=np.int64)
+        self._sorted_ids = np.empty(0, dtype=np.int64)
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._xyz)
+
+    def _points(self, lats, lons) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+        lons = np.asarray(lons, dtype=np.float64).reshape(-1)
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        xyz = to_unit_xyz(np.where(valid, lats, 0.0), np.where(valid, lons, 0.0))
+        xyz *= _EARTH_RADIUS_M
+        cells = np.floor(xyz / self.tolerance_m).astype(np.int64)
+        return xyz, cells, valid
+
+    def extend(self, lats, lons):
+        """
+        Добавить точки (номера продолжают уже имеющиеся).
+        """
+        xyz, cells, valid = self._points(lats, lons)
+        self._xyz = np.concatenate([self._xyz, xyz])
+        self._cells = np.concatenate([self._cells, cells])
+        self._valid = np.concatenate([self._valid, valid])
+        self._dirty = True
+
+    def _ensure_sorted(self):
+        if self._dirty:
+            ids = np.flatnonzero(self._valid)
+            keys = _cell_hash(self._cells[ids])
+            order = np.argsort(keys, kind="stable")
+            self._sorted_keys, self._sorted_ids = keys[order], ids[order]
+            # Отрезки точек с одинаковым хешем ячейки
+            bounds = np.flatnonzero(np.diff(self._sorted_keys)) + 1
+            self._starts = np.r_[0, bounds].astype(np.int64)
+            self._counts = np.diff(np.r_[self._starts, len(order)])
+            self._unique_keys = self._sorted_keys[self._starts]
+            self._dirty = False
+
+    def _pairs_with_cells(
+        self, keys: np.ndarray, offsets: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Все пары (номер запроса, номер точки индекса), где точка лежит
+        в ячейке запроса, сдвинутой на один из offsets. keys — хеши ячеек
+        запросов; хеш линеен, поэтому хеш соседней ячейки — сдвиг на
+        константу, и отсортированные запросы остаются отсортированными
+        (двоичный поиск по ним идёт последовательно по памяти).
+        """
+        self._ensure_sorted()
+        unique_keys = self._unique_keys
+        queries: List[np.ndarray] = []
+        found: List[np.ndarray] = []
+        if not len(unique_keys):
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        for offset in offsets:
+            with np.errstate(over="ignore"):
+                target = keys + _cell_hash(offset)
+            pos = np.searchsorted(unique_keys, target)
+            pos[pos == len(unique_keys)] = 0
+            hit = np.flatnonzero(unique_keys[pos] == target)
+            if not len(hit):
+                continue
+            # Развернуть отрезки точек ячеек в пары без цикла по запросам
+            reps = self._counts[pos[hit]]
+            q = np.repeat(hit, reps)
+            shift = np.repeat(self._starts[pos[hit]] - np.cumsum(reps) + reps, reps)
+            queries.append(q)
+            found.append(self._sorted_ids[shift + np.arange(len(q))])
+        if not queries:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(queries), np.concatenate(found)
+
+    def _close(self, a_xyz: np.ndarray, b_xyz: np.ndarray) -> np.ndarray:
+        return ((a_xyz - b_xyz) ** 2).sum(axis=1) <= self.tolerance_m**2
+
+    def near(self, lats, lons) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Точки индекса ближе допуска к каждой из заданных точек: пары
+        (номер заданной точки, номер точки индекса). Проверка перед вставкой.
+        """
+        xyz, cells, valid = self._points(lats, lons)
+        q = np.flatnonzero(valid)
+        keys = _cell_hash(cells[q])
+        order = np.argsort(keys, kind="stable")
+        q = q[order]
+        pairs_q, pairs_id = self._pairs_with_cells(keys[order], _ALL_OFFSETS)
+        pairs_q = q[pairs_q]
+        keep = self._close(xyz[pairs_q], self._xyz[pairs_id])
+        pairs_q, pairs_id = pairs_q[keep], pairs_id[keep]
+        order = np.lexsort((pairs_id, pairs_q))
+        return pairs_q[order], pairs_id[order]
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Все пары точек индекса (i < j), лежащих ближе допуска.
+        """
+        self._ensure_sorted()
+        ids = self._sorted_ids
+        q, other = self._pairs_with_cells(self._sorted_keys, _HALF_OFFSETS)
+        a = ids[q]
+        # В своей ячейке каждая пара встречается дважды и с самой собой
+        keep = a != other
+        a, other = a[keep], other[keep]
+        a, b = np.minimum(a, other), np.maximum(a, other)
+        keep = self._close(self._xyz[a], self._xyz[b])
+        pairs = np.unique(np.stack([a[keep], b[keep]], axis=1), axis=0)
+        return pairs[:, 0], pairs[:, 1]
+
+    def groups(self) -> List[np.ndarray]:
+        """
+        Группы дубликатов: связные компоненты по отношению «ближе допуска»
+        (номера по возрастанию, группы — по первому номеру).
+        """
+        a, b = self.pairs()
+        if not len(a):
+            return []
+        labels = np.arange(len(self._xyz))
+        # Распространение меньшей метки по рёбрам до устойчивого состояния
+        while True:
+            low = np.minimum(labels[a], labels[b])
+            changed = (labels[a] != low) | (labels[b] != low)
+            if not changed.any():
+                break
+            np.minimum.at(labels, a, low)
+            np.minimum.at(labels, b, low)
+            labels = labels[labels]
+        members = np.unique(np.concatenate([a, b]))
+        roots = labels[members]
+        order = np.lexsort((members, roots))
+        members, roots = members[order], roots[order]
+        bounds = np.flatnonzero(np.diff(roots)) + 1
+        return np.split(members, bounds)
+
+
+def find_duplicates(lats, lons, tolerance_m: float = DEDUP_TOLERANCE_M) -> List[np.ndarray]:
+    """
+    Группы номеров точек, лежащих ближе tolerance_m друг к другу
+    (tolerance_m близко к нулю — только точные совпадения координат).
+    """
+    index = CoordinateIndex(tolerance_m)
+    index.extend(lats, lons)
+    return index.groups()
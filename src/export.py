@@ -0,0 +1,253 @@
+"""
+Выгрузка точек из базы в CSV, TXT (формат city.txt) и GeoJSON.
+
+Записи читаются из хранилища частями по EXPORT_CHUNK строк, поэтому
+память не зависит от размера выгрузки. Файл пишется во временный и
+заменяет целевой только после успешной записи.
+"""
+
+import csv
+import json
+import math
+import os
+import tempfile
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, TextIO
+
+from src.city_manager import CityRecord, format_city_line
+from src.columnar_store import ColumnarPointStore
+from src.file_lock import keep_file_mode
+from src.mapped_store import MappedPointStore
+from src.metrics import METRICS
+
+# Сколько записей читается из хранилища за раз
+EXPORT_CHUNK = 10000
+# Расширение файла → формат выгрузки
+EXPORT_FORMATS: Dict[str, str] = {
+    ".csv": "csv",
+    ".txt": "txt",
+    ".geojson": "geojson",
+    ".json": "geojson",
+}
+
+Progress = Callable[[int, int], None]
+
+
+def export_format(path: str) -> str:
+    """
+    Формат выгрузки по расширению файла (по умолчанию — CSV).
+    """
+    return EXPORT_FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def rows_at(store, ids: Sequence[int], columns: Sequence[str]) -> List[Sequence[str]]:
+    """
+    Значения колонок columns для строк ids; колоночное хранилище и mmap
+    отдают их без создания записей (по колонке за раз или кусками файла).
+    """
+    if isinstance(store, (ColumnarPointStore, MappedPointStore)):
+        return store.rows_at(ids, columns)
+    return [[rec.data.get(c) or "" for c in columns] for rec in store.records_at(ids)]
+
+
+def iter_chunks(
+    manager, ids: Sequence[int], columns: Sequence[str], progress: Optional[Progress] = None
+) -> Iterator[List[Sequence[str]]]:
+    """
+    Строки ids (значения колонок columns) частями по EXPORT_CHUNK; после
+    каждой части — progress(выгружено, всего).
+    """
+    total = len(ids)
+    for start in range(0, total, EXPORT_CHUNK):
+        chunk = [int(i) for i in ids[start : start + EXPORT_CHUNK]]
+        yield rows_at(manager.store, chunk, columns)
+        if progress is not None:
+            progress(min(start + EXPORT_CHUNK, total), total)
+
+
+def write_csv(
+    manager,
+    ids: Sequence[int],
+    columns: Sequence[str],
+    f: TextIO,
+    progress: Optional[Progress] = None,
+) -> int:
+    """
+    Строки ids в CSV с заголовком (как AllPoint.csv). Возвращает число строк.
+    """
+    writer = csv.writer(f, lineterminator="\r\n")
+    writer.writerow(columns)
+    for rows in iter_chunks(manager, ids, columns, progress):
+        writer.writerows(rows)
+    return len(ids)
+
+
+def _coordinate(value: str) -> float:
+    try:
+        return float(value.replace(",", "."))
+    except ValueError:
+        return math.nan
+
+
+def _txt_field(value: str) -> str:
+    # "_" разделяет поля строки city.txt, перевод строки — записи
+    return " ".join(value.replace("_", " ").split())
+
+
+def _unique_name(name: str, names: Dict[str, int]) -> str:
+    # names: уже выданные названия → последний суффикс для повторов
+    n = names.get(name)
+    if n is None:
+        names[name] = 1
+        return name
+    while True:
+        n += 1
+        candidate = f"{name} ({n})"
+        if candidate not in names:
+            names[name] = n
+            names[candidate] = 1
+            return candidate
+
+
+# Название в TXT для точки без City_Value (пустое city.txt не разберёт)
+TXT_NO_NAME = "Без названия"
+# Колонки для строки city.txt: город, район, широта, долгота, страна,
+# дата, время, регион
+TXT_COLUMNS = (
+    "City_Value",
+    "Description of the area",
+    "Lat_WGS84",
+    "Lon_WGS84",
+    "Country_Value",
+    "Data",
+    "Time",
+    "Description of the region",
+)
+
+
+def write_txt(
+    manager,
+    ids: Sequence[int],
+    columns: Sequence[str],
+    f: TextIO,
+    progress: Optional[Progress] = None,
+) -> int:
+    """
+    Точки строками формата city.txt, которые читает parse_city_line
+    (и CityManager). Поля CityRecord заполняются так:
+
+        orig_name    ← City_Value
+        type_and_rus ← Description of the area
+        latitude     ← Lat_WGS84
+        longitude    ← Lon_WGS84
+        country      ← Country_Value
+        description  ← "Data Time"
+        region       ← Description of the region
+
+    Символы-разделители формата в значениях заменяются пробелами ("_",
+    переводы строк, "=" в названии). CityManager хранит города по названию,
+    поэтому пустое название становится TXT_NO_NAME, а повторное получает
+    суффикс " (2)", " (3)"... — так каждая точка загружается отдельным
+    городом. Точки без координат пропускаются. columns не используется
+    (состав полей задан форматом). Возвращает число записанных строк.
+    """
+    written = 0
+    names: Dict[str, int] = {}
+    for rows in iter_chunks(manager, ids, TXT_COLUMNS, progress):
+        lines = []
+        for city, area, lat, lon, country, date, time, region in rows:
+            lat, lon = _coordinate(lat), _coordinate(lon)
+            if math.isnan(lat) or math.isnan(lon):
+                continue
+            # Строка, начинающаяся с "'", в city.txt — комментарий
+            name = _txt_field(city).replace("=", " ").lstrip("' ") or TXT_NO_NAME
+            rec = CityRecord(
+                orig_name=_unique_name(name, names),
+                type_and_rus=_txt_field(area),
+                latitude=lat,
+                longitude=lon,
+                country=_txt_field(country),
+                description=_txt_field(f"{date} {time}"),
+                region=_txt_field(region),
+            )
+            lines.append(format_city_line(rec) + "\n")
+        f.writelines(lines)
+        written += len(lines)
+    return written
+
+
+def write_geojson(
+    manager,
+    ids: Sequence[int],
+    columns: Sequence[str],
+    f: TextIO,
+    progress: Optional[Progress] = None,
+) -> int:
+    """
+    Точки как FeatureCollection: геометрия Point [долгота, широта] (null без
+    координат), свойства — колонки columns. Возвращает число точек.
+    """
+    columns = list(columns)
+    f.write('{"type": "FeatureCollection", "features": [')
+    separator = "\n"
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    for rows in iter_chunks(manager, ids, columns + ["Lat_WGS84", "Lon_WGS84"], progress):
+        parts = []
+        for row in rows:
+            lat, lon = _coordinate(row[-2]), _coordinate(row[-1])
+            geometry = None
+            if not (math.isnan(lat) or math.isnan(lon)):
+                geometry = {"type": "Point", "coordinates": [lon, lat]}
+            feature = {
+                "type": "Feature",
+                "geometry": geometry,
+                "properties": dict(zip(columns, row)),
+            }
+            parts.append(separator + encode(feature))
+            separator = ",\n"
+        f.write("".join(parts))
+    f.write("\n]}\n")
+    return len(ids)
+
+
+WRITERS = {"csv": write_csv, "txt": write_txt, "geojson": write_geojson}
+
+
+def export_points(
+    manager,
+    path: str,
+    ids: Optional[Sequence[int]] = None,
+    fmt: Optional[str] = None,
+    columns: Optional[Sequence[str]] = None,
+    progress: Optional[Progress] = None,
+) -> int:
+    """
+    Выгрузить строки ids базы (по умолчанию все) в файл path атомарно.
+    fmt — "csv", "txt" или "geojson" (по умолчанию — по расширению),
+    columns — колонки CSV/GeoJSON (по умолчанию все). Исключение из
+    progress (например, отмена задачи) прерывает выгрузку, прежний файл
+    остаётся нетронутым. Возвращает число записанных точек.
+    """
+    fmt = fmt or export_format(path)
+    if fmt not in WRITERS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    if ids is None:
+        ids = range(len(manager))
+    columns = list(columns or manager.header)
+    directory = os.path.dirname(os.path.abspath(path))
+    with METRICS.span("points.export") as span:
+        fd, tmp_path = tempfile.mkstemp(prefix=".export-", suffix=".tmp", dir=directory)
+        try:
+            # Буфер побольше: запись идёт крупными блоками
+            with os.fdopen(fd, "w", encoding="utf-8", newline="", buffering=1 << 20) as f:
+                keep_file_mode(tmp_path, path)
+                count = WRITERS[fmt](manager, ids, columns, f, progress)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        span.rows = count
+        span.bytes_written = os.path.getsize(path)
+    return count
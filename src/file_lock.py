@@ -0,0 +1,180 @@
+"""
+Согласование записи в файл данных несколькими процессами и потоками.
+
+FileLock — рекомендательная (advisory) блокировка между процессами:
+fcntl.flock на POSIX, msvcrt.locking на Windows. Блокируется отдельный
+файл <путь>.lock, а не сами данные: AllPoint.csv при сохранении
+заменяется новым файлом (os.replace), и блокировка старого потерялась бы.
+GroupCommit объединяет записи из нескольких потоков в одну.
+keep_file_mode сохраняет права файла при его атомарной замене.
+"""
+
+import os
+import stat
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Sequence
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_SUFFIX = ".lock"
+
+
+def keep_file_mode(tmp_path: str, path: str):
+    """
+    Выставить временному файлу (tempfile.mkstemp создаёт его с правами
+    0600) права файла path, который он заменит через os.replace, а если
+    path ещё нет — права нового файла по umask. Иначе после замены общий
+    файл становится недоступен другим пользователям.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_umask()
+    os.chmod(tmp_path, mode)
+
+
+def _umask() -> int:
+    # Узнать umask можно, только установив новую
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+class FileLock:
+    """
+    Блокировка файла path для записи (exclusive) и чтения (shared).
+
+    Внутри процесса блокировка повторно входима для одного потока (запись
+    может вызывать чтение) и не даёт другим потокам процесса писать
+    одновременно. На Windows разделяемой блокировки нет — чтение тоже
+    берёт исключительную, она короткая (см. AllPointsManager._open_snapshot).
+    Если файл блокировки нельзя создать (каталог только для чтения),
+    чтение идёт без блокировки: писать туда всё равно никто не может.
+    """
+
+    def __init__(self, path: str):
+        self.path = path + LOCK_SUFFIX
+        self._thread_lock = threading.RLock()
+        self._fd: Optional[int] = None
+        self._depth = 0
+        self._exclusive = False
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        with self._hold(True):
+            yield
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        with self._hold(False):
+            yield
+
+    @contextmanager
+    def _hold(self, exclusive: bool) -> Iterator[None]:
+        with self._thread_lock:
+            if self._depth == 0:
+                self._acquire(exclusive)
+            elif exclusive and not self._exclusive:
+                raise RuntimeError(f"Нельзя повысить блокировку чтения до записи: {self.path}")
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._release()
+
+    def _acquire(self, exclusive: bool):
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        except OSError:
+            if exclusive:
+                raise
+            fd = None
+        if fd is not None:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                else:
+                    _lock_windows(fd)
+            except BaseException:
+                os.close(fd)
+                raise
+        self._fd = fd
+        self._exclusive = exclusive
+
+    def _release(self):
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+
+def _lock_windows(fd: int):
+    # LK_LOCK сам повторяет попытку 10 раз с паузой в секунду, затем OSError
+    while True:
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+class _Ticket:
+    def __init__(self, items: Sequence[Any]):
+        self.items = items
+        self.done = False
+        self.error: Optional[BaseException] = None
+
+
+class GroupCommit:
+    """
+    Групповая запись: пока один поток пишет, вызовы submit из других
+    потоков встают в очередь, и следующий из них записывает всю очередь
+    одним вызовом write(элементы) — одна дозапись и один fsync на пачку
+    вместо одного на каждый вызов. submit возвращается, когда его элементы
+    записаны; ошибку записи пачки получают все её участники.
+    """
+
+    def __init__(self, write: Callable[[List[Any]], None]):
+        self._write = write
+        self._cond = threading.Condition()
+        self._queue: List[_Ticket] = []
+        self._busy = False
+
+    def submit(self, items: Sequence[Any]):
+        ticket = _Ticket(items)
+        with self._cond:
+            self._queue.append(ticket)
+            while self._busy and not ticket.done:
+                self._cond.wait()
+            if not ticket.done:
+                # Запись свободна: этот поток пишет всё, что накопилось
+                self._busy = True
+                batch, self._queue = self._queue, []
+        if not ticket.done:
+            error: Optional[BaseException] = None
+            try:
+                self._write([item for t in batch for item in t.items])
+            except BaseException as e:
+                error = e
+            with self._cond:
+                for t in batch:
+                    t.done, t.error = True, error
+                self._busy = False
+                self._cond.notify_all()
+        if ticket.error is not None:
+            raise ticket.error
@@ -0,0 +1,177 @@
+"""
+Слежение за файлами данных (AllPoint.csv, city.txt), которые меняют
+другие программы: inotify на Linux (через ctypes, без зависимостей),
+в остальных случаях — опрос os.stat с интервалом.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Интервал опроса файлов (и проверки остановки потока при inotify), с
+WATCH_INTERVAL = 1.0
+
+# События inotify: запись, закрытие после записи, смена атрибутов,
+# появление (в том числе заменой через os.replace) и удаление файла
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+
+
+def _file_state(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class _Inotify:
+    """
+    Наблюдение inotify за каталогами файлов (а не за самими файлами: при
+    замене файла через os.replace наблюдение за старым файлом теряется).
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        # Номер наблюдения → {имя файла в каталоге: путь}
+        self._names: Dict[int, Dict[str, str]] = {}
+        by_dir: Dict[str, Dict[str, str]] = {}
+        for path in paths:
+            directory, name = os.path.split(os.path.abspath(path))
+            by_dir.setdefault(directory, {})[name] = path
+        try:
+            for directory, names in by_dir.items():
+                wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), "inotify_add_watch", directory)
+                self._names[wd] = names
+        except OSError:
+            self.close()
+            raise
+
+    def read(self, timeout: float) -> Set[str]:
+        """
+        Пути файлов, по которым пришли события за время ожидания timeout.
+        """
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        pos = 0
+        while pos + _EVENT.size <= len(data):
+            wd, _, _, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            name = os.fsdecode(data[pos : pos + length].rstrip(b"\0"))
+            pos += length
+            path = self._names.get(wd, {}).get(name)
+            if path is not None:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class FileWatcher:
+    """
+    Следит за файлами paths в фоновом потоке. Изменённые файлы копятся,
+    changed() забирает их — например, из главного потока GUI по
+    root.after, где по ним запускаются фоновые задачи перечитывания.
+    Замена файла (os.replace), его появление и удаление тоже считаются
+    изменением.
+
+    use_inotify=False — только опрос (backend после start: "inotify"
+    или "poll"). Изменения, сделанные нами самими, тоже попадают в
+    changed(): AllPointsManager.refresh и CityManager.reload_if_changed
+    в этом случае ничего не перечитывают.
+    """
+
+    def __init__(
+        self, paths: Iterable[str], interval: float = WATCH_INTERVAL, use_inotify: bool = True
+    ):
+        self.paths = list(dict.fromkeys(paths))
+        self.interval = interval
+        self.use_inotify = use_inotify
+        self.backend = ""
+        self._changed: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify: Optional[_Inotify] = None
+
+    def start(self) -> "FileWatcher":
+        self._inotify = None
+        if self.use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify(self.paths)
+            except (OSError, AttributeError):
+                self._inotify = None  # нет inotify или исчерпан лимит наблюдений
+        self.backend = "inotify" if self._inotify is not None else "poll"
+        self._stop.clear()
+        target = self._run_inotify if self._inotify is not None else self._run_poll
+        self._thread = threading.Thread(target=target, name="file-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def changed(self) -> List[str]:
+        """
+        Файлы, изменившиеся после предыдущего вызова (в порядке paths).
+        """
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        return [path for path in self.paths if path in changed]
+
+    def _notify(self, paths: Iterable[str]):
+        with self._lock:
+            self._changed.update(paths)
+
+    def _run_inotify(self):
+        while not self._stop.is_set():
+            try:
+                changed = self._inotify.read(self.interval)
+            except OSError:
+                # Наблюдение сломалось (например, удалён каталог) — опрос
+                self.backend = "poll"
+                self._run_poll()
+                return
+            if changed:
+                self._notify(changed)
+
+    def _run_poll(self):
+        states = {path: _file_state(path) for path in self.paths}
+        while not self._stop.wait(self.interval):
+            for path in self.paths:
+                state = _file_state(path)
+                if state != states[path]:
+                    states[path] = state
+                    self._notify([path])
@@ -0,0 +1,209 @@
+from typing import Tuple
+
+import numpy as np
+
+# Эллипсоиды: большая полуось (м) и сжатие
+WGS84_ELLIPSOID = (6378137.0, 1 / 298.257223563)
+KRASSOVSKY_ELLIPSOID = (6378245.0, 1 / 298.3)
+
+# Параметры перехода СК-42 → WGS-84 (ГОСТ Р 51794-2008): сдвиги (м),
+# повороты осей (угл. секунды, правило поворота системы координат)
+# и масштаб (млн⁻¹). Обратный переход — те же параметры с обратным знаком.
+SK42_TO_WGS84 = (23.57, -140.95, -79.8, 0.0, -0.35, -0.79, -0.22)
+
+# Зоны Гаусса-Крюгера шириной 6°; к восточной координате Y прибавляется
+# номер зоны × 1 000 000 и 500 000 м (условный сдвиг осевого меридиана)
+ZONE_WIDTH = 6.0
+FALSE_EASTING = 500000.0
+ZONE_MULTIPLIER = 1000000.0
+
+_ARCSEC = np.pi / (180 * 3600)
+
+
+def geodetic_to_ecef(lat, lon, h, ellipsoid) -> np.ndarray:
+    """
+    Геодезические координаты (градусы, м) в геоцентрические XYZ, массив (3, n).
+    """
+    a, f = ellipsoid
+    e2 = f * (2 - f)
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    sin_lat = np.sin(lat)
+    n = a / np.sqrt(1 - e2 * sin_lat**2)
+    return np.stack(
+        [
+            (n + h) * np.cos(lat) * np.cos(lon),
+            (n + h) * np.cos(lat) * np.sin(lon),
+            (n * (1 - e2) + h) * sin_lat,
+        ]
+    )
+
+
+def ecef_to_geodetic(xyz: np.ndarray, ellipsoid) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Геоцентрические XYZ в широту, долготу (градусы) и высоту (м).
+    Широта — по формуле Боуринга с двумя уточнениями (точность < 1 мм).
+    """
+    a, f = ellipsoid
+    e2 = f * (2 - f)
+    b = a * (1 - f)
+    ep2 = e2 / (1 - e2)
+    x, y, z = xyz
+    p = np.hypot(x, y)
+    lon = np.arctan2(y, x)
+    lat = np.arctan2(z, p * (1 - e2))
+    for _ in range(2):
+        beta = np.arctan2((1 - f) * np.sin(lat), np.cos(lat))
+        lat = np.arctan2(
+            z + ep2 * b * np.sin(beta) ** 3, p - e2 * a * np.cos(beta) ** 3
+        )
+    sin_lat = np.sin(lat)
+    n = a / np.sqrt(1 - e2 * sin_lat**2)
+    h = p * np.cos(lat) + z * sin_lat - a**2 / n
+    return np.degrees(lat), np.degrees(lon), h
+
+
+def helmert(xyz: np.ndarray, params, inverse: bool = False) -> np.ndarray:
+    """
+    Семипараметрическое преобразование Гельмерта (малые углы).
+    """
+    dx, dy, dz, rx, ry, rz, ppm = params
+    sign = -1.0 if inverse else 1.0
+    rx, ry, rz = (sign * r * _ARCSEC for r in (rx, ry, rz))
+    scale = 1 + sign * ppm * 1e-6
+    x, y, z = xyz
+    return np.stack(
+        [
+            sign * dx + scale * (x + rz * y - ry * z),
+            sign * dy + scale * (-rz * x + y + rx * z),
+            sign * dz + scale * (ry * x - rx * y + z),
+        ]
+    )
+
+
+def wgs84_to_sk42(lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Широта/долгота WGS-84 (градусы) → широта/долгота СК-42 на эллипсоиде
+    Красовского (высота над эллипсоидом принимается нулевой).
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    xyz = geodetic_to_ecef(lat, lon, 0.0, WGS84_ELLIPSOID)
+    sk_lat, sk_lon, _ = ecef_to_geodetic(
+        helmert(xyz, SK42_TO_WGS84, inverse=True), KRASSOVSKY_ELLIPSOID
+    )
+    return sk_lat, sk_lon
+
+
+def sk42_to_wgs84(lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    xyz = geodetic_to_ecef(lat, lon, 0.0, KRASSOVSKY_ELLIPSOID)
+    wgs_lat, wgs_lon, _ = ecef_to_geodetic(helmert(xyz, SK42_TO_WGS84), WGS84_ELLIPSOID)
+    return wgs_lat, wgs_lon
+
+
+def _series(f: float):
+    # Коэффициенты рядов Крюгера (до n⁴): погрешность проекции в пределах
+    # 6-градусной зоны — доли миллиметра
+    n = f / (2 - f)
+    n2, n3, n4 = n**2, n**3, n**4
+    big_a = 1 / (1 + n) * (1 + n2 / 4 + n4 / 64)
+    alpha = (
+        n / 2 - 2 / 3 * n2 + 5 / 16 * n3 + 41 / 180 * n4,
+        13 / 48 * n2 - 3 / 5 * n3 + 557 / 1440 * n4,
+        61 / 240 * n3 - 103 / 140 * n4,
+        49561 / 161280 * n4,
+    )
+    beta = (
+        n / 2 - 2 / 3 * n2 + 37 / 96 * n3 - 1 / 360 * n4,
+        1 / 48 * n2 + 1 / 15 * n3 - 437 / 1440 * n4,
+        17 / 480 * n3 - 37 / 840 * n4,
+        4397 / 161280 * n4,
+    )
+    delta = (
+        2 * n - 2 / 3 * n2 - 2 * n3 + 116 / 45 * n4,
+        7 / 3 * n2 - 8 / 5 * n3 - 227 / 45 * n4,
+        56 / 15 * n3 - 136 / 35 * n4,
+        4279 / 630 * n4,
+    )
+    return big_a, alpha, beta, delta
+
+
+def zone_of(lon) -> np.ndarray:
+    """
+    Номер 6-градусной зоны Гаусса-Крюгера по долготе (1..60).
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    return (np.floor(np.mod(lon, 360.0) / ZONE_WIDTH) + 1).astype(np.int64)
+
+
+def geodetic_to_gk(lat, lon, zone=None, ellipsoid=KRASSOVSKY_ELLIPSOID):
+    """
+    Широта/долгота (градусы) → прямоугольные координаты Гаусса-Крюгера:
+    X — северная (м), Y — восточная с номером зоны впереди (м).
+    zone — номер зоны (по умолчанию — зона, в которую попадает точка).
+    """
+    a, f = ellipsoid
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    zone = zone_of(lon) if zone is None else np.asarray(zone, dtype=np.int64)
+    central = zone * ZONE_WIDTH - ZONE_WIDTH / 2
+    dlon = np.radians((lon - central + 180.0) % 360.0 - 180.0)
+    big_a, alpha, _, _ = _series(f)
+    e = np.sqrt(f * (2 - f))
+    sin_lat = np.sin(np.radians(lat))
+    t = np.sinh(np.arctanh(sin_lat) - e * np.arctanh(e * sin_lat))
+    xi0 = np.arctan2(t, np.cos(dlon))
+    eta0 = np.arctanh(np.sin(dlon) / np.sqrt(1 + t**2))
+    xi, eta = xi0.copy(), eta0.copy()
+    for j, c in enumerate(alpha, 1):
+        xi += c * np.sin(2 * j * xi0) * np.cosh(2 * j * eta0)
+        eta += c * np.cos(2 * j * xi0) * np.sinh(2 * j * eta0)
+    x = a * big_a * xi
+    y = a * big_a * eta + FALSE_EASTING + zone * ZONE_MULTIPLIER
+    return x, y
+
+
+def gk_to_geodetic(x, y, ellipsoid=KRASSOVSKY_ELLIPSOID):
+    """
+    Координаты Гаусса-Крюгера (Y с номером зоны) → широта/долгота (градусы).
+    """
+    a, f = ellipsoid
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    zone = np.floor(y / ZONE_MULTIPLIER).astype(np.int64)
+    central = zone * ZONE_WIDTH - ZONE_WIDTH / 2
+    big_a, _, beta, delta = _series(f)
+    xi = x / (a * big_a)
+    eta = (y - zone * ZONE_MULTIPLIER - FALSE_EASTING) / (a * big_a)
+    xi0, eta0 = xi.copy(), eta.copy()
+    for j, c in enumerate(beta, 1):
+        xi0 -= c * np.sin(2 * j * xi) * np.cosh(2 * j * eta)
+        eta0 -= c * np.cos(2 * j * xi) * np.sinh(2 * j * eta)
+    chi = np.arcsin(np.sin(xi0) / np.cosh(eta0))
+    lat = chi.copy()
+    for j, c in enumerate(delta, 1):
+        lat += c * np.sin(2 * j * chi)
+    lon = central + np.degrees(np.arctan2(np.sinh(eta0), np.cos(xi0)))
+    return np.degrees(lat), (lon + 180.0) % 360.0 - 180.0
+
+
+def wgs84_to_gk(lat, lon, zone=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    WGS-84 → X/Y СК-42 Гаусса-Крюгера (колонки X_SK-42_Gauss_Kruger и
+    Y_SK-42_Gauss_Kruger). Весь расчёт — операции над массивами numpy.
+    """
+    sk_lat, sk_lon = wgs84_to_sk42(lat, lon)
+    if zone is None:
+        # Зона — по исходной долготе, чтобы точка у границы зоны не
+        # перескакивала в соседнюю из-за сдвига датума
+        zone = zone_of(lon)
+    return geodetic_to_gk(sk_lat, sk_lon, zone)
+
+
+def gk_to_wgs84(x, y) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    X/Y СК-42 Гаусса-Крюгера → широта/долгота WGS-84 (градусы).
+    """
+    return sk42_to_wgs84(*gk_to_geodetic(x, y))
@@ -0,0 +1,189 @@
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from src.metrics import METRICS, profile_call
+
+# Интервал опроса очереди результатов из главного потока, мс
+POLL_INTERVAL_MS = 100
+
+
+class TaskCancelled(Exception):
+    """
+    Задача отменена (бросается из Task.check_cancelled внутри функции задачи).
+    """
+
+
+class Task:
+    """
+    Фоновая задача: функция выполняется в потоке пула и получает сам Task,
+    через который сообщает прогресс (report) и проверяет отмену (cancelled).
+    """
+
+    def __init__(self, name: str, fn: Callable[["Task"], Any]):
+        self.name = name
+        self.fn = fn
+        self.progress = 0.0
+        self.message = ""
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self._cancel = threading.Event()
+        self.on_done: Optional[Callable[[Any], None]] = None
+        self.on_error: Optional[Callable[[BaseException], None]] = None
+        self.on_progress: Optional[Callable[[float, str], None]] = None
+        self.on_finish: Optional[Callable[[], None]] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise TaskCancelled(self.name)
+
+    def report(self, progress: float, message: str = ""):
+        """
+        Сообщить прогресс (0..1); вызывается из потока задачи.
+        """
+        self.progress = progress
+        self.message = message
+
+
+class TaskRunner:
+    """
+    Пул фоновых потоков для GUI. Результаты, ошибки и прогресс передаются
+    в главный поток опросом очереди через schedule (root.after), поэтому
+    обработчики on_done/on_error/on_progress могут работать с виджетами.
+
+    Задачи с одинаковым именем вытесняют друг друга: новая отменяет
+    предыдущую, и результат отменённой задачи не доставляется.
+    """
+
+    def __init__(
+        self,
+        schedule: Callable[[int, Callable[[], None]], Any],
+        max_workers: int = 1,
+        poll_interval_ms: int = POLL_INTERVAL_MS,
+    ):
+        self._schedule = schedule
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._poll_interval_ms = poll_interval_ms
+        self._results: "queue.Queue[Task]" = queue.Queue()
+        self.active: Dict[str, Task] = {}
+        self._polling = False
+
+    def submit(
+        self,
+        name: str,
+        fn: Callable[[Task], Any],
+        on_done: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        on_progress: Optional[Callable[[float, str], None]] = None,
+        on_finish: Optional[Callable[[], None]] = None,
+    ) -> Task:
+        """
+        Запустить fn(task) в фоне. on_done(result), on_error(exc) и
+        on_progress(progress, message) вызываются в главном потоке.
+        on_finish() вызывается там же после завершения fn в любом случае,
+        в том числе после отмены, — когда задача уже не работает с данными.
+        """
+        previous = self.active.get(name)
+        if previous is not None:
+            previous.cancel()
+        task = Task(name, fn)
+        task.on_done, task.on_error, task.on_progress = on_done, on_error, on_progress
+        task.on_finish = on_finish
+        self.active[name] = task
+        self._pool.submit(self._run, task)
+        if not self._polling:
+            self._polling = True
+            self._schedule(self._poll_interval_ms, self.poll)
+        return task
+
+    @staticmethod
+    def _metric_name(task: Task) -> str:
+        # "city_update:Moscow" → "city_update": статистика по виду задачи
+        return task.name.split(":", 1)[0]
+
+    def _run(self, task: Task):
+        if not task.cancelled:
+            started = time.perf_counter()
+            mode = METRICS.take_profile_mode()
+            try:
+                if mode is None:
+                    task.result = task.fn(task)
+                else:
+                    task.result = profile_call(lambda: task.fn(task), mode, task.name)
+            except BaseException as e:
+                task.error = e
+            METRICS.add(
+                "task." + self._metric_name(task),
+                time.perf_counter() - started,
+                error=task.error is not None,
+            )
+        task.done = True
+        self._results.put(task)
+
+    def is_running(self, name: str) -> bool:
+        return name in self.active
+
+    def cancel(self, name: str) -> bool:
+        task = self.active.get(name)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def cancel_all(self):
+        for task in self.active.values():
+            task.cancel()
+
+    def poll(self):
+        """
+        Доставить готовые результаты и прогресс (вызывается в главном потоке).
+        """
+        while True:
+            try:
+                task = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if self.active.get(task.name) is task:
+                del self.active[task.name]
+            if not (task.cancelled or isinstance(task.error, TaskCancelled)):
+                # Время обработчика в главном потоке — обновление виджетов
+                started = time.perf_counter()
+                if task.error is not None:
+                    self._call(task.on_error, task.error)
+                else:
+                    self._call(task.on_done, task.result)
+                METRICS.add("ui." + self._metric_name(task), time.perf_counter() - started)
+            self._call(task.on_finish)
+        for task in list(self.active.values()):
+            if not task.cancelled:
+                self._call(task.on_progress, task.progress, task.message)
+        if self.active:
+            self._schedule(self._poll_interval_ms, self.poll)
+        else:
+            self._polling = False
+
+    @staticmethod
+    def _call(callback: Optional[Callable[..., None]], *args: Any):
+        # Ошибка обработчика (например, окно уже закрыто) не должна
+        # останавливать опрос остальных задач
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception:
+            traceback.print_exc()
+
+    def shutdown(self):
+        self.cancel_all()
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,235 @@
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.allpoints_manager import AllPointRecord, AllPointsManager
+
+# Расширения входных файлов в rootFolder
+INPUT_EXTENSIONS = (".json", ".xml")
+
+# Синонимы имён полей во входных файлах → колонки AllPoint.csv
+FIELD_ALIASES: Dict[str, str] = {
+    "data": "Data",
+    "date": "Data",
+    "time": "Time",
+    "lat": "Lat_WGS84",
+    "latitude": "Lat_WGS84",
+    "lat_wgs84": "Lat_WGS84",
+    "lon": "Lon_WGS84",
+    "lng": "Lon_WGS84",
+    "longitude": "Lon_WGS84",
+    "lon_wgs84": "Lon_WGS84",
+    "x": "X_SK-42_Gauss_Kruger",
+    "x_sk-42_gauss_kruger": "X_SK-42_Gauss_Kruger",
+    "y": "Y_SK-42_Gauss_Kruger",
+    "y_sk-42_gauss_kruger": "Y_SK-42_Gauss_Kruger",
+    "city": "City_Value",
+    "city_value": "City_Value",
+    "country": "Country_Value",
+    "country_value": "Country_Value",
+    "area": "Description of the area",
+    "description of the area": "Description of the area",
+    "region": "Description of the region",
+    "description of the region": "Description of the region",
+    "text": "Original text",
+    "message": "Original text",
+    "original_text": "Original text",
+    "original text": "Original text",
+}
+
+# Колонки, по которым точка считается уже имеющейся в базе
+DEDUP_COLUMNS = ("Data", "Time", "Lat_WGS84", "Lon_WGS84")
+
+
+class IngestStats:
+    """
+    Счётчики загрузки: файлы, строки, добавленные точки, дубликаты, ошибки.
+    """
+
+    def __init__(self, total_files: int = 0):
+        self.total_files = total_files
+        self.files = 0
+        self.rows = 0
+        self.added = 0
+        self.duplicates = 0
+        self.errors: List[Tuple[str, str]] = []
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def _tick(self):
+        self.seconds = time.perf_counter() - self.started
+
+    @property
+    def files_per_sec(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Файлов: {self.files}/{self.total_files}, строк: {self.rows}, "
+            f"добавлено: {self.added}, дубликатов: {self.duplicates}, "
+            f"ошибок: {len(self.errors)}; "
+            f"{self.files_per_sec:.1f} файл/с, {self.rows_per_sec:.0f} строк/с"
+        )
+
+
+def discover_files(root: str, extensions: Iterable[str] = INPUT_EXTENSIONS) -> List[str]:
+    """
+    Все входные файлы в каталоге root (рекурсивно), в отсортированном порядке.
+    """
+    extensions = tuple(e.lower() for e in extensions)
+    found = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.lower().endswith(extensions):
+                found.append(os.path.join(dirpath, name))
+    found.sort()
+    return found
+
+
+def _normalize(item: Dict[str, object]) -> Optional[Dict[str, str]]:
+    row: Dict[str, str] = {}
+    for key, value in item.items():
+        column = FIELD_ALIASES.get(str(key).strip().lower())
+        if column is None or value is None or isinstance(value, (dict, list)):
+            continue
+        row[column] = str(value).strip()
+    if not row.get("Lat_WGS84") or not row.get("Lon_WGS84"):
+        return None  # без координат это не точка
+    return row
+
+
+def _json_rows(data: object) -> Iterable[Dict[str, str]]:
+    # Каждый объект нормализуется один раз: он же решает, точка ли это
+    if isinstance(data, list):
+        for item in data:
+            yield from _json_rows(item)
+    elif isinstance(data, dict):
+        row = _normalize(data)
+        if row is not None:
+            yield row
+        for value in data.values():
+            if isinstance(value, list):
+                yield from _json_rows(value)
+
+
+def parse_json(path: str) -> List[Dict[str, str]]:
+    with open(path, encoding="utf-8-sig") as f:
+        data = json.load(f)
+    return list(_json_rows(data))
+
+
+def parse_xml(path: str) -> List[Dict[str, str]]:
+    rows = []
+    for _, elem in ET.iterparse(path, events=("end",)):
+        item: Dict[str, object] = dict(elem.attrib)
+        for child in elem:
+            if len(child) == 0 and child.text is not None:
+                item.setdefault(child.tag, child.text)
+        row = _normalize(item)
+        if row is not None:
+            rows.append(row)
+            elem.clear()
+    return rows
+
+
+def parse_file(path: str) -> List[Dict[str, str]]:
+    """
+    Разобрать входной файл в список строк AllPoint.csv (выполняется в процессе пула).
+    """
+    if path.lower().endswith(".xml"):
+        return parse_xml(path)
+    return parse_json(path)
+
+
+def _dedup_key(data: Dict[str, str]) -> Tuple[str, ...]:
+    return tuple(data.get(column) or "" for column in DEDUP_COLUMNS)
+
+
+def ingest_folder(
+    manager: AllPointsManager,
+    root: str,
+    workers: Optional[int] = None,
+    batch_size: int = 5000,
+    progress: Optional[Callable[[IngestStats], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> IngestStats:
+    """
+    Загрузить все файлы из root в базу точек.
+
+    Файлы разбираются параллельно в пуле процессов (workers=0 — в текущем
+    процессе), точки пишутся в базу пачками по batch_size через add_points.
+    Точки, совпадающие с уже имеющимися по DEDUP_COLUMNS, пропускаются.
+    progress вызывается после каждого файла, should_stop позволяет прервать загрузку.
+    """
+    files = discover_files(root)
+    stats = IngestStats(len(files))
+    if manager.loaded:
+        seen: Set[Tuple[str, ...]] = set(
+            zip(*(manager.store.column_values(column) for column in DEDUP_COLUMNS))
+        )
+    else:
+        seen = {
+            _dedup_key(rec.data) for rec in manager.iter_records(columns=DEDUP_COLUMNS)
+        }
+    pending: List[AllPointRecord] = []
+
+    def flush():
+        manager.add_points(pending)
+        stats.added += len(pending)
+        pending.clear()
+
+    def consume(path: str, rows: List[Dict[str, str]]):
+        stats.files += 1
+        stats.rows += len(rows)
+        for row in rows:
+            key = _dedup_key(row)
+            if key in seen:
+                stats.duplicates += 1
+                continue
+            seen.add(key)
+            pending.append(AllPointRecord(row))
+        if len(pending) >= batch_size:
+            flush()
+        stats._tick()
+        if progress is not None:
+            progress(stats)
+
+    if workers == 0:
+        for path in files:
+            if should_stop is not None and should_stop():
+                break
+            try:
+                consume(path, parse_file(path))
+            except Exception as e:
+                stats.errors.append((path, str(e)))
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        finished = False
+        try:
+            futures = {pool.submit(parse_file, path): path for path in files}
+            for future in as_completed(futures):
+                if should_stop is not None and should_stop():
+                    break
+                path = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    stats.errors.append((path, str(e)))
+                    continue
+                consume(path, rows)
+            else:
+                finished = True
+        finally:
+            # При отмене (или ошибке) ждущие файлы снимаются с очереди, а уже
+            # разбираемые не дожидаемся: их результат всё равно не нужен
+            pool.shutdown(wait=finished, cancel_futures=True)
+    flush()
+    stats._tick()
+    return stats
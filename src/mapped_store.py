@@ -0,0 +1,285 @@
+import csv
+import io
+import mmap
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.allpoints_manager import AllPointRecord
+
+# Размер куска файла, в котором за один проход numpy ищутся переводы строк
+SCAN_CHUNK = 1 << 24
+# Сколько строк декодируется за раз при последовательном чтении
+DECODE_BLOCK = 8192
+
+
+def row_ends(buf, start: int, end: int, chunk: int = SCAN_CHUNK) -> Tuple[np.ndarray, bool]:
+    """
+    Смещения концов записей CSV (байт после перевода строки) в buf[start:end].
+    Перевод строки внутри кавычек (многострочный "Original text") концом
+    записи не считается: кавычки до него должны быть парными — удвоенная
+    кавычка внутри поля парность не меняет. Второе значение — осталась ли
+    незакрытая кавычка в конце.
+    """
+    ends: List[np.ndarray] = []
+    quotes = 0
+    for pos in range(start, end, chunk):
+        block = np.frombuffer(buf, dtype=np.uint8, count=min(chunk, end - pos), offset=pos)
+        q = np.flatnonzero(block == 0x22)
+        nl = np.flatnonzero(block == 0x0A)
+        outside = (np.searchsorted(q, nl) + quotes) % 2 == 0
+        ends.append(nl[outside] + (pos + 1))
+        quotes += len(q)
+        del block
+    result = np.concatenate(ends) if ends else np.empty(0, dtype=np.int64)
+    return result.astype(np.int64, copy=False), quotes % 2 == 1
+
+
+def _parse_rows(text: str) -> Iterator[List[str]]:
+    # Пустые строки пропускаются, как в csv.DictReader
+    for fields in csv.reader(io.StringIO(text, newline="")):
+        if fields:
+            yield fields
+
+
+class MappedScan:
+    """
+    Итог разметки файла: valid_size — размер корректной части, torn_bytes —
+    байты оборванной последней записи, missing_newline — последняя запись
+    целая, но без перевода строки (смысл — как у полей AllPointsManager).
+    """
+
+    def __init__(self, valid_size: int, torn_bytes: int = 0, missing_newline: bool = False):
+        self.valid_size = valid_size
+        self.torn_bytes = torn_bytes
+        self.missing_newline = missing_newline
+
+
+class MappedPointStore:
+    """
+    Хранилище точек поверх отображённого в память AllPoint.csv: в памяти
+    только массив смещений начала строк (offsets, 8 байт на точку), запись
+    декодируется при обращении к ней. Доступ к строке i — срез
+    offsets[i]:offsets[i + 1], без чтения остального файла.
+
+    Точки, добавленные после разметки (append/extend), хранятся списком
+    записей, правки (set_values) — словарями поверх файла; после
+    AllPointsManager.compact файл размечается заново.
+    """
+
+    def __init__(self, header: List[str]):
+        self.header = header
+        self.path: Optional[str] = None
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        # Колонки в порядке заголовка файла
+        self.file_columns: List[str] = list(header)
+        # Начала размеченных строк и конец последней (длина — строк + 1)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self._tail: List[AllPointRecord] = []
+        self._overrides: Dict[str, Dict[int, str]] = {}
+
+    @property
+    def mapped_rows(self) -> int:
+        return len(self.offsets) - 1
+
+    def __len__(self) -> int:
+        return self.mapped_rows + len(self._tail)
+
+    def attach(self, path: str) -> MappedScan:
+        """
+        Отобразить файл и разметить строки (добавленные точки и правки
+        сбрасываются). Оборванная последняя запись в разметку не входит.
+        """
+        self.clear()
+        self.path = path
+        size = os.path.getsize(path)
+        if not size:
+            return MappedScan(0)
+        self._open(size)
+        ends, open_quote = row_ends(self._map, 0, size)
+        if not len(ends):
+            # Оборван сам заголовок — при дозаписи файл начнётся заново
+            self.close()
+            return MappedScan(0, size)
+        header = self._map[: ends[0]].decode("utf-8-sig")
+        self.file_columns = next(_parse_rows(header), self.header)
+        starts = ends[:-1]
+        # Пустые строки (ручная правка) не считаются записями
+        short = np.flatnonzero(np.diff(ends) <= 2)
+        blank = [i for i in short.tolist() if not self._map[ends[i] : ends[i + 1]].strip()]
+        if blank:
+            starts = np.delete(starts, blank)
+        scan = MappedScan(int(ends[-1]))
+        last = int(ends[-1])
+        if last < size:
+            if not open_quote and self._is_complete(self._map[last:size]):
+                # Файл сохранён без завершающего перевода строки
+                starts = np.append(starts, last)
+                last = size
+                scan = MappedScan(size, 0, True)
+            else:
+                # Оборванная дозапись: отображается только корректная часть,
+                # чтобы хвост можно было обрезать при следующей записи
+                scan = MappedScan(last, size - last)
+                self._open(last)
+        self.offsets = np.append(starts, last)
+        return scan
+
+    def _is_complete(self, raw: bytes) -> bool:
+        try:
+            rows = list(_parse_rows(raw.decode("utf-8")))
+        except UnicodeDecodeError:
+            return False
+        return len(rows) == 1 and len(rows[0]) == len(self.file_columns)
+
+    def _open(self, length: int):
+        self.close()
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), length, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """
+        Снять отображение (Windows не даёт заменить отображённый файл);
+        разметка и правки сохраняются, reopen отображает файл снова.
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def reopen(self):
+        if self.mapped_rows:
+            self._open(int(self.offsets[-1]))
+
+    def append(self, rec: AllPointRecord):
+        self._tail.append(rec)
+
+    def extend(self, records: Iterable[AllPointRecord]):
+        self._tail.extend(records)
+
+    def pop(self):
+        if self._tail:
+            self._tail.pop()
+        else:
+            self.offsets = self.offsets[:-1]
+
+    def clear(self):
+        self.close()
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self._tail = []
+        self._overrides = {}
+
+    def _fields(self, i: int) -> List[str]:
+        raw = self._map[self.offsets[i] : self.offsets[i + 1]]
+        return next(_parse_rows(raw.decode("utf-8")), [])
+
+    def _iter_fields(self, start: int = 0) -> Iterator[Tuple[int, List[str]]]:
+        i = start
+        for a in range(start, self.mapped_rows, DECODE_BLOCK):
+            b = min(a + DECODE_BLOCK, self.mapped_rows)
+            raw = self._map[self.offsets[a] : self.offsets[b]]
+            for fields in _parse_rows(raw.decode("utf-8")):
+                yield i, fields
+                i += 1
+
+    def _record(self, i: int, fields: List[str]) -> AllPointRecord:
+        data = dict(zip(self.file_columns, fields))
+        for column, values in self._overrides.items():
+            if i in values:
+                data[column] = values[i]
+        return AllPointRecord(data)
+
+    def value(self, i: int, column: str) -> str:
+        if i >= self.mapped_rows:
+            return self._tail[i - self.mapped_rows].data.get(column, "")
+        override = self._overrides.get(column)
+        if override is not None and i in override:
+            return override[i]
+        fields = self._fields(i)
+        try:
+            return fields[self.file_columns.index(column)]
+        except (ValueError, IndexError):
+            return ""
+
+    def record(self, i: int) -> AllPointRecord:
+        if i < 0:
+            i += len(self)
+        if i >= self.mapped_rows:
+            return self._tail[i - self.mapped_rows]
+        return self._record(i, self._fields(i))
+
+    def records_at(self, ids: Iterable[int]) -> List[AllPointRecord]:
+        return [self.record(int(i)) for i in ids]
+
+    def rows_at(self, ids: Sequence[int], columns: Sequence[str]) -> List[List[str]]:
+        """
+        Значения колонок columns для строк ids списками, без создания записей;
+        подряд идущие строки декодируются одним куском.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return []
+        index = [self.file_columns.index(c) if c in self.file_columns else -1 for c in columns]
+        width = len(self.file_columns)
+        rows: List[List[str]] = []
+        # Куски подряд идущих строк; размеченные и добавленные — в разных кусках
+        breaks = np.flatnonzero((np.diff(ids) != 1) | (ids[1:] == self.mapped_rows)) + 1
+        for run in np.split(ids, breaks):
+            first, last = int(run[0]), int(run[-1])
+            if first >= self.mapped_rows:
+                for rec in self._tail[first - self.mapped_rows : last - self.mapped_rows + 1]:
+                    rows.append([rec.data.get(c) or "" for c in columns])
+                continue
+            raw = self._map[self.offsets[first] : self.offsets[last + 1]]
+            for fields in _parse_rows(raw.decode("utf-8")):
+                if len(fields) < width:
+                    fields += [""] * (width - len(fields))
+                rows.append([fields[k] if k >= 0 else "" for k in index])
+        for pos, column in enumerate(columns):
+            override = self._overrides.get(column)
+            if override:
+                for k, i in enumerate(ids.tolist()):
+                    if i in override and i < self.mapped_rows:
+                        rows[k][pos] = override[i]
+        return rows
+
+    def iter_records(self) -> Iterator[AllPointRecord]:
+        for i, fields in self._iter_fields():
+            yield self._record(i, fields)
+        yield from self._tail
+
+    def column_values(self, column: str, start: int = 0) -> List[str]:
+        values: List[str] = []
+        if column in self.file_columns and start < self.mapped_rows:
+            k = self.file_columns.index(column)
+            values = [
+                fields[k] if k < len(fields) else "" for _, fields in self._iter_fields(start)
+            ]
+            for i, value in self._overrides.get(column, {}).items():
+                if i >= start:
+                    values[i - start] = value
+        elif start < self.mapped_rows:
+            values = [self.value(i, column) for i in range(start, self.mapped_rows)]
+        tail = self._tail[max(start - self.mapped_rows, 0) :]
+        return values + [rec.data.get(column) or "" for rec in tail]
+
+    def set_values(self, column: str, ids: Sequence[int], values: Sequence[str]):
+        override = self._overrides.setdefault(column, {})
+        for i, value in zip(ids, values):
+            i = int(i)
+            if i >= self.mapped_rows:
+                self._tail[i - self.mapped_rows].data[column] = value
+            else:
+                override[i] = value
+
+    def find_where(self, conditions: Dict[str, str]) -> List[int]:
+        items = list(conditions.items())
+        return [
+            i
+            for i, rec in enumerate(self.iter_records())
+            if all(rec.data.get(column, "") == value for column, value in items)
+        ]
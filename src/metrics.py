@@ -0,0 +1,338 @@
+import bisect
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Верхние границы корзин гистограммы длительности операции, мс
+# (последняя корзина — всё, что дольше)
+HISTOGRAM_BOUNDS_MS = (
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000
+)
+# Режимы профилирования одного действия (см. Metrics.profile_next)
+PROFILE_MODES = ("cprofile", "tracemalloc")
+# Сколько строк профиля попадает в отчёт
+PROFILE_TOP = 25
+
+
+class OperationStats:
+    """
+    Статистика одной операции: число вызовов и ошибок, суммарное и
+    максимальное время, гистограмма длительностей, обработанные строки
+    и прочитанные/записанные байты.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.rows = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def add_time(self, seconds: float, error: bool = False):
+        self.calls += 1
+        self.errors += error
+        self.total_s += seconds
+        self.max_s = max(self.max_s, seconds)
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, seconds * 1000)] += 1
+
+    def percentile_ms(self, q: float) -> float:
+        """
+        Оценка перцентиля q (0..1) по гистограмме: верхняя граница корзины,
+        в которую он попадает (для последней корзины — максимум).
+        """
+        if not self.calls:
+            return 0.0
+        rank = q * self.calls
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                if i < len(HISTOGRAM_BOUNDS_MS):
+                    return min(HISTOGRAM_BOUNDS_MS[i], self.max_s * 1000)
+                break
+        return self.max_s * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": self.total_s * 1000,
+            "mean_ms": self.total_s * 1000 / self.calls if self.calls else 0.0,
+            "p50_ms": self.percentile_ms(0.5),
+            "p95_ms": self.percentile_ms(0.95),
+            "max_ms": self.max_s * 1000,
+            "histogram": dict(
+                zip([f"<={b}" for b in HISTOGRAM_BOUNDS_MS] + ["more"], self.buckets)
+            ),
+            "rows": self.rows,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+
+
+class _Span:
+    # Замер одного вызова; поля rows/bytes_* заполняет сам замеряемый код
+    __slots__ = ("rows", "bytes_read", "bytes_written")
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+
+class Metrics:
+    """
+    Счётчики и гистограммы длительностей операций менеджеров данных и GUI.
+
+    Выключено по умолчанию: тогда timed/span стоят одну проверку флага.
+    Все методы потокобезопасны (операции идут и из фоновых задач).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.ops: Dict[str, OperationStats] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+        # Профилирование следующего действия (см. profile_next)
+        self._profile_mode: Optional[str] = None
+        self.profile_dir: Optional[str] = None
+        self.last_profile: Optional[Tuple[str, str, Optional[str]]] = None
+
+    def _stats(self, name: str) -> OperationStats:
+        stats = self.ops.get(name)
+        if stats is None:
+            stats = self.ops[name] = OperationStats()
+        return stats
+
+    def add(
+        self,
+        name: str,
+        seconds: Optional[float] = None,
+        rows: int = 0,
+        bytes_read: int = 0,
+        bytes_written: int = 0,
+        error: bool = False,
+    ):
+        """
+        Учесть вызов операции name (seconds=None — только счётчики строк и
+        байт, без вызова: например, байты, прочитанные внутри операции).
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stats(name)
+            if seconds is not None:
+                stats.add_time(seconds, error)
+            stats.rows += rows
+            stats.bytes_read += bytes_read
+            stats.bytes_written += bytes_written
+
+    def span(self, name: str) -> "_SpanContext":
+        """
+        Замер блока кода: with metrics.span("points.save") as s: ... s.rows = n
+        """
+        return _SpanContext(self, name)
+
+    def reset(self):
+        with self._lock:
+            self.ops.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in sorted(self.ops.items())}
+
+    def report(self) -> str:
+        """
+        Таблица операций для вкладки диагностики.
+        """
+        lines = [
+            f"{'Операция':<28} {'вызовов':>8} {'всего, мс':>11} {'p50':>8} {'p95':>8}"
+            f" {'макс':>9} {'строк':>10} {'прочитано':>11} {'записано':>11}"
+        ]
+        for name, s in self.snapshot().items():
+            lines.append(
+                f"{name:<28} {s['calls']:>8} {s['total_ms']:>11.1f} {s['p50_ms']:>8.2f}"
+                f" {s['p95_ms']:>8.2f} {s['max_ms']:>9.1f} {s['rows']:>10}"
+                f" {_size(s['bytes_read']):>11} {_size(s['bytes_written']):>11}"
+            )
+        if self.last_profile is not None:
+            name, text, path = self.last_profile
+            lines += ["", f"Профиль действия {name}" + (f" ({path})" if path else ""), text]
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> str:
+        """
+        Записать статистику в JSON (атомарно). Возвращает путь к файлу.
+        """
+        data = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "dumped": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "histogram_bounds_ms": list(HISTOGRAM_BOUNDS_MS),
+            "operations": self.snapshot(),
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".metrics-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def profile_next(self, mode: Optional[str]):
+        """
+        Профилировать следующее действие (фоновую задачу GUI): "cprofile" —
+        время по функциям, "tracemalloc" — места выделения памяти; None — отмена.
+        """
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        self._profile_mode = mode
+
+    def take_profile_mode(self) -> Optional[str]:
+        # Профилируется ровно одно действие: режим сбрасывается при выдаче
+        with self._lock:
+            mode, self._profile_mode = self._profile_mode, None
+        return mode
+
+
+class _SpanContext:
+    __slots__ = ("_metrics", "_name", "_span", "_started")
+
+    def __init__(self, metrics: Metrics, name: str):
+        self._metrics = metrics
+        self._name = name
+        self._span = _Span()
+        self._started = 0.0
+
+    def __enter__(self) -> _Span:
+        self._started = time.perf_counter()
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        s = self._span
+        self._metrics.add(
+            self._name,
+            time.perf_counter() - self._started,
+            s.rows,
+            s.bytes_read,
+            s.bytes_written,
+            error=exc_type is not None,
+        )
+        return False
+
+
+def _size(n: int) -> str:
+    for unit in ("Б", "КБ", "МБ"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "Б" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} ГБ"
+
+
+# Общий экземпляр: его пишут менеджеры данных и GUI, читает вкладка диагностики
+METRICS = Metrics()
+
+
+def timed(name: str, rows: Optional[Callable[[Any], int]] = None):
+    """
+    Декоратор: замер длительности вызова как операции name в METRICS.
+    rows(результат) — сколько строк вернула операция (например, len).
+    """
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                METRICS.add(name, time.perf_counter() - started, error=True)
+                raise
+            METRICS.add(
+                name,
+                time.perf_counter() - started,
+                rows=rows(result) if rows is not None else 0,
+            )
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def configure(settings) -> None:
+    """
+    Применить настройки: metricsEnabled включает сбор статистики, профили
+    действий сохраняются в каталог файла metricsFile.
+    """
+    METRICS.enabled = settings.get("metricsEnabled", False) is True
+    METRICS.profile_dir = os.path.dirname(os.path.abspath(metrics_file(settings)))
+
+
+def metrics_file(settings) -> str:
+    return settings.get("metricsFile") or "metrics.json"
+
+
+def profile_call(fn: Callable[[], Any], mode: str, name: str) -> Any:
+    """
+    Выполнить fn под профилировщиком mode и сохранить отчёт в
+    METRICS.last_profile. Для cProfile полный профиль пишется в
+    <METRICS.profile_dir>/<name>-<время>.prof (открывается pstats/snakeviz).
+    """
+    if mode == "cprofile":
+        import cProfile
+        import io
+        import pstats
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(fn)
+        finally:
+            out = io.StringIO()
+            stats = pstats.Stats(profiler, stream=out)
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+            path = None
+            directory = METRICS.profile_dir
+            if directory is not None:
+                path = os.path.join(
+                    directory, f"{name.replace(':', '_')}-{time.strftime('%Y%m%d-%H%M%S')}.prof"
+                )
+                try:
+                    os.makedirs(directory, exist_ok=True)
+                    stats.dump_stats(path)
+                except OSError:
+                    path = None
+            METRICS.last_profile = (name, out.getvalue(), path)
+    if mode == "tracemalloc":
+        import tracemalloc
+
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        try:
+            return fn()
+        finally:
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if not was_tracing:
+                tracemalloc.stop()
+            top: List[str] = [f"Пик выделенной памяти: {_size(peak)}"]
+            for diff in after.compare_to(before, "lineno")[:PROFILE_TOP]:
+                top.append(str(diff))
+            METRICS.last_profile = (name, "\n".join(top), None)
+    raise ValueError(f"Неизвестный режим профилирования: {mode}")
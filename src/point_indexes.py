@@ -0,0 +1,86 @@
+from array import array
+from typing import Dict, Iterable, Sequence, Tuple
+
+# Доступные вторичные индексы: имя → колонки, составляющие ключ
+INDEX_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "city": ("City_Value",),
+    "date": ("Data",),
+    "lon_lat": ("Lon_WGS84", "Lat_WGS84"),
+}
+
+class HashIndex:
+    """
+    Хеш-индекс: значение колонок (строгое сравнение строк) → номера строк.
+    Номера хранятся в array("q") — 8 байт на строку вместо объекта int.
+    built=False означает, что индекс ещё не построен (строится при первом поиске).
+    """
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = tuple(columns)
+        self._rows: Dict[object, array] = {}
+        self.built = False
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _key(self, values: Sequence[str]) -> object:
+        return values[0] if len(values) == 1 else tuple(values)
+
+    def _add(self, key: object, row_id: int):
+        rows = self._rows.get(key)
+        if rows is None:
+            rows = self._rows[key] = array("q")
+        rows.append(row_id)
+
+    def build(self, store, start: int = 0):
+        """
+        Проиндексировать строки хранилища, начиная с номера start.
+        """
+        if start == 0:
+            self._rows.clear()
+        self.built = True
+        if len(self.columns) == 1 and hasattr(store, "row_groups"):
+            # Колоночное хранилище группирует строки по значению векторно
+            for key, ids in store.row_groups(self.columns[0], start).items():
+                rows = self._rows.get(key)
+                if rows is None:
+                    rows = self._rows[key] = array("q")
+                rows.frombytes(ids.astype("<i8").tobytes())
+            return
+        columns = [store.column_values(name, start) for name in self.columns]
+        if len(columns) == 1:
+            for i, key in enumerate(columns[0], start):
+                self._add(key, i)
+        else:
+            for i, key in enumerate(zip(*columns), start):
+                self._add(key, i)
+
+    def add(self, row_id: int, data: Dict[str, str]):
+        self._add(self._key([data.get(name) or "" for name in self.columns]), row_id)
+
+    def lookup(self, *values: str) -> Sequence[int]:
+        """
+        Номера строк со значением values — копия: изменения результата
+        вызывающим кодом не портят индекс. (Представление только для чтения
+        здесь не годится: array с выданным буфером нельзя дописывать.)
+        """
+        rows = self._rows.get(self._key(values))
+        return rows[:] if rows is not None else array("q")
+
+    def count(self, *values: str) -> int:
+        rows = self._rows.get(self._key(values))
+        return len(rows) if rows is not None else 0
+
+    def keys(self) -> Iterable[object]:
+        return self._rows.keys()
+
+    def clear(self):
+        self._rows.clear()
+        self.built = True
+
+    def reset(self):
+        """
+        Сбросить индекс; он будет построен заново при следующем поиске.
+        """
+        self._rows.clear()
+        self.built = False
@@ -0,0 +1,253 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.columnar_store import CategoryColumn
+from src.spatial_index import bbox_mask
+
+# Сколько строк просматривается для оценки селективности условия без индекса
+SAMPLE_SIZE = 1024
+# Условие с индексом пересекается с кандидатами по номерам строк, если найдёт
+# не больше чем в столько раз строк, чем уже отобрано; иначе дешевле
+# проверить само условие на каждом кандидате
+INTERSECT_RATIO = 8
+
+
+class Predicate:
+    """
+    Условие запроса к базе точек. estimate — оценка числа подходящих строк
+    (exact=True — точное число, известное по индексу без чтения записей),
+    ids — все подходящие строки по возрастанию номера, mask — проверка
+    условия для заданных строк.
+    """
+
+    name = ""
+    exact = False
+
+    def estimate(self, manager) -> int:
+        # По умолчанию — доля подходящих строк в равномерной выборке
+        total = len(manager.store)
+        if total <= SAMPLE_SIZE:
+            return int(self.mask(manager, np.arange(total)).sum())
+        sample = np.linspace(0, total - 1, SAMPLE_SIZE).astype(np.int64)
+        return int(self.mask(manager, sample).mean() * total)
+
+    def ids(self, manager) -> np.ndarray:
+        return np.flatnonzero(self.mask(manager, np.arange(len(manager.store))))
+
+    def mask(self, manager, ids: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+def _column_equals(store, column: str, value: str, ids: np.ndarray) -> np.ndarray:
+    col = getattr(store, "columns", {}).get(column)
+    if isinstance(col, CategoryColumn):
+        code = col.lookup(value)
+        if code is None:
+            return np.zeros(len(ids), dtype=bool)
+        return col.codes.view()[ids] == code
+    return np.array([store.value(int(i), column) == value for i in ids], dtype=bool)
+
+
+class ValuePredicate(Predicate):
+    """
+    Колонки равны значениям (строгое сравнение строк, как в find_*).
+    index — имя хеш-индекса менеджера по этим колонкам, если он включён.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        columns: Sequence[str],
+        values: Sequence[str],
+        index: Optional[str] = None,
+    ):
+        self.name = name
+        self.columns = tuple(columns)
+        self.values = tuple(values)
+        self.index = index
+        self.exact = index is not None
+
+    def estimate(self, manager) -> int:
+        if self.exact:
+            return len(manager.find_ids(self.index, *self.values))
+        return super().estimate(manager)
+
+    def ids(self, manager) -> np.ndarray:
+        if self.exact:
+            ids = manager.find_ids(self.index, *self.values)
+        else:
+            ids = manager.store.find_where(dict(zip(self.columns, self.values)))
+        return np.sort(np.asarray(ids, dtype=np.int64))
+
+    def mask(self, manager, ids: np.ndarray) -> np.ndarray:
+        keep = np.ones(len(ids), dtype=bool)
+        for column, value in zip(self.columns, self.values):
+            keep &= _column_equals(manager.store, column, value, ids)
+        return keep
+
+
+class TimeRangePredicate(Predicate):
+    """
+    Момент Data+Time в диапазоне [start, end] (секунды, None — без границы).
+    """
+
+    name = "date_range"
+    exact = True
+
+    def __init__(self, start: Optional[int], end: Optional[int]):
+        self.start = start
+        self.end = end
+
+    def estimate(self, manager) -> int:
+        return manager.time_index.count(self.start, self.end)
+
+    def ids(self, manager) -> np.ndarray:
+        return np.sort(manager.time_index.range(self.start, self.end))
+
+    def mask(self, manager, ids: np.ndarray) -> np.ndarray:
+        from src.columnar_store import NO_TIMESTAMP
+        from src.time_index import timestamps_at
+
+        ts = timestamps_at(manager.store, ids)
+        keep = ts != NO_TIMESTAMP
+        if self.start is not None:
+            keep &= ts >= self.start
+        if self.end is not None:
+            keep &= ts <= self.end
+        return keep
+
+
+class BBoxPredicate(Predicate):
+    """
+    Точка внутри прямоугольника широт/долгот (lon_min > lon_max — через 180°,
+    lon_max - lon_min >= 360 — все долготы).
+    """
+
+    name = "bbox"
+
+    def __init__(self, lat_min: float, lon_min: float, lat_max: float, lon_max: float):
+        self.box = (lat_min, lon_min, lat_max, lon_max)
+
+    def ids(self, manager) -> np.ndarray:
+        return manager.spatial_index.in_bbox(*self.box)
+
+    def mask(self, manager, ids: np.ndarray) -> np.ndarray:
+        spatial = manager.spatial_index
+        return bbox_mask(spatial.lats.view()[ids], spatial.lons.view()[ids], *self.box)
+
+
+class TextPredicate(Predicate):
+    """
+    Исходный текст точки содержит подстроку (без учёта регистра).
+    """
+
+    name = "text"
+
+    def __init__(self, text: str):
+        self.text = text.casefold()
+
+    def mask(self, manager, ids: np.ndarray) -> np.ndarray:
+        store = manager.store
+        text = self.text
+        return np.array(
+            [text in store.value(int(i), "Original text").casefold() for i in ids],
+            dtype=bool,
+        )
+
+
+class QueryPlan:
+    """
+    План запроса: условия в порядке выполнения с оценками числа строк.
+
+    Для AND первым выполняется самое селективное условие (по оценке),
+    его строки — кандидаты. Следующие условия с индексом пересекаются
+    с кандидатами по номерам строк (np.intersect1d), если их результат
+    сопоставим по размеру; остальные проверяются только на кандидатах.
+    Для OR объединяются номера строк всех условий.
+    """
+
+    def __init__(self, manager, predicates: Sequence[Predicate], mode: str = "and"):
+        if mode not in ("and", "or"):
+            raise ValueError(f"Неизвестный режим запроса: {mode}")
+        self.manager = manager
+        self.mode = mode
+        estimated = [(p.estimate(manager), p) for p in predicates]
+        estimated.sort(key=lambda item: item[0])
+        self.steps: List[Tuple[int, Predicate]] = estimated
+
+    def explain(self) -> List[Tuple[str, int, str]]:
+        """
+        Шаги плана: (условие, оценка числа строк, способ: ids/intersect/filter).
+        Способ выбран по оценкам; при выполнении (ids) он уточняется по
+        фактическому числу кандидатов.
+        """
+        if self.mode == "or":
+            return [(p.name, n, "ids") for n, p in self.steps]
+        result = []
+        for i, (n, p) in enumerate(self.steps):
+            if i == 0:
+                how = "ids"
+            elif p.exact and n <= self.steps[0][0] * INTERSECT_RATIO:
+                how = "intersect"
+            else:
+                how = "filter"
+            result.append((p.name, n, how))
+        return result
+
+    def ids(self) -> np.ndarray:
+        """
+        Номера подходящих строк по возрастанию (записи не создаются).
+        """
+        manager = self.manager
+        if not self.steps:
+            return np.arange(len(manager.store), dtype=np.int64)
+        if self.mode == "or":
+            ids = np.empty(0, dtype=np.int64)
+            for _, p in self.steps:
+                ids = np.union1d(ids, p.ids(manager))
+            return ids
+        ids = self.steps[0][1].ids(manager)
+        for n, p in self.steps[1:]:
+            if not len(ids):
+                break
+            if p.exact and n <= len(ids) * INTERSECT_RATIO:
+                ids = np.intersect1d(ids, p.ids(manager), assume_unique=True)
+            else:
+                ids = ids[p.mask(manager, ids)]
+        return ids
+
+    def count(self) -> int:
+        """
+        Число подходящих строк. Для одного условия с индексом — без
+        построения списка строк.
+        """
+        if len(self.steps) == 1 and self.steps[0][1].exact:
+            return self.steps[0][0]
+        if not self.steps:
+            return len(self.manager.store)
+        if self.mode == "and" and self.steps[0][1].exact and self.steps[0][0] == 0:
+            return 0
+        return len(self.ids())
+
+
+def filter_conditions(city: str = "", date: str = "", lat: str = "", lon: str = "") -> dict:
+    """
+    Условия AllPointsManager.query для фильтров вкладки «Точки»: город,
+    дата (день, диапазон "дата [время] .. дата [время]" или, если не
+    распознана, строгое сравнение) и координаты (только парой).
+    """
+    from src.time_index import parse_range
+
+    conditions: dict = {"city": city}
+    if lat and lon:
+        conditions["lon_lat"] = (lon, lat)
+    if date:
+        try:
+            conditions["date_range"] = parse_range(date)
+        except ValueError:
+            conditions["date"] = date
+    return conditions
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.columnar_store import ColumnarPointStore
+
+# Двоичный кэш колоночного хранилища рядом с AllPoint.csv (<файл>.pcache).
+# Формат: MAGIC, длина заголовка (8 байт), JSON-заголовок, затем сырые
+# numpy-массивы, выровненные по 64 байта. Массивы читаются через mmap.
+MAGIC = b"POINTS-CACHE-1\n"
+CACHE_SUFFIX = ".pcache"
+_ALIGN = 64
+# Сколько байт с начала и с конца файла участвует в хеше содержимого
+HASH_SAMPLE = 1 << 20
+# Блок чтения для полного хеша
+HASH_BLOCK = 1 << 22
+
+
+def cache_path(csv_path: str) -> str:
+    return csv_path + CACHE_SUFFIX
+
+
+def content_hash(f, size: int) -> str:
+    """
+    Хеш содержимого первых size байт файла: начало, конец и сам размер.
+    Полный хеш многогигабайтного файла съел бы весь выигрыш от кэша.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(size).encode())
+    f.seek(0)
+    h.update(f.read(min(size, HASH_SAMPLE)))
+    if size > HASH_SAMPLE:
+        f.seek(max(HASH_SAMPLE, size - HASH_SAMPLE))
+        h.update(f.read(size - f.tell()))
+    return h.hexdigest()
+
+
+def prefix_hash(f, size: int) -> str:
+    """
+    Хеш всех первых size байт файла. Нужен, когда файл после сохранения
+    кэша дописан: изменился и mtime, и конец, так что правку в середине
+    прежнего содержимого выборочный content_hash уже не заметит.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    f.seek(0)
+    left = size
+    while left > 0:
+        block = f.read(min(left, HASH_BLOCK))
+        if not block:
+            break
+        h.update(block)
+        left -= len(block)
+    return h.hexdigest()
+
+
+def file_key(f: BinaryIO, size: int) -> Dict[str, object]:
+    """
+    Ключ кэша для первых size байт открытого файла f — тех, что разобраны.
+    Дозаписи после size (и замена файла по пути) на ключ не влияют.
+    """
+    return {
+        "size": size,
+        "mtime_ns": os.fstat(f.fileno()).st_mtime_ns,
+        "hash": content_hash(f, size),
+        "prefix_hash": prefix_hash(f, size),
+    }
+
+
+class CacheHit:
+    """
+    Результат чтения кэша. prefix_only=True — CSV с тех пор дописан,
+    и строки после valid_size нужно дочитать из CSV.
+    """
+
+    def __init__(self, store: ColumnarPointStore, state: Dict[str, object], prefix_only: bool):
+        self.store = store
+        self.valid_size = int(state["valid_size"])
+        self.torn_bytes = int(state["torn_bytes"])
+        self.missing_newline = bool(state["missing_newline"])
+        self.prefix_only = prefix_only
+
+
+def save_cache(
+    csv_path: str,
+    store: ColumnarPointStore,
+    state: Dict[str, object],
+    f: Optional[BinaryIO] = None,
+) -> bool:
+    """
+    Записать кэш (атомарно). state — valid_size, torn_bytes, missing_newline
+    менеджера: кэш покрывает ровно valid_size + torn_bytes разобранных байт.
+    f — файл, из которого они прочитаны (иначе CSV открывается заново): если
+    другой процесс успел дописать строки, кэш их не захватит, а если заменил
+    файл — ключ не совпадёт с новым. Ошибки записи не критичны: False.
+    """
+    size = int(state["valid_size"]) + int(state["torn_bytes"])
+    try:
+        if f is not None:
+            key = file_key(f, size)
+        else:
+            with open(csv_path, "rb") as csv_file:
+                key = file_key(csv_file, size)
+    except OSError:
+        return False
+    arrays: List[np.ndarray] = []
+    columns: Dict[str, object] = {}
+    offset = 0
+    for name, (kind, column_arrays, meta) in store.export().items():
+        specs = {}
+        for array_name, arr in column_arrays.items():
+            arr = np.ascontiguousarray(arr)
+            specs[array_name] = {
+                "offset": offset,
+                "dtype": arr.dtype.str,
+                "length": len(arr),
+            }
+            arrays.append(arr)
+            offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+        columns[name] = {"kind": kind, "arrays": specs, "meta": meta}
+    header = json.dumps(
+        {
+            "key": key,
+            "header": store.header,
+            "rows": len(store),
+            "state": state,
+            "columns": columns,
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+    path = cache_path(csv_path)
+    try:
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".pcache-", dir=os.path.dirname(os.path.abspath(path))
+        )
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+            f.write(b"\0" * (data_start - f.tell()))
+            for arr in arrays:
+                f.write(arr.tobytes())
+                f.write(b"\0" * (-arr.nbytes % _ALIGN))
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+def load_cache(csv_path: str, header: List[str]) -> Optional[CacheHit]:
+    """
+    Прочитать кэш, если он соответствует CSV. Устаревший, повреждённый или
+    чужой кэш молча игнорируется (None) — тогда CSV разбирается заново.
+    """
+    try:
+        return _load_cache(csv_path, header)
+    except (OSError, ValueError, KeyError, TypeError, OverflowError, struct.error):
+        return None
+
+
+def _load_cache(csv_path: str, header: List[str]) -> Optional[CacheHit]:
+    path = cache_path(csv_path)
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        if header_len > os.fstat(f.fileno()).st_size:
+            return None
+        meta = json.loads(f.read(header_len).decode("utf-8"))
+        if meta["header"] != header:
+            return None
+        prefix_only = _check_key(csv_path, meta["key"], meta["state"])
+        if prefix_only is None:
+            return None
+        data_start = -(-(len(MAGIC) + 8 + header_len) // _ALIGN) * _ALIGN
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    columns: Dict[str, Tuple[str, Dict[str, np.ndarray], Dict[str, object]]] = {}
+    for name, spec in meta["columns"].items():
+        arrays = {}
+        for array_name, a in spec["arrays"].items():
+            arrays[array_name] = np.frombuffer(
+                buf,
+                dtype=np.dtype(a["dtype"]),
+                count=a["length"],
+                offset=data_start + a["offset"],
+            )
+        columns[name] = (spec["kind"], arrays, spec["meta"])
+    store = ColumnarPointStore.restore(header, int(meta["rows"]), columns)
+    return CacheHit(store, meta["state"], prefix_only)
+
+
+def _check_key(
+    csv_path: str, key: Dict[str, object], state: Dict[str, object]
+) -> Optional[bool]:
+    """
+    False — кэш соответствует файлу, True — файл только дописан после
+    сохранения кэша (префикс совпадает), None — кэш устарел.
+    """
+    st = os.stat(csv_path)
+    size = int(key["size"])
+    if st.st_size == size and st.st_mtime_ns == key["mtime_ns"]:
+        with open(csv_path, "rb") as f:
+            return False if content_hash(f, size) == key["hash"] else None
+    # Дописывать можно только к файлу без оборванного хвоста
+    if st.st_size <= size or state["torn_bytes"] or state["missing_newline"]:
+        return None
+    with open(csv_path, "rb") as f:
+        f.seek(size - 1)
+        if f.read(1) != b"\n":
+            return None
+        # mtime уже не совпадает: прежнее содержимое сверяется целиком
+        if prefix_hash(f, size) != key["prefix_hash"]:
+            return None
+    return True
@@ -0,0 +1,155 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.allpoints_manager import parse_date, parse_time
+from src.columnar_store import FLOAT_COLUMNS, CategoryColumn, ColumnarPointStore
+from src.spatial_index import parse_coordinates
+
+# Размер страницы, которой строки читаются из хранилища, и число страниц в кэше
+PAGE_SIZE = 256
+PAGE_CACHE = 16
+
+
+def _value_ranks(values: Sequence[str], column: str) -> np.ndarray:
+    """
+    Место каждого значения из values в порядке сортировки колонки (равные
+    при сравнении значения получают одно место).
+    Дата и время сравниваются как моменты времени, остальное — как строки
+    без учёта регистра; нераспознанные даты и пустые значения получают -1.
+    """
+    if column == "Data":
+        parsed = [parse_date(v) for v in values]
+    elif column == "Time":
+        parsed = [parse_time(v) for v in values]
+    else:
+        parsed = [v.casefold() if v else None for v in values]
+    ranks = np.full(len(values), -1, dtype=np.int64)
+    # Равные значения (например, "Москва" и "москва") получают одно место
+    rank, prev = -1, None
+    for i in sorted((i for i, p in enumerate(parsed) if p is not None), key=parsed.__getitem__):
+        if parsed[i] != prev:
+            rank, prev = rank + 1, parsed[i]
+        ranks[i] = rank
+    return ranks
+
+
+def column_sort_rank(store, column: str) -> np.ndarray:
+    """
+    Место значения каждой строки хранилища в порядке колонки: строки с
+    равными значениями получают одно место, пустые значения (и NaN) — -1.
+    Числовые колонки сортируются как числа.
+    """
+    if column in FLOAT_COLUMNS:
+        if isinstance(store, ColumnarPointStore):
+            values = store.float_array(column)
+        else:
+            values = parse_coordinates(store.column_values(column))
+        filled = ~np.isnan(values)
+        keys = np.full(len(values), -1, dtype=np.int64)
+        keys[filled] = np.unique(values[filled], return_inverse=True)[1].ravel()
+    elif isinstance(store, ColumnarPointStore) and isinstance(
+        store.columns[column], CategoryColumn
+    ):
+        # Сортируются только уникальные значения, строки получают их места
+        col = store.columns[column]
+        keys = _value_ranks(col.values, column)[col.codes.view()]
+    else:
+        values = store.column_values(column)
+        unique = list(set(values))
+        unique_ranks = _value_ranks(unique, column)
+        position = {value: unique_ranks[i] for i, value in enumerate(unique)}
+        keys = np.fromiter(
+            (position[v] for v in values), dtype=np.int64, count=len(values)
+        )
+    return keys
+
+
+class ResultSet:
+    """
+    Результат поиска по базе точек: номера строк без самих записей.
+    Строки читаются из хранилища страницами (page) по мере показа,
+    сортировка переставляет только номера по готовому порядку колонки
+    (AllPointsManager.sort_rank).
+    """
+
+    def __init__(self, manager, ids: Sequence[int]):
+        self.manager = manager
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.sort_column: Optional[str] = None
+        self.descending = False
+        self._pages: "OrderedDict[int, List[Dict[str, str]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def sort(self, column: str, descending: bool = False):
+        """
+        Упорядочить результат по колонке (пустые значения — в конце в обоих
+        направлениях, строки с равными значениями сохраняют прежний порядок).
+        """
+        self.set_order(self.sorted_ids(column, descending), column, descending)
+
+    def sorted_ids(self, column: str, descending: bool = False) -> np.ndarray:
+        """
+        Номера строк результата в порядке сортировки по колонке; сам
+        результат не меняется, поэтому порядок можно считать в фоне, пока
+        главный поток показывает страницы (см. set_order).
+        """
+        rank = self.manager.sort_rank(column)[self.ids]
+        # lexsort устойчив: последний ключ главный — пустые (-1) в конец
+        order = np.lexsort((-rank if descending else rank, rank < 0))
+        return self.ids[order]
+
+    def set_order(self, ids: np.ndarray, column: str, descending: bool = False):
+        """
+        Применить порядок, вычисленный sorted_ids.
+        """
+        self.ids = ids
+        self.sort_column, self.descending = column, descending
+        self._pages.clear()
+
+    def invalidate(self):
+        """
+        Сбросить кэш страниц (записи базы изменились).
+        """
+        self._pages.clear()
+
+    def row_id(self, i: int) -> int:
+        return int(self.ids[i])
+
+    def record(self, i: int):
+        return self.manager.store.record(self.row_id(i))
+
+    def page(
+        self, start: int, count: int, columns: Optional[Sequence[str]] = None
+    ) -> List[List[str]]:
+        """
+        Значения колонок (по умолчанию всех) для строк результата start..start+count.
+        """
+        columns = list(columns or self.manager.header)
+        rows: List[List[str]] = []
+        end = min(start + count, len(self.ids))
+        i = start
+        while i < end:
+            number = i // PAGE_SIZE
+            block = self._page(number)
+            offset = i - number * PAGE_SIZE
+            take = min(end - i, PAGE_SIZE - offset)
+            for row in block[offset : offset + take]:
+                rows.append([row.get(c) or "" for c in columns])
+            i += take
+        return rows
+
+    def _page(self, number: int) -> List[Dict[str, str]]:
+        block = self._pages.get(number)
+        if block is not None:
+            self._pages.move_to_end(number)
+            return block
+        ids = self.ids[number * PAGE_SIZE : (number + 1) * PAGE_SIZE].tolist()
+        block = [rec.data for rec in self.manager.store.records_at(ids)]
+        self._pages[number] = block
+        if len(self._pages) > PAGE_CACHE:
+            self._pages.popitem(last=False)
+        return block
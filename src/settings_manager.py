@@ -1,6 +1,8 @@
 import os
 from typing import Any, Dict, Optional
 
+from src.metrics import timed
+
 
 class SettingsManager:
     # Шаблон настроек с подробными комментариями и порядком
@@ -20,6 +22,18 @@ class SettingsManager:
         "mainDataCSV=E:\\Programming\\Projects\\Python\\weather\\settings\\AllPoint.csv",
         "# cityDataFile — файл для хранения данных о городах (txt, UTF-8)",
         "cityDataFile=E:\\Programming\\Projects\\Python\\weather\\data\\city.txt",
+        "# pointsStorage — хранение базы точек: csv (в памяти), mmap (CSV через mmap) или sqlite",
+        "pointsStorage=csv",
+        "# pointsDatabase — файл базы SQLite (пусто — mainDataCSV с расширением .sqlite)",
+        "pointsDatabase=",
+        "# watchFiles — подхватывать изменения mainDataCSV и cityDataFile другими программами",
+        "watchFiles=True",
+        "",
+        "# === Диагностика ===",
+        "# metricsEnabled — собирать время, число строк и байт по операциям (True/False)",
+        "metricsEnabled=False",
+        "# metricsFile — файл для выгрузки статистики (JSON); рядом сохраняются профили действий",
+        "metricsFile=metrics.json",
     ]
 
     def __init__(self, filepath: str = "settings.txt"):
@@ -27,6 +41,7 @@ class SettingsManager:
         self.settings: Dict[str, Any] = {}
         self.load()
 
+    @timed("settings.load")
     def load(self) -> None:
         """Загрузить настройки из файла."""
         self.settings.clear()
@@ -40,6 +55,7 @@ class SettingsManager:
                 key, value = line.split("=", 1)
                 self.settings[key.strip()] = self._parse_value(value.strip())
 
+    @timed("settings.save")
     def save(self) -> None:
         """Сохранить текущие настройки в файл с подробными комментариями и структурой."""
         template_lines = self.SETTINGS_TEMPLATE.copy()
@@ -0,0 +1,434 @@
+import heapq
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.columnar_store import ColumnarPointStore, GrowableArray
+
+# Средний радиус Земли (км), используется в формуле гаверсинуса
+EARTH_RADIUS_KM = 6371.0088
+# Прямоугольники шире (по широте или долготе), градусов, in_bbox проверяет
+# перебором без отбора кандидатов по описанной окружности
+BBOX_CAP_MAX_DEG = 90.0
+
+
+def bbox_mask(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    lat_min: float,
+    lon_min: float,
+    lat_max: float,
+    lon_max: float,
+) -> np.ndarray:
+    """
+    Маска точек внутри прямоугольника: lon_min > lon_max — через 180-й
+    меридиан, lon_max - lon_min >= 360 — все долготы. Точки без координат
+    (NaN) не попадают.
+    """
+    mask = (lats >= lat_min) & (lats <= lat_max)
+    if lon_max - lon_min >= 360:
+        mask &= ~np.isnan(lons)
+    elif lon_min <= lon_max:
+        mask &= (lons >= lon_min) & (lons <= lon_max)
+    else:
+        mask &= (lons >= lon_min) | (lons <= lon_max)
+    return mask
+
+
+def to_unit_xyz(lats, lons) -> np.ndarray:
+    """
+    Широты/долготы (градусы) в точки единичной сферы, массив (n, 3).
+    """
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Расстояние по большому кругу (км), работает и с numpy-массивами.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _km_to_chord2(km: float) -> float:
+    # Квадрат хорды единичной сферы, соответствующей дуге km
+    return (2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)) ** 2
+
+
+def _chord2_to_km(chord2: np.ndarray) -> np.ndarray:
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.sqrt(chord2) / 2, 1.0))
+
+
+def bearing_deg(lat1, lon1, lat2, lon2):
+    """
+    Начальный азимут (градусы от севера по часовой стрелке) из точки 1 в точку 2.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlon = lon2 - lon1
+    x = np.sin(dlon) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return np.degrees(np.arctan2(x, y)) % 360
+
+
+def store_coordinates(store, start: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Широты и долготы строк хранилища начиная с start (NaN для пустых/ошибочных).
+    """
+    return store_floats(store, "Lat_WGS84", start), store_floats(store, "Lon_WGS84", start)
+
+
+def store_floats(store, column: str, start: int = 0) -> np.ndarray:
+    """
+    Значения числовой колонки начиная со строки start (NaN для пустых/ошибочных).
+    """
+    if isinstance(store, ColumnarPointStore):
+        return store.float_array(column)[start:]
+    return parse_coordinates(store.column_values(column, start))
+
+
+def parse_coordinates(values: List[str]) -> np.ndarray:
+    result = np.empty(len(values), dtype=np.float64)
+    for i, s in enumerate(values):
+        try:
+            result[i] = float(s.replace(",", "."))
+        except ValueError:
+            result[i] = np.nan
+    return result
+
+
+class _KDTree:
+    """
+    Статическое KD-дерево по точкам единичной сферы. Узлы хранятся в списках,
+    листья — непрерывные диапазоны переупорядоченных массивов xyz/ids.
+    """
+
+    def __init__(self, ids: np.ndarray, xyz: np.ndarray, leaf_size: int):
+        n = len(ids)
+        order = np.arange(n)
+        self.start: List[int] = []
+        self.end: List[int] = []
+        self.children: List[Optional[Tuple[int, int]]] = []
+        self.box: List[Tuple[float, ...]] = []
+
+        def new_node(s: int, e: int) -> int:
+            self.start.append(s)
+            self.end.append(e)
+            self.children.append(None)
+            self.box.append(())
+            return len(self.start) - 1
+
+        stack = [new_node(0, n)]
+        while stack:
+            node = stack.pop()
+            s, e = self.start[node], self.end[node]
+            pts = xyz[order[s:e]]
+            lo, hi = pts.min(axis=0), pts.max(axis=0)
+            self.box[node] = tuple(lo.tolist()) + tuple(hi.tolist())
+            if e - s <= leaf_size:
+                continue
+            axis = int(np.argmax(hi - lo))
+            mid = (s + e) // 2
+            part = np.argpartition(pts[:, axis], mid - s)
+            order[s:e] = order[s:e][part]
+            left, right = new_node(s, mid), new_node(mid, e)
+            self.children[node] = (left, right)
+            stack.extend((left, right))
+        self.ids = ids[order]
+        self.xyz = xyz[order]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _box_d2(self, node: int, q: Tuple[float, float, float]) -> float:
+        x0, y0, z0, x1, y1, z1 = self.box[node]
+        dx = x0 - q[0] if q[0] < x0 else (q[0] - x1 if q[0] > x1 else 0.0)
+        dy = y0 - q[1] if q[1] < y0 else (q[1] - y1 if q[1] > y1 else 0.0)
+        dz = z0 - q[2] if q[2] < z0 else (q[2] - z1 if q[2] > z1 else 0.0)
+        return dx * dx + dy * dy + dz * dz
+
+    def within(self, q: Tuple[float, float, float], r2: float):
+        ranges = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._box_d2(node, q) > r2:
+                continue
+            children = self.children[node]
+            if children is None:
+                ranges.append((self.start[node], self.end[node]))
+            else:
+                stack.extend(children)
+        if not ranges:
+            return self.ids[:0], self.xyz[:0, 0]
+        idx = np.concatenate([np.arange(s, e) for s, e in ranges])
+        d2 = ((self.xyz[idx] - q) ** 2).sum(axis=1)
+        mask = d2 <= r2
+        return self.ids[idx][mask], d2[mask]
+
+    def nearest(self, q: Tuple[float, float, float], k: int, bound: float):
+        best_ids, best_d2 = self.ids[:0], self.xyz[:0, 0]
+        heap = [(self._box_d2(0, q), 0)]
+        while heap:
+            d2, node = heapq.heappop(heap)
+            if d2 > bound:
+                break
+            children = self.children[node]
+            if children is not None:
+                for child in children:
+                    child_d2 = self._box_d2(child, q)
+                    if child_d2 <= bound:
+                        heapq.heappush(heap, (child_d2, child))
+                continue
+            s, e = self.start[node], self.end[node]
+            leaf_d2 = ((self.xyz[s:e] - q) ** 2).sum(axis=1)
+            mask = leaf_d2 <= bound
+            best_ids = np.concatenate([best_ids, self.ids[s:e][mask]])
+            best_d2 = np.concatenate([best_d2, leaf_d2[mask]])
+            if len(best_d2) >= k:
+                keep = np.argpartition(best_d2, k - 1)[:k]
+                best_ids, best_d2 = best_ids[keep], best_d2[keep]
+                bound = min(bound, float(best_d2.max()))
+        return best_ids, best_d2
+
+
+class SpatialIndex:
+    """
+    Пространственный индекс точек (широта/долгота WGS84) для запросов
+    по радиусу, ближайшим соседям и прямоугольнику.
+
+    Точки хранятся на единичной сфере в наборе KD-деревьев растущих размеров
+    (логарифмический метод): новые точки попадают в небольшой буфер, а при его
+    заполнении сливаются с деревьями не большего размера. Вставка не требует
+    полной перестройки, запрос просматривает O(log N) деревьев и буфер.
+    Номера точек совпадают с номерами строк хранилища.
+    """
+
+    def __init__(self, leaf_size: int = 32, buffer_size: int = 256):
+        self.leaf_size = leaf_size
+        self.buffer_size = buffer_size
+        self.lats = GrowableArray(np.float64)
+        self.lons = GrowableArray(np.float64)
+        self._trees: List[_KDTree] = []
+        self._buffer_ids: List[int] = []
+        self._buffer_xyz = np.empty((buffer_size, 3), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def clear(self):
+        self.lats.truncate(0)
+        self.lons.truncate(0)
+        self._trees = []
+        self._buffer_ids = []
+
+    def extend(self, lats: np.ndarray, lons: np.ndarray):
+        """
+        Добавить точки с номерами len(self), len(self)+1, ...
+        Точки без координат (NaN) получают номер, но не индексируются.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        start = len(self.lats)
+        self.lats.extend(lats)
+        self.lons.extend(lons)
+        valid = np.flatnonzero(~(np.isnan(lats) | np.isnan(lons)))
+        if len(valid) < self.buffer_size:
+            for i in valid.tolist():
+                self._buffer_add(start + i, lats[i], lons[i])
+            return
+        self._insert_tree(valid + start, to_unit_xyz(lats[valid], lons[valid]))
+
+    def add(self, lat: float, lon: float) -> int:
+        row_id = len(self.lats)
+        self.lats.append(lat)
+        self.lons.append(lon)
+        if not (math.isnan(lat) or math.isnan(lon)):
+            self._buffer_add(row_id, lat, lon)
+        return row_id
+
+    def _buffer_add(self, row_id: int, lat: float, lon: float):
+        self._buffer_xyz[len(self._buffer_ids)] = to_unit_xyz(lat, lon)
+        self._buffer_ids.append(row_id)
+        if len(self._buffer_ids) == self.buffer_size:
+            ids = np.array(self._buffer_ids, dtype=np.int64)
+            xyz = self._buffer_xyz.copy()
+            self._buffer_ids = []
+            self._insert_tree(ids, xyz)
+
+    def _insert_tree(self, ids: np.ndarray, xyz: np.ndarray):
+        # Сливаем с деревьями не большего размера, чтобы их было O(log N)
+        while self._trees and len(self._trees[-1]) <= len(ids):
+            tree = self._trees.pop()
+            ids = np.concatenate([tree.ids, ids])
+            xyz = np.concatenate([tree.xyz, xyz])
+        self._trees.append(_KDTree(ids, xyz, self.leaf_size))
+
+    def _buffer(self):
+        n = len(self._buffer_ids)
+        return np.array(self._buffer_ids, dtype=np.int64), self._buffer_xyz[:n]
+
+    def _within_chord(self, lat: float, lon: float, r2: float):
+        q = tuple(to_unit_xyz(lat, lon).tolist())
+        parts_ids, parts_d2 = [], []
+        for tree in self._trees:
+            ids, d2 = tree.within(q, r2)
+            parts_ids.append(ids)
+            parts_d2.append(d2)
+        buf_ids, buf_xyz = self._buffer()
+        d2 = ((buf_xyz - q) ** 2).sum(axis=1)
+        mask = d2 <= r2
+        parts_ids.append(buf_ids[mask])
+        parts_d2.append(d2[mask])
+        return np.concatenate(parts_ids), np.concatenate(parts_d2)
+
+    def within_radius(
+        self, lat: float, lon: float, radius_km: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Точки в радиусе radius_km: (номера, расстояния в км), по возрастанию расстояния.
+        """
+        ids, d2 = self._within_chord(lat, lon, _km_to_chord2(radius_km))
+        order = np.argsort(d2, kind="stable")
+        return ids[order], _chord2_to_km(d2[order])
+
+    def nearest(
+        self, lat: float, lon: float, k: int = 1, max_km: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k ближайших точек: (номера, расстояния в км), по возрастанию расстояния.
+        """
+        q = tuple(to_unit_xyz(lat, lon).tolist())
+        bound = math.inf if max_km is None else _km_to_chord2(max_km)
+        buf_ids, buf_xyz = self._buffer()
+        best_ids = buf_ids
+        best_d2 = ((buf_xyz - q) ** 2).sum(axis=1)
+        mask = best_d2 <= bound
+        best_ids, best_d2 = best_ids[mask], best_d2[mask]
+        # Начинаем с крупных деревьев: они быстрее всего сужают границу поиска
+        for tree in self._trees:
+            if len(best_d2) >= k:
+                keep = np.argpartition(best_d2, k - 1)[:k]
+                best_ids, best_d2 = best_ids[keep], best_d2[keep]
+                bound = min(bound, float(best_d2.max()))
+            ids, d2 = tree.nearest(q, k, bound)
+            best_ids = np.concatenate([best_ids, ids])
+            best_d2 = np.concatenate([best_d2, d2])
+        order = np.argsort(best_d2, kind="stable")[:k]
+        return best_ids[order], _chord2_to_km(best_d2[order])
+
+    def in_bbox(
+        self, lat_min: float, lon_min: float, lat_max: float, lon_max: float
+    ) -> np.ndarray:
+        """
+        Номера точек внутри прямоугольника (по возрастанию). Если lon_min > lon_max,
+        прямоугольник пересекает 180-й меридиан; при lon_max - lon_min >= 360
+        он охватывает все долготы.
+        """
+        full_circle = lon_max - lon_min >= 360
+        lon_span = (lon_max - lon_min) % 360 if lon_min != lon_max else 0.0
+        if full_circle or lon_span > BBOX_CAP_MAX_DEG or lat_max - lat_min > BBOX_CAP_MAX_DEG:
+            # Описанная окружность такого прямоугольника почти ничего не отсекает
+            # (и по точкам границы оценивается грубо) — проверяются все точки
+            ids = np.arange(len(self), dtype=np.int64)
+        else:
+            ids = self._bbox_candidates(lat_min, lon_min, lat_max, lon_span)
+        mask = bbox_mask(
+            self.lats.view()[ids], self.lons.view()[ids], lat_min, lon_min, lat_max, lon_max
+        )
+        return np.sort(ids[mask])
+
+    def _bbox_candidates(
+        self, lat_min: float, lon_min: float, lat_max: float, lon_span: float
+    ) -> np.ndarray:
+        center_lat = (lat_min + lat_max) / 2
+        center_lon = lon_min + lon_span / 2
+        # Радиус описанной окружности: максимум по точкам на границе прямоугольника
+        steps = np.linspace(0.0, 1.0, 17)
+        edge_lats = np.concatenate(
+            [lat_min + (lat_max - lat_min) * steps, lat_min + (lat_max - lat_min) * steps,
+             np.full(17, lat_min), np.full(17, lat_max)]
+        )
+        edge_lons = np.concatenate(
+            [np.full(17, lon_min), np.full(17, lon_min + lon_span),
+             lon_min + lon_span * steps, lon_min + lon_span * steps]
+        )
+        radius_km = float(
+            haversine_km(center_lat, center_lon, edge_lats, edge_lons).max()
+        )
+        ids, _ = self._within_chord(
+            center_lat, center_lon, _km_to_chord2(radius_km * 1.01 + 1.0)
+        )
+        return ids
+
+    def nearest_many(
+        self,
+        lats,
+        lons,
+        max_km: Optional[float] = None,
+        cell_deg: float = 0.5,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Ближайшая точка индекса для каждой из точек (lats, lons):
+        (номера, расстояния в км); -1 и NaN, если соседа нет (или он дальше max_km).
+
+        Точки запроса группируются по ячейкам сетки cell_deg. Для каждой ячейки
+        с центром c и полудиагональю h кандидаты — точки индекса в радиусе
+        D + 2h от c, где D — расстояние от c до ближайшей точки: по неравенству
+        треугольника все более далёкие точки не могут быть ближайшими. Расстояния
+        до кандидатов считаются матрично сразу для всех точек ячейки.
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        result_ids = np.full(len(lats), -1, dtype=np.int64)
+        result_km = np.full(len(lats), np.nan)
+        query = np.flatnonzero(~(np.isnan(lats) | np.isnan(lons)))
+        if not len(query) or not (self._trees or self._buffer_ids):
+            return result_ids, result_km
+        n_cols = int(math.ceil(360 / cell_deg))
+        rows = np.floor((lats[query] + 90) / cell_deg).astype(np.int64)
+        cols = np.floor(((lons[query] + 180) % 360) / cell_deg).astype(np.int64)
+        keys = rows * n_cols + cols
+        order = np.argsort(keys, kind="stable")
+        query, keys = query[order], keys[order]
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        q_xyz = to_unit_xyz(lats[query], lons[query])
+        index_lats, index_lons = self.lats.view(), self.lons.view()
+        best = np.empty(len(query), dtype=np.int64)
+        for s, e in zip(np.r_[0, bounds].tolist(), np.r_[bounds, len(query)].tolist()):
+            row, col = divmod(int(keys[s]), n_cols)
+            lat0 = row * cell_deg - 90
+            lat1 = min(lat0 + cell_deg, 90.0)
+            lon0 = col * cell_deg - 180
+            c_lat, c_lon = (lat0 + lat1) / 2, lon0 + cell_deg / 2
+            half_diag = float(
+                haversine_km(
+                    c_lat, c_lon, np.array([lat0, lat0, lat1, lat1]),
+                    np.array([lon0, lon0 + cell_deg, lon0, lon0 + cell_deg]),
+                ).max()
+            )
+            _, d = self.nearest(c_lat, c_lon, 1)
+            candidates, _ = self.within_radius(c_lat, c_lon, float(d[0]) + 2 * half_diag + 1e-3)
+            c_xyz = to_unit_xyz(index_lats[candidates], index_lons[candidates])
+            # Ограничиваем размер матрицы расстояний
+            step = max(1, 4_000_000 // max(1, len(candidates)))
+            for i in range(s, e, step):
+                j = min(i + step, e)
+                dot = q_xyz[i:j] @ c_xyz.T
+                best[i:j] = candidates[np.argmax(dot, axis=1)]
+        result_ids[query] = best
+        result_km[query] = haversine_km(
+            lats[query], lons[query], index_lats[best], index_lons[best]
+        )
+        if max_km is not None:
+            far = result_km > max_km
+            result_ids[far] = -1
+            result_km[far] = np.nan
+        return result_ids, result_km
@@ -0,0 +1,738 @@
+import csv
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.allpoints_manager import (
+    INDEX_COLUMNS,
+    POINT_COLUMNS,
+    AllPointRecord,
+    AllPointsManager,
+    parse_date,
+    parse_time,
+)
+from src.file_lock import keep_file_mode
+from src.metrics import METRICS, timed
+from src.spatial_index import EARTH_RADIUS_KM, haversine_km
+
+# Версия схемы базы (таблица meta); другая версия — ошибка открытия
+SCHEMA_VERSION = 1
+# Сколько записей вставляется одной транзакцией при переносе из CSV
+INSERT_BATCH = 50000
+# Сколько номеров строк передаётся в одном запросе "id IN (...)"
+IN_CHUNK = 900
+# Начальный радиус поиска ближайших точек, км (увеличивается вчетверо)
+NEAREST_START_KM = 1.0
+
+# Колонки CSV → колонки таблицы points
+SQL_COLUMNS: Dict[str, str] = {
+    "Data": "data",
+    "Time": "time",
+    "Lat_WGS84": "lat_wgs84",
+    "Lon_WGS84": "lon_wgs84",
+    "X_SK-42_Gauss_Kruger": "x_sk42",
+    "Y_SK-42_Gauss_Kruger": "y_sk42",
+    "City_Value": "city",
+    "Country_Value": "country",
+    "Description of the area": "area_desc",
+    "Description of the region": "region_desc",
+    "Original text": "original_text",
+}
+
+_VALUE_COLUMNS = ", ".join(SQL_COLUMNS[c] for c in POINT_COLUMNS)
+
+# Номер строки id совпадает с номером строки в хранилищах в памяти (с нуля,
+# без пропусков); ts, lat, lon — разобранные Data+Time и координаты для
+# индексов (NULL, если значение не распознано)
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS points (
+    id INTEGER PRIMARY KEY,
+    {", ".join(f"{SQL_COLUMNS[c]} TEXT NOT NULL DEFAULT ''" for c in POINT_COLUMNS)},
+    ts INTEGER,
+    lat REAL,
+    lon REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS points_rtree
+    USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS points_city ON points(city);
+CREATE INDEX IF NOT EXISTS points_country ON points(country);
+CREATE INDEX IF NOT EXISTS points_date ON points(data);
+CREATE INDEX IF NOT EXISTS points_lon_lat ON points(lon_wgs84, lat_wgs84);
+CREATE INDEX IF NOT EXISTS points_ts ON points(ts);
+"""
+
+
+def _coordinate(value: str) -> Optional[float]:
+    try:
+        result = float(value.replace(",", "."))
+    except ValueError:
+        return None
+    return None if math.isnan(result) else result
+
+
+class _Derived:
+    """
+    Разбор Data+Time и координат записей с кэшем уникальных дат и времени.
+    """
+
+    def __init__(self):
+        self._days: Dict[str, Optional[int]] = {}
+        self._seconds: Dict[str, int] = {}
+
+    def timestamp(self, date: str, time: str) -> Optional[int]:
+        day = self._days.get(date, -1)
+        if day == -1:
+            day = self._days[date] = parse_date(date)
+        if day is None:
+            return None
+        sec = self._seconds.get(time)
+        if sec is None:
+            sec = self._seconds[time] = parse_time(time) or 0
+        return day + sec
+
+    def row(self, row_id: int, data: Dict[str, str]) -> tuple:
+        values = [data.get(c) or "" for c in POINT_COLUMNS]
+        return (
+            row_id,
+            *values,
+            self.timestamp(values[0], values[1]),
+            _coordinate(values[2]),
+            _coordinate(values[3]),
+        )
+
+
+class SqlitePointStore:
+    """
+    Хранилище точек в таблице SQLite с интерфейсом хранилищ в памяти
+    (RecordListStore, ColumnarPointStore): номера строк, value, records_at,
+    column_values, set_values, find_where.
+
+    База в режиме WAL (чтение не блокируется записью); каждая пачка
+    вставок — одна транзакция. Соединение общее для потоков, обращения
+    к нему сериализуются блокировкой.
+    """
+
+    def __init__(self, path: str, header: Sequence[str] = POINT_COLUMNS, indexes: bool = True):
+        self.path = path
+        self.header = list(header)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # В WAL достаточно NORMAL: при сбое теряется только последняя транзакция
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.create_function(
+            "casefold", 1, lambda s: s.casefold() if s is not None else None, deterministic=True
+        )
+        with self.transaction():
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    self.conn.execute(statement)
+            version = self.conn.execute(
+                "SELECT value FROM meta WHERE key = 'version'"
+            ).fetchone()
+            if version is None:
+                self.conn.execute(
+                    "INSERT INTO meta VALUES ('version', ?)", (str(SCHEMA_VERSION),)
+                )
+            elif int(version[0]) != SCHEMA_VERSION:
+                raise ValueError(f"Неподдерживаемая версия базы точек: {version[0]}")
+        if indexes:
+            self.create_indexes()
+        self._size = self._max_id(self.conn)
+        self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def create_indexes(self):
+        """
+        Создать индексы по городу, стране, дате, координатам и времени (при
+        массовой загрузке их выгоднее создавать после вставки).
+        """
+        with self.transaction():
+            for statement in _INDEXES.split(";"):
+                if statement.strip():
+                    self.conn.execute(statement)
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def refresh(self) -> bool:
+        """
+        Учесть транзакции других соединений (data_version меняется после
+        чужой фиксации): пересчитать число строк. True — база изменилась.
+        """
+        with self.lock:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return False
+            self._data_version = version
+            self._size = self._max_id(self.conn)
+            return True
+
+    @staticmethod
+    def _max_id(conn: sqlite3.Connection) -> int:
+        # Следующий свободный номер строки (номера идут подряд с нуля)
+        return conn.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM points").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def ids(self, sql: str, params: Sequence = ()) -> np.ndarray:
+        """
+        Номера строк из запроса, возвращающего одну колонку id.
+        """
+        with self.lock:
+            cursor = self.conn.execute(sql, params)
+            return np.fromiter((row[0] for row in cursor), dtype=np.int64)
+
+    def append(self, rec: AllPointRecord):
+        self.extend([rec])
+
+    def extend(self, records: Iterable[AllPointRecord]):
+        derived = _Derived()
+        with self.transaction() as conn:
+            # Номер читается внутри BEGIN IMMEDIATE: другие соединения могли
+            # дописать строки после нашего последнего чтения
+            start = self._max_id(conn)
+            rows = [derived.row(i, rec.data) for i, rec in enumerate(records, start)]
+            placeholders = ", ".join("?" * (len(POINT_COLUMNS) + 4))
+            conn.executemany(
+                f"INSERT INTO points (id, {_VALUE_COLUMNS}, ts, lat, lon) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+            conn.executemany(
+                "INSERT INTO points_rtree VALUES (?, ?, ?, ?, ?)",
+                [
+                    (row[0], row[-2], row[-2], row[-1], row[-1])
+                    for row in rows
+                    if row[-2] is not None and row[-1] is not None
+                ],
+            )
+            self._size = start + len(rows)
+        METRICS.add("sqlite.insert", rows=len(rows))
+
+    def pop(self):
+        if not self._size:
+            raise IndexError("pop from empty store")
+        self.delete([self._size - 1])
+
+    def clear(self):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM points")
+            conn.execute("DELETE FROM points_rtree")
+            self._size = 0
+
+    def delete(self, ids: Iterable[int]):
+        """
+        Удалить строки; номера остальных сдвигаются, чтобы остаться без пропусков.
+        """
+        ids = sorted(set(int(i) for i in ids))
+        if not ids:
+            return
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM points WHERE id = ?", [(i,) for i in ids])
+            conn.execute("CREATE TEMP TABLE renumber (old INTEGER PRIMARY KEY, new INTEGER)")
+            conn.execute(
+                "INSERT INTO renumber SELECT id, ROW_NUMBER() OVER (ORDER BY id) - 1 FROM points"
+            )
+            # Через отрицательные номера, чтобы не нарушить уникальность id
+            conn.execute(
+                "UPDATE points SET id = -1 - (SELECT new FROM renumber WHERE old = points.id)"
+            )
+            conn.execute("UPDATE points SET id = -1 - id")
+            conn.execute("DROP TABLE renumber")
+            conn.execute("DELETE FROM points_rtree")
+            conn.execute(
+                "INSERT INTO points_rtree SELECT id, lat, lat, lon, lon FROM points "
+                "WHERE lat IS NOT NULL AND lon IS NOT NULL"
+            )
+            self._size = self._max_id(conn)
+
+    def _records(self, rows: Iterable[tuple]) -> Iterator[AllPointRecord]:
+        for row in rows:
+            yield AllPointRecord(dict(zip(POINT_COLUMNS, row)))
+
+    def value(self, i: int, column: str) -> str:
+        rows = self.query(f"SELECT {SQL_COLUMNS[column]} FROM points WHERE id = ?", (int(i),))
+        if not rows:
+            raise IndexError(i)
+        return rows[0][0]
+
+    def record(self, i: int) -> AllPointRecord:
+        records = self.records_at([i])
+        if not records:
+            raise IndexError(i)
+        return records[0]
+
+    def records_at(self, ids: Iterable[int]) -> List[AllPointRecord]:
+        ids = [int(i) for i in ids]
+        found: Dict[int, tuple] = {}
+        for s in range(0, len(ids), IN_CHUNK):
+            chunk = ids[s : s + IN_CHUNK]
+            rows = self.query(
+                f"SELECT id, {_VALUE_COLUMNS} FROM points "
+                f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            for row in rows:
+                found[row[0]] = row[1:]
+        return list(self._records(found[i] for i in ids if i in found))
+
+    def iter_records(
+        self, where: str = "", params: Sequence = (), columns: Sequence[str] = POINT_COLUMNS
+    ) -> Iterator[AllPointRecord]:
+        """
+        Записи по порядку номеров (where — условие SQL), читаются порциями.
+        """
+        names = ", ".join(SQL_COLUMNS[c] for c in columns)
+        last = -1
+        while True:
+            rows = self.query(
+                f"SELECT id, {names} FROM points WHERE id > ?"
+                + (f" AND ({where})" if where else "")
+                + f" ORDER BY id LIMIT {INSERT_BATCH}",
+                (last, *params),
+            )
+            if not rows:
+                return
+            for row in rows:
+                yield AllPointRecord(dict(zip(columns, row[1:])))
+            last = rows[-1][0]
+
+    def column_values(self, column: str, start: int = 0) -> List[str]:
+        rows = self.query(
+            f"SELECT {SQL_COLUMNS[column]} FROM points WHERE id >= ? ORDER BY id", (start,)
+        )
+        return [row[0] for row in rows]
+
+    def set_values(self, column: str, ids: Sequence[int], values: Sequence[str]):
+        ids = [int(i) for i in ids]
+        with self.transaction() as conn:
+            conn.executemany(
+                f"UPDATE points SET {SQL_COLUMNS[column]} = ? WHERE id = ?",
+                zip(values, ids),
+            )
+            if column in ("Data", "Time", "Lat_WGS84", "Lon_WGS84"):
+                self._update_derived(conn, ids)
+
+    def _update_derived(self, conn, ids: List[int]):
+        derived = _Derived()
+        rows = []
+        for s in range(0, len(ids), IN_CHUNK):
+            chunk = ids[s : s + IN_CHUNK]
+            rows += conn.execute(
+                "SELECT id, data, time, lat_wgs84, lon_wgs84 FROM points "
+                f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+        updates = [
+            (derived.timestamp(d, t), _coordinate(lat), _coordinate(lon), i)
+            for i, d, t, lat, lon in rows
+        ]
+        conn.executemany("UPDATE points SET ts = ?, lat = ?, lon = ? WHERE id = ?", updates)
+        conn.executemany("DELETE FROM points_rtree WHERE id = ?", [(u[3],) for u in updates])
+        conn.executemany(
+            "INSERT INTO points_rtree VALUES (?, ?, ?, ?, ?)",
+            [
+                (i, lat, lat, lon, lon)
+                for _, lat, lon, i in updates
+                if lat is not None and lon is not None
+            ],
+        )
+
+    def find_where(self, conditions: Dict[str, str]) -> np.ndarray:
+        if not conditions:
+            return np.arange(self._size, dtype=np.int64)
+        where = " AND ".join(f"{SQL_COLUMNS[c]} = ?" for c in conditions)
+        return self.ids(
+            f"SELECT id FROM points WHERE {where} ORDER BY id", list(conditions.values())
+        )
+
+    def checkpoint(self):
+        """
+        Перенести журнал WAL в основной файл базы и обрезать журнал.
+        """
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def _bbox_condition(
+    lat_min: float, lon_min: float, lat_max: float, lon_max: float
+) -> Tuple[str, list]:
+    # Кандидаты — по R*-дереву (координаты в нём float32, поэтому проверка
+    # пересечения), точная проверка — по колонкам lat/lon
+    rtree = "SELECT id FROM points_rtree WHERE max_lat >= ? AND min_lat <= ?"
+    params: list = [lat_min, lat_max]
+    if lon_min <= lon_max:
+        rtree += " AND max_lon >= ? AND min_lon <= ?"
+        params += [lon_min, lon_max]
+        exact = "lon BETWEEN ? AND ?"
+    else:
+        # Прямоугольник через 180-й меридиан
+        rtree += " AND (max_lon >= ? OR min_lon <= ?)"
+        params += [lon_min, lon_max]
+        exact = "(lon >= ? OR lon <= ?)"
+    sql = f"id IN ({rtree}) AND lat BETWEEN ? AND ? AND {exact}"
+    return sql, params + [lat_min, lat_max, lon_min, lon_max]
+
+
+def _radius_bbox(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    # Прямоугольник, содержащий круг радиуса radius_km (с запасом)
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM) * 1.01 + 1e-6
+    lat_min, lat_max = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    cos_lat = min(math.cos(math.radians(lat_min)), math.cos(math.radians(lat_max)))
+    if lat_min <= -90.0 or lat_max >= 90.0 or cos_lat <= 0 or dlat / cos_lat >= 180.0:
+        return lat_min, -180.0, lat_max, 180.0
+    dlon = dlat / cos_lat
+    lon_min = (lon - dlon + 180.0) % 360.0 - 180.0
+    lon_max = (lon + dlon + 180.0) % 360.0 - 180.0
+    return lat_min, lon_min, lat_max, lon_max
+
+
+class SqlQueryPlan:
+    """
+    Составной запрос (как QueryPlan, см. point_query) в виде одного SELECT:
+    порядок условий и выбор индексов — за планировщиком SQLite.
+    """
+
+    def __init__(
+        self, store: SqlitePointStore, conditions: List[Tuple[str, str, list]], mode: str
+    ):
+        if mode not in ("and", "or"):
+            raise ValueError(f"Неизвестный режим запроса: {mode}")
+        self.store = store
+        self.conditions = conditions
+        self.mode = mode
+
+    def _where(self) -> Tuple[str, list]:
+        if not self.conditions:
+            return "", []
+        joiner = " AND " if self.mode == "and" else " OR "
+        where = " WHERE " + joiner.join(f"({sql})" for _, sql, _ in self.conditions)
+        return where, [p for _, _, params in self.conditions for p in params]
+
+    def explain(self) -> List[Tuple[str, Optional[int], str]]:
+        """
+        Шаги плана SQLite: (условие, None — оценки нет, описание шага).
+        """
+        where, params = self._where()
+        rows = self.store.query(f"EXPLAIN QUERY PLAN SELECT id FROM points{where}", params)
+        names = ", ".join(name for name, _, _ in self.conditions) or "все"
+        return [(names, None, row[-1]) for row in rows]
+
+    def ids(self) -> np.ndarray:
+        where, params = self._where()
+        return self.store.ids(f"SELECT id FROM points{where} ORDER BY id", params)
+
+    def count(self) -> int:
+        where, params = self._where()
+        return self.store.query(f"SELECT COUNT(*) FROM points{where}", params)[0][0]
+
+
+class SqlitePointsManager(AllPointsManager):
+    """
+    База точек в SQLite с тем же API, что у AllPointsManager (add_point,
+    find_*, query, get_all, clear, ...). Файл не загружается в память:
+    поиск по городу, стране и дате — индексы таблицы, по диапазону
+    времени — индекс меток, по прямоугольнику и радиусу — R*-дерево.
+    csv_path — путь к файлу базы (имя атрибута — как у AllPointsManager).
+    """
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path, indexes=(), lazy=True)
+        self.store = SqlitePointStore(db_path, self.header)
+        self.storage = "sqlite"
+        self.loaded = True
+
+    def _load(self):
+        pass
+
+    def load(
+        self,
+        progress: Optional[Callable[[float, str], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> bool:
+        # Данные читаются из базы по запросу: загружать нечего
+        self.rebuild_indexes()
+        return True
+
+    def close(self):
+        self.store.close()
+
+    def compact(self):
+        self.store.checkpoint()
+
+    def clear(self):
+        # Транзакции SQLite сами согласуют процессы: файловая блокировка
+        # и перезапись файла (AllPointsManager.clear) не нужны
+        self.store.clear()
+        self.rebuild_indexes()
+        self.compact()
+
+    @timed("points.refresh", rows=lambda added: added)
+    def refresh(self) -> int:
+        """
+        Подхватить точки, добавленные другими процессами: запросы и так
+        видят их сразу, сбрасываются только число строк и индексы в памяти.
+        Возвращает число новых точек.
+        """
+        before = len(self.store)
+        if not self.store.refresh():
+            return 0
+        self.rebuild_indexes()
+        return max(len(self.store) - before, 0)
+
+    @timed("points.add", rows=lambda added: added)
+    def add_points(
+        self, points: List[AllPointRecord], skip_duplicates_m: Optional[float] = None
+    ) -> int:
+        """
+        Добавить пачку точек одной транзакцией. skip_duplicates_m — как в
+        AllPointsManager.add_points.
+        """
+        if points and skip_duplicates_m is not None:
+            points = self._without_duplicates(points, skip_duplicates_m)
+        if not points:
+            return 0
+        start = len(self.store)
+        self.store.extend(points)
+        self._spatial = None
+        self._time_index = None
+        self._sort_ranks.clear()
+        if self._dedup_index is not None:
+            from src.spatial_index import store_coordinates
+
+            self._dedup_index.extend(*store_coordinates(self.store, start))
+        return len(points)
+
+    def _drop_rows(self, drop: Iterable[int]):
+        self.store.delete(drop)
+        self.rebuild_indexes()
+
+    def iter_records(
+        self,
+        filter: Union[None, Dict[str, str], Callable[[AllPointRecord], bool]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Iterator[AllPointRecord]:
+        where, params, predicate = "", [], None
+        if isinstance(filter, dict):
+            where = " AND ".join(f"{SQL_COLUMNS[c]} = ?" for c in filter)
+            params = list(filter.values())
+        else:
+            predicate = filter
+        names = POINT_COLUMNS if predicate is not None or columns is None else columns
+        for rec in self.store.iter_records(where, params, names):
+            if predicate is not None and not predicate(rec):
+                continue
+            if columns is not None and names is not columns:
+                rec = AllPointRecord({c: rec.data.get(c, "") for c in columns})
+            yield rec
+
+    @timed("points.find_ids", rows=len)
+    def find_ids(self, index_name: str, *values: str) -> Sequence[int]:
+        return self.store.find_where(dict(zip(INDEX_COLUMNS[index_name], values)))
+
+    def _ts_condition(self, start, end) -> Tuple[str, list]:
+        from src.time_index import to_seconds
+
+        start, end = to_seconds(start), to_seconds(end, end=True)
+        parts, params = ["ts IS NOT NULL"], []
+        if start is not None:
+            parts.append("ts >= ?")
+            params.append(int(start))
+        if end is not None:
+            parts.append("ts <= ?")
+            params.append(int(end))
+        return " AND ".join(parts), params
+
+    @timed("points.find_between", rows=len)
+    def find_ids_between(self, start=None, end=None):
+        where, params = self._ts_condition(start, end)
+        return self.store.ids(f"SELECT id FROM points WHERE {where} ORDER BY ts, id", params)
+
+    def count_between(self, start=None, end=None) -> int:
+        where, params = self._ts_condition(start, end)
+        return self.store.query(f"SELECT COUNT(*) FROM points WHERE {where}", params)[0][0]
+
+    def plan_query(
+        self,
+        city: Optional[str] = None,
+        country: Optional[str] = None,
+        date: Optional[str] = None,
+        date_range=None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        lon_lat: Optional[Tuple[str, str]] = None,
+        text: Optional[str] = None,
+        mode: str = "and",
+    ) -> SqlQueryPlan:
+        """
+        Запрос с условиями как у AllPointsManager.plan_query.
+        """
+        conditions: List[Tuple[str, str, list]] = []
+        if city:
+            conditions.append(("city", "city = ?", [city]))
+        if country:
+            conditions.append(("country", "country = ?", [country]))
+        if date:
+            conditions.append(("date", "data = ?", [date]))
+        if date_range:
+            if isinstance(date_range, str):
+                from src.time_index import parse_range
+
+                date_range = parse_range(date_range)
+            conditions.append(("date_range", *self._ts_condition(*date_range)))
+        if bbox is not None:
+            conditions.append(("bbox", *_bbox_condition(*bbox)))
+        if lon_lat is not None and all(lon_lat):
+            conditions.append(
+                ("lon_lat", "lon_wgs84 = ? AND lat_wgs84 = ?", [lon_lat[0], lon_lat[1]])
+            )
+        if text:
+            conditions.append(
+                ("text", "instr(casefold(original_text), ?) > 0", [text.casefold()])
+            )
+        return SqlQueryPlan(self.store, conditions, mode)
+
+    def _within(self, lat: float, lon: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        # Кандидаты — по описанному прямоугольнику, затем точное расстояние
+        where, params = _bbox_condition(*_radius_bbox(lat, lon, radius_km))
+        rows = self.store.query(f"SELECT id, lat, lon FROM points WHERE {where}", params)
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        data = np.array(rows, dtype=np.float64)
+        ids = data[:, 0].astype(np.int64)
+        km = haversine_km(lat, lon, data[:, 1], data[:, 2])
+        order = np.lexsort((ids, km))
+        keep = order[km[order] <= radius_km]
+        return ids[keep], km[keep]
+
+    @timed("points.find_within_radius", rows=len)
+    def find_within_radius(self, lat: float, lon: float, radius_km: float) -> List[AllPointRecord]:
+        ids, _ = self._within(lat, lon, radius_km)
+        return self.store.records_at(ids.tolist())
+
+    @timed("points.find_nearest", rows=len)
+    def find_nearest(
+        self, lat: float, lon: float, k: int = 1, max_km: Optional[float] = None
+    ) -> List[Tuple[AllPointRecord, float]]:
+        # Радиус растёт, пока в круге не окажется k точек: всё, что вне
+        # круга, дальше любой точки внутри него
+        limit = math.pi * EARTH_RADIUS_KM if max_km is None else max_km
+        radius = min(NEAREST_START_KM, limit)
+        while True:
+            ids, km = self._within(lat, lon, radius)
+            if len(ids) >= k or radius >= limit:
+                break
+            radius = min(radius * 4, limit)
+        ids, km = ids[:k], km[:k]
+        return list(zip(self.store.records_at(ids.tolist()), km.tolist()))
+
+    @timed("points.find_in_bbox", rows=len)
+    def find_in_bbox(
+        self, lat_min: float, lon_min: float, lat_max: float, lon_max: float
+    ) -> List[AllPointRecord]:
+        where, params = _bbox_condition(lat_min, lon_min, lat_max, lon_max)
+        ids = self.store.ids(f"SELECT id FROM points WHERE {where} ORDER BY id", params)
+        return self.store.records_at(ids.tolist())
+
+
+@timed("sqlite.migrate")
+def migrate_csv_to_sqlite(
+    csv_path: str,
+    db_path: str,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Перенести AllPoint.csv в новую базу SQLite (потоково, пачками по
+    INSERT_BATCH строк; индексы создаются после вставки). База собирается
+    во временном файле и появляется под именем db_path только целиком.
+    Возвращает число перенесённых точек.
+    """
+    if os.path.exists(db_path):
+        raise FileExistsError(f"База уже существует: {db_path}")
+    directory = os.path.dirname(os.path.abspath(db_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".points-", suffix=".sqlite", dir=directory)
+    os.close(fd)
+    # До открытия базы: файлы -wal и -shm SQLite создаёт с теми же правами
+    keep_file_mode(tmp_path, db_path)
+    store = SqlitePointStore(tmp_path, indexes=False)
+    try:
+        batch: List[AllPointRecord] = []
+        for rec in AllPointsManager(csv_path, lazy=True).iter_records():
+            batch.append(rec)
+            if len(batch) >= INSERT_BATCH:
+                store.extend(batch)
+                batch = []
+                if progress is not None:
+                    progress(len(store))
+        store.extend(batch)
+        store.create_indexes()
+        store.checkpoint()
+        # Временный файл без WAL: переименовывается один файл базы
+        store.conn.execute("PRAGMA journal_mode=DELETE")
+        count = len(store)
+        store.close()
+        os.replace(tmp_path, db_path)
+    except BaseException:
+        store.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(tmp_path + suffix):
+                os.remove(tmp_path + suffix)
+        raise
+    return count
+
+
+@timed("sqlite.export")
+def export_sqlite_to_csv(db_path: str, csv_path: str) -> int:
+    """
+    Выгрузить базу SQLite в AllPoint.csv (атомарно: временный файл + замена).
+    Возвращает число выгруженных точек.
+    """
+    store = SqlitePointStore(db_path)
+    directory = os.path.dirname(os.path.abspath(csv_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".AllPoint-", suffix=".tmp", dir=directory)
+    try:
+        count = 0
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            keep_file_mode(tmp_path, csv_path)
+            writer = csv.DictWriter(f, fieldnames=list(POINT_COLUMNS))
+            writer.writeheader()
+            for rec in store.iter_records():
+                writer.writerow(rec.data)
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, csv_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        store.close()
+    return count
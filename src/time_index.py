@@ -0,0 +1,166 @@
+import re
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.allpoints_manager import parse_date, parse_time
+from src.columnar_store import NO_TIMESTAMP, ColumnarPointStore
+
+# Длина суток в секундах (конец диапазона, заданного только датой)
+DAY_SECONDS = 86400
+
+# Разделители границ диапазона в строке запроса: "01.03.2024 .. 07.03.2024"
+_RANGE_SEP_RE = re.compile(r"\s*(?:\.\.|—|–|(?:^|(?<=\s))-(?=\s|$))\s*")
+
+Bound = Union[None, int, str]
+
+
+def store_timestamps(store, start: int = 0) -> np.ndarray:
+    """
+    Метки времени Data+Time строк хранилища начиная с start (в секундах,
+    NO_TIMESTAMP для нераспознанной даты). Каждое уникальное значение даты
+    и времени разбирается один раз.
+    """
+    if isinstance(store, ColumnarPointStore):
+        return store.timestamps[start:]
+    return _timestamps(
+        store.column_values("Data", start), store.column_values("Time", start)
+    )
+
+
+def timestamps_at(store, ids: Sequence[int]) -> np.ndarray:
+    """
+    Метки времени строк ids (как store_timestamps, но для выборки строк).
+    """
+    if isinstance(store, ColumnarPointStore):
+        return store.timestamps[np.asarray(ids, dtype=np.int64)]
+    return _timestamps(
+        [store.value(int(i), "Data") for i in ids],
+        [store.value(int(i), "Time") for i in ids],
+    )
+
+
+def _timestamps(dates: Sequence[str], times: Sequence[str]) -> np.ndarray:
+    days: Dict[str, int] = {}
+    seconds: Dict[str, int] = {}
+    result = np.empty(len(dates), dtype=np.int64)
+    for i, (d, t) in enumerate(zip(dates, times)):
+        day = days.get(d)
+        if day is None:
+            parsed = parse_date(d)
+            day = days[d] = NO_TIMESTAMP if parsed is None else parsed
+        if day == NO_TIMESTAMP:
+            result[i] = NO_TIMESTAMP
+            continue
+        sec = seconds.get(t)
+        if sec is None:
+            sec = seconds[t] = parse_time(t) or 0
+        result[i] = day + sec
+    return result
+
+
+def parse_bound(value: str, end: bool = False) -> int:
+    """
+    Граница диапазона "дата [время]" в секундах. Если время не указано,
+    начальная граница — начало суток, конечная (end=True) — их последняя
+    секунда, чтобы диапазон по датам включал весь последний день.
+    """
+    value = value.strip()
+    date_part, _, time_part = value.partition(" ")
+    day = parse_date(date_part)
+    if day is None:
+        raise ValueError(f"Не удалось разобрать дату: {value!r}")
+    if not time_part.strip():
+        return day + DAY_SECONDS - 1 if end else day
+    sec = parse_time(time_part)
+    if sec is None:
+        raise ValueError(f"Не удалось разобрать время: {value!r}")
+    return day + sec
+
+
+def parse_range(text: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Диапазон из строки фильтра: "дата [время] .. дата [время]" (любая из
+    границ может отсутствовать) или одна дата — тогда это весь день.
+    """
+    parts = _RANGE_SEP_RE.split(text.strip(), maxsplit=1)
+    if len(parts) == 1:
+        return parse_bound(parts[0]), parse_bound(parts[0], end=True)
+    first, second = parts
+    return (
+        parse_bound(first) if first else None,
+        parse_bound(second, end=True) if second else None,
+    )
+
+
+class TimeIndex:
+    """
+    Отсортированный индекс меток времени: times[i] — метка строки ids[i].
+    Запрос диапазона — два двоичных поиска и срез, O(log N + k). Строки
+    с нераспознанной датой в индекс не попадают. Строки с равной меткой
+    идут в порядке номеров.
+    """
+
+    def __init__(self):
+        self.times = np.empty(0, dtype=np.int64)
+        self.ids = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def build(self, store):
+        self.times = np.empty(0, dtype=np.int64)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.extend(store_timestamps(store), 0)
+
+    def extend(self, timestamps: np.ndarray, start: int):
+        """
+        Добавить строки start, start+1, ... с метками timestamps.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        keep = np.flatnonzero(timestamps != NO_TIMESTAMP)
+        if not len(keep):
+            return
+        order = np.argsort(timestamps[keep], kind="stable")
+        times, ids = timestamps[keep][order], keep[order] + start
+        if not len(self.times) or times[0] >= self.times[-1]:
+            # Частый случай — новые точки не раньше имеющихся: достаточно
+            # дописать отсортированный кусок в конец
+            self.times = np.concatenate([self.times, times])
+            self.ids = np.concatenate([self.ids, ids])
+            return
+        # Устойчивая сортировка (timsort) сливает два отсортированных
+        # отрезка почти за линейное время
+        times = np.concatenate([self.times, times])
+        ids = np.concatenate([self.ids, ids])
+        order = np.argsort(times, kind="stable")
+        self.times, self.ids = times[order], ids[order]
+
+    def _bounds(self, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        # Границы приводятся к int64: с float numpy преобразовал бы весь массив
+        lo, hi = 0, len(self.times)
+        if start is not None:
+            lo = int(np.searchsorted(self.times, np.int64(start), "left"))
+        if end is not None:
+            hi = int(np.searchsorted(self.times, np.int64(end), "right"))
+        return lo, max(lo, hi)
+
+    def range(self, start: Optional[int], end: Optional[int]) -> np.ndarray:
+        """
+        Номера строк с меткой в [start, end] (None — без ограничения), по времени.
+        """
+        lo, hi = self._bounds(start, end)
+        return self.ids[lo:hi]
+
+    def count(self, start: Optional[int], end: Optional[int]) -> int:
+        lo, hi = self._bounds(start, end)
+        return hi - lo
+
+
+def to_seconds(value: Bound, end: bool = False) -> Optional[int]:
+    """
+    Граница запроса в секундах: None, число секунд или строка "дата [время]".
+    """
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    return parse_bound(value, end)
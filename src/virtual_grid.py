@@ -0,0 +1,117 @@
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import customtkinter as ctk  # type: ignore
+
+# Количество видимых строк таблицы по умолчанию
+VISIBLE_ROWS = 12
+
+
+class VirtualGrid(ctk.CTkFrame):
+    """
+    Таблица с виртуальной прокруткой: виджеты создаются только для видимых
+    строк и при прокрутке заполняются заново из источника fetch(start, count),
+    поэтому 100 тыс. строк результата не создают ни одного лишнего виджета.
+
+    columns — (ключ, заголовок, ширина); щелчок по заголовку вызывает
+    on_sort(ключ), щелчок по строке — on_select(номер строки результата).
+    """
+
+    def __init__(
+        self,
+        master,
+        columns: Sequence[Tuple[str, str, int]],
+        visible_rows: int = VISIBLE_ROWS,
+        on_sort: Optional[Callable[[str], None]] = None,
+        on_select: Optional[Callable[[int], None]] = None,
+        **kwargs,
+    ):
+        super().__init__(master, **kwargs)
+        self.columns = list(columns)
+        self.visible_rows = visible_rows
+        self.on_sort = on_sort
+        self.on_select = on_select
+        self.total = 0
+        self.offset = 0
+        self._fetch: Callable[[int, int], List[List[str]]] = lambda start, count: []
+        self._headers: List[ctk.CTkButton] = []
+        self._cells: List[List[ctk.CTkLabel]] = []
+
+        for col, (key, title, width) in enumerate(self.columns):
+            button = ctk.CTkButton(
+                self,
+                text=title,
+                width=width,
+                height=24,
+                command=lambda key=key: self.on_sort and self.on_sort(key),
+            )
+            button.grid(row=0, column=col, padx=1, pady=(0, 2), sticky="ew")
+            self._headers.append(button)
+        for row in range(visible_rows):
+            cells = []
+            for col, (_, _, width) in enumerate(self.columns):
+                label = ctk.CTkLabel(self, text="", width=width, height=20, anchor="w")
+                label.grid(row=row + 1, column=col, padx=1, sticky="ew")
+                label.bind("<Button-1>", lambda event, row=row: self._select(row))
+                label.bind("<MouseWheel>", self._on_wheel)
+                label.bind("<Button-4>", lambda event: self.scroll(-3))
+                label.bind("<Button-5>", lambda event: self.scroll(3))
+                cells.append(label)
+            self._cells.append(cells)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(
+            row=1, column=len(self.columns), rowspan=visible_rows, sticky="ns"
+        )
+        self.bind("<MouseWheel>", self._on_wheel)
+
+    def set_source(self, total: int, fetch: Callable[[int, int], List[List[str]]]):
+        """
+        Новый источник строк: total строк, fetch(start, count) → значения колонок.
+        """
+        self.total = total
+        self._fetch = fetch
+        self.offset = 0
+        self.refresh()
+
+    def set_sort_marker(self, key: Optional[str], descending: bool = False):
+        for (col_key, title, _), button in zip(self.columns, self._headers):
+            mark = ""
+            if col_key == key:
+                mark = " ▼" if descending else " ▲"
+            button.configure(text=title + mark)
+
+    def refresh(self):
+        rows = self._fetch(self.offset, self.visible_rows) if self.total else []
+        for i, cells in enumerate(self._cells):
+            values = rows[i] if i < len(rows) else [""] * len(cells)
+            for label, value in zip(cells, values):
+                label.configure(text=value)
+        if self.total > self.visible_rows:
+            first = self.offset / self.total
+            last = min(1.0, (self.offset + self.visible_rows) / self.total)
+        else:
+            first, last = 0.0, 1.0
+        self.scrollbar.set(first, last)
+
+    def scroll(self, rows: int):
+        self.scroll_to(self.offset + rows)
+
+    def scroll_to(self, offset: int):
+        offset = max(0, min(offset, self.total - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+
+    def _on_scrollbar(self, action: str, value: str, unit: Optional[str] = None):
+        if action == "moveto":
+            self.scroll_to(int(float(value) * self.total))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll(int(value) * step)
+
+    def _on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    def _select(self, row: int):
+        index = self.offset + row
+        if index < self.total and self.on_select is not None:
+            self.on_select(index)
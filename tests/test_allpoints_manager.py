@@ -0,0 +1,630 @@
+import os
+import shutil
+import tempfile
+from typing import Dict, Tuple
+
+import pytest
+
+from src.allpoints_manager import AllPointRecord, AllPointsManager
+
+HEADER = (
+    "Data,Time,Lat_WGS84,Lon_WGS84,X_SK-42_Gauss_Kruger,Y_SK-42_Gauss_Kruger,"
+    "City_Value,Country_Value,Description of the area,Description of the region,"
+    "Original text\r\n"
+)
+ROW_1 = "01.03.2024,06:00,55.75,37.62,6179000,7413000,Москва,Россия,,,текст 1\r\n"
+ROW_2 = '02.03.2024,07:30,51.5,-0.12,,,London,Англия,,,"многострочный\r\nтекст"\r\n'
+NEW_ROW = "03.03.2024,12:00,48.8566,2.3522,,,Paris,Франция,,,новая точка\r\n"
+
+
+def make_csv(content: str) -> Tuple[str, str]:
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, "AllPoint.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(content)
+    return path, temp_dir
+
+
+def make_point(city: str = "Paris", **extra: str) -> AllPointRecord:
+    data: Dict[str, str] = {
+        "Data": "03.03.2024",
+        "Time": "12:00",
+        "Lat_WGS84": "48.8566",
+        "Lon_WGS84": "2.3522",
+        "City_Value": city,
+        "Country_Value": "Франция",
+        "Original text": "новая точка",
+    }
+    data.update(extra)
+    return AllPointRecord(data)
+
+
+STORAGES = ["records", "columnar", "mmap"]
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_load_and_find(storage: str) -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        assert len(mgr.get_all()) == 2
+        assert mgr.find_by_city("London")[0].original_text == "многострочный\r\nтекст"
+        assert mgr.find_by_date("01.03.2024")[0].city == "Москва"
+        assert mgr.find_by_lon_lat("37.62", "55.75")[0].time == "06:00"
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_add_point_appends_without_rewrite(storage: str) -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        mgr.add_point(make_point())
+        with open(path, encoding="utf-8", newline="") as f:
+            content = f.read()
+        # Старое содержимое не тронуто, новая строка в конце
+        assert content.startswith(HEADER + ROW_1 + ROW_2)
+        assert content.endswith(NEW_ROW)
+        reloaded = AllPointsManager(path, storage=storage)
+        assert [r.city for r in reloaded.get_all()] == ["Москва", "London", "Paris"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_add_point_creates_file_with_header() -> None:
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, "AllPoint.csv")
+    try:
+        mgr = AllPointsManager(path)
+        mgr.add_point(make_point())
+        mgr.add_point(make_point("Lyon"))
+        with open(path, encoding="utf-8", newline="") as f:
+            assert f.read().startswith(HEADER)
+        assert len(AllPointsManager(path).get_all()) == 2
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize(
+    "torn",
+    [
+        "03.03.2024,12:00,48.85",  # оборвано посреди строки
+        '03.03.2024,12:00,48.85,2.35,,,Paris,Франция,,,"незакрытый',  # в кавычках
+    ],
+)
+@pytest.mark.parametrize("storage", STORAGES)
+def test_torn_tail_is_ignored_and_truncated(torn: str, storage: str) -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + torn)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        assert [r.city for r in mgr.get_all()] == ["Москва"]
+        assert mgr.torn_bytes == len(torn.encode("utf-8"))
+        mgr.add_point(make_point())
+        with open(path, encoding="utf-8", newline="") as f:
+            content = f.read()
+        assert content == HEADER + ROW_1 + NEW_ROW
+        assert [r.city for r in AllPointsManager(path).get_all()] == ["Москва", "Paris"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("storage", STORAGES + ["lazy"])
+def test_torn_tail_inside_utf8_character(storage: str) -> None:
+    # Дозапись оборвана посреди "М" (0xD0 0x9C) следующего символа
+    torn = "03.03.2024,12:00,48.85,2.35,,,М".encode("utf-8") + b"\xd0"
+    path, temp_dir = make_csv(HEADER + ROW_1)
+    with open(path, "ab") as f:
+        f.write(torn)
+    try:
+        assert [r.city for r in AllPointsManager(path, lazy=True).iter_records()] == ["Москва"]
+        if storage == "lazy":
+            mgr = AllPointsManager(path, lazy=True)
+        else:
+            mgr = AllPointsManager(path, storage=storage)
+            assert [r.city for r in mgr.get_all()] == ["Москва"]
+            assert mgr.torn_bytes == len(torn)
+        mgr.add_point(make_point())
+        with open(path, encoding="utf-8", newline="") as f:
+            assert f.read() == HEADER + ROW_1 + NEW_ROW
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_missing_final_newline_keeps_last_row() -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1.rstrip("\r\n"))
+    try:
+        mgr = AllPointsManager(path)
+        assert mgr.torn_bytes == 0
+        mgr.add_point(make_point())
+        assert [r.city for r in AllPointsManager(path).get_all()] == ["Москва", "Paris"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_compact_and_clear() -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2 + "обрыв,")
+    try:
+        mgr = AllPointsManager(path)
+        mgr.records[0].data["City_Value"] = "Moscow"
+        mgr.compact()
+        assert mgr.torn_bytes == 0
+        assert AllPointsManager(path).find_by_city("Moscow")
+        mgr.clear()
+        with open(path, encoding="utf-8", newline="") as f:
+            assert f.read() == HEADER
+        assert AllPointsManager(path).get_all() == []
+        # Временные файлы не остаются (рядом — только файл блокировки)
+        assert sorted(os.listdir(temp_dir)) == ["AllPoint.csv", "AllPoint.csv.lock"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_unknown_storage() -> None:
+    with pytest.raises(ValueError):
+        AllPointsManager("AllPoint.csv", storage="xml")
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_indexes_follow_add_and_clear(storage: str) -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        assert not mgr.indexes["city"].built
+        assert mgr.find_by_city("Москва")
+        assert len(mgr.indexes["city"]) == 2
+        mgr.add_point(make_point())
+        mgr.add_point(make_point(Data="01.03.2024"))
+        assert len(mgr.find_by_city("Paris")) == 2
+        assert len(mgr.find_by_date("01.03.2024")) == 2
+        assert len(mgr.find_by_lon_lat("2.3522", "48.8566")) == 2
+        assert mgr.find_by_lon_lat("48.8566", "2.3522") == []
+        # Изменение найденных номеров не портит индекс
+        mgr.find_ids("city", "Paris").append(0)
+        mgr.find_ids("city", "Рим").append(0)
+        assert mgr.indexes["city"].count("Paris") == 2
+        assert not mgr.find_ids("city", "Рим") and len(mgr.find_ids("city", "Paris")) == 2
+        mgr.clear()
+        assert mgr.find_by_city("Paris") == []
+        mgr.add_point(make_point())
+        assert [r.city for r in mgr.find_by_city("Paris")] == ["Paris"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_selected_indexes_only() -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        mgr = AllPointsManager(path, indexes=["city"])
+        assert list(mgr.indexes) == ["city"]
+        # Поиск без индекса выполняется просмотром и даёт тот же результат
+        assert mgr.find_by_date("02.03.2024")[0].city == "London"
+        assert mgr.find_by_lon_lat("-0.12", "51.5")[0].city == "London"
+        with pytest.raises(ValueError):
+            AllPointsManager(path, indexes=["country"])
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_spatial_queries(storage: str) -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        assert [r.city for r in mgr.find_within_radius(51.0, 0.0, 100.0)] == ["London"]
+        mgr.add_point(make_point())
+        nearest = mgr.find_nearest(48.0, 2.0, k=2)
+        assert [r.city for r, _ in nearest] == ["Paris", "London"]
+        assert 90 < nearest[0][1] < 100
+        assert [r.city for r in mgr.find_in_bbox(45.0, -1.0, 60.0, 3.0)] == [
+            "London",
+            "Paris",
+        ]
+        mgr.clear()
+        assert mgr.find_nearest(48.0, 2.0) == []
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_time_range_queries(storage: str) -> None:
+    path, temp_dir = make_csv(HEADER + ROW_2 + ROW_1)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        cities = lambda recs: [r.city for r in recs]  # noqa: E731
+        # Результат упорядочен по времени, конец без времени — весь день
+        assert cities(mgr.find_between("2024-03-01", "2024-03-02")) == ["Москва", "London"]
+        assert cities(mgr.find_between("01.03.2024 06:01", None)) == ["London"]
+        assert cities(mgr.find_between(None, "02.03.2024 07:29")) == ["Москва"]
+        assert mgr.count_between("2024-03-03", "2024-03-07") == 0
+        mgr.add_point(make_point(Data="2024-03-01", Time="23:00"))
+        mgr.add_point(make_point(city="Lyon"))
+        assert cities(mgr.find_between("2024-03-01 06:00", "2024-03-07")) == [
+            "Москва",
+            "Paris",
+            "London",
+            "Lyon",
+        ]
+        mgr.add_point(make_point(city="Nowhere", Data="вчера"))
+        assert mgr.count_between() == 4
+        with pytest.raises(ValueError):
+            mgr.find_between("вчера")
+        mgr.clear()
+        assert mgr.count_between() == 0
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_fill_and_check_coordinates(storage: str) -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        # Заполненные вручную X/Y Москвы не совпадают с пересчётом (~2,7 км)
+        ids, error = mgr.check_coordinates()
+        assert list(ids) == [0] and 2000 < error[0] < 3000
+        mgr.add_point(
+            make_point(
+                Lat_WGS84="", Lon_WGS84="", **{
+                    "X_SK-42_Gauss_Kruger": "6181692",
+                    "Y_SK-42_Gauss_Kruger": "7413462",
+                }
+            )
+        )
+        assert mgr.fill_coordinates() == 2
+        reloaded = AllPointsManager(path, storage=storage)
+        london, paris = reloaded.get_all()[1:]
+        assert london.x and london.y.startswith("60")  # зона 60: 354°–360°
+        assert abs(float(paris.lat) - 55.75) < 1e-5
+        assert abs(float(paris.lon) - 37.62) < 1e-5
+        assert mgr.fill_coordinates(overwrite=True) == 3
+        assert len(mgr.check_coordinates(tolerance_m=1.0)[0]) == 0
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_duplicates_by_coordinates(storage: str) -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        # Точка в 5 м от Москвы и точная копия Лондона — дубликаты
+        near_moscow = make_point(
+            "", Lat_WGS84="55.75004", Lon_WGS84="37.62", Country_Value=""
+        )
+        near_moscow.data["Description of the area"] = "центр"
+        mgr.add_point(near_moscow)
+        mgr.add_point(make_point("London", Lat_WGS84="51.5", Lon_WGS84="-0.12"))
+        groups = mgr.find_duplicates(tolerance_m=10.0)
+        assert [g.tolist() for g in groups] == [[0, 2], [1, 3]]
+        assert mgr.find_duplicates(tolerance_m=1.0)[0].tolist() == [1, 3]
+        # Проверка перед вставкой: с базой и внутри пачки
+        added = mgr.add_points(
+            [make_point(), make_point(Lat_WGS84="55.75", Lon_WGS84="37.62"), make_point()],
+            skip_duplicates_m=10.0,
+        )
+        assert added == 1
+        assert mgr.merge_duplicates(tolerance_m=10.0) == 2
+        reloaded = AllPointsManager(path, storage=storage)
+        assert [r.city for r in reloaded.get_all()] == ["Москва", "London", "Paris"]
+        assert reloaded.get_all()[0].area_desc == "центр"
+        assert reloaded.find_duplicates() == []
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("storage", ["records", "columnar"])
+def test_merge_duplicates_batches_fills(storage: str, monkeypatch) -> None:
+    # 20 000 точек, 2000 групп дубликатов: у первой точки группы пусты
+    # описание и исходный текст — заполнение идёт одним set_values на колонку
+    rows = []
+    for i in range(20000):
+        lat, lon = f"{40 + i // 1000 * 0.01:.5f}", f"{10 + i % 1000 * 0.01:.5f}"
+        rows.append(f"01.03.2024,06:00,{lat},{lon},,,Город,Страна,,,текст {i}\r\n")
+    for i in range(0, 20000, 10):
+        lat, lon = f"{40 + i // 1000 * 0.01:.5f}", f"{10 + i % 1000 * 0.01:.5f}"
+        rows[i] = f"01.03.2024,06:00,{lat},{lon},,,Город,Страна,,,\r\n"
+        rows.append(f"01.03.2024,06:00,{lat},{lon},,,Город,Страна,центр,,дубль {i}\r\n")
+    path, temp_dir = make_csv(HEADER + "".join(rows))
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        calls = []
+        set_values = mgr.store.set_values
+        monkeypatch.setattr(
+            mgr.store,
+            "set_values",
+            lambda column, ids, values: calls.append(len(ids)) or set_values(column, ids, values),
+        )
+        assert mgr.merge_duplicates(tolerance_m=1.0) == 2000
+        assert calls == [2000, 2000]
+        reloaded = AllPointsManager(path, storage=storage)
+        assert len(reloaded) == 20000
+        assert reloaded.get_all()[10].area_desc == "центр"
+        assert reloaded.get_all()[10].original_text == "дубль 10"
+        assert reloaded.get_all()[11].original_text == "текст 11"
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+CITY_TXT = """
+Gomel Oblast=г.Гомель_52,432898_30,992859_Белоруссия__на территории Белоруссии
+Paris=г.Париж_48,8566_2,3522_Франция__на территории Франции
+"""
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_fill_locations(storage: str) -> None:
+    from src.city_manager import CityManager
+
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    city_path = os.path.join(temp_dir, "city.txt")
+    with open(city_path, "w", encoding="utf-8") as f:
+        f.write(CITY_TXT)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        mgr.add_point(make_point("", Lat_WGS84="51.78", Lon_WGS84="30.27"))
+        filled = mgr.fill_locations(CityManager(city_path), max_km=500, only_empty=True)
+        assert filled == 1
+        rec = AllPointsManager(path, storage=storage).find_by_city("Gomel Oblast")[0]
+        assert rec.country == "Белоруссия"
+        assert rec.area_desc == "88 км юго-зап. г.Гомель"
+        assert rec.region_desc == "на территории Белоруссии"
+        # Без only_empty перезаписываются все точки, для которых нашёлся город
+        assert mgr.fill_locations(CityManager(city_path), max_km=500) == 2
+        assert [r.city for r in mgr.get_all()] == ["Москва", "Paris", "Gomel Oblast"]
+        assert mgr.find_by_city("Paris")[0].area_desc == "343 км сев.-зап. г.Париж"
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_iter_records_streams_from_disk() -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2 + "обрыв,")
+    try:
+        mgr = AllPointsManager(path, lazy=True)
+        assert [r.city for r in mgr.iter_records()] == ["Москва", "London"]
+        assert [r.city for r in mgr.iter_records(filter={"Data": "02.03.2024"})] == [
+            "London"
+        ]
+        only = list(mgr.iter_records(filter=lambda r: r.city == "Москва", columns=["Time"]))
+        assert [r.data for r in only] == [{"Time": "06:00"}]
+        assert not mgr.loaded
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_lazy_mode_appends_without_loading() -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1)
+    try:
+        mgr = AllPointsManager(path, lazy=True)
+        mgr.add_point(make_point())
+        assert not mgr.loaded
+        assert [r.city for r in mgr.iter_records()] == ["Москва", "Paris"]
+        # Первый поиск загружает базу
+        assert mgr.find_by_city("Paris")[0].date == "03.03.2024"
+        assert mgr.loaded and len(mgr) == 2
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_lazy_mode_loads_when_tail_is_torn() -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + "обрыв,")
+    try:
+        mgr = AllPointsManager(path, lazy=True)
+        mgr.add_point(make_point())
+        assert [r.city for r in AllPointsManager(path).get_all()] == ["Москва", "Paris"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_load_with_progress_and_cancel(monkeypatch) -> None:
+    import src.allpoints_manager as allpoints_manager
+
+    monkeypatch.setattr(allpoints_manager, "LOAD_BATCH_SIZE", 1)
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2 + NEW_ROW)
+    try:
+        mgr = AllPointsManager(path, lazy=True)
+        assert not mgr.load(should_stop=lambda: True)
+        assert not mgr.loaded
+        reports = []
+        assert mgr.load(progress=lambda fraction, message: reports.append(fraction))
+        assert mgr.loaded and len(mgr) == 3
+        assert reports and reports == sorted(reports) and reports[-1] <= 1.0
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_refresh_reads_only_appended_tail(storage: str) -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        assert mgr.find_by_city("Paris") == []  # индекс построен
+        assert len(mgr.find_within_radius(48.85, 2.35, 10)) == 0
+        assert mgr.refresh() == 0
+        # Другой процесс дописывает строку по частям
+        with open(path, "a", encoding="utf-8", newline="") as f:
+            f.write(NEW_ROW[:20])
+        assert mgr.refresh() == 0
+        assert len(mgr) == 2 and mgr.torn_bytes == 20
+        with open(path, "a", encoding="utf-8", newline="") as f:
+            f.write(NEW_ROW[20:])
+        assert mgr.refresh() == 1
+        assert mgr.find_by_city("Paris")[0].original_text == "новая точка"
+        assert len(mgr.find_within_radius(48.85, 2.35, 10)) == 1
+        # Своя дозапись повторно не читается
+        mgr.add_point(make_point("Lyon"))
+        assert mgr.refresh() == 0
+        assert [r.city for r in mgr.get_all()] == ["Москва", "London", "Paris", "Lyon"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_refresh_reloads_replaced_file(storage: str) -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        replacement, _ = make_csv(HEADER + ROW_2 + NEW_ROW + ROW_1)
+        os.replace(replacement, path)
+        shutil.rmtree(os.path.dirname(replacement))
+        assert mgr.refresh() == 3
+        assert [r.city for r in mgr.get_all()] == ["London", "Paris", "Москва"]
+        # Правка конца прежнего содержимого с дозаписью — тоже перечитывание
+        with open(path, "r+b") as f:
+            f.seek(len((HEADER + ROW_2 + NEW_ROW).encode("utf-8")))
+            f.write(b"09")
+        with open(path, "a", encoding="utf-8", newline="") as f:
+            f.write(ROW_2)
+        assert mgr.refresh() == 4
+        assert mgr.find_by_date("09.03.2024")[0].city == "Москва"
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def _write_points(path: str, name: str, count: int, lazy: bool) -> None:
+    mgr = AllPointsManager(path, lazy=lazy)
+    for i in range(count):
+        mgr.add_point(make_point(f"{name}-{i}"))
+
+
+def test_concurrent_processes_keep_all_rows() -> None:
+    import multiprocessing
+
+    path, temp_dir = make_csv(HEADER + ROW_1)
+    try:
+        writers = [
+            multiprocessing.Process(target=_write_points, args=(path, f"p{n}", 25, n % 2 == 0))
+            for n in range(4)
+        ]
+        for p in writers:
+            p.start()
+        for p in writers:
+            p.join()
+            assert p.exitcode == 0
+        mgr = AllPointsManager(path)
+        assert mgr.torn_bytes == 0 and len(mgr) == 101
+        cities = [r.city for r in mgr.get_all()]
+        for n in range(4):
+            own = [c for c in cities if c.startswith(f"p{n}-")]
+            assert own == [f"p{n}-{i}" for i in range(25)]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_writers_catch_up_with_other_writers(storage: str) -> None:
+    from src.allpoints_manager import FileChangedError
+
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        other = AllPointsManager(path, lazy=True)
+        other.add_point(make_point("Lyon"))
+        mgr.add_point(make_point("Nice"))
+        assert [r.city for r in mgr.get_all()] == ["Москва", "London", "Lyon", "Nice"]
+        # Чужая строка оборвана: её байты не обрезаются как «свой» обрыв
+        with open(path, "a", encoding="utf-8", newline="") as f:
+            f.write(NEW_ROW[:20])
+        other.add_point(make_point("Lille"))  # сама обрезает обрыв и пишет
+        mgr.store.set_values("Country_Value", [0], ["РФ"])
+        mgr.compact()
+        reloaded = AllPointsManager(path)
+        assert [r.city for r in reloaded.get_all()] == [
+            "Москва",
+            "London",
+            "Lyon",
+            "Nice",
+            "Lille",
+        ]
+        assert reloaded.get_all()[0].country == "РФ"
+        # Файл перезаписан другим процессом — правки не затирают его
+        reloaded.merge_duplicates(100)
+        before = open(path, "rb").read()
+        mgr.store.set_values("Country_Value", [1], ["UK"])
+        with pytest.raises(FileChangedError):
+            mgr.compact()
+        assert open(path, "rb").read() == before
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_reader_sees_only_whole_appends() -> None:
+    import threading
+
+    path, temp_dir = make_csv(HEADER + ROW_1)
+    try:
+        writer = AllPointsManager(path, lazy=True)
+        started, loaded = threading.Event(), []
+
+        def read() -> None:
+            started.set()
+            loaded.append(len(AllPointsManager(path)))
+
+        with writer.lock.exclusive():
+            with open(path, "a", encoding="utf-8", newline="") as f:
+                f.write(NEW_ROW[:20])
+                f.flush()
+                reader = threading.Thread(target=read)
+                reader.start()
+                started.wait()
+                reader.join(0.2)
+                assert reader.is_alive()  # ждёт окончания записи
+                f.write(NEW_ROW[20:])
+        reader.join()
+        assert loaded == [2]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_threads_share_one_append(monkeypatch) -> None:
+    import threading
+    import time
+
+    path, temp_dir = make_csv(HEADER + ROW_1)
+    try:
+        mgr = AllPointsManager(path, storage="columnar")
+        original, writes = mgr._append, []
+
+        def slow_append(records):
+            writes.append(len(records))
+            time.sleep(0.01)  # пока идёт запись, остальные потоки ждут в очереди
+            original(records)
+
+        monkeypatch.setattr(mgr, "_append", slow_append)
+
+        def produce(n: int) -> None:
+            for i in range(20):
+                mgr.add_point(make_point(f"t{n}-{i}"))
+
+        threads = [threading.Thread(target=produce, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sum(writes) == 160 and len(writes) < 160
+        assert len(mgr) == 161
+        assert [r.city for r in AllPointsManager(path).get_all()] == [
+            r.city for r in mgr.get_all()
+        ]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="права доступа POSIX")
+def test_compact_keeps_file_mode() -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        os.chmod(path, 0o664)
+        mgr = AllPointsManager(path)
+        mgr.compact()
+        mgr.merge_duplicates(100)
+        assert os.stat(path).st_mode & 0o777 == 0o664
+        # Нового файла ещё нет — права по umask, как у обычного open
+        new_path = os.path.join(temp_dir, "New.csv")
+        AllPointsManager(new_path).clear()
+        with open(os.path.join(temp_dir, "plain.txt"), "w"):
+            pass
+        plain_mode = os.stat(os.path.join(temp_dir, "plain.txt")).st_mode & 0o777
+        assert os.stat(new_path).st_mode & 0o777 == plain_mode
+    finally:
+        shutil.rmtree(temp_dir)
@@ -97,3 +97,191 @@ def test_parse_float():
     assert isinstance(rec.latitude, float)
     assert abs(rec.latitude - 51.505064) < 1e-6
     os.remove(path)
+
+
+def test_nearest_city():
+    path = create_temp_city_file(CITY_TXT_CONTENT)
+    mgr = CityManager(path)
+    cities, km = mgr.nearest_city([51.4, 55.0, 48.85], [-0.1, 37.0, 2.35], max_km=200)
+    assert [c.orig_name for c in cities] == ["London", "Москва", "Paris"]
+    assert km[0] < 15 and km[2] < 1
+    cities, km = mgr.nearest_city([0.0], [0.0], max_km=200)
+    assert cities == [None]
+    os.remove(path)
+
+
+def test_compiled_cache():
+    path = create_temp_city_file(CITY_TXT_CONTENT)
+    cold = CityManager(path, cache=True)
+    assert not cold.from_cache
+    assert os.path.exists(cold.cache_path)
+    cold.nearest_city([48.85], [2.35])
+    warm = CityManager(path, cache=True)
+    assert warm.from_cache
+    assert warm._geo_index is not None
+    assert warm.search("г.Москва").orig_name == "Москва"
+    assert warm.find_by_rus("Лондон").latitude == 51.505064
+    assert warm.nearest_city([48.85], [2.35])[0][0].orig_name == "Paris"
+    assert "из кэша" in warm.load_report()
+    # Изменённый city.txt разбирается заново
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("Berlin=г.Берлин_52,52_13,405_Германия__на территории Германии\n")
+    changed = CityManager(path, cache=True)
+    assert not changed.from_cache
+    assert changed.find_by_eng("Berlin") is not None
+    # Повреждённый кэш игнорируется
+    with open(changed.cache_path, "wb") as f:
+        f.write(b"garbage")
+    assert CityManager(path, cache=True).find_by_eng("Berlin") is not None
+    os.remove(changed.cache_path)
+    os.remove(path)
+
+
+DOCUMENT_CONTENT = """' Комментарий в начале
+' ================== ГЕРМАНИЯ ==================
+
+Berlin=г.Берлин_52,52_13,405_Германия__на территории Германии
+Munich=г.Мюнхен_48,137_11,575_Германия__на территории Германии
+' ================== РОССИЯ ==================
+
+Kursk=г.Курск_51,73_36,19_Россия__на территории Курской области
+Tula=г.Тула_54,19_37,61_Россия__на территории Тульской области
+"""
+
+
+def read_file(path: str) -> str:
+    with open(path, encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def test_document_update_in_place():
+    path = create_temp_city_file(DOCUMENT_CONTENT)
+    mgr = CityManager(path)
+    # Та же длина строки — запись на месте, остальной файл не меняется
+    mgr.update_city("Kursk", latitude=51.74)
+    mgr.save()
+    assert read_file(path) == DOCUMENT_CONTENT.replace("51,73", "51,74")
+    # Другая длина — хвост файла переписывается
+    mgr.update_city("Berlin", type_and_rus="г.Берлин-Центр")
+    mgr.save()
+    expected = DOCUMENT_CONTENT.replace("51,73", "51,74").replace(
+        "г.Берлин_", "г.Берлин-Центр_"
+    )
+    assert read_file(path) == expected
+    reloaded = CityManager(path)
+    assert reloaded.find_by_rus("Берлин-Центр").orig_name == "Berlin"
+    assert reloaded.find_by_eng("Kursk").latitude == 51.74
+    os.remove(path)
+
+
+def test_document_insert_and_delete():
+    path = create_temp_city_file(DOCUMENT_CONTENT)
+    mgr = CityManager(path)
+    mgr.add_city(CityRecord("Moscow", "г.Москва", 55.75, 37.62, "Россия"))
+    mgr.add_city(CityRecord("Zhukovsky", "г.Жуковский", 55.6, 38.1, "Россия"))
+    mgr.add_city(CityRecord("Paris", "г.Париж", 48.85, 2.35, "Франция"))
+    mgr.add_city(CityRecord("Rome", "г.Рим", 41.9, 12.5, "Италия"))
+    mgr.delete_city("Munich")
+    with pytest.raises(ValueError):
+        mgr.add_city(CityRecord("Tula", "г.Тула", 0.0, 0.0, "Россия"))
+    mgr.save()
+    lines = read_file(path).splitlines()
+    assert lines == [
+        "' Комментарий в начале",
+        "' ================== ГЕРМАНИЯ ==================",
+        "",
+        "Berlin=г.Берлин_52,52_13,405_Германия__на территории Германии",
+        "' ================== ИТАЛИЯ ==================",
+        "",
+        "Rome=г.Рим_41,9_12,5_Италия_",
+        "' ================== РОССИЯ ==================",
+        "",
+        "Kursk=г.Курск_51,73_36,19_Россия__на территории Курской области",
+        "Moscow=г.Москва_55,75_37,62_Россия_",
+        "Tula=г.Тула_54,19_37,61_Россия__на территории Тульской области",
+        "Zhukovsky=г.Жуковский_55,6_38,1_Россия_",
+        "' ================== ФРАНЦИЯ ==================",
+        "",
+        "Paris=г.Париж_48,85_2,35_Франция_",
+    ]
+    reloaded = CityManager(path)
+    assert reloaded.find_by_eng("Munich") is None
+    assert reloaded.find_by_rus("Москва").country == "Россия"
+    os.remove(path)
+
+
+def test_document_bulk_edits_one_pass():
+    rows = "".join(
+        f"City{i:04d}=н.п.Город{i}_50,{i:04d}_30,5_Россия__\n" for i in range(2000)
+    )
+    path = create_temp_city_file("' ================== РОССИЯ ==================\n" + rows)
+    mgr = CityManager(path)
+    for i in range(0, 2000, 2):
+        mgr.update_city(f"City{i:04d}", description=f"{i} км")
+    mgr.add_city(CityRecord("City0999a", "н.п.Новый", 1.5, 2.5, "Россия"))
+    assert mgr.document.dirty
+    mgr.save()
+    assert not mgr.document.dirty
+    reloaded = CityManager(path)
+    assert len(reloaded.all_cities()) == 2001
+    assert reloaded.find_by_eng("City0998").description == "998 км"
+    assert reloaded.find_by_eng("City0999").description == ""
+    names = [line.split("=")[0] for line in read_file(path).splitlines()[1:]]
+    assert names == sorted(names)
+    os.remove(path)
+
+
+def test_duplicates_by_name_and_coordinates():
+    content = CITY_TXT_CONTENT + (
+        "Moskva=г.Москва_55,754_37,6239_Россия__на территории России\n"
+        "Paris=г.Париж_48,8566_2,3522_Франция__повтор\n"
+    )
+    path = create_temp_city_file(content)
+    mgr = CityManager(path)
+    assert mgr.duplicate_names == ["Paris"]
+    groups = mgr.find_duplicates(tolerance_m=500)
+    assert [[c.orig_name for c in g] for g in groups] == [["Москва", "Moskva"]]
+    assert mgr.merge_duplicates(tolerance_m=500) == ["Moskva"]
+    mgr.save()
+    assert CityManager(path).find_duplicates(tolerance_m=500) == []
+    os.remove(path)
+
+
+def test_reload_only_when_content_changed():
+    path = create_temp_city_file(DOCUMENT_CONTENT)
+    mgr = CityManager(path, cache=True)
+    assert not mgr.reload_if_changed()
+    # Собственное сохранение и пересохранение без правок — не изменение
+    mgr.update_city("Kursk", latitude=51.74)
+    mgr.save()
+    assert not mgr.reload_if_changed()
+    os.utime(path, ns=(0, 0))
+    assert not mgr.reload_if_changed()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("Orel=г.Орёл_52,97_36,07_Россия__\n")
+    assert mgr.reload_if_changed()
+    assert mgr.find_by_rus("Орёл").orig_name == "Orel"
+    assert mgr.find_by_eng("Kursk").latitude == 51.74
+    # Несохранённые правки не теряются: файл не перечитывается
+    mgr.update_city("Tula", description="правка")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("Oryol=г.Орёл-2_52,97_36,07_Россия__\n")
+    assert not mgr.reload_if_changed()
+    assert mgr.find_by_eng("Tula").description == "правка"
+    os.remove(path)
+    os.remove(path + ".cache")
+
+
+@pytest.mark.skipif(os.name == "nt", reason="права доступа POSIX")
+def test_save_keeps_file_mode():
+    path = create_temp_city_file(CITY_TXT_CONTENT)
+    os.chmod(path, 0o664)
+    mgr = CityManager(path)
+    mgr.add_city(CityRecord("Rome", "г.Рим", 41.9, 12.5, "Италия"))
+    # Файл изменён извне после чтения — save переписывает его целиком
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("' правка\n")
+    mgr.save()
+    assert "Rome=" in read_file(path)
+    assert os.stat(path).st_mode & 0o777 == 0o664
+    os.remove(path)
@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+from src.city_manager import CityManager
+from src.city_search import CitySearchIndex, normalize_name
+
+CITY_TXT_CONTENT = """
+London=г.Лондон_51,505064_-0,126634_Англия__на территории Англии
+Moscow=г.Москва_55,754057_37,623898_Россия__на территории России
+Oryol=г.Орёл_52,967_36,069_Россия__на территории России
+Naryan-Mar=н.п.Нарьян-Мар_67,64_53,0_Россия__на территории России
+Mozhaysk=г.Можайск_55,5_36,03_Россия__на территории России
+"""
+
+
+def test_normalize_name():
+    assert normalize_name("г.Орёл") == "орел"
+    assert normalize_name("н.п. Нарьян-Мар") == "нарьян мар"
+    assert normalize_name("г Москва") == "москва"
+    assert normalize_name("  LONDON ") == "london"
+
+
+def test_index_exact_prefix_fuzzy():
+    index = CitySearchIndex(
+        [("Moscow", ["Moscow", "г.Москва"]), ("Mozhaysk", ["Mozhaysk", "г.Можайск"])]
+    )
+    assert index.exact("МОСКВА") == ["Moscow"]
+    assert index.prefix("мо") == ["Moscow", "Mozhaysk"]
+    ranked = index.search("Масква")
+    assert ranked[0][0] == "Moscow"
+    assert 0 < ranked[0][1] < 1
+    assert index.search("москва")[0] == ("Moscow", 1.0)
+    assert index.search("qwerty") == []
+
+
+def test_city_manager_suggest():
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(CITY_TXT_CONTENT)
+    mgr = CityManager(path)
+    assert mgr.suggest("орел")[0][0].orig_name == "Oryol"
+    assert mgr.suggest("Нарьян Мар")[0][0].orig_name == "Naryan-Mar"
+    assert mgr.suggest("londn")[0][0].orig_name == "London"
+    assert [c.orig_name for c, _ in mgr.suggest("Мо", limit=2)] == ["Moscow", "Mozhaysk"]
+    os.remove(path)
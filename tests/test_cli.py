@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Tuple
+
+import pytest
+
+from src.cli import main
+
+HEADER = (
+    "Data,Time,Lat_WGS84,Lon_WGS84,X_SK-42_Gauss_Kruger,Y_SK-42_Gauss_Kruger,"
+    "City_Value,Country_Value,Description of the area,Description of the region,"
+    "Original text\r\n"
+)
+ROWS = (
+    "01.03.2024,06:00,55.75,37.62,,,Москва,Россия,,,ветер 5 м/с\r\n"
+    "02.03.2024,07:30,51.5,-0.12,,,London,Англия,,,туман\r\n"
+    "05.03.2024,09:00,55.76,37.6,,,Москва,Россия,,,ветер 3 м/с\r\n"
+)
+CITY_TXT = (
+    "London=г.Лондон_51,505064_-0,126634_Англия__на территории Англии\n"
+    "Moscow=г.Москва_55,754057_37,623898_Россия__на территории России\n"
+)
+
+
+@pytest.fixture
+def files() -> Tuple[str, str, str]:
+    temp_dir = tempfile.mkdtemp()
+    points = os.path.join(temp_dir, "AllPoint.csv")
+    cities = os.path.join(temp_dir, "city.txt")
+    with open(points, "w", encoding="utf-8", newline="") as f:
+        f.write(HEADER + ROWS)
+    with open(cities, "w", encoding="utf-8") as f:
+        f.write(CITY_TXT)
+    yield temp_dir, points, cities
+    shutil.rmtree(temp_dir)
+
+
+def test_query_prints_csv(files, capsys) -> None:
+    _, points, _ = files
+    code = main(["--csv", points, "query", "--city", "Москва", "--columns", "Data", "Time"])
+    assert code == 0
+    rows = list(csv.reader(io.StringIO(capsys.readouterr().out)))
+    assert rows == [["Data", "Time"], ["01.03.2024", "06:00"], ["05.03.2024", "09:00"]]
+
+
+def test_query_count_and_range(files, capsys) -> None:
+    _, points, _ = files
+    assert main(["--csv", points, "query", "--range", "02.03.2024 ..", "--count"]) == 0
+    assert capsys.readouterr().out.strip() == "2"
+    assert main(["--csv", points, "query", "--city", "Москва", "--text", "3 м/с", "--count"]) == 0
+    assert capsys.readouterr().out.strip() == "1"
+    assert main(["--csv", points, "query", "--bbox", "-90", "-180", "90", "180", "--count"]) == 0
+    assert capsys.readouterr().out.strip() == "3"
+
+
+def test_query_errors(files, capsys) -> None:
+    _, points, _ = files
+    assert main(["--csv", points, "query", "--range", "вчера"]) == 1
+    assert "Ошибка" in capsys.readouterr().err
+    assert main(["--csv", points, "query", "--columns", "Нет"]) == 1
+
+
+def test_export_writes_file(files, capsys) -> None:
+    temp_dir, points, _ = files
+    out = os.path.join(temp_dir, "out.csv")
+    assert main(["--csv", points, "export", "--out", out, "--country", "Англия"]) == 0
+    with open(out, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["City_Value"] for r in rows] == ["London"]
+    assert [name for name in os.listdir(temp_dir) if name.endswith(".tmp")] == []
+
+
+def test_geocode_and_stats(files, capsys) -> None:
+    temp_dir, points, cities = files
+    assert main(["--csv", points, "--cities", cities, "geocode"]) == 0
+    assert "Заполнено точек: 3" in capsys.readouterr().out
+    metrics = os.path.join(temp_dir, "metrics.json")
+    assert main(["--csv", points, "--metrics", metrics, "stats", "--json"]) == 0
+    stats = json.loads(capsys.readouterr().out)
+    assert stats["points"] == 3
+    assert stats["first"] == "01.03.2024 06:00:00"
+    assert stats["top_cities"][0] == ["Moscow", 2]
+    with open(metrics, encoding="utf-8") as f:
+        assert "points.load" in json.load(f)["operations"]
+
+
+def test_city_search(files, capsys) -> None:
+    _, _, cities = files
+    assert main(["--cities", cities, "city", "Москва"]) == 0
+    assert capsys.readouterr().out.startswith("Moscow\t")
+    assert main(["--cities", cities, "city", "Londn"]) == 0
+    assert "London" in capsys.readouterr().out
+
+
+def test_main_does_not_import_gui() -> None:
+    root = os.path.join(os.path.dirname(__file__), "..")
+    code = "import sys, main; print('customtkinter' in sys.modules, 'numpy' in sys.modules)"
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True
+    ).stdout
+    assert out.split() == ["False", "False"]
@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from src.allpoints_manager import AllPointRecord, AllPointsManager, parse_date
+from src.columnar_store import NO_TIMESTAMP, ColumnarPointStore
+
+HEADER = [
+    "Data",
+    "Time",
+    "Lat_WGS84",
+    "Lon_WGS84",
+    "X_SK-42_Gauss_Kruger",
+    "Y_SK-42_Gauss_Kruger",
+    "City_Value",
+    "Country_Value",
+    "Description of the area",
+    "Description of the region",
+    "Original text",
+]
+
+
+def make_record(**values: str) -> AllPointRecord:
+    data = {name: "" for name in HEADER}
+    data.update(values)
+    return AllPointRecord(data)
+
+
+def test_round_trip_keeps_original_strings() -> None:
+    store = ColumnarPointStore(HEADER)
+    rows = [
+        make_record(Lat_WGS84="55.75", Lon_WGS84="37,62", City_Value="Москва"),
+        make_record(Lat_WGS84="55.750", Lon_WGS84="", **{"X_SK-42_Gauss_Kruger": "6179000"}),
+        make_record(Lat_WGS84="abc", **{"Original text": "текст\r\nв две строки"}),
+    ]
+    store.extend(rows)
+    assert len(store) == 3
+    for i, rec in enumerate(rows):
+        assert store.record(i).data == rec.data
+
+
+def test_find_where_is_exact_string_match() -> None:
+    store = ColumnarPointStore(HEADER)
+    store.extend(
+        [
+            make_record(Lat_WGS84="55.75", Lon_WGS84="37.62"),
+            make_record(Lat_WGS84="55.750", Lon_WGS84="37.62"),
+            make_record(Lat_WGS84="55.75", Lon_WGS84="37.6"),
+        ]
+    )
+    assert list(store.find_where({"Lat_WGS84": "55.75", "Lon_WGS84": "37.62"})) == [0]
+    assert list(store.find_where({"Lat_WGS84": "55.750"})) == [1]
+    assert list(store.find_where({"City_Value": "нет"})) == []
+
+
+def test_timestamps_and_truncate() -> None:
+    store = ColumnarPointStore(HEADER)
+    store.extend(
+        [
+            make_record(Data="01.03.2024", Time="06:00"),
+            make_record(Data="2024-03-01", Time=""),
+            make_record(Data="неизвестно", Time="06:00"),
+        ]
+    )
+    day = parse_date("01.03.2024")
+    assert list(store.timestamps) == [day + 6 * 3600, day, NO_TIMESTAMP]
+    store.pop()
+    assert len(store) == 2 and len(store.timestamps) == 2
+    assert np.array_equal(store.float_array("Lat_WGS84"), [np.nan, np.nan], equal_nan=True)
+
+
+def test_columnar_uses_less_memory_than_records() -> None:
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, "AllPoint.csv")
+    try:
+        source = AllPointsManager(path)
+        source.store.extend(
+            make_record(
+                Data=f"{1 + i % 28:02d}.03.2024",
+                Time=f"{i % 24:02d}:00",
+                Lat_WGS84=f"{50 + i / 1000:.4f}",
+                Lon_WGS84=f"{30 + i / 1000:.4f}",
+                City_Value=f"Город {i % 50}",
+                Country_Value="Россия",
+                **{"Original text": f"точка {i}"},
+            )
+            for i in range(5000)
+        )
+        source.rebuild_indexes()
+        source.compact()
+        columnar = AllPointsManager(path, storage="columnar")
+        assert len(columnar) == 5000
+        assert columnar.store.nbytes < 200 * len(columnar)
+        assert [r.data for r in columnar.find_by_city("Город 7")] == [
+            r.data for r in source.find_by_city("Город 7")
+        ]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_set_values() -> None:
+    store = ColumnarPointStore(HEADER)
+    store.extend([make_record(City_Value="A"), make_record(City_Value="B")])
+    store.set_values("City_Value", [1], ["C"])
+    store.set_values("Lat_WGS84", [0, 1], ["55,5", "1e-3"])
+    store.set_values("Original text", [0], ["новый текст"])
+    assert store.column_values("City_Value") == ["A", "C"]
+    assert store.column_values("Lat_WGS84") == ["55,5", "1e-3"]
+    assert store.record(0).original_text == "новый текст"
+    assert list(store.find_where({"City_Value": "C"})) == [1]
+
+
+def test_set_text_updates_only_touched_rows() -> None:
+    store = ColumnarPointStore(HEADER)
+    store.extend([make_record(**{"Original text": f"текст {i}"}) for i in range(5)])
+    # Та же длина в байтах — на место; другая — со сдвигом смещений
+    store.set_values("Original text", [3], ["ТЕКСТ 3"])
+    store.set_values("Original text", [4, 1], ["", "длинный текст 1"])
+    assert store.column_values("Original text") == [
+        "текст 0", "длинный текст 1", "текст 2", "ТЕКСТ 3", ""
+    ]
+    # Буфер, восстановленный из кэша (memoryview), тоже правится
+    exported = {
+        name: (kind, {k: v.copy() for k, v in arrays.items()}, meta)
+        for name, (kind, arrays, meta) in store.export().items()
+    }
+    restored = ColumnarPointStore.restore(HEADER, len(store), exported)
+    restored.set_values("Original text", [0, 2], ["x", "текст два"])
+    assert restored.column_values("Original text") == [
+        "x", "длинный текст 1", "текст два", "ТЕКСТ 3", ""
+    ]
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from src.dedup import CoordinateIndex, find_duplicates
+from src.spatial_index import haversine_km
+
+
+def test_pairs_match_brute_force() -> None:
+    rng = np.random.default_rng(7)
+    lats = rng.uniform(55.0, 55.01, 2000)
+    lons = rng.uniform(37.0, 37.01, 2000)
+    lats[5] = np.nan
+    index = CoordinateIndex(25.0)
+    index.extend(lats, lons)
+    a, b = index.pairs()
+    metres = haversine_km(lats[:, None], lons[:, None], lats[None], lons[None]) * 1000
+    ei, ej = np.nonzero(np.triu(metres <= 25.0, 1))
+    assert set(zip(a.tolist(), b.tolist())) == set(zip(ei.tolist(), ej.tolist()))
+    q, ids = index.near(lats[:3], lons[:3])
+    for k in range(3):
+        assert set(ids[q == k].tolist()) == set(np.flatnonzero(metres[k] <= 25.0).tolist())
+
+
+def test_groups_are_connected_components() -> None:
+    # Цепочка 0–1–2 (по 6 м), отдельно точное совпадение 3 и 5, 4 — одна
+    lats = [55.0, 55.000054, 55.000108, 60.0, 61.0, 60.0]
+    lons = [37.0, 37.0, 37.0, 30.0, 30.0, 30.0]
+    groups = find_duplicates(lats, lons, tolerance_m=10.0)
+    assert [g.tolist() for g in groups] == [[0, 1, 2], [3, 5]]
+    # Через 180-й меридиан и у полюса
+    assert len(find_duplicates([0.0, 0.0], [179.99995, -179.99995], 20.0)) == 1
+    assert len(find_duplicates([89.99999, 89.99999], [0.0, 180.0], 5.0)) == 1
+    with pytest.raises(ValueError):
+        CoordinateIndex(0.0)
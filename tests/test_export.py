@@ -0,0 +1,147 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from typing import Iterator, Tuple
+
+import pytest
+
+import src.export as export
+from src.allpoints_manager import AllPointRecord, AllPointsManager
+from src.city_manager import CityManager, parse_city_line
+from src.export import TXT_NO_NAME, export_points
+from src.point_query import filter_conditions
+
+HEADER = (
+    "Data,Time,Lat_WGS84,Lon_WGS84,X_SK-42_Gauss_Kruger,Y_SK-42_Gauss_Kruger,"
+    "City_Value,Country_Value,Description of the area,Description of the region,"
+    "Original text\r\n"
+)
+ROWS = (
+    "01.03.2024,06:00,55.75,37.62,,,Москва,Россия,5 км сев. г.Москва,Московская обл.,текст 1\r\n"
+    '02.03.2024,07:30,51.5,-0.12,,,London,Англия,,,"многострочный\r\nтекст"\r\n'
+    "05.03.2024,09:00,,,,,Москва,Россия,,,без координат\r\n"
+)
+
+
+@pytest.fixture(params=["records", "columnar", "mmap"])
+def manager(request) -> Iterator[Tuple[AllPointsManager, str]]:
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, "AllPoint.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(HEADER + ROWS)
+    mgr = AllPointsManager(path, storage=request.param)
+    yield mgr, temp_dir
+    if request.param == "mmap":
+        mgr.store.close()
+    shutil.rmtree(temp_dir)
+
+
+def test_csv_export_in_chunks_matches_source(manager, monkeypatch) -> None:
+    mgr, temp_dir = manager
+    monkeypatch.setattr(export, "EXPORT_CHUNK", 2)
+    calls = []
+    out = os.path.join(temp_dir, "out.csv")
+    assert export_points(mgr, out, progress=lambda done, total: calls.append((done, total))) == 3
+    assert calls == [(2, 3), (3, 3)]
+    with open(mgr.csv_path, encoding="utf-8", newline="") as a:
+        with open(out, encoding="utf-8", newline="") as b:
+            assert list(csv.reader(a)) == list(csv.reader(b))
+
+
+def test_txt_export_uses_city_format(manager) -> None:
+    mgr, temp_dir = manager
+    out = os.path.join(temp_dir, "out.txt")
+    assert export_points(mgr, out) == 2  # точка без координат пропускается
+    with open(out, encoding="utf-8") as f:
+        records = [parse_city_line(line) for line in f]
+    assert records[0].orig_name == "Москва"
+    assert records[0].type_and_rus == "5 км сев. г.Москва"
+    assert (records[0].latitude, records[0].longitude) == (55.75, 37.62)
+    assert records[0].description == "01.03.2024 06:00"
+    assert records[0].region == "Московская обл."
+    assert records[1].longitude == -0.12
+
+
+def test_txt_export_round_trip_through_city_manager(manager) -> None:
+    mgr, temp_dir = manager
+    mgr.add_points(
+        [
+            AllPointRecord(
+                {
+                    "Data": "06.03.2024",
+                    "Time": "",
+                    "Lat_WGS84": "55.7",
+                    "Lon_WGS84": "37.5",
+                    "City_Value": "Москва",
+                    "Country_Value": "Россия",
+                    "Description of the area": "юж. окраина_Москвы",
+                    "Description of the region": "на территории\nРоссии",
+                }
+            ),
+            AllPointRecord({"Lat_WGS84": "1,5", "Lon_WGS84": "-2", "City_Value": ""}),
+            AllPointRecord({"Lat_WGS84": "3", "Lon_WGS84": "4", "City_Value": "'A=B"}),
+        ]
+    )
+    out = os.path.join(temp_dir, "out.txt")
+    assert export_points(mgr, out) == 5
+    cities = CityManager(out)
+    cities.load()
+    # Каждая точка с координатами — отдельный город, поля не сдвигаются
+    assert list(cities.cities) == ["Москва", "London", "Москва (2)", TXT_NO_NAME, "A B"]
+    assert cities.duplicate_names == []
+    second = cities.cities["Москва (2)"]
+    assert (second.latitude, second.longitude) == (55.7, 37.5)
+    assert (second.type_and_rus, second.country) == ("юж. окраина Москвы", "Россия")
+    assert (second.description, second.region) == ("06.03.2024", "на территории России")
+    first = cities.cities["Москва"]
+    assert (first.description, first.region) == ("01.03.2024 06:00", "Московская обл.")
+    no_name = cities.cities[TXT_NO_NAME]
+    assert (no_name.latitude, no_name.longitude) == (1.5, -2.0)
+
+
+def test_geojson_export_with_filter(manager) -> None:
+    mgr, temp_dir = manager
+    out = os.path.join(temp_dir, "moscow.geojson")
+    ids = mgr.query(**filter_conditions(city="Москва"))
+    assert export_points(mgr, out, ids, columns=["Data", "Original text"]) == 2
+    with open(out, encoding="utf-8") as f:
+        data = json.load(f)
+    features = data["features"]
+    assert features[0]["geometry"] == {"type": "Point", "coordinates": [37.62, 55.75]}
+    assert features[1]["geometry"] is None
+    assert features[1]["properties"] == {"Data": "05.03.2024", "Original text": "без координат"}
+
+
+def test_failed_export_keeps_previous_file(manager) -> None:
+    mgr, temp_dir = manager
+    out = os.path.join(temp_dir, "out.csv")
+    with open(out, "w", encoding="utf-8") as f:
+        f.write("старое содержимое")
+
+    def cancel(done: int, total: int) -> None:
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        export_points(mgr, out, progress=cancel)
+    with open(out, encoding="utf-8") as f:
+        assert f.read() == "старое содержимое"
+    assert [name for name in os.listdir(temp_dir) if name.endswith(".tmp")] == []
+    with pytest.raises(ValueError):
+        export_points(mgr, out, fmt="xlsx")
+
+
+@pytest.mark.skipif(os.name == "nt", reason="права доступа POSIX")
+def test_export_file_mode(manager) -> None:
+    mgr, temp_dir = manager
+    plain = os.path.join(temp_dir, "plain.txt")
+    with open(plain, "w"):
+        pass
+    out = os.path.join(temp_dir, "out.csv")
+    export_points(mgr, out)
+    # Новый файл — по umask, как при обычном open; заменённый — с его правами
+    assert os.stat(out).st_mode & 0o777 == os.stat(plain).st_mode & 0o777
+    os.chmod(out, 0o640)
+    export_points(mgr, out)
+    assert os.stat(out).st_mode & 0o777 == 0o640
@@ -0,0 +1,54 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Iterator, List, Tuple
+
+import pytest
+
+from src.file_watcher import FileWatcher
+
+
+@pytest.fixture
+def files() -> Iterator[Tuple[str, str, str]]:
+    temp_dir = tempfile.mkdtemp()
+    points = os.path.join(temp_dir, "AllPoint.csv")
+    cities = os.path.join(temp_dir, "city.txt")
+    for path in (points, cities):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("начало\n")
+    yield temp_dir, points, cities
+    shutil.rmtree(temp_dir)
+
+
+def wait_changed(watcher: FileWatcher, timeout: float = 5.0) -> List[str]:
+    # Ждём первое событие, затем даём дойти остальным событиям той же записи
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not watcher._changed:
+        time.sleep(0.02)
+    time.sleep(0.2)
+    return watcher.changed()
+
+
+@pytest.mark.parametrize("use_inotify", [False, True])
+def test_append_and_replace_are_reported(files, use_inotify: bool) -> None:
+    temp_dir, points, cities = files
+    watcher = FileWatcher([points, cities], interval=0.05, use_inotify=use_inotify).start()
+    try:
+        if use_inotify and sys.platform.startswith("linux"):
+            assert watcher.backend == "inotify"
+        elif not use_inotify:
+            assert watcher.backend == "poll"
+        time.sleep(0.1)  # опрос запоминает исходное состояние файлов
+        with open(points, "a", encoding="utf-8") as f:
+            f.write("строка\n")
+        assert wait_changed(watcher) == [points]
+        replacement = os.path.join(temp_dir, "city.tmp")
+        with open(replacement, "w", encoding="utf-8") as f:
+            f.write("новый справочник\n")
+        os.replace(replacement, cities)
+        assert wait_changed(watcher) == [cities]
+        assert watcher.changed() == []
+    finally:
+        watcher.stop()
@@ -0,0 +1,36 @@
+import numpy as np
+
+from src.gauss_kruger import (
+    geodetic_to_gk,
+    gk_to_geodetic,
+    gk_to_wgs84,
+    wgs84_to_gk,
+    wgs84_to_sk42,
+    zone_of,
+)
+
+
+def test_projection_on_krassovsky() -> None:
+    # Четверть меридиана эллипсоида Красовского — 10 002 137,5 м
+    x, y = geodetic_to_gk([0.0, 89.999999], [39.0, 39.0])
+    assert abs(x[0]) < 1e-6 and y[0] == 7500000.0
+    assert abs(x[1] - 10002137.5) < 1.0
+    assert list(zone_of([0.5, 37.6, 179.9, -0.5])) == [1, 7, 30, 60]
+    lat, lon = gk_to_geodetic(*geodetic_to_gk(55.0, 41.9))
+    assert abs(lat - 55.0) < 1e-9 and abs(lon - 41.9) < 1e-9
+
+
+def test_round_trip_and_datum_shift() -> None:
+    rng = np.random.default_rng(1)
+    lats = rng.uniform(41.0, 70.0, 10000)
+    lons = rng.uniform(19.0, 60.0, 10000)
+    x, y = wgs84_to_gk(lats, lons)
+    back_lat, back_lon = gk_to_wgs84(x, y)
+    assert np.abs(back_lat - lats).max() * 111000 < 0.01
+    assert np.abs(back_lon - lons).max() * 111000 < 0.01
+    # Сдвиг СК-42 относительно WGS-84 в Москве — порядка 100–150 м
+    sk_lat, sk_lon = wgs84_to_sk42(55.75, 37.62)
+    shift = np.hypot((sk_lat - 55.75) * 111000, (sk_lon - 37.62) * 111000 * 0.56)
+    assert 80 < shift < 180
+    x, y = wgs84_to_gk(55.75, 37.62)
+    assert 6180000 < x < 6183000 and 7412000 < y < 7415000
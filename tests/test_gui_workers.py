@@ -0,0 +1,107 @@
+import threading
+import time
+from typing import Callable, List
+
+from src.gui_workers import TaskRunner
+
+
+class FakeScheduler:
+    """
+    Замена root.after: отложенные вызовы выполняются вручную через run().
+    """
+
+    def __init__(self):
+        self.pending: List[Callable[[], None]] = []
+
+    def __call__(self, delay_ms: int, callback: Callable[[], None]):
+        self.pending.append(callback)
+
+    def run(self, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            callback = self.pending.pop(0)
+            callback()
+            time.sleep(0.005)
+
+
+def test_result_delivered_on_poll() -> None:
+    schedule = FakeScheduler()
+    runner = TaskRunner(schedule)
+    results = []
+    runner.submit("sum", lambda task: sum(range(10)), on_done=results.append)
+    assert results == []  # результат приходит только через опрос
+    schedule.run()
+    assert results == [45]
+    assert not runner.is_running("sum")
+
+
+def test_error_and_progress() -> None:
+    schedule = FakeScheduler()
+    runner = TaskRunner(schedule)
+    release = threading.Event()
+    progress, errors = [], []
+
+    def work(task):
+        task.report(0.5, "половина")
+        release.wait(5)
+        raise ValueError("сбой")
+
+    runner.submit(
+        "work",
+        work,
+        on_error=errors.append,
+        on_progress=lambda p, m: progress.append((p, m)),
+    )
+    time.sleep(0.05)
+    schedule.pending.pop(0)()
+    assert progress == [(0.5, "половина")]
+    release.set()
+    schedule.run()
+    assert isinstance(errors[0], ValueError)
+
+
+def test_cancel_and_replace() -> None:
+    schedule = FakeScheduler()
+    runner = TaskRunner(schedule)
+    started = threading.Event()
+    results = []
+
+    def slow(task):
+        started.set()
+        while not task.cancelled:
+            time.sleep(0.001)
+        task.check_cancelled()
+
+    runner.submit("load", slow, on_done=results.append)
+    started.wait(5)
+    assert runner.cancel("load")
+    # Задача с тем же именем вытесняет предыдущую
+    runner.submit("search", lambda task: "старый", on_done=results.append)
+    runner.submit("search", lambda task: "новый", on_done=results.append)
+    schedule.run()
+    assert results == ["новый"]
+    assert not runner.active
+
+
+def test_on_finish_after_cancel() -> None:
+    schedule = FakeScheduler()
+    runner = TaskRunner(schedule)
+    started = threading.Event()
+    finished, results = [], []
+
+    def slow(task):
+        started.set()
+        while not task.cancelled:
+            time.sleep(0.001)
+        task.check_cancelled()
+
+    runner.submit("write", slow, on_done=results.append, on_finish=lambda: finished.append(1))
+    runner.submit(
+        "sum", lambda task: 3, on_done=results.append, on_finish=lambda: finished.append(2)
+    )
+    started.wait(5)
+    runner.cancel("write")
+    schedule.run()
+    # Отменённая задача не доставляет результат, но о завершении сообщает
+    assert results == [3]
+    assert finished == [1, 2]
@@ -0,0 +1,116 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+from src.allpoints_manager import AllPointRecord, AllPointsManager
+from src.ingest import discover_files, ingest_folder, parse_file
+
+JSON_POINTS = {
+    "points": [
+        {"date": "01.03.2024", "time": "06:00", "lat": 55.75, "lon": 37.62, "text": "a"},
+        {"date": "01.03.2024", "time": "07:00", "lat": "51,5", "lon": "-0,12"},
+        {"date": "01.03.2024", "comment": "без координат"},
+    ]
+}
+XML_POINTS = """<?xml version="1.0" encoding="utf-8"?>
+<report>
+  <point date="02.03.2024" time="08:00" lat="48.85" lon="2.35"><text>Париж</text></point>
+  <point><date>02.03.2024</date><lat>52.52</lat><lon>13.40</lon></point>
+</report>
+"""
+
+
+def make_input_dir() -> str:
+    temp_dir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(temp_dir, "INPUT", "day1"))
+    with open(os.path.join(temp_dir, "INPUT", "a.json"), "w", encoding="utf-8") as f:
+        json.dump(JSON_POINTS, f)
+    with open(os.path.join(temp_dir, "INPUT", "day1", "b.xml"), "w", encoding="utf-8") as f:
+        f.write(XML_POINTS)
+    with open(os.path.join(temp_dir, "INPUT", "readme.txt"), "w", encoding="utf-8") as f:
+        f.write("не входной файл")
+    return temp_dir
+
+
+def test_discover_and_parse() -> None:
+    temp_dir = make_input_dir()
+    try:
+        files = discover_files(os.path.join(temp_dir, "INPUT"))
+        assert [os.path.basename(p) for p in files] == ["a.json", "b.xml"]
+        json_rows = parse_file(files[0])
+        assert len(json_rows) == 2
+        assert json_rows[0]["Lat_WGS84"] == "55.75"
+        assert json_rows[0]["Original text"] == "a"
+        xml_rows = parse_file(files[1])
+        assert [r["Lon_WGS84"] for r in xml_rows] == ["2.35", "13.40"]
+        assert xml_rows[0]["Original text"] == "Париж"
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_ingest_folder_deduplicates(workers: int) -> None:
+    temp_dir = make_input_dir()
+    try:
+        path = os.path.join(temp_dir, "AllPoint.csv")
+        mgr = AllPointsManager(path)
+        mgr.add_point(
+            AllPointRecord(
+                {"Data": "01.03.2024", "Time": "06:00", "Lat_WGS84": "55.75", "Lon_WGS84": "37.62"}
+            )
+        )
+        seen = []
+        stats = ingest_folder(
+            mgr, os.path.join(temp_dir, "INPUT"), workers=workers, progress=seen.append
+        )
+        assert (stats.files, stats.rows, stats.added, stats.duplicates) == (2, 4, 3, 1)
+        assert not stats.errors and len(seen) == 2
+        assert len(AllPointsManager(path).get_all()) == 4
+        # Повторная загрузка ничего не добавляет
+        again = ingest_folder(mgr, os.path.join(temp_dir, "INPUT"), workers=workers)
+        assert again.added == 0 and again.duplicates == 4
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_ingest_reports_broken_files() -> None:
+    temp_dir = make_input_dir()
+    try:
+        with open(os.path.join(temp_dir, "INPUT", "broken.json"), "w") as f:
+            f.write("{")
+        mgr = AllPointsManager(os.path.join(temp_dir, "AllPoint.csv"))
+        stats = ingest_folder(mgr, os.path.join(temp_dir, "INPUT"), workers=0)
+        assert stats.added == 4
+        assert [os.path.basename(p) for p, _ in stats.errors] == ["broken.json"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_cancel_does_not_wait_for_running_files() -> None:
+    temp_dir = make_input_dir()
+    try:
+        big = os.path.join(temp_dir, "INPUT", "z_big.json")
+        with open(big, "w", encoding="utf-8") as f:
+            json.dump([{"lat": i, "lon": i, "text": "x" * 20} for i in range(300000)], f)
+        started = time.perf_counter()
+        parse_file(big)
+        parse_seconds = time.perf_counter() - started
+        seen = []
+        mgr = AllPointsManager(os.path.join(temp_dir, "AllPoint.csv"))
+        started = time.perf_counter()
+        # Отмена после первого файла: большой файл ещё разбирается в пуле
+        stats = ingest_folder(
+            mgr,
+            os.path.join(temp_dir, "INPUT"),
+            workers=3,
+            progress=seen.append,
+            should_stop=lambda: bool(seen),
+        )
+        assert time.perf_counter() - started < parse_seconds / 2
+        assert stats.files == 1
+    finally:
+        shutil.rmtree(temp_dir)
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+from typing import Iterator, Tuple
+
+import pytest
+
+from src.allpoints_manager import AllPointRecord, AllPointsManager, open_points_manager
+from src.mapped_store import MappedPointStore, row_ends
+from src.settings_manager import SettingsManager
+
+HEADER = (
+    "Data,Time,Lat_WGS84,Lon_WGS84,X_SK-42_Gauss_Kruger,Y_SK-42_Gauss_Kruger,"
+    "City_Value,Country_Value,Description of the area,Description of the region,"
+    "Original text\r\n"
+)
+ROWS = (
+    "01.03.2024,06:00,55.75,37.62,,,Москва,Россия,,,текст 1\r\n"
+    '02.03.2024,07:30,51.5,-0.12,,,London,Англия,,,"многострочный\r\nтекст, ""в кавычках"""\r\n'
+    "\r\n"
+    "05.03.2024,09:00,55.76,37.6,,,Москва,Россия,,,текст 3\r\n"
+)
+
+
+@pytest.fixture
+def csv_file() -> Iterator[Tuple[str, str]]:
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, "AllPoint.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(HEADER + ROWS)
+    yield temp_dir, path
+    shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 1 << 20])
+def test_row_ends_skip_quoted_newlines(chunk: int) -> None:
+    data = b'a,b\r\n1,"x\r\ny"\r\n2,"""q"""\n3,z'
+    ends, open_quote = row_ends(data, 0, len(data), chunk)
+    assert ends.tolist() == [5, 15, 25]
+    assert not open_quote
+    assert row_ends(b'1,"x\n', 0, 5)[1]
+
+
+def test_offsets_give_random_access(csv_file) -> None:
+    _, path = csv_file
+    store = MappedPointStore(list(AllPointsManager(path, lazy=True).header))
+    scan = store.attach(path)
+    assert scan.valid_size == os.path.getsize(path)
+    assert len(store) == 3  # пустая строка — не запись
+    assert store.record(1).original_text == 'многострочный\r\nтекст, "в кавычках"'
+    assert store.value(2, "Data") == "05.03.2024"
+    assert store.column_values("City_Value", 1) == ["London", "Москва"]
+    assert store.find_where({"City_Value": "Москва"}) == [0, 2]
+    store.close()
+
+
+def test_torn_tail_is_not_mapped(csv_file) -> None:
+    _, path = csv_file
+    with open(path, "ab") as f:
+        f.write('06.03.2024,10:00,1,2,,,"оборв'.encode("utf-8"))
+    mgr = AllPointsManager(path, storage="mmap")
+    assert len(mgr) == 3
+    assert mgr.torn_bytes > 0
+    mgr.add_point(AllPointRecord({"Data": "07.03.2024", "City_Value": "Paris"}))
+    reloaded = AllPointsManager(path, storage="mmap")
+    assert [r.city for r in reloaded.get_all()] == ["Москва", "London", "Москва", "Paris"]
+
+
+def test_edits_and_added_points_survive_compact(csv_file) -> None:
+    _, path = csv_file
+    mgr = AllPointsManager(path, storage="mmap")
+    mgr.add_point(AllPointRecord({"Data": "08.03.2024", "City_Value": "Paris"}))
+    mgr.store.set_values("Country_Value", [0, 3], ["РФ", "Франция"])
+    assert mgr.store.record(0).data["Country_Value"] == "РФ"
+    assert mgr.store.column_values("Country_Value")[::3] == ["РФ", "Франция"]
+    mgr.compact()
+    assert mgr.store.mapped_rows == 4
+    assert [r.data["Country_Value"] for r in AllPointsManager(path).get_all()] == [
+        "РФ",
+        "Англия",
+        "Россия",
+        "Франция",
+    ]
+
+
+def test_settings_select_mmap(csv_file) -> None:
+    temp_dir, path = csv_file
+    settings = SettingsManager(os.path.join(temp_dir, "settings.txt"))
+    settings.set("mainDataCSV", path)
+    settings.set("pointsStorage", "mmap")
+    mgr = open_points_manager(settings)
+    assert mgr.storage == "mmap"
+    assert mgr.find_by_city("London")[0].date == "02.03.2024"
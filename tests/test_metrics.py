@@ -0,0 +1,137 @@
+import json
+import os
+import shutil
+import tempfile
+from typing import Iterator
+
+import pytest
+
+from src.allpoints_manager import AllPointsManager
+from src.metrics import METRICS, Metrics, OperationStats, profile_call, timed
+
+HEADER = (
+    "Data,Time,Lat_WGS84,Lon_WGS84,X_SK-42_Gauss_Kruger,Y_SK-42_Gauss_Kruger,"
+    "City_Value,Country_Value,Description of the area,Description of the region,"
+    "Original text\r\n"
+)
+ROWS = (
+    "01.03.2024,06:00,55.75,37.62,,,Москва,Россия,,,текст 1\r\n"
+    "02.03.2024,07:30,51.5,-0.12,,,London,Англия,,,текст 2\r\n"
+)
+
+
+@pytest.fixture
+def metrics() -> Iterator[Metrics]:
+    # Общий экземпляр включается только на время теста
+    METRICS.reset()
+    METRICS.enabled = True
+    try:
+        yield METRICS
+    finally:
+        METRICS.enabled = False
+        METRICS.reset()
+        METRICS.profile_dir = None
+        METRICS.last_profile = None
+
+
+def test_histogram_percentiles() -> None:
+    stats = OperationStats()
+    for ms in [0.05] * 90 + [30.0] * 10:
+        stats.add_time(ms / 1000)
+    assert stats.calls == 100
+    assert stats.percentile_ms(0.5) == 0.1  # верхняя граница корзины
+    assert stats.percentile_ms(0.95) == pytest.approx(30.0)  # не больше максимума
+    assert stats.to_dict()["histogram"]["<=0.1"] == 90
+    assert stats.to_dict()["histogram"]["<=50"] == 10
+
+
+def test_disabled_metrics_record_nothing() -> None:
+    calls = []
+
+    @timed("test.op")
+    def op(x: int) -> int:
+        calls.append(x)
+        return x * 2
+
+    METRICS.reset()
+    assert op(2) == 4
+    assert calls == [2]
+    assert "test.op" not in METRICS.snapshot()
+
+
+def test_timed_counts_calls_rows_and_errors(metrics: Metrics) -> None:
+    @timed("test.find", rows=len)
+    def find(n: int):
+        if n < 0:
+            raise ValueError(n)
+        return list(range(n))
+
+    find(3)
+    find(4)
+    with pytest.raises(ValueError):
+        find(-1)
+    stats = metrics.snapshot()["test.find"]
+    assert stats["calls"] == 3
+    assert stats["errors"] == 1
+    assert stats["rows"] == 7
+
+
+def test_span_and_dump(metrics: Metrics) -> None:
+    with metrics.span("test.write") as span:
+        span.rows = 5
+        span.bytes_written = 2048
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = metrics.dump(os.path.join(temp_dir, "sub", "metrics.json"))
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        op = data["operations"]["test.write"]
+        assert op["calls"] == 1
+        assert op["rows"] == 5
+        assert op["bytes_written"] == 2048
+        assert "test.write" in metrics.report()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_manager_operations_are_recorded(metrics: Metrics) -> None:
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, "AllPoint.csv")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(HEADER + ROWS)
+        manager = AllPointsManager(path)
+        manager.find_by_city("Москва")
+        manager.save()
+        ops = metrics.snapshot()
+        assert ops["points.load"]["calls"] == 1
+        assert ops["points.load"]["rows"] == 2
+        assert ops["points.load"]["bytes_read"] == os.path.getsize(path)
+        assert ops["points.find_ids"]["rows"] == 1
+        assert ops["points.save"]["bytes_written"] == os.path.getsize(path)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("mode", ["cprofile", "tracemalloc"])
+def test_profile_single_action(metrics: Metrics, mode: str) -> None:
+    temp_dir = tempfile.mkdtemp()
+    try:
+        metrics.profile_dir = temp_dir
+        result = profile_call(lambda: sorted(str(i) for i in range(1000)), mode, "city_search")
+        assert len(result) == 1000
+        name, text, path = metrics.last_profile
+        assert name == "city_search"
+        assert text
+        if mode == "cprofile":
+            assert path is not None and os.path.exists(path)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_profile_next_is_taken_once(metrics: Metrics) -> None:
+    metrics.profile_next("cprofile")
+    assert metrics.take_profile_mode() == "cprofile"
+    assert metrics.take_profile_mode() is None
+    with pytest.raises(ValueError):
+        metrics.profile_next("perf")
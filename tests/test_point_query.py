@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from src.allpoints_manager import AllPointRecord, AllPointsManager
+from src.point_query import filter_conditions
+
+STORAGES = ["records", "columnar", "mmap"]
+
+CITIES = [
+    ("Москва", "Россия", 55.75, 37.62),
+    ("Тула", "Россия", 54.19, 37.61),
+    ("Paris", "Франция", 48.85, 2.35),
+    ("London", "Англия", 51.5, -0.12),
+]
+
+
+def make_manager(storage: str, rows: int = 400):
+    temp_dir = tempfile.mkdtemp()
+    mgr = AllPointsManager(os.path.join(temp_dir, "AllPoint.csv"), storage=storage)
+    points = []
+    for i in range(rows):
+        city, country, lat, lon = CITIES[i % len(CITIES)]
+        points.append(
+            AllPointRecord(
+                {
+                    "Data": f"{1 + i % 28:02d}.03.2024",
+                    "Time": f"{i % 24:02d}:00",
+                    "Lat_WGS84": str(lat),
+                    "Lon_WGS84": str(lon),
+                    "City_Value": city,
+                    "Country_Value": country,
+                    "Original text": f"Сообщение {i} из {city}",
+                }
+            )
+        )
+    mgr.add_points(points)
+    return mgr, temp_dir
+
+
+def brute_force(mgr, predicate):
+    return [i for i, rec in enumerate(mgr.get_all()) if predicate(rec)]
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_and_matches_full_scan(storage: str) -> None:
+    mgr, temp_dir = make_manager(storage)
+    try:
+        ids = mgr.query(country="Россия", date_range="05.03.2024 .. 10.03.2024")
+        expected = brute_force(
+            mgr,
+            lambda r: r.country == "Россия" and 5 <= int(r.date[:2]) <= 10,
+        )
+        assert list(ids) == expected
+        ids = mgr.query(
+            city="Тула", bbox=(50.0, 30.0, 60.0, 40.0), text="СООБЩЕНИЕ 1"
+        )
+        expected = brute_force(
+            mgr, lambda r: r.city == "Тула" and "Сообщение 1" in r.original_text
+        )
+        assert list(ids) == expected and expected
+        assert mgr.query_count(city="Paris", country="Россия") == 0
+        # Прямоугольник на все долготы и через 180-й меридиан
+        assert mgr.query_count(bbox=(-90.0, -180.0, 90.0, 180.0)) == len(mgr)
+        assert list(mgr.query(bbox=(40.0, 30.0, 60.0, -170.0))) == brute_force(
+            mgr, lambda r: r.country == "Россия"
+        )
+        assert list(mgr.query(lon_lat=("2.35", "48.85"))) == brute_force(
+            mgr, lambda r: r.city == "Paris"
+        )
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_or_and_counts(storage: str) -> None:
+    mgr, temp_dir = make_manager(storage)
+    try:
+        ids = mgr.query(city="Paris", country="Англия", mode="or")
+        assert list(ids) == brute_force(mgr, lambda r: r.city in ("Paris", "London"))
+        assert mgr.query_count(city="Москва") == 100
+        assert mgr.query_count(date="01.03.2024") == len(
+            brute_force(mgr, lambda r: r.date == "01.03.2024")
+        )
+        assert mgr.query_count() == 400
+        with pytest.raises(ValueError):
+            mgr.query(city="Paris", mode="xor")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_plan_starts_with_most_selective() -> None:
+    mgr, temp_dir = make_manager("columnar")
+    try:
+        plan = mgr.plan_query(
+            country="Россия", city="Тула", date_range=("2024-03-01", "2024-03-28")
+        )
+        steps = plan.explain()
+        # Город по индексу (100 строк) — первым, страна без индекса — проверкой
+        assert steps[0] == ("city", 100, "ids")
+        assert dict((name, how) for name, _, how in steps) == {
+            "city": "ids",
+            "date_range": "intersect",
+            "country": "filter",
+        }
+        assert plan.count() == 100
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_filter_conditions() -> None:
+    assert filter_conditions("Москва") == {"city": "Москва"}
+    assert filter_conditions(lat="55.75") == {"city": ""}
+    assert filter_conditions(lat="55.75", lon="37.62")["lon_lat"] == ("37.62", "55.75")
+    assert "date_range" in filter_conditions(date="01.03.2024 .. 02.03.2024")
+    assert filter_conditions(date="март")["date"] == "март"
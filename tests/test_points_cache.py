@@ -0,0 +1,118 @@
+import os
+import shutil
+
+import pytest
+
+from src.allpoints_manager import AllPointsManager
+from src.points_cache import cache_path, load_cache
+from tests.test_allpoints_manager import HEADER, ROW_1, ROW_2, make_csv, make_point
+
+
+def test_cache_written_and_used() -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        first = AllPointsManager(path, storage="columnar", cache=True)
+        assert os.path.exists(cache_path(path))
+        hit = load_cache(path, first.header)
+        assert hit is not None and not hit.prefix_only
+        second = AllPointsManager(path, storage="columnar", cache=True)
+        assert [r.data for r in second.get_all()] == [r.data for r in first.get_all()]
+        assert second.find_by_city("London")[0].original_text == "многострочный\r\nтекст"
+        # Хранилище из кэша можно изменять (массивы копируются при записи)
+        second.add_point(make_point())
+        assert len(second.find_by_city("Paris")) == 1
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_cache_reads_appended_tail() -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        AllPointsManager(path, storage="columnar", cache=True)
+        AllPointsManager(path, lazy=True).add_point(make_point())
+        assert load_cache(path, AllPointsManager(path, lazy=True).header).prefix_only
+        mgr = AllPointsManager(path, storage="columnar", cache=True)
+        assert [r.city for r in mgr.get_all()] == ["Москва", "London", "Paris"]
+        mgr.add_point(make_point("Lyon"))
+        reloaded = AllPointsManager(path)
+        assert [r.city for r in reloaded.get_all()] == ["Москва", "London", "Paris", "Lyon"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_cache_ignores_rows_appended_after_scan(monkeypatch) -> None:
+    import src.points_cache
+
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    save_cache = src.points_cache.save_cache
+
+    def append_then_save(*args):
+        # Другой процесс дописывает строку между разбором CSV и записью кэша
+        AllPointsManager(path, lazy=True).add_point(make_point())
+        return save_cache(*args)
+
+    try:
+        monkeypatch.setattr(src.points_cache, "save_cache", append_then_save)
+        first = AllPointsManager(path, storage="columnar", cache=True)
+        monkeypatch.undo()
+        assert len(first) == 2
+        hit = load_cache(path, first.header)
+        assert hit is not None and hit.prefix_only and len(hit.store) == 2
+        mgr = AllPointsManager(path, storage="columnar", cache=True)
+        assert [r.city for r in mgr.get_all()] == ["Москва", "London", "Paris"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_cache_edited_and_appended_falls_back_to_csv(monkeypatch) -> None:
+    import src.points_cache
+
+    # Выборочный хеш видит только начало и конец файла
+    monkeypatch.setattr(src.points_cache, "HASH_SAMPLE", 8)
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        AllPointsManager(path, storage="columnar", cache=True)
+        # Середина прежнего содержимого исправлена (длина та же), и файл дописан
+        with open(path, "r+", encoding="utf-8", newline="") as f:
+            f.write(HEADER + ROW_1.replace("Москва", "Моксва"))
+        AllPointsManager(path, lazy=True).add_point(make_point())
+        assert load_cache(path, AllPointsManager(path, lazy=True).header) is None
+        mgr = AllPointsManager(path, storage="columnar", cache=True)
+        assert [r.city for r in mgr.get_all()] == ["Моксва", "London", "Paris"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_stale_cache_falls_back_to_csv() -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        AllPointsManager(path, storage="columnar", cache=True)
+        # Файл переписан вручную: размер тот же, содержимое другое
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(HEADER + ROW_1.replace("Москва", "Моск0а") + ROW_2)
+        mgr = AllPointsManager(path, storage="columnar", cache=True)
+        assert mgr.find_by_city("Моск0а")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_corrupt_cache_falls_back_to_csv() -> None:
+    path, temp_dir = make_csv(HEADER + ROW_1 + ROW_2)
+    try:
+        AllPointsManager(path, storage="columnar", cache=True)
+        with open(cache_path(path), "r+b") as f:
+            f.seek(20)
+            f.write(b"\xff" * 40)
+        mgr = AllPointsManager(path, storage="columnar", cache=True)
+        assert [r.city for r in mgr.get_all()] == ["Москва", "London"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_cache_requires_columnar_storage() -> None:
+    path, temp_dir = make_csv(HEADER)
+    try:
+        with pytest.raises(ValueError):
+            AllPointsManager(path, cache=True)
+    finally:
+        shutil.rmtree(temp_dir)
@@ -0,0 +1,114 @@
+import shutil
+
+import pytest
+
+from src.allpoints_manager import AllPointsManager
+from src.result_view import ResultSet
+from tests.test_allpoints_manager import HEADER, STORAGES, make_csv, make_point
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_sort_and_page(storage: str) -> None:
+    path, temp_dir = make_csv(HEADER)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        mgr.add_points(
+            [
+                make_point("b", Data="02.01.2024", Time="10:00", Lat_WGS84="9.5"),
+                make_point("A", Data="31.12.2023", Time="23:00", Lat_WGS84="10"),
+                make_point("c", Data="", Time="", Lat_WGS84=""),
+                make_point("a", Data="01.01.2024", Time="09:00", Lat_WGS84="-1"),
+            ]
+        )
+        results = ResultSet(mgr, [0, 1, 2, 3])
+        results.sort("City_Value")
+        assert [row[0] for row in results.page(0, 10, ["City_Value"])] == ["A", "a", "b", "c"]
+        # Дата сравнивается как дата, а не как строка; пустые — в конце
+        results.sort("Data")
+        assert results.ids.tolist() == [1, 3, 0, 2]
+        results.sort("Lat_WGS84")
+        assert results.ids.tolist() == [3, 0, 1, 2]
+        # По убыванию пустые значения тоже в конце
+        results.sort("Lat_WGS84", descending=True)
+        assert results.ids.tolist() == [1, 0, 3, 2]
+        assert results.page(1, 2, ["Lat_WGS84", "Time"]) == [["9.5", "10:00"], ["-1", "09:00"]]
+        assert results.record(0).city == "A"
+        results.sort("Data", descending=True)
+        assert results.ids.tolist() == [0, 3, 1, 2]
+        # Порядок колонки пересчитывается после добавления точек
+        mgr.add_point(make_point("0"))
+        subset = ResultSet(mgr, mgr.find_ids("city", "0") + mgr.find_ids("city", "A"))
+        subset.sort("City_Value")
+        assert [r[0] for r in subset.page(0, 5, ["City_Value"])] == ["0", "A"]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_descending_keeps_blanks_last_and_ties_stable(storage: str) -> None:
+    path, temp_dir = make_csv(HEADER)
+    try:
+        mgr = AllPointsManager(path, storage=storage)
+        mgr.add_points(
+            [
+                make_point("a", Lat_WGS84="1"),
+                make_point("", Lat_WGS84=""),
+                make_point("B", Lat_WGS84="2"),
+                make_point("b", Lat_WGS84="1"),
+                make_point("A", Lat_WGS84=""),
+            ]
+        )
+        results = ResultSet(mgr, [4, 3, 2, 1, 0])
+        # Равные значения ("b" и "B", "A" и "a") сохраняют прежний порядок
+        results.sort("City_Value", descending=True)
+        assert results.ids.tolist() == [3, 2, 4, 0, 1]
+        results.sort("City_Value")
+        assert results.ids.tolist() == [4, 0, 3, 2, 1]
+        results.sort("Lat_WGS84", descending=True)
+        assert results.ids.tolist() == [2, 0, 3, 4, 1]
+        results.sort("Lat_WGS84")
+        assert results.ids.tolist() == [0, 3, 2, 4, 1]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_pages_across_boundaries(monkeypatch) -> None:
+    import src.result_view as result_view
+
+    monkeypatch.setattr(result_view, "PAGE_SIZE", 3)
+    monkeypatch.setattr(result_view, "PAGE_CACHE", 2)
+    path, temp_dir = make_csv(HEADER)
+    try:
+        mgr = AllPointsManager(path, storage="columnar")
+        mgr.add_points([make_point(f"c{i:02d}") for i in range(10)])
+        results = ResultSet(mgr, range(10))
+        results.sort("City_Value", descending=True)
+        assert [r[0] for r in results.page(2, 5, ["City_Value"])] == [
+            "c07", "c06", "c05", "c04", "c03"
+        ]
+        assert [r[0] for r in results.page(8, 5, ["City_Value"])] == ["c01", "c00"]
+        assert len(results._pages) <= 2
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_sorted_ids_does_not_touch_result() -> None:
+    path, temp_dir = make_csv(HEADER)
+    try:
+        mgr = AllPointsManager(path, storage="columnar")
+        mgr.add_points([make_point("b"), make_point("a"), make_point("c")])
+        results = ResultSet(mgr, [0, 1, 2])
+        assert results.page(0, 3, ["City_Value"]) == [["b"], ["a"], ["c"]]
+        # Порядок считается в фоне, показ до set_order идёт по прежнему
+        ids = results.sorted_ids("City_Value")
+        assert results.ids.tolist() == [0, 1, 2] and results.sort_column is None
+        assert results.page(0, 3, ["City_Value"]) == [["b"], ["a"], ["c"]]
+        results.set_order(ids, "City_Value")
+        assert results.page(0, 3, ["City_Value"]) == [["a"], ["b"], ["c"]]
+        assert results.sort_column == "City_Value"
+        # После изменения базы страницы читаются заново
+        mgr.store.set_values("City_Value", [1], ["aa"])
+        results.invalidate()
+        assert results.page(0, 1, ["City_Value"]) == [["aa"]]
+    finally:
+        shutil.rmtree(temp_dir)
@@ -0,0 +1,69 @@
+import numpy as np
+
+from src.spatial_index import SpatialIndex, haversine_km
+
+
+def make_points(n: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(40, 60, n), rng.uniform(20, 50, n)
+
+
+def test_radius_and_nearest_match_brute_force() -> None:
+    lats, lons = make_points(5000)
+    index = SpatialIndex(leaf_size=8, buffer_size=16)
+    index.extend(lats[:3000], lons[:3000])
+    # Остальные точки добавляются по одной, с периодическим слиянием буфера
+    for lat, lon in zip(lats[3000:], lons[3000:]):
+        index.add(float(lat), float(lon))
+    assert len(index) == 5000
+    dist = haversine_km(50.0, 35.0, lats, lons)
+
+    ids, km = index.within_radius(50.0, 35.0, 100.0)
+    assert set(ids.tolist()) == set(np.flatnonzero(dist <= 100.0).tolist())
+    assert np.all(np.diff(km) >= 0)
+
+    ids, km = index.nearest(50.0, 35.0, k=7)
+    assert ids.tolist() == np.argsort(dist)[:7].tolist()
+    assert np.allclose(km, np.sort(dist)[:7])
+
+    ids, _ = index.nearest(50.0, 35.0, k=7, max_km=float(np.sort(dist)[2]))
+    assert len(ids) == 3
+
+
+def test_bbox_and_missing_coordinates() -> None:
+    index = SpatialIndex()
+    index.extend(
+        np.array([10.0, np.nan, 10.5, -10.0]), np.array([179.5, 0.0, -179.5, 0.0])
+    )
+    assert index.in_bbox(9.0, 179.0, 11.0, -179.0).tolist() == [0, 2]
+    assert index.in_bbox(-11.0, -1.0, 11.0, 1.0).tolist() == [3]
+    assert index.nearest(10.0, 179.0, k=10)[0].tolist() == [0, 2, 3]
+
+
+def test_bbox_wide_and_antimeridian_match_brute_force() -> None:
+    rng = np.random.default_rng(3)
+    lats, lons = rng.uniform(-90, 90, 10000), rng.uniform(-180, 180, 10000)
+    index = SpatialIndex()
+    index.extend(lats, lons)
+
+    def brute(lat_min, lon_min, lat_max, lon_max):
+        inside = (lats >= lat_min) & (lats <= lat_max)
+        if lon_max - lon_min >= 360:
+            pass
+        elif lon_min <= lon_max:
+            inside &= (lons >= lon_min) & (lons <= lon_max)
+        else:
+            inside &= (lons >= lon_min) | (lons <= lon_max)
+        return np.flatnonzero(inside).tolist()
+
+    for box in [
+        (-90, -180, 90, 180),
+        (-60, -180, 60, 180),
+        (0, 0, 80, 360),
+        (-30, -100, 30, 100),
+        (-45, 170, 45, -170),
+        (-80, 10, 80, -10),
+        (20, 120, 70, -120),
+        (40, 20, 60, 50),
+    ]:
+        assert index.in_bbox(*box).tolist() == brute(*box), box
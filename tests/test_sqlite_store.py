@@ -0,0 +1,217 @@
+import csv
+import os
+import shutil
+import sqlite3
+import tempfile
+from typing import Iterator, Tuple
+
+import pytest
+
+from src.allpoints_manager import AllPointRecord, AllPointsManager, open_points_manager
+from src.cli import main
+from src.settings_manager import SettingsManager
+from src.sqlite_store import SqlitePointsManager, export_sqlite_to_csv, migrate_csv_to_sqlite
+
+HEADER = (
+    "Data,Time,Lat_WGS84,Lon_WGS84,X_SK-42_Gauss_Kruger,Y_SK-42_Gauss_Kruger,"
+    "City_Value,Country_Value,Description of the area,Description of the region,"
+    "Original text\r\n"
+)
+ROWS = (
+    "01.03.2024,06:00,55.75,37.62,,,Москва,Россия,,,Ветер 5 м/с\r\n"
+    '02.03.2024,07:30,51.5,-0.12,,,London,Англия,,,"многострочный\r\nтекст"\r\n'
+    "05.03.2024,09:00,55.76,37.6,,,Москва,Россия,,,ветер 3 м/с\r\n"
+    "06.03.2024,10:00,64.8,179.5,,,Анадырь,Россия,,,\r\n"
+    "07.03.2024,,,,,,,,,,без координат\r\n"
+)
+
+
+@pytest.fixture
+def base() -> Iterator[Tuple[str, str]]:
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, "AllPoint.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(HEADER + ROWS)
+    yield temp_dir, path
+    shutil.rmtree(temp_dir)
+
+
+@pytest.fixture
+def managers(base) -> Iterator[Tuple[AllPointsManager, SqlitePointsManager]]:
+    temp_dir, path = base
+    db_path = os.path.join(temp_dir, "AllPoint.sqlite")
+    assert migrate_csv_to_sqlite(path, db_path) == 5
+    db = SqlitePointsManager(db_path)
+    yield AllPointsManager(path, storage="columnar"), db
+    db.close()
+
+
+def cities(records) -> list:
+    return [rec.city for rec in records]
+
+
+def test_migration_keeps_records_and_uses_wal(managers) -> None:
+    csv_mgr, db = managers
+    assert len(db) == len(csv_mgr) == 5
+    assert [r.data for r in db.get_all()] == [r.data for r in csv_mgr.get_all()]
+    assert db.store.query("PRAGMA journal_mode")[0][0] == "wal"
+    names = {row[0] for row in db.store.query("SELECT name FROM sqlite_master")}
+    assert {"points_city", "points_ts", "points_rtree"} <= names
+
+
+def test_same_answers_as_csv_manager(managers) -> None:
+    csv_mgr, db = managers
+    for mgr in (csv_mgr, db):
+        assert cities(mgr.find_by_city("Москва")) == ["Москва", "Москва"]
+        assert mgr.find_by_lon_lat("-0.12", "51.5")[0].original_text == "многострочный\r\nтекст"
+        assert list(mgr.find_ids_between("02.03.2024", "05.03.2024 23:59")) == [1, 2]
+        assert mgr.count_between(None, "01.03.2024") == 1
+        assert cities(mgr.find_in_bbox(50, -1, 56, 38)) == ["Москва", "London", "Москва"]
+        # Прямоугольник через 180-й меридиан
+        assert cities(mgr.find_in_bbox(60, 170, 70, -170)) == ["Анадырь"]
+        assert cities(mgr.find_within_radius(55.75, 37.62, 5)) == ["Москва", "Москва"]
+        nearest = mgr.find_nearest(51.0, 0.0, k=2)
+        assert cities(rec for rec, _ in nearest) == ["London", "Москва"]
+        assert nearest[0][1] == pytest.approx(csv_mgr.find_nearest(51.0, 0.0)[0][1])
+        assert list(mgr.query(city="Москва", text="ВЕТЕР 3")) == [2]
+        assert list(mgr.query(country="Англия", date="06.03.2024", mode="or")) == [1, 3]
+        assert mgr.query_count(date_range="01.03.2024 .. 02.03.2024") == 2
+        assert [r.data for r in mgr.iter_records({"City_Value": "London"}, ["Data"])] == [
+            {"Data": "02.03.2024"}
+        ]
+
+
+def test_add_points_and_reopen(managers) -> None:
+    _, db = managers
+    point = AllPointRecord(
+        {
+            "Data": "08.03.2024",
+            "Time": "12:00",
+            "Lat_WGS84": "48.8566",
+            "Lon_WGS84": "2.3522",
+            "City_Value": "Paris",
+        }
+    )
+    assert db.add_points([point]) == 1
+    assert db.add_points([point], skip_duplicates_m=100) == 0
+    assert cities(db.find_within_radius(48.85, 2.35, 10)) == ["Paris"]
+    db.close()
+    reopened = SqlitePointsManager(db.csv_path)
+    assert len(reopened) == 6
+    assert reopened.find_by_date("08.03.2024")[0].data["Country_Value"] == ""
+    reopened.close()
+
+
+def test_set_values_updates_spatial_and_time_columns(managers) -> None:
+    _, db = managers
+    db.store.set_values("Lat_WGS84", [4], ["10.0"])
+    db.store.set_values("Lon_WGS84", [4], ["20.0"])
+    db.store.set_values("Data", [0], ["09.03.2024"])
+    assert db.find_in_bbox(9, 19, 11, 21)[0].original_text == "без координат"
+    assert list(db.find_ids_between("09.03.2024", None)) == [0]
+
+
+def test_merge_duplicates_renumbers_rows(managers) -> None:
+    _, db = managers
+    assert db.merge_duplicates(5000) == 1
+    assert len(db) == 4
+    dates = [r.date for r in db.get_all()]
+    assert dates == ["01.03.2024", "02.03.2024", "06.03.2024", "07.03.2024"]
+    assert list(db.find_ids("city", "Анадырь")) == [2]
+    assert cities(db.find_in_bbox(60, 170, 70, -170)) == ["Анадырь"]
+
+
+def test_transaction_rolls_back_on_error(managers) -> None:
+    _, db = managers
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.store.transaction() as conn:
+            conn.execute("INSERT INTO points (id) VALUES (100)")
+            conn.execute("INSERT INTO points (id) VALUES (100)")
+    assert db.store.query("SELECT COUNT(*) FROM points")[0][0] == 5
+
+
+def test_export_round_trip(managers, base) -> None:
+    temp_dir, path = base
+    _, db = managers
+    out = os.path.join(temp_dir, "export.csv")
+    assert export_sqlite_to_csv(db.csv_path, out) == 5
+    with open(path, encoding="utf-8", newline="") as a:
+        with open(out, encoding="utf-8", newline="") as b:
+            assert list(csv.reader(a)) == list(csv.reader(b))
+    with pytest.raises(FileExistsError):
+        migrate_csv_to_sqlite(out, db.csv_path)
+
+
+def test_settings_select_sqlite_and_migrate_once(base) -> None:
+    temp_dir, path = base
+    settings = SettingsManager(os.path.join(temp_dir, "settings.txt"))
+    settings.set("mainDataCSV", path)
+    settings.set("pointsStorage", "sqlite")
+    mgr = open_points_manager(settings)
+    assert isinstance(mgr, SqlitePointsManager)
+    assert mgr.csv_path == os.path.join(temp_dir, "AllPoint.sqlite")
+    assert len(mgr) == 5
+    mgr.close()
+    settings.set("pointsStorage", "csv")
+    assert not isinstance(open_points_manager(settings), SqlitePointsManager)
+
+
+def test_cli_migrate_and_query(base, capsys) -> None:
+    temp_dir, path = base
+    db_path = os.path.join(temp_dir, "points.db")
+    assert main(["--csv", path, "migrate", "--to", "sqlite", "--out", db_path]) == 0
+    assert "Перенесено точек: 5" in capsys.readouterr().out
+    assert main(["--csv", db_path, "query", "--city", "Москва", "--count", "--explain"]) == 0
+    out, err = capsys.readouterr()
+    assert out.strip() == "2"
+    assert "points_city" in err
+    assert main(["--csv", db_path, "stats", "--json"]) == 0
+    assert '"Москва",\n      2' in capsys.readouterr().out
+
+
+def test_refresh_sees_other_connection(managers) -> None:
+    _, db = managers
+    assert db.refresh() == 0
+    other = SqlitePointsManager(db.csv_path)
+    other.add_point(AllPointRecord({"Data": "09.03.2024", "City_Value": "Paris"}))
+    other.close()
+    assert db.refresh() == 1
+    assert len(db) == 6 and db.find_by_city("Paris")[0].date == "09.03.2024"
+    assert db.refresh() == 0
+    db.clear()
+    assert len(db) == 0 and db.find_by_city("Paris") == []
+    assert db.store.query("PRAGMA integrity_check")[0][0] == "ok"
+
+
+def test_two_connections_append_in_turn(managers) -> None:
+    _, db = managers
+    other = SqlitePointsManager(db.csv_path)
+    try:
+        # Оба соединения открыты до записи: номер строки берётся из базы,
+        # а не из числа строк, прочитанного при открытии
+        db.add_point(AllPointRecord({"Data": "08.03.2024", "City_Value": "Paris"}))
+        other.add_point(AllPointRecord({"Data": "09.03.2024", "City_Value": "Tokyo"}))
+        db.add_point(AllPointRecord({"Data": "10.03.2024", "City_Value": "Rome"}))
+        assert len(db) == 8 and len(other) == 7
+        assert other.refresh() == 1
+        assert cities(other.get_all())[5:] == ["Paris", "Tokyo", "Rome"]
+        assert db.store.query("SELECT MAX(id), COUNT(*) FROM points")[0] == (7, 8)
+    finally:
+        other.close()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="права доступа POSIX")
+def test_migrate_and_export_file_modes(managers, base) -> None:
+    temp_dir, path = base
+    _, db = managers
+    plain = os.path.join(temp_dir, "plain.txt")
+    with open(plain, "w"):
+        pass
+    umask_mode = os.stat(plain).st_mode & 0o777
+    assert os.stat(db.csv_path).st_mode & 0o777 == umask_mode
+    out = os.path.join(temp_dir, "export.csv")
+    export_sqlite_to_csv(db.csv_path, out)
+    assert os.stat(out).st_mode & 0o777 == umask_mode
+    os.chmod(out, 0o640)
+    export_sqlite_to_csv(db.csv_path, out)
+    assert os.stat(out).st_mode & 0o777 == 0o640
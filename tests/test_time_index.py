@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from src.columnar_store import NO_TIMESTAMP
+from src.time_index import DAY_SECONDS, TimeIndex, parse_bound, parse_range
+
+
+def test_parse_range() -> None:
+    day = parse_bound("2024-03-01")
+    assert parse_bound("01.03.2024 06:00") == day + 6 * 3600
+    assert parse_bound("01.03.2024", end=True) == day + DAY_SECONDS - 1
+    assert parse_range("01.03.2024") == (day, day + DAY_SECONDS - 1)
+    assert parse_range("2024-03-01 06:00 .. 2024-03-07") == (
+        day + 6 * 3600,
+        day + 7 * DAY_SECONDS - 1,
+    )
+    assert parse_range("2024-03-01 - ") == (day, None)
+    assert parse_range(".. 01.03.2024") == (None, day + DAY_SECONDS - 1)
+    with pytest.raises(ValueError):
+        parse_range("2024-03-01 25:99")
+
+
+def test_extend_keeps_order() -> None:
+    index = TimeIndex()
+    index.extend(np.array([30, NO_TIMESTAMP, 10, 20]), 0)
+    assert index.range(None, None).tolist() == [2, 3, 0]
+    # Новые строки позже имеющихся и вперемешку с ними
+    index.extend(np.array([40, 30]), 4)
+    index.extend(np.array([5, 20]), 6)
+    assert index.range(None, None).tolist() == [6, 2, 3, 7, 0, 5, 4]
+    assert index.range(20, 30).tolist() == [3, 7, 0, 5]
+    assert index.count(31, None) == 1
+    assert index.range(50, 10).tolist() == []